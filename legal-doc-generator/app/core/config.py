@@ -23,6 +23,8 @@ APP_DIR = ROOT_DIR / "app"
 OUTPUT_DIR = APP_DIR / "output"
 LOGS_DIR = APP_DIR / "logs"
 DATA_DIR = APP_DIR / "data"
+TEMPLATES_DIR = APP_DIR / "templates"
+STORAGE_DIR = ROOT_DIR / "storage" / "documents"
 
 # Ensure directories exist
 OUTPUT_DIR.mkdir(exist_ok=True)
@@ -43,6 +45,89 @@ else:
 
 # API Settings
 API_USE_MOCK_DATA = os.getenv("API_USE_MOCK_DATA", "False").lower() in ("true", "1", "t")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "32"))
+# Gemini-compatible REST endpoint to use instead of Google's API, e.g. the local stand-in for load tests
+# (python -m app.loadtest.fake_gemini); no API key is needed for it
+GEMINI_API_ENDPOINT = os.getenv("GEMINI_API_ENDPOINT", "")
+
+# Gemini resilience: overall analysis deadline, retries with backoff, and the circuit breaker
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", "45"))
+GEMINI_ATTEMPT_TIMEOUT_SECONDS = float(os.getenv("GEMINI_ATTEMPT_TIMEOUT_SECONDS", "25"))
+GEMINI_RETRY_MAX_ATTEMPTS = int(os.getenv("GEMINI_RETRY_MAX_ATTEMPTS", "3"))
+GEMINI_RETRY_BASE_DELAY_SECONDS = float(os.getenv("GEMINI_RETRY_BASE_DELAY_SECONDS", "0.5"))
+GEMINI_RETRY_MAX_DELAY_SECONDS = float(os.getenv("GEMINI_RETRY_MAX_DELAY_SECONDS", "8"))
+GEMINI_BREAKER_FAILURE_RATE = float(os.getenv("GEMINI_BREAKER_FAILURE_RATE", "0.5"))
+GEMINI_BREAKER_WINDOW = int(os.getenv("GEMINI_BREAKER_WINDOW", "20"))
+GEMINI_BREAKER_MIN_CALLS = int(os.getenv("GEMINI_BREAKER_MIN_CALLS", "10"))
+GEMINI_BREAKER_OPEN_SECONDS = float(os.getenv("GEMINI_BREAKER_OPEN_SECONDS", "30"))
+
+# Analysis cache settings (in-process LRU in front of a shared SQLite store)
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+ANALYSIS_CACHE_PATH = Path(os.getenv("ANALYSIS_CACHE_PATH", str(DATA_DIR / "analysis_cache.db")))
+ANALYSIS_CACHE_MEMORY_SIZE = int(os.getenv("ANALYSIS_CACHE_MEMORY_SIZE", "1024"))
+ANALYSIS_CACHE_MEMORY_TTL_SECONDS = float(os.getenv("ANALYSIS_CACHE_MEMORY_TTL_SECONDS", "3600"))
+ANALYSIS_CACHE_DISK_TTL_SECONDS = float(os.getenv("ANALYSIS_CACHE_DISK_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Coalescing of identical concurrent analyses; the cross-worker mode uses a lock table in the cache database
+ANALYSIS_COALESCE_CROSS_WORKER = os.getenv("ANALYSIS_COALESCE_CROSS_WORKER", "False").lower() in ("true", "1", "t")
+ANALYSIS_COALESCE_LOCK_TTL_SECONDS = float(os.getenv("ANALYSIS_COALESCE_LOCK_TTL_SECONDS", "90"))
+ANALYSIS_COALESCE_POLL_SECONDS = float(os.getenv("ANALYSIS_COALESCE_POLL_SECONDS", "0.25"))
+
+# Near-duplicate reuse (MinHash/LSH over earlier case descriptions)
+NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "True").lower() in ("true", "1", "t")
+NEAR_DUPLICATE_INDEX_PATH = Path(os.getenv("NEAR_DUPLICATE_INDEX_PATH", str(DATA_DIR / "near_duplicates.db")))
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+NEAR_DUPLICATE_NUM_PERM = int(os.getenv("NEAR_DUPLICATE_NUM_PERM", "128"))
+NEAR_DUPLICATE_BANDS = int(os.getenv("NEAR_DUPLICATE_BANDS", "16"))
+# Stored cases older than the TTL, and the oldest beyond MAX_CASES, are purged as new ones are added
+NEAR_DUPLICATE_TTL_SECONDS = float(os.getenv("NEAR_DUPLICATE_TTL_SECONDS", str(30 * 24 * 3600)))
+NEAR_DUPLICATE_MAX_CASES = int(os.getenv("NEAR_DUPLICATE_MAX_CASES", "100000"))
+
+# Local statute store (BM25 over Turkish-stemmed article text) used to ground relevant_laws
+STATUTE_INDEX_ENABLED = os.getenv("STATUTE_INDEX_ENABLED", "True").lower() in ("true", "1", "t")
+STATUTE_SOURCE_PATH = Path(os.getenv("STATUTE_SOURCE_PATH", str(DATA_DIR / "statutes" / "statutes.jsonl")))
+STATUTE_INDEX_DIR = Path(os.getenv("STATUTE_INDEX_DIR", str(DATA_DIR / "statute_index")))
+STATUTE_CANDIDATES = int(os.getenv("STATUTE_CANDIDATES", "8"))
+
+# Local Yargıtay decision corpus (built with python -m app.services.decision_index), used to ground relevant_decisions
+DECISION_INDEX_ENABLED = os.getenv("DECISION_INDEX_ENABLED", "True").lower() in ("true", "1", "t")
+DECISION_INDEX_DIR = Path(os.getenv("DECISION_INDEX_DIR", str(DATA_DIR / "decision_index")))
+DECISION_CANDIDATES = int(os.getenv("DECISION_CANDIDATES", "5"))
+
+# Dense-vector retrieval of similar articles and decisions (python -m app.services.vector_index), fused with BM25
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "True").lower() in ("true", "1", "t")
+VECTOR_INDEX_DIR = Path(os.getenv("VECTOR_INDEX_DIR", str(DATA_DIR / "vector_index")))
+VECTOR_DIMENSIONS = int(os.getenv("VECTOR_DIMENSIONS", "256"))
+# Corpora at least this large get the IVF-PQ backend, smaller ones are searched exhaustively
+VECTOR_IVF_MIN_SIZE = int(os.getenv("VECTOR_IVF_MIN_SIZE", "50000"))
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "16"))
+# Prompt tokens available for retrieved articles and decisions
+RETRIEVAL_TOKEN_BUDGET = int(os.getenv("RETRIEVAL_TOKEN_BUDGET", "1500"))
+
+# Verification of cited articles and E/K numbers against the law catalog, statute corpus and decision index
+CITATION_VERIFIER_ENABLED = os.getenv("CITATION_VERIFIER_ENABLED", "True").lower() in ("true", "1", "t")
+LAW_CATALOG_PATH = Path(os.getenv("LAW_CATALOG_PATH", str(DATA_DIR / "statutes" / "laws.json")))
+
+# Model tiers: short, clear-cut cases go to the fast model, everything else to the pro model
+MODEL_ROUTER_ENABLED = os.getenv("MODEL_ROUTER_ENABLED", "True").lower() in ("true", "1", "t")
+GEMINI_FAST_MODEL = os.getenv("GEMINI_FAST_MODEL", "gemini-1.5-flash")
+GEMINI_PRO_MODEL = os.getenv("GEMINI_PRO_MODEL", "gemini-1.5-pro")
+GEMINI_FAST_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_FAST_MAX_OUTPUT_TOKENS", "2048"))
+GEMINI_PRO_MAX_OUTPUT_TOKENS = int(os.getenv("GEMINI_PRO_MAX_OUTPUT_TOKENS", "2048"))
+# USD per million prompt / output tokens, for cost accounting
+GEMINI_FAST_INPUT_PRICE = float(os.getenv("GEMINI_FAST_INPUT_PRICE", "0.075"))
+GEMINI_FAST_OUTPUT_PRICE = float(os.getenv("GEMINI_FAST_OUTPUT_PRICE", "0.30"))
+GEMINI_PRO_INPUT_PRICE = float(os.getenv("GEMINI_PRO_INPUT_PRICE", "1.25"))
+GEMINI_PRO_OUTPUT_PRICE = float(os.getenv("GEMINI_PRO_OUTPUT_PRICE", "5.00"))
+# A case goes to the fast tier only if its description is at most this long, its category is not listed here,
+# and the category classifier agrees with its category at least this strongly
+ROUTER_FAST_MAX_CHARS = int(os.getenv("ROUTER_FAST_MAX_CHARS", "600"))
+ROUTER_PRO_CATEGORIES = [c.strip() for c in os.getenv("ROUTER_PRO_CATEGORIES", "ticaret_hukuku,idare_hukuku").split(",")
+                         if c.strip()]
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6"))
+# Fast-tier answers retried on the pro tier: "invalid" (no JSON), "repaired" (truncated or malformed JSON),
+# "missing_sections" (no laws or no decisions)
+ROUTER_ESCALATE_ON = [c.strip() for c in os.getenv("ROUTER_ESCALATE_ON", "invalid,repaired").split(",") if c.strip()]
 
 # Logging configuration
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -52,6 +137,40 @@ LOG_FILE = LOGS_DIR / "app.log"
 DEFAULT_TEMPLATE = DATA_DIR / "templates" / "default_template.docx"
 MAX_FILE_SIZE_MB = 10
 
+# Document index settings (document_id -> generated file lookup)
+DOCUMENT_INDEX_PATH = Path(os.getenv("DOCUMENT_INDEX_PATH", str(DATA_DIR / "document_index.db")))
+# Index entries kept in each process; lookups beyond these go to SQLite
+DOCUMENT_INDEX_CACHE_SIZE = int(os.getenv("DOCUMENT_INDEX_CACHE_SIZE", "10000"))
+# Lazy DOCX: store only each document's render recipe and build the .docx on its first download,
+# so previews that are never downloaded write nothing to app/output
+LAZY_DOCX_ENABLED = os.getenv("LAZY_DOCX_ENABLED", "False").lower() in ("true", "1", "t")
+
+# Rendered-HTML cache for /documents/{id}/content: an in-process LRU over .html sidecars next to the DOCX files.
+# Documents whose HTML is larger than the entry limit are served from the sidecar file instead of memory.
+HTML_CACHE_ENABLED = os.getenv("HTML_CACHE_ENABLED", "True").lower() in ("true", "1", "t")
+HTML_CACHE_MEMORY_BYTES = int(os.getenv("HTML_CACHE_MEMORY_BYTES", str(64 * 1024 * 1024)))
+HTML_CACHE_MAX_ENTRY_BYTES = int(os.getenv("HTML_CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+
+# Render engine settings (worker pool used for DOCX rendering)
+RENDER_POOL_SIZE = int(os.getenv("RENDER_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+RENDER_JOB_TIMEOUT_SECONDS = float(os.getenv("RENDER_JOB_TIMEOUT_SECONDS", "30"))
+RENDER_USE_PROCESSES = os.getenv("RENDER_USE_PROCESSES", "True").lower() in ("true", "1", "t")
+
+# Batch generation (/api/documents/batch): records per request, and renders in flight per batch; finished
+# documents wait for the client to read them, so this also bounds how many are held in memory
+BATCH_MAX_RECORDS = int(os.getenv("BATCH_MAX_RECORDS", "1000"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(2 * RENDER_POOL_SIZE)))
+
+# Asynchronous job queue (SQLite, shared by the web app and app.worker processes)
+JOB_QUEUE_PATH = Path(os.getenv("JOB_QUEUE_PATH", str(DATA_DIR / "jobs.db")))
+JOB_WORKER_CONCURRENCY = int(os.getenv("JOB_WORKER_CONCURRENCY", "4"))
+JOB_RUN_WORKERS_IN_WEB = os.getenv("JOB_RUN_WORKERS_IN_WEB", "True").lower() in ("true", "1", "t")
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# How often each worker process requeues jobs whose lease expired
+JOB_RECOVER_SECONDS = float(os.getenv("JOB_RECOVER_SECONDS", "30"))
+
 # Function to get the API key safely
 def get_gemini_api_key() -> Optional[str]:
     """
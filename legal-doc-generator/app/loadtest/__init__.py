@@ -0,0 +1,3 @@
+"""
+Load testing tools: a local Gemini stand-in and a load generator for the document API
+"""
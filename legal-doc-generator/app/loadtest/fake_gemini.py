@@ -0,0 +1,362 @@
+"""
+Fake Gemini
+A local stand-in for the Gemini generateContent REST API, so the whole document
+pipeline can be load-tested without network access, quota or cost. Point the app
+at it with GEMINI_API_ENDPOINT:
+
+    python -m app.loadtest.fake_gemini --port 8765 --latency lognormal:1.5,0.4 --error-rate 0.02
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 uvicorn app.main:app
+
+Each call waits for a latency drawn from the configured distribution (per model if
+wanted), then fails with an error status, answers with truncated JSON, or answers with
+an analysis. The analysis is a canned response from a file, with $category and $case
+filled in, or by default one built from the prompt: its candidate articles and
+decisions are returned as the picks. GET /stats reports what was served.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from string import Template
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+from app.utils.text import estimate_tokens
+
+# Status names the API returns for each error code
+_STATUS_NAMES = {
+    400: "INVALID_ARGUMENT",
+    403: "PERMISSION_DENIED",
+    429: "RESOURCE_EXHAUSTED",
+    500: "INTERNAL",
+    503: "UNAVAILABLE",
+    504: "DEADLINE_EXCEEDED",
+}
+
+_CATEGORY_LINE = re.compile(r"^Analiz kategorisi: (.*)$", re.MULTILINE)
+_CASE_BLOCK = re.compile(r"^Olay örgüsü:\n(.*?)(?:\n\n|\Z)", re.MULTILINE | re.DOTALL)
+_CANDIDATE_LINE = re.compile(r"^- (.+?) \((.+?)\): (.*)$")
+
+# Sources returned when the prompt has no candidates
+_DEFAULT_LAWS = [
+    {"title": "Türk Medeni Kanunu Madde 2", "description": "Herkes haklarını kullanırken ve borçlarını yerine getirirken dürüstlük kurallarına uymak zorundadır."},
+    {"title": "Türk Borçlar Kanunu Madde 112", "description": "Borç hiç veya gereği gibi ifa edilmezse borçlu, kusursuz olduğunu ispat etmedikçe alacaklının zararını gidermekle yükümlüdür."},
+    {"title": "Hukuk Muhakemeleri Kanunu Madde 190", "description": "İspat yükü, kanunda özel bir düzenleme bulunmadıkça, iddia edilen olgudan kendi lehine hak çıkaran tarafa aittir."},
+]
+_DEFAULT_DECISIONS = [
+    {"case_number": "Yargıtay 3. HD, E. 2019/1234 K. 2019/5678", "date": "12.03.2019", "summary": "Dürüstlük kuralına aykırı hak kullanımı hukuk düzenince korunmaz."},
+    {"case_number": "Yargıtay HGK, E. 2017/2345 K. 2018/1122", "date": "07.02.2018", "summary": "İspat yükü, iddia edilen olgudan lehine hak çıkaran taraftadır."},
+]
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parse a latency distribution in seconds
+
+    Args:
+        spec (str): "fixed:S", "uniform:LOW,HIGH", "normal:MEAN,SD" or "lognormal:MEDIAN,SIGMA"
+
+    Returns:
+        Callable[[random.Random], float]: Draws a non-negative latency from the distribution
+    """
+    kind, _, params = spec.partition(":")
+    try:
+        values = [float(value) for value in params.split(",")] if params else []
+    except ValueError:
+        raise ValueError(f"Invalid latency parameters: {spec}")
+    arity = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if kind not in arity or len(values) != arity[kind] or min(values) < 0:
+        raise ValueError(f"Invalid latency distribution: {spec}")
+
+    if kind == "fixed":
+        return lambda rng: values[0]
+    if kind == "uniform":
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "normal":
+        return lambda rng: max(0.0, rng.gauss(values[0], values[1]))
+    if values[0] == 0:
+        raise ValueError(f"Invalid latency distribution: {spec}")
+    mu = math.log(values[0])
+    return lambda rng: rng.lognormvariate(mu, values[1])
+
+
+def parse_error_mix(spec: str) -> Dict[int, float]:
+    """
+    Parse the mix of error statuses, e.g. "429:0.5,503:0.5"
+
+    Returns:
+        Dict[int, float]: Weight of each status code
+    """
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        code, _, weight = item.partition(":")
+        mix[int(code)] = float(weight or 1)
+    if not mix or min(mix.values()) < 0 or not sum(mix.values()):
+        raise ValueError(f"Invalid error mix: {spec}")
+    return mix
+
+
+def _prompt_fields(prompt: str) -> Dict[str, str]:
+    """The category and case description of an analyzer prompt"""
+    category = _CATEGORY_LINE.search(prompt)
+    case = _CASE_BLOCK.search(prompt)
+    return {"category": category.group(1).strip() if category else "Genel",
+            "case": " ".join(case.group(1).split()) if case else ""}
+
+
+def _candidates(prompt: str, header: str) -> List[tuple]:
+    """The (name, detail, text) candidate lines listed under a header of the prompt"""
+    _, found, rest = prompt.partition(f"{header}\n")
+    if not found:
+        return []
+    candidates = []
+    for line in rest.split("\n"):
+        match = _CANDIDATE_LINE.match(line)
+        if not match:
+            break
+        candidates.append(match.groups())
+    return candidates
+
+
+def build_analysis(prompt: str) -> Dict[str, Any]:
+    """
+    Build a plausible analysis for a prompt of the analyzer
+
+    The candidate articles and decisions in the prompt, if any, are returned as the
+    picks, so citation verification finds them in the local catalog.
+
+    Args:
+        prompt (str): An analysis or section follow-up prompt
+
+    Returns:
+        Dict[str, Any]: An analysis with summary, relevant_laws, relevant_decisions and recommendations
+    """
+    fields = _prompt_fields(prompt)
+    laws = [{"title": title, "description": f"{heading}: {text}"}
+            for title, heading, text in _candidates(prompt, "Aday kanun maddeleri:")[:4]]
+    decisions = [{"case_number": case_number, "date": date, "summary": summary}
+                 for case_number, date, summary in _candidates(prompt, "Aday Yargıtay kararları:")[:3]]
+    return {
+        "summary": f"{fields['category']} kapsamında değerlendirilen olay: {fields['case'][:300]}",
+        "relevant_laws": laws or _DEFAULT_LAWS,
+        "relevant_decisions": decisions or _DEFAULT_DECISIONS,
+        "recommendations": "Delillerin toplanması, karşı tarafa ihtarname gönderilmesi ve yetkili mahkemede dava açılması önerilir.",
+    }
+
+
+def _fill(value: Any, fields: Dict[str, str]) -> Any:
+    """Substitute $category and $case in every string of a canned response"""
+    if isinstance(value, str):
+        return Template(value).safe_substitute(fields)
+    if isinstance(value, list):
+        return [_fill(item, fields) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, fields) for key, item in value.items()}
+    return value
+
+
+class FakeGemini:
+    """Serves generateContent and streamGenerateContent calls with configurable latency, errors and answers"""
+
+    def __init__(self, latency: str = "fixed:0.5", model_latency: Optional[Dict[str, str]] = None,
+                 error_rate: float = 0.0, error_mix: str = "429:0.5,503:0.5", truncate_rate: float = 0.0,
+                 responses: Optional[List[Dict[str, Any]]] = None, stream_chunks: int = 8,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            latency (str): Latency distribution of every call (see parse_latency)
+            model_latency (Dict[str, str], optional): Latency distributions of particular models
+            error_rate (float): Share of calls answered with an error status
+            error_mix (str): Weights of the error statuses (see parse_error_mix)
+            truncate_rate (float): Share of calls answered with JSON cut off midway, as at the output token limit
+            responses (List[Dict[str, Any]], optional): Canned answers to pick from instead of building one
+            stream_chunks (int): Chunks a streamed answer is split into, its latency spread across them
+            seed (int, optional): Seed for reproducible latencies, errors and picks
+        """
+        self.latency = parse_latency(latency)
+        self.model_latency = {model: parse_latency(spec) for model, spec in (model_latency or {}).items()}
+        self.error_rate = error_rate
+        self.error_mix = parse_error_mix(error_mix)
+        self.truncate_rate = truncate_rate
+        self.responses = responses or []
+        self.stream_chunks = max(1, stream_chunks)
+        self.rng = random.Random(seed)
+
+        self.started = time.monotonic()
+        self.outcomes = Counter()
+        self.models = Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _answer(self, body: Dict[str, Any]) -> str:
+        """The answer text for a request, limited to the keys its response schema asks for"""
+        prompt = "".join(part.get("text", "") for content in body.get("contents", [])
+                         for part in content.get("parts", []))
+        if self.responses:
+            analysis = _fill(self.rng.choice(self.responses), _prompt_fields(prompt))
+        else:
+            analysis = build_analysis(prompt)
+        schema = body.get("generationConfig", {}).get("responseSchema")
+        if schema and schema.get("properties"):
+            analysis = {key: value for key, value in analysis.items() if key in schema["properties"]}
+        return json.dumps(analysis, ensure_ascii=False)
+
+    def _error(self, model: str) -> Optional[JSONResponse]:
+        """An error response for this call, drawn with the configured error rate and mix"""
+        if self.rng.random() >= self.error_rate:
+            return None
+        code = self.rng.choices(list(self.error_mix), weights=list(self.error_mix.values()))[0]
+        self.outcomes[f"error_{code}"] += 1
+        status = _STATUS_NAMES.get(code, "UNKNOWN")
+        return JSONResponse(status_code=code, content={
+            "error": {"code": code, "message": f"Simulated {status} error for {model}", "status": status}
+        })
+
+    @staticmethod
+    def _chunk(text: str, model: str, prompt_tokens: int, finish_reason: Optional[str]) -> Dict[str, Any]:
+        candidate = {"content": {"role": "model", "parts": [{"text": text}]}, "index": 0}
+        if finish_reason:
+            candidate["finishReason"] = finish_reason
+        output_tokens = estimate_tokens(text)
+        return {
+            "candidates": [candidate],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "candidatesTokenCount": output_tokens,
+                              "totalTokenCount": prompt_tokens + output_tokens},
+            "modelVersion": model,
+        }
+
+    async def generate(self, model: str, body: Dict[str, Any], stream: bool):
+        """
+        Answer one call
+
+        Args:
+            model (str): The model named in the URL
+            body (Dict[str, Any]): The generateContent request
+            stream (bool): Answer as server-sent events
+
+        Returns:
+            JSONResponse or StreamingResponse
+        """
+        self.models[model] += 1
+        error = self._error(model)
+        if error is not None:
+            return error
+
+        latency = self.model_latency.get(model, self.latency)(self.rng)
+        text = self._answer(body)
+        finish_reason = "STOP"
+        if self.rng.random() < self.truncate_rate:
+            text = text[:self.rng.randint(1, max(1, len(text) - 1))]
+            finish_reason = "MAX_TOKENS"
+            self.outcomes["truncated"] += 1
+        else:
+            self.outcomes["ok"] += 1
+        prompt_tokens = estimate_tokens(json.dumps(body.get("contents", []), ensure_ascii=False))
+
+        if not stream:
+            async with self._tracked():
+                await asyncio.sleep(latency)
+            return JSONResponse(self._chunk(text, model, prompt_tokens, finish_reason))
+
+        size = -(-len(text) // self.stream_chunks)
+        pieces = [text[start:start + size] for start in range(0, len(text), size)] or [""]
+
+        async def events():
+            async with self._tracked():
+                for number, piece in enumerate(pieces, 1):
+                    await asyncio.sleep(latency / len(pieces))
+                    chunk = self._chunk(piece, model, prompt_tokens, finish_reason if number == len(pieces) else None)
+                    yield f"data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @asynccontextmanager
+    async def _tracked(self):
+        """Count the call as in flight while it waits out its latency"""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Return what has been served so far
+
+        Returns:
+            Dict[str, Any]: Calls per outcome and model, current and peak concurrency, and uptime
+        """
+        return {
+            "requests": sum(self.models.values()),
+            "outcomes": dict(self.outcomes),
+            "models": dict(self.models),
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "uptime_seconds": round(time.monotonic() - self.started, 1),
+        }
+
+
+def create_app(fake: FakeGemini) -> FastAPI:
+    """
+    Create the ASGI app serving the Gemini REST routes the analyzer calls
+
+    Args:
+        fake (FakeGemini): The configured stand-in
+
+    Returns:
+        FastAPI: App with POST /v1beta/models/{model}:generateContent, :streamGenerateContent and GET /stats
+    """
+    app = FastAPI(title="Fake Gemini")
+
+    @app.post("/v1beta/models/{model_action}")
+    async def generate_content(model_action: str, request: Request):
+        model, _, action = model_action.partition(":")
+        if action not in ("generateContent", "streamGenerateContent"):
+            raise HTTPException(status_code=404, detail=f"Unknown method: {action}")
+        return await fake.generate(model, await request.json(), stream=action == "streamGenerateContent")
+
+    @app.get("/stats")
+    async def stats():
+        return fake.get_stats()
+
+    return app
+
+
+def _load_responses(path: str) -> List[Dict[str, Any]]:
+    """Canned answers from a JSON file holding one answer object or a list of them"""
+    with open(path, "r", encoding="utf-8") as f:
+        responses = json.load(f)
+    return responses if isinstance(responses, list) else [responses]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.loadtest.fake_gemini")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", default="lognormal:1.5,0.4",
+                        help="fixed:S, uniform:LOW,HIGH, normal:MEAN,SD or lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument("--model-latency", action="append", default=[], metavar="MODEL=SPEC",
+                        help="latency of one model, e.g. gemini-1.5-flash=lognormal:0.6,0.3")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-mix", default="429:0.5,503:0.5", help="status weights, e.g. 429:0.7,500:0.1,503:0.2")
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--responses", help="JSON file of canned answers; $category and $case are filled in")
+    parser.add_argument("--stream-chunks", type=int, default=8)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    model_latency = dict(item.split("=", 1) for item in args.model_latency)
+    fake = FakeGemini(args.latency, model_latency, args.error_rate, args.error_mix, args.truncate_rate,
+                      _load_responses(args.responses) if args.responses else None, args.stream_chunks, args.seed)
+
+    import uvicorn
+    uvicorn.run(create_app(fake), host=args.host, port=args.port, log_level="warning")
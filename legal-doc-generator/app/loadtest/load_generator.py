@@ -0,0 +1,355 @@
+"""
+Load Generator
+Drives POST /api/documents/ai-generate at a target request rate and reports
+throughput, end-to-end and per-stage latency percentiles, and errors broken down by
+the stage they happened in. Requests are sent open-loop, on a fixed schedule (or
+Poisson arrivals) whether or not earlier ones have finished, so a slow server shows
+up as growing latency rather than as a lower request rate.
+
+    python -m app.loadtest.load_generator --rps 20 --duration 60 --start-stack \\
+        --fake-args "--latency lognormal:1.5,0.4 --error-rate 0.02"
+
+With --start-stack the fake Gemini server (app.loadtest.fake_gemini) and the app are
+started locally with GEMINI_API_ENDPOINT pointing at it, so nothing leaves the machine.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shlex
+import signal
+import subprocess
+import sys
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from app.utils.metrics import percentiles
+
+DEFAULT_ENDPOINT = "/api/documents/ai-generate"
+# Timings the API reports in metadata.timings_ms
+STAGES = ("render", "html", "analysis", "total")
+# Summary of the placeholder analysis returned when every analysis attempt failed
+FAILED_ANALYSIS_SUMMARY = "AI analizi başarısız oldu"
+
+_TEMPLATE_DATA = {
+    "kurum": "Ankara Nöbetçi Asliye Hukuk Mahkemesi",
+    "konu": "Dava dilekçesi",
+    "icerik": "Olayın ayrıntıları ekte sunulmuştur.",
+    "ad_soyad": "Ayşe Yılmaz",
+}
+
+SAMPLE_CASES = [
+    {"case_category": "aile_hukuku",
+     "case_description": "Eşimle beş yıldır evliyim ve iki çocuğumuz var. Eşim bir yıldır evi terk etti, çocukların "
+                         "velayetini ve aylık nafaka talep ederek boşanmak istiyorum."},
+    {"case_category": "iş_hukuku",
+     "case_description": "İşverenim sekiz yıllık çalışmamın ardından haklı bir neden göstermeden iş sözleşmemi feshetti. "
+                         "Kıdem ve ihbar tazminatımı ve ödenmeyen fazla mesai ücretlerimi alamadım."},
+    {"case_category": "borçlar_hukuku",
+     "case_description": "Kiracım altı aydır kira bedelini ödemiyor, ihtarname göndermeme rağmen ödeme yapmadı. "
+                         "Tahliye ve birikmiş kira alacağımın tahsili için ne yapabilirim?"},
+    {"case_category": "tüketici_hukuku",
+     "case_description": "İnternetten aldığım çamaşır makinesi ilk haftada arızalandı, satıcı garanti kapsamında "
+                         "değişim yapmayı reddediyor. Ayıplı mal nedeniyle bedel iadesi istiyorum."},
+]
+
+
+def make_request(case: Dict[str, Any], bypass_cache: bool = True) -> Dict[str, Any]:
+    """
+    Build the request body for a case
+
+    Args:
+        case (Dict[str, Any]): case_description and case_category, optionally template_name and template_data
+        bypass_cache (bool): Ask the API not to answer from the analysis cache
+
+    Returns:
+        Dict[str, Any]: An AIDocumentRequest body
+    """
+    return {
+        "template_name": case.get("template_name", "dilekce"),
+        "case_description": case["case_description"],
+        "case_category": case["case_category"],
+        "template_data": case.get("template_data", _TEMPLATE_DATA),
+        "metadata": {"bypass_cache": bypass_cache, **case.get("metadata", {})},
+    }
+
+
+def classify_response(status_code: int, payload: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """
+    Find the stage a response failed in, if it did
+
+    Args:
+        status_code (int): HTTP status of the response
+        payload (Dict[str, Any], optional): The decoded body
+
+    Returns:
+        Optional[Tuple[str, str]]: (stage, kind) of the failure, None for a good response
+    """
+    if status_code >= 400:
+        return "api", f"http_{status_code}"
+    if not isinstance(payload, dict):
+        return "api", "invalid_body"
+    analysis = payload.get("analysis") or {}
+    if (payload.get("metadata") or {}).get("using_mock_data"):
+        return "analysis", "mock_data"
+    if analysis.get("summary") == FAILED_ANALYSIS_SUMMARY:
+        return "analysis", "failed"
+    if not (analysis.get("relevant_laws") and analysis.get("relevant_decisions")):
+        return "analysis", "incomplete"
+    return None
+
+
+class LoadReport:
+    """Collects the outcome of every request of a run"""
+
+    def __init__(self):
+        self.sent = 0
+        self.latencies: List[float] = []
+        self.stage_timings: Dict[str, List[float]] = defaultdict(list)
+        self.errors = Counter()
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, seconds: float, timings: Optional[Dict[str, float]] = None,
+               error: Optional[Tuple[str, str]] = None) -> None:
+        """
+        Record one finished request
+
+        Args:
+            seconds (float): Client-side latency, from sending to the full response (or the failure)
+            timings (Dict[str, float], optional): The server's metadata.timings_ms
+            error (Tuple[str, str], optional): (stage, kind) of the failure
+        """
+        self.latencies.append(seconds * 1000)
+        for stage, value in (timings or {}).items():
+            if stage in STAGES:
+                self.stage_timings[stage].append(value)
+        if error is not None:
+            self.errors[error] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Summarize the run
+
+        Returns:
+            Dict[str, Any]: Request counts, throughput, latency percentiles in milliseconds
+            (client end-to-end and per server stage), and error counts per stage and kind
+        """
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        completed = len(self.latencies)
+        failed = sum(self.errors.values())
+        errors = defaultdict(dict)
+        for (stage, kind), count in sorted(self.errors.items()):
+            errors[stage][kind] = count
+        return {
+            "sent": self.sent,
+            "completed": completed,
+            "succeeded": completed - failed,
+            "failed": failed,
+            "error_rate": round(failed / completed, 4) if completed else 0.0,
+            "elapsed_seconds": round(elapsed, 2),
+            "throughput_rps": round((completed - failed) / elapsed, 2) if elapsed else 0.0,
+            "latency_ms": {"client": _rounded(percentiles(self.latencies)),
+                           **{stage: _rounded(percentiles(self.stage_timings[stage]))
+                              for stage in STAGES if self.stage_timings[stage]}},
+            "errors": dict(errors),
+        }
+
+
+def _rounded(values: Dict[str, float]) -> Dict[str, float]:
+    return {key: round(value, 1) for key, value in values.items()}
+
+
+async def _send(client: httpx.AsyncClient, url: str, body: Dict[str, Any], report: LoadReport) -> None:
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, json=body)
+    except httpx.HTTPError as e:
+        report.record(time.perf_counter() - started, error=("client", type(e).__name__))
+        return
+    try:
+        payload = response.json()
+    except ValueError:
+        payload = None
+    timings = ((payload or {}).get("metadata") or {}).get("timings_ms") if isinstance(payload, dict) else None
+    report.record(time.perf_counter() - started, timings, classify_response(response.status_code, payload))
+
+
+async def run_load(url: str, rps: float, duration: float, cases: List[Dict[str, Any]], poisson: bool = False,
+                   timeout: float = 120.0, bypass_cache: bool = True, seed: Optional[int] = None,
+                   client: Optional[httpx.AsyncClient] = None) -> LoadReport:
+    """
+    Send requests at a target rate for a while, then wait for the outstanding ones
+
+    Args:
+        url (str): URL of the document endpoint
+        rps (float): Target requests per second
+        duration (float): Seconds to keep sending
+        cases (List[Dict[str, Any]]): Cases to cycle through
+        poisson (bool): Exponentially distributed gaps instead of a fixed interval
+        timeout (float): Per-request timeout in seconds
+        bypass_cache (bool): Ask the API not to answer from the analysis cache
+        seed (int, optional): Seed for the arrival gaps
+        client (httpx.AsyncClient, optional): Client to send with, e.g. one bound to an ASGI app in tests
+
+    Returns:
+        LoadReport: The outcome of every request
+    """
+    rng = random.Random(seed)
+    bodies = [make_request(case, bypass_cache) for case in cases]
+    report = LoadReport()
+    owned = client is None
+    if owned:
+        client = httpx.AsyncClient(timeout=timeout, limits=httpx.Limits(max_connections=None))
+
+    tasks = []
+    try:
+        next_send = time.perf_counter()
+        end = next_send + duration
+        while next_send < end:
+            await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+            tasks.append(asyncio.create_task(_send(client, url, bodies[report.sent % len(bodies)], report)))
+            report.sent += 1
+            next_send += rng.expovariate(rps) if poisson else 1 / rps
+        await asyncio.gather(*tasks)
+    finally:
+        report.finished = time.perf_counter()
+        if owned:
+            await client.aclose()
+    return report
+
+
+def format_report(summary: Dict[str, Any]) -> str:
+    """Render a run summary as a plain-text table"""
+    lines = [
+        f"requests   sent {summary['sent']}, completed {summary['completed']}, "
+        f"succeeded {summary['succeeded']}, failed {summary['failed']} ({summary['error_rate']:.1%})",
+        f"throughput {summary['throughput_rps']} successful requests/s over {summary['elapsed_seconds']} s",
+        f"{'latency ms':<12}{'p50':>10}{'p95':>10}{'p99':>10}",
+    ]
+    for stage, values in summary["latency_ms"].items():
+        lines.append(f"  {stage:<10}{values['p50']:>10}{values['p95']:>10}{values['p99']:>10}")
+    for stage, kinds in summary["errors"].items():
+        lines.append(f"errors in {stage}: " + ", ".join(f"{kind} {count}" for kind, count in kinds.items()))
+    if "gemini" in summary:
+        lines.append(f"fake gemini {json.dumps(summary['gemini'])}")
+    return "\n".join(lines)
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{url} was not ready within {timeout} s")
+
+
+@contextmanager
+def start_stack(app_port: int, fake_port: int, fake_args: List[str]) -> Iterator[Tuple[str, str]]:
+    """
+    Run the fake Gemini server and the app, wired together, for the duration of the block
+
+    Args:
+        app_port (int): Port for the app
+        fake_port (int): Port for the fake Gemini server
+        fake_args (List[str]): Extra fake_gemini options (latency, error rate, ...)
+
+    Yields:
+        Tuple[str, str]: Base URLs of the app and of the fake Gemini server
+    """
+    fake_url = f"http://127.0.0.1:{fake_port}"
+    app_url = f"http://127.0.0.1:{app_port}"
+    env = {**os.environ, "GEMINI_API_ENDPOINT": fake_url}
+    processes = []
+
+    def start(*command: str) -> subprocess.Popen:
+        # In a session of their own, so the render engine's worker processes are stopped with the app;
+        # the app logs to app/logs/app.log, which keeps its console output out of the report
+        process = subprocess.Popen([sys.executable, "-m", *command], env=env, stdout=subprocess.DEVNULL,
+                                   stderr=subprocess.DEVNULL, start_new_session=True)
+        processes.append(process)
+        return process
+
+    try:
+        _wait_until_ready(f"{fake_url}/stats", start("app.loadtest.fake_gemini", "--port", str(fake_port), *fake_args))
+        _wait_until_ready(f"{app_url}/api/metrics", start("uvicorn", "app.main:app", "--port", str(app_port),
+                                                          "--log-level", "warning"))
+        yield app_url, fake_url
+    finally:
+        for process in reversed(processes):
+            _stop(process)
+
+
+def _stop(process: subprocess.Popen) -> None:
+    """Terminate a process started by start_stack, and the processes it started"""
+    def send(signum: int) -> None:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signum)
+        else:
+            process.kill() if signum != signal.SIGTERM else process.terminate()
+
+    try:
+        send(signal.SIGTERM)
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        send(getattr(signal, "SIGKILL", signal.SIGTERM))
+    except ProcessLookupError:
+        pass
+
+
+def _load_cases(path: str) -> List[Dict[str, Any]]:
+    """Cases from a JSON Lines file, one request body (or case_description and case_category) per line"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.loadtest.load_generator")
+    parser.add_argument("--url", default="http://127.0.0.1:8000", help="base URL of the app")
+    parser.add_argument("--endpoint", default=DEFAULT_ENDPOINT)
+    parser.add_argument("--rps", type=float, default=5.0)
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--poisson", action="store_true", help="Poisson arrivals instead of a fixed interval")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--cases", help="JSON Lines file of cases; built-in samples otherwise")
+    parser.add_argument("--use-cache", action="store_true", help="let the API answer from its analysis cache")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--start-stack", action="store_true", help="start the fake Gemini server and the app")
+    parser.add_argument("--app-port", type=int, default=8000)
+    parser.add_argument("--fake-port", type=int, default=8765)
+    parser.add_argument("--fake-args", default="", help='fake_gemini options, e.g. "--latency fixed:1 --error-rate 0.05"')
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    cases = _load_cases(args.cases) if args.cases else SAMPLE_CASES
+
+    def run(base_url: str, fake_url: Optional[str] = None) -> Dict[str, Any]:
+        report = asyncio.run(run_load(f"{base_url}{args.endpoint}", args.rps, args.duration, cases, args.poisson,
+                                      args.timeout, not args.use_cache, args.seed))
+        summary = report.summary()
+        if fake_url:
+            summary["gemini"] = httpx.get(f"{fake_url}/stats").json()
+        return summary
+
+    if args.start_stack:
+        with start_stack(args.app_port, args.fake_port, shlex.split(args.fake_args)) as (app_url, fake_url):
+            summary = run(app_url, fake_url)
+    else:
+        summary = run(args.url)
+    print(json.dumps(summary, ensure_ascii=False, indent=2) if args.json else format_report(summary))
+
+
+if __name__ == "__main__":
+    main()
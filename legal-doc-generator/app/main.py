@@ -3,22 +3,37 @@ Hukuk.AI - Legal Document Generator API
 A simplified FastAPI application for generating legal documents
 """
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import FileResponse, JSONResponse, HTMLResponse
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, JSONResponse, HTMLResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable
 import os
 import json
 import uuid
+import time
+import asyncio
 from datetime import datetime
 import logging
 from dotenv import load_dotenv
+from app.services.batch_export import archive_name, parse_records, stream_batch_zip
 from app.services.document_generator import DocumentGenerator
+from app.services.docx_html import docx_to_html, error_html, open_docx_html_stream
+from app.services.html_cache import HTMLCache, IMMUTABLE_CACHE_CONTROL, STREAMED_CACHE_CONTROL, etag_matches, make_etag
 from app.services.ai_service import AILegalAnalyzer
+from app.services.category_classifier import FAMILY_LAW, category_scores
+from app.services.render_engine import get_render_engine
+from app.services.template_compiler import get_template_cache
+from app.services.job_queue import JobWorkerPool, get_job_store, TERMINAL_STATUSES
+from app.utils.concurrency import run_concurrently
+from app.utils.resilience import Deadline, ServiceUnavailableError
+from app.utils.sse import format_sse
 from app.models import DocumentRequest, DocumentResponse, AIDocumentRequest, LegalAnalysis
-from app.core.config import get_gemini_api_key, API_USE_MOCK_DATA
+from app.core.config import (
+    get_gemini_api_key, API_USE_MOCK_DATA, ANALYSIS_DEADLINE_SECONDS,
+    JOB_RUN_WORKERS_IN_WEB, JOB_POLL_SECONDS, BATCH_MAX_RECORDS, MAX_FILE_SIZE_MB
+)
 
 # Load environment variables directly here as well to ensure they're available
 load_dotenv()
@@ -72,6 +87,9 @@ app.add_middleware(
 # Initialize the document generator service
 document_generator = DocumentGenerator()
 
+# Rendered HTML of generated documents, served by /documents/{id}/content
+html_cache = HTMLCache()
+
 # Initialize the AI legal analyzer service with the API key from config
 ai_legal_analyzer = AILegalAnalyzer(api_key=api_key)
 
@@ -100,6 +118,12 @@ class DocumentResponse(BaseModel):
     metadata: Dict[str, Any]
     analysis: Optional[Dict[str, Any]] = None
 
+class BatchDocumentRequest(BaseModel):
+    template_name: str
+    # One template_data object per document; records that are not objects fail on their own, in the manifest
+    records: List[Any]
+    filename_field: Optional[str] = None
+
 # Mount static files after all other routes to prevent conflicts
 # This is important because the order matters in FastAPI
 @app.get("/")
@@ -124,6 +148,9 @@ async def generate_document(request: AIDocumentRequest):
     """
     Generate a document based on AI analysis of the case description
     
+    Rendering (DOCX + HTML preview) and AI analysis are independent, so they run
+    concurrently; if either fails the other is cancelled.
+    
     Args:
         request: The document generation request
         
@@ -133,204 +160,534 @@ async def generate_document(request: AIDocumentRequest):
     try:
         # Log the request
         logger.info(f"Received document generation request: Template={request.template_name}, Category={request.case_category}")
-        description_preview = request.case_description[:100] + "..." if len(request.case_description) > 100 else request.case_description
-        logger.info(f"Case description preview: {description_preview}")
         
         # Create a unique document ID
         document_id = str(uuid.uuid4())
         logger.info(f"Created document ID: {document_id}")
         
-        # Initialize the document generator service
-        generator = DocumentGenerator()
-        logger.info("DocumentGenerator initialized")
+        return await build_document_response(request, document_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error generating document: {str(e)}")
+        logging.exception(e)
+        raise HTTPException(status_code=500, detail=f"Document generation failed: {str(e)}")
+
+async def build_document_response(request: AIDocumentRequest, document_id: str,
+                                  report_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> DocumentResponse:
+    """
+    Render the document and run the AI analysis concurrently, then assemble the response
+    
+    Args:
+        request: The document generation request
+        document_id: ID of the document to generate
+        report_progress: Optional callback receiving partial results ({"document_id", "content"}
+            once the document is rendered, {"analysis"} once the analysis is done)
         
-        # Get the method that will generate the document
-        generate_method = getattr(generator, "generate_document", None)
+    Returns:
+        DocumentResponse: The generated document details and analysis
+    """
+    description_preview = request.case_description[:100] + "..." if len(request.case_description) > 100 else request.case_description
+    logger.info(f"Case description preview: {description_preview}")
+    
+    async def render():
+        result = await render_document_preview(request, document_id, timings)
+        if report_progress:
+            report_progress({"document_id": document_id, "content": result[0]})
+        return result
+    
+    async def analyze():
+        result = await analyze_case_with_retries(request, timings)
+        if report_progress:
+            report_progress({"analysis": result[0]})
+        return result
+    
+    started = time.perf_counter()
+    timings = {}
+    (document_html, _), (analysis_data, using_mock_data) = await run_concurrently(render(), analyze())
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(f"Document pipeline finished in {timings['total']} ms (stages: {timings})")
+    
+    return assemble_document_response(request, document_id, document_html, analysis_data, using_mock_data, timings)
+
+def assemble_document_response(request: AIDocumentRequest, document_id: str, document_html: str,
+                               analysis_data: Dict[str, Any], using_mock_data: bool,
+                               timings: Dict[str, float]) -> DocumentResponse:
+    """
+    Build the response for a rendered document and its finished analysis
+    
+    Shared by the blocking and the streaming endpoint, so both return the same payload,
+    including the family law guidance added to family law cases.
+    
+    Args:
+        request: The document generation request
+        document_id: ID of the generated document
+        document_html: HTML preview of the document
+        analysis_data: The finished analysis
+        using_mock_data: Whether the analysis is mock data
+        timings: Stage timings in milliseconds
         
-        if generate_method:
-            # Log the parameters for debugging
-            import inspect
-            sig = inspect.signature(generate_method)
-            logger.info(f"Found generate_document method with parameters: {list(sig.parameters.keys())}")
-            
-            # Check if the method expects document_id
-            if "document_id" in sig.parameters:
-                logger.info("Calling generate_document with document_id")
-                result = await generate_method(
-                    template_name=request.template_name,
-                    template_data=request.template_data,
-                    document_id=document_id,
-                    output_format="docx"
-                )
-            else:
-                logger.info("Calling generate_document without document_id")
-                result = await generate_method(
-                    template_name=request.template_name,
-                    template_data=request.template_data,
-                    output_format="docx"
-                )
-                
-            # Extract the file path from the result
-            file_path = result.get("document_path") if isinstance(result, dict) else result
-        else:
-            logger.error("Generate document method not found")
-            raise HTTPException(status_code=500, detail="Document generation method not found")
+    Returns:
+        DocumentResponse: The generated document details and analysis
+    """
+    # Log the analysis source for debugging
+    logger.info(f"Analysis data source: {'MOCK DATA' if using_mock_data else 'REAL AI ANALYSIS'}")
+    if analysis_data and not using_mock_data:
+        logger.info(f"Analysis summary: {analysis_data.get('summary', 'No summary')[:100]}...")
+        
+    # Create the response
+    response = DocumentResponse(
+        document_id=document_id,
+        title=f"Belge - {document_id[:8]}",
+        document_type=request.template_name,
+        content=document_html,  # Include the HTML content directly
+        metadata={
+            "category": request.case_category,
+            "description_length": len(request.case_description),
+            "using_mock_data": using_mock_data,
+            "real_analysis": not using_mock_data,
+            "analysis_timestamp": datetime.now().isoformat(),
+            "timings_ms": timings
+        },
+        analysis=analysis_data
+    )
+    
+    # Special handling for family law/divorce cases: ensure we have meaningful family law content
+    is_family_law_case = category_scores(request.case_description)[FAMILY_LAW] > 0
+    
+    if is_family_law_case and not using_mock_data:
+        # Check relevant laws for family law content
+        has_family_law_content = any(
+            category_scores(f"{law.get('title', '')} {law.get('description', '')}")[FAMILY_LAW] > 0
+            for law in (analysis_data or {}).get("relevant_laws", [])
+        )
+        
+        if not has_family_law_content:
+            logger.warning("Family law case detected but no family law content in analysis. Adding family law guidance.")
+            # Add family law guidance to help the user
+            if "relevant_laws" not in analysis_data:
+                analysis_data["relevant_laws"] = []
             
-        # If the file was generated successfully, log it
-        if file_path and os.path.exists(file_path):
-            logger.info(f"Successfully generated document at: {file_path}")
+            analysis_data["relevant_laws"].append({
+                "title": "Türk Medeni Kanunu - Aile Hukuku",
+                "description": "Medeni Kanun'un 118-494 maddeleri arasında düzenlenen aile hukuku, evlenme, boşanma, nafaka, velayet gibi aile ilişkilerini düzenler."
+            })
             
-            # Convert DOCX to HTML for direct display
-            document_html = await convert_docx_to_html(file_path)
-            logger.info(f"Converted document to HTML: {len(document_html)} characters")
-        else:
-            logger.error(f"Failed to generate document, file path not found: {file_path}")
-            raise HTTPException(status_code=500, detail="Document generation failed - output file not found")
+            # Update the response with the enhanced analysis
+            response.analysis = analysis_data
+            logger.info("Added family law guidance to the analysis")
+    
+    return response
+
+@app.post("/api/documents/ai-generate/stream")
+async def generate_document_stream(request: AIDocumentRequest):
+    """
+    Streaming variant of /api/documents/ai-generate using Server-Sent Events
+    
+    Events, in order of availability:
+        start            {"document_id"}
+        summary          the case summary
+        law / decision   each relevant law or court decision as soon as Gemini has produced it
+        recommendations  the recommendations text
+        document         {"document_id", "content"} once the document is rendered
+        complete         the payload /api/documents/ai-generate returns, without the content
+                         already sent with "document"
+        error            {"message"} if the analysis or rendering failed
+    
+    Args:
+        request: The document generation request
         
-        # Use the AI Legal Analyzer to analyze the case and get relevant laws/decisions
-        logger.info(f"Requesting AI analysis for case in category: {request.case_category}")
+    Returns:
+        StreamingResponse: The text/event-stream response
+    """
+    logger.info(f"Received streaming document generation request: Template={request.template_name}, Category={request.case_category}")
+    return StreamingResponse(
+        stream_document_generation(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def stream_document_generation(request: AIDocumentRequest):
+    """
+    Render the document and stream the AI analysis as it is generated
+    
+    Yields:
+        str: Formatted Server-Sent Events
+    """
+    document_id = str(uuid.uuid4())
+    started = time.perf_counter()
+    timings = {}
+    render_task = asyncio.ensure_future(render_document_preview(request, document_id, timings))
+    document_sent = False
+    
+    try:
+        yield format_sse("start", {"document_id": document_id})
         
-        # First, try to get AI analysis with retry mechanism
-        max_retries = 3  # Increased from 2 to 3 for more attempts
-        using_mock_data = False
         analysis_data = None
+        analysis_started = time.perf_counter()
+        async for event, data in ai_legal_analyzer.stream_analysis(
+            request.case_description,
+            request.case_category,
+            deadline=Deadline(ANALYSIS_DEADLINE_SECONDS)
+        ):
+            if event == "complete":
+                analysis_data = data
+            else:
+                if "first_content" not in timings:
+                    timings["first_content"] = round((time.perf_counter() - analysis_started) * 1000, 2)
+                yield format_sse(event, data)
+            if not document_sent and render_task.done():
+                document_html, _ = render_task.result()
+                yield format_sse("document", {"document_id": document_id, "content": document_html})
+                document_sent = True
+        timings["analysis"] = round((time.perf_counter() - analysis_started) * 1000, 2)
         
-        for attempt in range(max_retries):
-            try:
+        document_html, _ = await render_task
+        if not document_sent:
+            yield format_sse("document", {"document_id": document_id, "content": document_html})
+        timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+        
+        analysis_data, using_mock_data = fallback_analysis(request, analysis_data)
+        response = assemble_document_response(request, document_id, document_html, analysis_data,
+                                              using_mock_data, timings)
+        # The HTML already went out with the "document" event
+        yield format_sse("complete", response.model_dump(exclude={"content"}))
+    except ServiceUnavailableError as e:
+        logger.error(f"Streaming analysis unavailable: {str(e)}")
+        yield format_sse("error", {"message": "Yapay zeka analizi şu anda kullanılamıyor. Lütfen daha sonra tekrar deneyin."})
+    except HTTPException as e:
+        yield format_sse("error", {"message": e.detail})
+    except Exception as e:
+        logger.error(f"Error streaming document generation: {str(e)}")
+        logger.exception(e)
+        yield format_sse("error", {"message": f"Document generation failed: {str(e)}"})
+    finally:
+        if not render_task.done():
+            render_task.cancel()
+        elif not render_task.cancelled():
+            render_task.exception()
+
+async def render_document_preview(request: AIDocumentRequest, document_id: str, timings: Dict[str, float]):
+    """
+    Render the requested document and its HTML for direct display
+    
+    Returns:
+        tuple: (HTML preview, path of the generated DOCX)
+    """
+    started = time.perf_counter()
+    result = await document_generator.generate_document(
+        template_name=request.template_name,
+        template_data=request.template_data,
+        document_id=document_id,
+        output_format="docx"
+    )
+    file_path = result.get("document_path") if isinstance(result, dict) else result
+    # Lazy documents only get their file on the first download
+    materialized = result.get("materialized", True) if isinstance(result, dict) else True
+    timings["render"] = round((time.perf_counter() - started) * 1000, 2)
+    
+    if not file_path or (materialized and not os.path.exists(file_path)):
+        logger.error(f"Failed to generate document, file path not found: {file_path}")
+        raise HTTPException(status_code=500, detail="Document generation failed - output file not found")
+    logger.info(f"Successfully generated document {'at' if materialized else 'recipe for'}: {file_path}")
+    
+    # The renderer returns the HTML alongside the DOCX; only convert the file if it did not
+    started = time.perf_counter()
+    content_hash = result.get("content_hash") if isinstance(result, dict) else None
+    document_html = result.get("html") if isinstance(result, dict) else None
+    if document_html is None:
+        document_html = await convert_docx_to_html(file_path, document_id, content_hash)
+    elif content_hash:
+        await html_cache.set(document_id, content_hash, file_path, document_html, write_sidecar=materialized)
+    timings["html"] = round((time.perf_counter() - started) * 1000, 2)
+    logger.info(f"Rendered document HTML: {len(document_html)} characters")
+    return document_html, file_path
+
+async def analyze_case_with_retries(request: AIDocumentRequest, timings: Dict[str, float]):
+    """
+    Run the AI analysis for the request, retrying when sections come back empty
+    
+    Transient Gemini errors are retried inside the analyzer with backoff; here we only retry
+    incomplete answers, and never once the analysis deadline has passed or Gemini is unavailable.
+    When only laws or decisions are missing, just those sections are requested again.
+    
+    Returns:
+        tuple: (analysis data, whether mock data was used)
+    """
+    started = time.perf_counter()
+    deadline = Deadline(ANALYSIS_DEADLINE_SECONDS)
+    
+    # Use the AI Legal Analyzer to analyze the case and get relevant laws/decisions
+    logger.info(f"Requesting AI analysis for case in category: {request.case_category}")
+    
+    # First, try to get AI analysis with retry mechanism
+    max_retries = 3  # Increased from 2 to 3 for more attempts
+    analysis_data = None
+    bypass_cache = bool((request.metadata or {}).get("bypass_cache"))
+    
+    for attempt in range(max_retries):
+        if attempt > 0 and deadline.expired:
+            logger.warning(f"Analysis deadline of {ANALYSIS_DEADLINE_SECONDS}s reached, not retrying")
+            break
+        try:
+            if analysis_data is None:
                 logger.info(f"AI analysis attempt {attempt+1}/{max_retries} - FORCING REAL ANALYSIS")
                 # Get AI analysis for the case - force real AI analysis 
                 analysis_data = await ai_legal_analyzer.analyze_case(
                     case_description=request.case_description,
                     case_category=request.case_category,
-                    force_real_analysis=True  # Always force real analysis
+                    force_real_analysis=True,  # Always force real analysis
+                    # Retries after a failed attempt must not be served from the cache
+                    bypass_cache=bypass_cache or attempt > 0,
+                    deadline=deadline
+                )
+            else:
+                # Keep the summary and recommendations we have; only ask for the empty sections
+                logger.info(f"AI analysis attempt {attempt+1}/{max_retries} - requesting missing sections only")
+                analysis_data = await ai_legal_analyzer.complete_missing_sections(
+                    case_description=request.case_description,
+                    case_category=request.case_category,
+                    analysis_data=analysis_data,
+                    deadline=deadline
                 )
-                
-                # Verify we have actual content (not empty sections)
-                has_laws = len(analysis_data.get("relevant_laws", [])) > 0
-                has_decisions = len(analysis_data.get("relevant_decisions", [])) > 0
-                
-                if has_laws and has_decisions:
-                    logger.info(f"✅ AI analysis completed successfully with content - Laws: {len(analysis_data.get('relevant_laws', []))}, Decisions: {len(analysis_data.get('relevant_decisions', []))}")
-                    break
-                else:
-                    logger.warning(f"⚠️ AI returned empty or incomplete analysis, will retry. Has laws: {has_laws}, Has decisions: {has_decisions}")
-                    
-            except Exception as analysis_error:
-                logger.error(f"Error during AI analysis attempt {attempt+1}: {str(analysis_error)}")
-                logger.exception(analysis_error)
-        
-        # Only fall back to mock data if real analysis completely fails and if mock data is allowed
-        if (not analysis_data or (not len(analysis_data.get("relevant_laws", [])) and not len(analysis_data.get("relevant_decisions", [])))) and MOCK_DATA_ENABLED:
-            logger.warning("Falling back to mock data for analysis after failed attempts - THIS SHOULD NOT HAPPEN IN PRODUCTION")
-            analysis_data = ai_legal_analyzer._get_mock_analysis(request.case_category)
-            using_mock_data = True
-        elif not analysis_data:
-            logger.error("AI analysis failed and mock data is not allowed or disabled")
-            analysis_data = {
-                "summary": "AI analizi başarısız oldu",
-                "relevant_laws": [
-                    {
-                        "title": "Analiz Hatası",
-                        "description": "Yapay zeka analizi başarısız oldu. Lütfen daha ayrıntılı bir olay özeti yazarak tekrar deneyin."
-                    }
-                ],
-                "relevant_decisions": [
-                    {
-                        "case_number": "Hata",
-                        "date": "Belirsiz",
-                        "summary": "Yapay zeka analizi başarısız oldu. Lütfen olay özetini genişleterek tekrar deneyin."
-                    }
-                ],
-                "recommendations": "Lütfen olay özetinizi daha ayrıntılı açıklayarak tekrar deneyin. En az 200 karakter içeren detaylı bir açıklama, yapay zeka analizinin daha doğru olmasını sağlar."
-            }
-        
-        # Log the analysis source for debugging
-        logger.info(f"Analysis data source: {'MOCK DATA' if using_mock_data else 'REAL AI ANALYSIS'}")
-        if analysis_data and not using_mock_data:
-            logger.info(f"Analysis summary: {analysis_data.get('summary', 'No summary')[:100]}...")
-            
-        # Create the response
-        response = DocumentResponse(
-            document_id=document_id,
-            title=f"Belge - {document_id[:8]}",
-            document_type=request.template_name,
-            content=document_html,  # Include the HTML content directly
-            metadata={
-                "category": request.case_category,
-                "description_length": len(request.case_description),
-                "using_mock_data": using_mock_data,
-                "real_analysis": not using_mock_data,
-                "analysis_timestamp": datetime.now().isoformat()
-            },
-            analysis=analysis_data
-        )
-        
-        # Special handling for family law/divorce cases: ensure we have meaningful family law content
-        family_law_keywords = ['boşan', 'boşanma', 'nafaka', 'velayet', 'çocuk', 'evlilik', 'aile']
-        is_family_law_case = any(keyword in request.case_description.lower() for keyword in family_law_keywords)
-        
-        if is_family_law_case and not using_mock_data:
-            # Check if we have family law content in the analysis
-            has_family_law_content = False
-            
-            # Check relevant laws for family law content
-            family_law_indicators = ['medeni', 'aile', 'boşanma', 'nafaka', 'velayet']
             
-            if analysis_data and "relevant_laws" in analysis_data:
-                for law in analysis_data["relevant_laws"]:
-                    law_text = str(law.get("title", "")) + str(law.get("description", ""))
-                    if any(indicator in law_text.lower() for indicator in family_law_indicators):
-                        has_family_law_content = True
-                        break
+            # Verify we have actual content (not empty sections)
+            has_laws = len(analysis_data.get("relevant_laws", [])) > 0
+            has_decisions = len(analysis_data.get("relevant_decisions", [])) > 0
             
-            if not has_family_law_content:
-                logger.warning("Family law case detected but no family law content in analysis. Adding family law guidance.")
-                # Add family law guidance to help the user
-                if "relevant_laws" not in analysis_data:
-                    analysis_data["relevant_laws"] = []
-                
-                analysis_data["relevant_laws"].append({
-                    "title": "Türk Medeni Kanunu - Aile Hukuku",
-                    "description": "Medeni Kanun'un 118-494 maddeleri arasında düzenlenen aile hukuku, evlenme, boşanma, nafaka, velayet gibi aile ilişkilerini düzenler."
-                })
+            if has_laws and has_decisions:
+                logger.info(f"✅ AI analysis completed successfully with content - Laws: {len(analysis_data.get('relevant_laws', []))}, Decisions: {len(analysis_data.get('relevant_decisions', []))}")
+                break
+            else:
+                logger.warning(f"⚠️ AI returned empty or incomplete analysis, will retry. Has laws: {has_laws}, Has decisions: {has_decisions}")
                 
-                # Update the response with the enhanced analysis
-                response.analysis = analysis_data
-                logger.info("Added family law guidance to the analysis")
+        except ServiceUnavailableError as unavailable_error:
+            # Already retried with backoff (or rejected by the circuit breaker); another attempt would only add latency
+            logger.error(f"AI analysis unavailable: {str(unavailable_error)}")
+            break
+        except Exception as analysis_error:
+            logger.error(f"Error during AI analysis attempt {attempt+1}: {str(analysis_error)}")
+            logger.exception(analysis_error)
+    
+    analysis_data, using_mock_data = fallback_analysis(request, analysis_data)
+    timings["analysis"] = round((time.perf_counter() - started) * 1000, 2)
+    return analysis_data, using_mock_data
+
+def fallback_analysis(request: AIDocumentRequest, analysis_data: Optional[Dict[str, Any]]):
+    """
+    Replace a failed or empty analysis with mock data, if allowed, or an error analysis
+    
+    Returns:
+        tuple: (analysis data, whether mock data was used)
+    """
+    using_mock_data = False
+    # Only fall back to mock data if real analysis completely fails and if mock data is allowed
+    if (not analysis_data or (not len(analysis_data.get("relevant_laws", [])) and not len(analysis_data.get("relevant_decisions", [])))) and MOCK_DATA_ENABLED:
+        logger.warning("Falling back to mock data for analysis after failed attempts - THIS SHOULD NOT HAPPEN IN PRODUCTION")
+        analysis_data = ai_legal_analyzer._get_mock_analysis(request.case_category)
+        using_mock_data = True
+    elif not analysis_data:
+        logger.error("AI analysis failed and mock data is not allowed or disabled")
+        analysis_data = {
+            "summary": "AI analizi başarısız oldu",
+            "relevant_laws": [
+                {
+                    "title": "Analiz Hatası",
+                    "description": "Yapay zeka analizi başarısız oldu. Lütfen daha ayrıntılı bir olay özeti yazarak tekrar deneyin."
+                }
+            ],
+            "relevant_decisions": [
+                {
+                    "case_number": "Hata",
+                    "date": "Belirsiz",
+                    "summary": "Yapay zeka analizi başarısız oldu. Lütfen olay özetini genişleterek tekrar deneyin."
+                }
+            ],
+            "recommendations": "Lütfen olay özetinizi daha ayrıntılı açıklayarak tekrar deneyin. En az 200 karakter içeren detaylı bir açıklama, yapay zeka analizinin daha doğru olmasını sağlar."
+        }
+    
+    return analysis_data, using_mock_data
+
+@app.post("/api/documents/batch")
+async def generate_document_batch(request: BatchDocumentRequest):
+    """
+    Generate one document per record and stream them back as a ZIP archive
+    
+    Documents are rendered in parallel and added to the archive as they finish. The
+    archive ends with manifest.json, which lists each record's file or its error.
+    
+    Args:
+        request: The template, its records, and optionally the record field naming each file
         
-        return response
-    except Exception as e:
-        logging.error(f"Error generating document: {str(e)}")
-        logging.exception(e)
-        raise HTTPException(status_code=500, detail=f"Document generation failed: {str(e)}")
+    Returns:
+        StreamingResponse: The ZIP archive
+    """
+    return batch_zip_response(request.template_name, request.records, request.filename_field)
+
+@app.post("/api/documents/batch/upload")
+async def upload_document_batch(template_name: str = Form(...), file: UploadFile = File(...),
+                                filename_field: Optional[str] = Form(None)):
+    """
+    Generate one document per row of an uploaded CSV or JSONL file, streamed back as a ZIP archive
+    
+    CSV columns (or JSONL object keys) are the template's fields; see /api/documents/batch.
+    """
+    limit = MAX_FILE_SIZE_MB * 1024 * 1024
+    data = await file.read(limit + 1)
+    if len(data) > limit:
+        raise HTTPException(
+            status_code=413,
+            detail={"message": "Batch file too large", "errors": [f"Upload at most {MAX_FILE_SIZE_MB} MB"]}
+        )
+    try:
+        records = parse_records(data, file.filename, file.content_type)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"message": "Invalid batch file", "errors": [str(e)]})
+    return batch_zip_response(template_name, records, filename_field)
+
+def batch_zip_response(template_name: str, records: List[Any], filename_field: Optional[str] = None) -> StreamingResponse:
+    """
+    Start streaming a batch as a ZIP archive
+
+    The template has to be one of the compiled templates: the generic layout would
+    accept any name, so a misspelled one would otherwise fill the archive with the
+    wrong document.
+    
+    Raises:
+        HTTPException: 400 for an unknown template, or if there are no records or more than BATCH_MAX_RECORDS
+    """
+    templates = get_template_cache()
+    if template_name not in templates:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Unknown template", "errors": [f"Available templates: {', '.join(templates.names())}"]}
+        )
+    if not records:
+        raise HTTPException(status_code=400, detail={"message": "Empty batch", "errors": ["No records were given"]})
+    if len(records) > BATCH_MAX_RECORDS:
+        raise HTTPException(
+            status_code=400,
+            detail={"message": "Batch too large", "errors": [f"At most {BATCH_MAX_RECORDS} records per batch"]}
+        )
+    
+    logger.info(f"Streaming batch of {len(records)} documents: Template={template_name}")
+    
+    async def render(template_data):
+        return await document_generator.render_document_bytes(template_name, template_data)
+    
+    return StreamingResponse(
+        stream_batch_zip(template_name, records, render, filename_field),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{archive_name(template_name)}"'}
+    )
+
+AI_DOCUMENT_JOB = "ai_document"
+
+@app.post("/api/jobs", status_code=202)
+async def create_job(request: AIDocumentRequest):
+    """
+    Queue an AI document generation job and return immediately
+    
+    The job runs the same pipeline as /api/documents/ai-generate in a worker; poll
+    GET /api/jobs/{job_id} or subscribe to /api/jobs/{job_id}/ws for its progress.
+    
+    Args:
+        request: The document generation request
+        
+    Returns:
+        dict: The job id and where to follow it
+    """
+    job_id = await asyncio.to_thread(get_job_store().enqueue, AI_DOCUMENT_JOB, request.model_dump())
+    job_worker_pool.notify()
+    logger.info(f"Queued document generation job {job_id}: Template={request.template_name}, Category={request.case_category}")
+    return {
+        "job_id": job_id,
+        "status": "queued",
+        "status_url": f"/api/jobs/{job_id}",
+        "websocket_url": f"/api/jobs/{job_id}/ws"
+    }
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Return the status of a job with its partial results, and the result once it succeeded
+    """
+    job = await asyncio.to_thread(get_job_store().get, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found")
+    return job_status(job)
+
+@app.websocket("/api/jobs/{job_id}/ws")
+async def job_updates(websocket: WebSocket, job_id: str):
+    """
+    Push the job status whenever it changes; the socket is closed once the job has finished
+    """
+    await websocket.accept()
+    store = get_job_store()
+    last_update = None
+    try:
+        while True:
+            job = await asyncio.to_thread(store.get, job_id)
+            if not job:
+                await websocket.send_json({"job_id": job_id, "status": "not_found"})
+                break
+            if job["updated_at"] != last_update:
+                last_update = job["updated_at"]
+                await websocket.send_json(job_status(job))
+            if job["status"] in TERMINAL_STATUSES:
+                break
+            await job_worker_pool.wait_for_update(job_id, JOB_POLL_SECONDS)
+        await websocket.close()
+    except WebSocketDisconnect:
+        logger.info(f"Client stopped following job {job_id}")
+
+def job_status(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Public view of a job record
+    """
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "attempts": job["attempts"],
+        "partial": job["partial"],
+        "result": job["result"],
+        "error": job["error"],
+        "created_at": datetime.fromtimestamp(job["created_at"]).isoformat(),
+        "finished_at": datetime.fromtimestamp(job["finished_at"]).isoformat() if job["finished_at"] else None
+    }
+
+async def run_document_job(payload: Dict[str, Any], report_progress: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """
+    Job handler for queued AI document generation
+    """
+    request = AIDocumentRequest(**payload)
+    document_id = str(uuid.uuid4())
+    response = await build_document_response(request, document_id, report_progress)
+    return response.model_dump()
+
+# Consumes the job queue; also run standalone with `python -m app.worker`
+job_worker_pool = JobWorkerPool(get_job_store(), {AI_DOCUMENT_JOB: run_document_job})
 
 @app.get("/documents/{document_id}/download")
 async def download_document(document_id: str):
     """
     Download a generated document
+    
+    Documents generated lazily are built from their recipe on the first download.
     """
     try:
-        # For this simplified version, we'll assume the document is in the output directory
-        # with a predictable name pattern
-        # In a real system, you'd look up the document path in a database
-        
-        # Look for the document in the output directory
-        output_dir = "app/output"
-        for filename in os.listdir(output_dir):
-            if document_id in filename:
-                file_path = os.path.join(output_dir, filename)
-                return FileResponse(
-                    path=file_path,
-                    filename=filename,
-                    media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
-                )
-        
-        # If document not found
-        raise HTTPException(
-            status_code=404,
-            detail={"message": "Document not found", "errors": ["The requested document could not be found"]}
+        entry = lookup_document(document_id)
+        if entry.get("recipe") is not None and not os.path.exists(entry["path"]):
+            file_path = await document_generator.materialize_document(entry)
+        else:
+            file_path = resolve_document_path(document_id)
+        return FileResponse(
+            path=file_path,
+            filename=os.path.basename(file_path),
+            media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document"
         )
-        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error downloading document: {str(e)}")
         raise HTTPException(
@@ -339,26 +696,52 @@ async def download_document(document_id: str):
         )
 
 @app.get("/documents/{document_id}/content", response_class=HTMLResponse)
-async def get_document_content(document_id: str):
+async def get_document_content(document_id: str, request: Request):
     """
     Get the document content as HTML for direct display
+    
+    Documents never change once generated, so their HTML is served from the HTML cache
+    with a strong ETag and an immutable Cache-Control, and a matching If-None-Match is
+    answered with 304. On a miss the HTML is streamed as the DOCX is parsed, so large
+    documents are neither held in memory nor delayed, and cached once complete. A
+    streamed response may still end in an error block, so it is sent with no-store and
+    no ETag; the immutable headers only go out once the HTML is in the cache. Lazy
+    documents not downloaded yet are rendered from their recipe, without touching disk.
     """
     try:
-        # Look for the document in the output directory
-        output_dir = "app/output"
-        for filename in os.listdir(output_dir):
-            if document_id in filename:
-                file_path = os.path.join(output_dir, filename)
-                # Convert the DOCX to HTML
-                html_content = await convert_docx_to_html(file_path)
-                return HTMLResponse(content=html_content)
-                
-        # If document not found
-        raise HTTPException(
-            status_code=404,
-            detail={"message": "Document not found", "errors": ["The requested document could not be found"]}
-        )
+        entry = lookup_document(document_id)
+        pending = entry.get("recipe") is not None and not os.path.exists(entry["path"])
+        file_path = entry["path"] if pending else resolve_document_path(document_id)
+        content_hash = document_generator.document_index.content_hash(document_id)
+        headers = {}
+        if content_hash is not None:
+            headers = {"ETag": make_etag(content_hash), "Cache-Control": IMMUTABLE_CACHE_CONTROL}
+            if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+                html_cache.record_not_modified()
+                return Response(status_code=304, headers=headers)
+            
+            cached_html, sidecar_path = await html_cache.get(document_id, content_hash, file_path)
+            if cached_html is not None:
+                return Response(content=cached_html, media_type="text/html; charset=utf-8", headers=headers)
+            if sidecar_path is not None:
+                return FileResponse(path=sidecar_path, media_type="text/html; charset=utf-8", headers=headers)
         
+        if pending:
+            document_html = await document_generator.render_recipe_html(entry)
+            await html_cache.set(document_id, content_hash, file_path, document_html, write_sidecar=False)
+            return HTMLResponse(content=document_html, headers=headers)
+        
+        try:
+            html_chunks = await open_docx_html_stream(file_path)
+        except Exception as conversion_error:
+            logger.error(f"Error converting DOCX to HTML: {str(conversion_error)}")
+            return HTMLResponse(content=error_html(conversion_error))
+        if content_hash is not None:
+            html_chunks = html_cache.stream_and_store(document_id, content_hash, file_path, html_chunks)
+        return StreamingResponse(html_chunks, media_type="text/html; charset=utf-8",
+                                 headers={"Cache-Control": STREAMED_CACHE_CONTROL})
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error getting document content: {str(e)}")
         raise HTTPException(
@@ -366,75 +749,89 @@ async def get_document_content(document_id: str):
             detail={"message": "Error getting document content", "errors": [str(e)]}
         )
 
-async def convert_docx_to_html(file_path):
+def lookup_document(document_id: str) -> Dict[str, Any]:
+    """
+    Look up a document's index entry
+
+    Raises:
+        HTTPException: 404 if the id is unknown
+    """
+    entry = document_generator.document_index.lookup(document_id)
+    if entry is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"message": "Document not found", "errors": ["The requested document could not be found"]}
+        )
+    return entry
+
+def resolve_document_path(document_id: str) -> str:
+    """
+    Resolve a document id to its file path through the document index
+
+    Raises:
+        HTTPException: 404 if the id is unknown or the indexed file no longer exists
+    """
+    entry = lookup_document(document_id)
+
+    file_path = entry["path"]
+    if not os.path.exists(file_path):
+        logger.error(f"Indexed document {document_id} is missing on disk: {file_path}")
+        raise HTTPException(
+            status_code=404,
+            detail={"message": "Document file missing", "errors": [f"The file for document {document_id} is no longer available"]}
+        )
+    return file_path
+
+async def convert_docx_to_html(file_path, document_id=None, content_hash=None):
     """
     Convert a DOCX file to HTML for direct display
+    
+    The body is read in one streaming pass, in document order (see app.services.docx_html),
+    in a worker thread. Given the document's id and content hash, the HTML is also put in
+    the HTML cache, so the first /documents/{id}/content request for a new document is
+    already a hit.
     """
     try:
-        from docx import Document
-        
-        # Read the document
-        doc = Document(file_path)
-        
-        # Simple conversion to HTML
-        html = ["<div class='document-content'>"]
-        
-        # Add document paragraphs
-        for para in doc.paragraphs:
-            # Skip empty paragraphs
-            if not para.text.strip():
-                html.append("<p>&nbsp;</p>")
-                continue
-                
-            # Check paragraph style and alignment
-            alignment = "left"
-            if para.alignment == 1:  # WD_ALIGN_PARAGRAPH.CENTER
-                alignment = "center"
-            elif para.alignment == 2:  # WD_ALIGN_PARAGRAPH.RIGHT
-                alignment = "right"
-                
-            # Start paragraph
-            html.append(f"<p style='text-align: {alignment};'>")
-            
-            # Handle runs with formatting
-            for run in para.runs:
-                text = run.text.replace('\n', '<br>')
-                
-                # Skip empty runs
-                if not text.strip() and text != "&nbsp;":
-                    continue
-                    
-                # Apply formatting
-                if run.bold and run.italic:
-                    html.append(f"<strong><em>{text}</em></strong>")
-                elif run.bold:
-                    html.append(f"<strong>{text}</strong>")
-                elif run.italic:
-                    html.append(f"<em>{text}</em>")
-                else:
-                    html.append(text)
-                    
-            html.append("</p>")
-            
-        # Add tables
-        for table in doc.tables:
-            html.append("<table class='table table-bordered'>")
-            for row in table.rows:
-                html.append("<tr>")
-                for cell in row.cells:
-                    html.append("<td>")
-                    for para in cell.paragraphs:
-                        html.append(para.text)
-                    html.append("</td>")
-                html.append("</tr>")
-            html.append("</table>")
-            
-        html.append("</div>")
-        
-        return "".join(html)
+        document_html = await asyncio.to_thread(docx_to_html, file_path)
     except Exception as e:
         logger.error(f"Error converting DOCX to HTML: {str(e)}")
-        return f"<div class='error'>Error converting document: {str(e)}</div>"
+        return error_html(e)
+    if document_id and content_hash:
+        await html_cache.set(document_id, content_hash, file_path, document_html)
+    return document_html
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """
+    Runtime metrics for document rendering and AI analysis
+    """
+    return {
+        "render": get_render_engine().get_metrics(),
+        "ai": ai_legal_analyzer.get_metrics(),
+        "jobs": job_worker_pool.get_metrics(),
+        "html_cache": html_cache.get_metrics(),
+        "documents": document_generator.get_metrics()
+    }
+
+@app.on_event("startup")
+async def load_services():
+    """
+    Compile the document templates once when the application starts, bind the render
+    engine to the server's loop, and start the job workers unless they run in separate
+    app.worker processes
+    """
+    logger.info(f"Compiled document templates: {get_template_cache().names()}")
+    get_render_engine().start()
+    if JOB_RUN_WORKERS_IN_WEB:
+        job_worker_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_services():
+    """
+    Release worker pools when the application stops
+    """
+    await job_worker_pool.stop()
+    get_render_engine().shutdown(wait=False)
 
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
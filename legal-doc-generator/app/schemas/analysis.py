@@ -0,0 +1,148 @@
+"""
+Legal analysis schema
+The shape Gemini is asked to return, and the validator that normalizes
+whatever actually came back into that shape.
+"""
+
+from typing import Any, Dict, List
+
+from pydantic import BaseModel, TypeAdapter, field_validator, model_validator
+
+MISSING_DETAIL = "Detay bilgi bulunmamaktadır."
+
+
+def _drop_nulls(data: Any) -> Any:
+    """Treat null fields as missing so they get their defaults"""
+    if isinstance(data, dict):
+        return {key: value for key, value in data.items() if value is not None}
+    return data
+
+
+def _as_text(value: Any) -> str:
+    """Numbers, lists and other values the model sometimes returns for text fields"""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, list):
+        return "\n".join(_as_text(item) for item in value)
+    return str(value)
+
+
+class RelevantLaw(BaseModel):
+    title: str = "Kanun"
+    description: str = MISSING_DETAIL
+
+    @model_validator(mode="before")
+    @classmethod
+    def _coerce(cls, data: Any) -> Any:
+        if not isinstance(data, dict):
+            return {"description": str(data)}
+        return {key: _as_text(value) for key, value in _drop_nulls(data).items()}
+
+
+class RelevantDecision(BaseModel):
+    case_number: str = "Belirsiz"
+    date: str = "Belirsiz"
+    summary: str = MISSING_DETAIL
+
+    @model_validator(mode="before")
+    @classmethod
+    def _coerce(cls, data: Any) -> Any:
+        if not isinstance(data, dict):
+            return {"summary": str(data)}
+        return {key: _as_text(value) for key, value in _drop_nulls(data).items()}
+
+
+class LegalAnalysisResult(BaseModel):
+    summary: str = ""
+    relevant_laws: List[RelevantLaw] = []
+    relevant_decisions: List[RelevantDecision] = []
+    recommendations: str = ""
+
+    @model_validator(mode="before")
+    @classmethod
+    def _coerce(cls, data: Any) -> Any:
+        return _drop_nulls(data)
+
+    @field_validator("relevant_laws", "relevant_decisions", mode="before")
+    @classmethod
+    def _as_list(cls, value: Any) -> Any:
+        if isinstance(value, dict):
+            return [value]
+        return value if isinstance(value, list) else []
+
+    @field_validator("summary", "recommendations", mode="before")
+    @classmethod
+    def _as_string(cls, value: Any) -> Any:
+        return _as_text(value)
+
+
+class GeminiRelevantLaw(BaseModel):
+    title: str
+    description: str
+
+
+class GeminiRelevantDecision(BaseModel):
+    case_number: str
+    date: str
+    summary: str
+
+
+class GeminiLegalAnalysis(BaseModel):
+    """Response schema sent to Gemini; kept free of defaults and validators, which it does not accept"""
+    summary: str
+    relevant_laws: List[GeminiRelevantLaw]
+    relevant_decisions: List[GeminiRelevantDecision]
+    recommendations: str
+
+
+class GeminiLawsSection(BaseModel):
+    relevant_laws: List[GeminiRelevantLaw]
+
+
+class GeminiDecisionsSection(BaseModel):
+    relevant_decisions: List[GeminiRelevantDecision]
+
+
+class GeminiSourcesSection(BaseModel):
+    relevant_laws: List[GeminiRelevantLaw]
+    relevant_decisions: List[GeminiRelevantDecision]
+
+
+# Response schema for a follow-up call that only asks for the missing sections
+SECTION_SCHEMAS = {
+    ("relevant_laws",): GeminiLawsSection,
+    ("relevant_decisions",): GeminiDecisionsSection,
+    ("relevant_laws", "relevant_decisions"): GeminiSourcesSection,
+}
+
+
+# Built once at import; validating through it is a single pass in pydantic-core
+ANALYSIS_ADAPTER = TypeAdapter(LegalAnalysisResult)
+
+
+def validate_analysis(data: Any) -> Dict[str, Any]:
+    """
+    Normalize parsed model output into the analysis shape
+
+    Missing keys get empty values, non-list sections become empty lists, and
+    malformed laws or decisions are coerced to items with placeholder fields.
+
+    Args:
+        data (Any): The parsed JSON
+
+    Returns:
+        Dict[str, Any]: summary, relevant_laws, relevant_decisions, recommendations
+    """
+    if not isinstance(data, dict):
+        data = {}
+    return ANALYSIS_ADAPTER.validate_python(data).model_dump()
+
+
+def validate_law(data: Any) -> Dict[str, Any]:
+    """Normalize a single relevant law"""
+    return RelevantLaw.model_validate(data).model_dump()
+
+
+def validate_decision(data: Any) -> Dict[str, Any]:
+    """Normalize a single court decision"""
+    return RelevantDecision.model_validate(data).model_dump()
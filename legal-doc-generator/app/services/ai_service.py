@@ -4,30 +4,223 @@ This module provides integration with Google's Gemini API for analyzing legal ca
 """
 
 import os
-import json
+import copy
+import uuid
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, Iterator, List, Optional, Tuple
+from contextlib import asynccontextmanager
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
 import asyncio
-import re
-from app.core.config import API_USE_MOCK_DATA
+import time
+from collections import deque
+from app.core.config import (
+    API_USE_MOCK_DATA,
+    ANALYSIS_DEADLINE_SECONDS,
+    GEMINI_MAX_CONCURRENCY,
+    GEMINI_API_ENDPOINT,
+    GEMINI_ATTEMPT_TIMEOUT_SECONDS,
+    GEMINI_RETRY_MAX_ATTEMPTS,
+    GEMINI_RETRY_BASE_DELAY_SECONDS,
+    GEMINI_RETRY_MAX_DELAY_SECONDS,
+    GEMINI_BREAKER_FAILURE_RATE,
+    GEMINI_BREAKER_WINDOW,
+    GEMINI_BREAKER_MIN_CALLS,
+    GEMINI_BREAKER_OPEN_SECONDS,
+    ANALYSIS_CACHE_ENABLED,
+    ANALYSIS_COALESCE_CROSS_WORKER,
+    ANALYSIS_COALESCE_LOCK_TTL_SECONDS,
+    ANALYSIS_COALESCE_POLL_SECONDS,
+    NEAR_DUPLICATE_ENABLED,
+    STATUTE_INDEX_ENABLED,
+    STATUTE_CANDIDATES,
+    DECISION_INDEX_ENABLED,
+    DECISION_CANDIDATES,
+    VECTOR_INDEX_ENABLED,
+    RETRIEVAL_TOKEN_BUDGET,
+    CITATION_VERIFIER_ENABLED,
+    MODEL_ROUTER_ENABLED,
+    GEMINI_FAST_MODEL,
+    GEMINI_PRO_MODEL,
+    GEMINI_FAST_MAX_OUTPUT_TOKENS,
+    GEMINI_PRO_MAX_OUTPUT_TOKENS,
+    GEMINI_FAST_INPUT_PRICE,
+    GEMINI_FAST_OUTPUT_PRICE,
+    GEMINI_PRO_INPUT_PRICE,
+    GEMINI_PRO_OUTPUT_PRICE,
+)
+from app.services.analysis_cache import AnalysisCache, make_cache_key
+from app.services.near_duplicate import NearDuplicateIndex
+from app.services.statute_index import StatuteIndex, get_statute_index
+from app.services.decision_index import DecisionIndex, get_decision_index
+from app.services.vector_index import VectorRetriever, fuse_rankings, get_vector_retriever
+from app.services.citation_verifier import CitationVerifier
+from app.services.category_classifier import FAMILY_LAW, category_scores
+from app.services.model_router import FAST, PRO, ModelRouter, ModelTier, usage_tokens
+from app.services.gemini_rest import RestGenerativeModel
+from app.utils.concurrency import SingleFlight
+from app.schemas.analysis import (
+    SECTION_SCHEMAS,
+    GeminiLegalAnalysis,
+    validate_analysis,
+    validate_decision,
+    validate_law,
+)
+from app.utils.json_repair import extract_json_object
+from app.utils.json_stream import IncrementalJSONParser
+from app.utils.resilience import CircuitBreaker, Deadline, DeadlineExceededError, RetryPolicy
+from app.utils.metrics import summarize_durations
+from app.utils.text import estimate_tokens
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Bump whenever _create_legal_analysis_prompt changes so cached analyses are not reused
+PROMPT_VERSION = "4"
+# Retrieved articles or decisions used for a section the model left empty
+_INDEX_SECTION_FALLBACK = 3
+# Analysis section -> (metadata key for the candidate count, metadata key set when the section came from the index)
+_GROUNDED_SECTIONS = {
+    "relevant_laws": ("statute_candidates", "laws_from_index"),
+    "relevant_decisions": ("decision_candidates", "decisions_from_index"),
+}
+# Article texts are cut to this many characters in the prompt
+_CANDIDATE_CHARS = 600
+
+
+def _law_candidate_line(candidate: Dict[str, Any]) -> str:
+    """Prompt line for a candidate article"""
+    description = candidate["description"]
+    if len(description) > _CANDIDATE_CHARS:
+        description = description[:_CANDIDATE_CHARS].rsplit(" ", 1)[0] + " …"
+    return f"- {candidate['title']} ({candidate['heading']}): {description}"
+
+
+def _decision_candidate_line(candidate: Dict[str, Any]) -> str:
+    """Prompt line for a candidate decision"""
+    return f"- {candidate['case_number']} ({candidate['date']}): {candidate['summary']}"
+
+
+_CANDIDATE_LINES = {"relevant_laws": _law_candidate_line, "relevant_decisions": _decision_candidate_line}
+
+# Gemini errors that are worth retrying: rate limits, server errors and timeouts
+_RETRYABLE_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServerError,
+    google_exceptions.DeadlineExceeded,
+    google_exceptions.Aborted,
+    google_exceptions.Unknown,
+    ConnectionError,
+    TimeoutError,
+)
+
+
+# Category names used in prompts
+CATEGORY_TRANSLATIONS = {
+    "aile_hukuku": "Aile Hukuku (Family Law)",
+    "borçlar_hukuku": "Borçlar Hukuku (Contract Law)",
+    "iş_hukuku": "İş Hukuku (Labor Law)",
+    "ceza_hukuku": "Ceza Hukuku (Criminal Law)",
+    "ticaret_hukuku": "Ticaret Hukuku (Commercial Law)",
+    "idare_hukuku": "İdare Hukuku (Administrative Law)",
+    "tüketici_hukuku": "Tüketici Hukuku (Consumer Law)"
+}
+
+# Instructions for each section a follow-up call may request
+_SECTION_INSTRUCTIONS = {
+    "relevant_laws": (
+        "İlgili Kanun Maddeleri (relevant_laws): Türk hukuk sisteminde bu durum için en ilgili ve önemli "
+        "3-5 kanun maddesini belirt. Her madde için \"title\" (kanun adı ve madde numarası) ve "
+        "\"description\" (maddenin içeriği ve bu duruma nasıl uygulanacağı) ver."
+    ),
+    "relevant_decisions": (
+        "İlgili Yargıtay Kararları (relevant_decisions): Bu durumla ilgili olabilecek 2-4 önemli Yargıtay "
+        "kararını belirt. Her karar için \"case_number\" (daire ve esas/karar numarası), \"date\" ve "
+        "\"summary\" (kararın ana sonucu veya ilkesi) ver."
+    ),
+}
+
+def is_retryable_error(error: BaseException) -> bool:
+    """Return whether a Gemini call that raised this error may succeed on retry"""
+    return isinstance(error, _RETRYABLE_ERRORS)
+
 class AILegalAnalyzer:
     """Handles the AI analysis of legal cases using Google's Generative AI (Gemini)"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 cache: Optional[AnalysisCache] = None, near_duplicates: Optional[NearDuplicateIndex] = None,
+                 statutes: Optional[StatuteIndex] = None, decisions: Optional[DecisionIndex] = None,
+                 vectors: Optional[VectorRetriever] = None, verifier: Optional[CitationVerifier] = None,
+                 router: Optional[ModelRouter] = None):
         """
         Initialize the legal analyzer with API credentials
         
         Args:
             api_key (str, optional): The API key for Google Generative AI
+            max_concurrency (int, optional): Maximum outstanding Gemini calls, defaults to GEMINI_MAX_CONCURRENCY
+            cache (AnalysisCache, optional): Analysis cache, created from config when not provided
+            near_duplicates (NearDuplicateIndex, optional): Near-duplicate index, created from config when not provided
+            statutes (StatuteIndex, optional): Local statute index, loaded from config when not provided
+            decisions (DecisionIndex, optional): Local Yargıtay decision index, loaded from config when not provided
+            vectors (VectorRetriever, optional): Similar-document retrieval over both indexes, loaded from config when not provided
+            verifier (CitationVerifier, optional): Checks cited articles and case numbers, created from config when not provided
+            router (ModelRouter, optional): Picks the fast or pro model per case, created from config when not provided
         """
         # Try to get API key from environment variable if not provided
         self.api_key = api_key or os.environ.get("GEMINI_API_KEY", "")
         
+        # Bound the number of outstanding Gemini calls; extra callers wait as coroutines
+        self.max_concurrency = max(1, max_concurrency or GEMINI_MAX_CONCURRENCY)
+        self._gemini_slots = asyncio.Semaphore(self.max_concurrency)
+        self._gemini_waiting = 0
+        self._gemini_in_flight = 0
+        self._gemini_calls = 0
+        self._gemini_errors = 0
+        self._gemini_queue_times = deque(maxlen=1000)
+        self._gemini_call_times = deque(maxlen=1000)
+        
+        # Retries only transient errors, never past the request deadline; the breaker fails fast during outages
+        self.retry_policy = RetryPolicy(
+            max_attempts=GEMINI_RETRY_MAX_ATTEMPTS,
+            base_delay=GEMINI_RETRY_BASE_DELAY_SECONDS,
+            max_delay=GEMINI_RETRY_MAX_DELAY_SECONDS,
+            attempt_timeout=GEMINI_ATTEMPT_TIMEOUT_SECONDS,
+            is_retryable=is_retryable_error
+        )
+        self.circuit_breaker = CircuitBreaker(
+            failure_rate=GEMINI_BREAKER_FAILURE_RATE,
+            window=GEMINI_BREAKER_WINDOW,
+            min_calls=GEMINI_BREAKER_MIN_CALLS,
+            open_seconds=GEMINI_BREAKER_OPEN_SECONDS
+        )
+        
+        # Repeat descriptions are answered from the analysis cache instead of calling Gemini again
+        self.cache = cache if cache is not None else (AnalysisCache() if ANALYSIS_CACHE_ENABLED else None)
+        # Descriptions that are almost identical to an analysed one reuse its analysis
+        self.near_duplicates = near_duplicates if near_duplicates is not None else (
+            NearDuplicateIndex() if NEAR_DUPLICATE_ENABLED else None)
+        # Candidate articles and decisions come from local indexes; the model only ranks and explains them
+        self.statutes = statutes if statutes is not None else (
+            get_statute_index() if STATUTE_INDEX_ENABLED else None)
+        self.decisions = decisions if decisions is not None else (
+            get_decision_index() if DECISION_INDEX_ENABLED else None)
+        # Vector similarity finds candidates that share meaning but few exact terms; fused with the BM25 ranking
+        self.vectors = vectors if vectors is not None else (
+            get_vector_retriever(self.statutes, self.decisions) if VECTOR_INDEX_ENABLED else None)
+        # Every cited article and case number is checked against the local catalog and marked verified or not
+        self.verifier = verifier if verifier is not None else (
+            CitationVerifier(statutes=self.statutes, decisions=self.decisions) if CITATION_VERIFIER_ENABLED else None)
+        
+        # Short, clear-cut cases go to the fast model tier; set up with the models once the API is configured
+        self.router = router
+        
+        # Concurrent identical requests share one Gemini call; optionally across workers via the cache database
+        self.single_flight = SingleFlight()
+        self.cross_worker_coalescing = ANALYSIS_COALESCE_CROSS_WORKER
+        self._lock_owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._remote_coalesced = 0
+        
         # Debug info on API key status (without showing the actual key)
         if self.api_key:
             key_preview = self.api_key[:4] + "..." + self.api_key[-4:] if len(self.api_key) > 8 else "[redacted]"
@@ -35,24 +228,39 @@ class AILegalAnalyzer:
         else:
             logger.warning("No Gemini API key provided. Using mock data for development.")
             
-        if not self.api_key:
+        if not self.api_key and not GEMINI_API_ENDPOINT:
             self.api_configured = False
         else:
             try:
-                # Configure the Gemini API
-                genai.configure(api_key=self.api_key)
+                if GEMINI_API_ENDPOINT:
+                    # A Gemini-compatible server, such as the local stand-in used for load tests
+                    logger.info(f"Using the Gemini REST endpoint at {GEMINI_API_ENDPOINT}")
+                    make_model = lambda name: RestGenerativeModel(name, GEMINI_API_ENDPOINT, self.api_key,
+                                                                   GEMINI_ATTEMPT_TIMEOUT_SECONDS)
+                else:
+                    # Configure the Gemini API
+                    genai.configure(api_key=self.api_key)
+                    make_model = genai.GenerativeModel
                 self.api_configured = True
                 logger.info("Gemini API configured successfully")
                 
                 # Set up the model
-                self.model = genai.GenerativeModel('gemini-1.5-pro')
+                self.model = make_model(GEMINI_PRO_MODEL)
+                if self.router is None and MODEL_ROUTER_ENABLED:
+                    self.router = ModelRouter(
+                        ModelTier(FAST, make_model(GEMINI_FAST_MODEL), GEMINI_FAST_MAX_OUTPUT_TOKENS,
+                                  GEMINI_FAST_INPUT_PRICE, GEMINI_FAST_OUTPUT_PRICE),
+                        ModelTier(PRO, self.model, GEMINI_PRO_MAX_OUTPUT_TOKENS,
+                                  GEMINI_PRO_INPUT_PRICE, GEMINI_PRO_OUTPUT_PRICE)
+                    )
                 logger.info("Gemini model initialized successfully")
             except Exception as e:
                 logger.error(f"Error configuring Gemini API: {str(e)}")
                 logger.exception(e)
                 self.api_configured = False
     
-    async def analyze_case(self, case_description: str, case_category: str, force_real_analysis: bool = False) -> Dict[str, Any]:
+    async def analyze_case(self, case_description: str, case_category: str, force_real_analysis: bool = False,
+                           bypass_cache: bool = False, deadline: Optional[Deadline] = None) -> Dict[str, Any]:
         """
         Analyze a legal case and provide relevant laws, court decisions, and recommendations
         
@@ -60,24 +268,16 @@ class AILegalAnalyzer:
             case_description (str): The detailed description of the legal case
             case_category (str): The category of law (e.g., family, contract, labor)
             force_real_analysis (bool): If True, forces real AI analysis even if API_USE_MOCK_DATA is True
+            bypass_cache (bool): If True, skips the cache lookup (a fresh result is still stored)
+            deadline (Deadline, optional): Deadline for the Gemini call, defaults to ANALYSIS_DEADLINE_SECONDS from now
             
         Returns:
             Dict[str, Any]: Results including relevant laws, court decisions, and recommendations
+            
+        Raises:
+            ServiceUnavailableError: If Gemini did not answer within the deadline, retries or circuit breaker
         """
-        # Check for divorce-related keywords to ensure correct categorization
-        divorce_keywords = ['boşan', 'boşanma', 'nafaka', 'velayet', 'çocuk', 'evlilik', 'eş', 'eşim', 
-                           'aile', 'mal paylaşım', 'evli', 'nikah', 'mehir', 'ayrılık', 'evlilik birliği']
-        
-        # Ensure case description is lowercase for case-insensitive matching
-        lower_case_description = case_description.lower()
-        
-        # Check if this is a divorce/family law case that may have been miscategorized
-        is_divorce_case = any(keyword in lower_case_description for keyword in divorce_keywords)
-        
-        if is_divorce_case and case_category != 'aile_hukuku':
-            logger.warning(f"Divorce keywords detected but category is {case_category}. Forcing category to aile_hukuku.")
-            case_category = 'aile_hukuku'
-        
+        case_category = self._correct_category(case_description, case_category)
         logger.info(f"Analyzing case in category: {case_category}")
         
         # Log if we're forcing real analysis
@@ -105,27 +305,142 @@ class AILegalAnalyzer:
                     "recommendations": "Gerçek yapay zeka analizi için sistem yöneticinizle iletişime geçin ve API anahtarını yapılandırın."
                 }
         
+        request_key = make_cache_key(case_description, case_category, self.prompt_version, self.model_key)
+        cache_key = None
+        if self.cache is not None:
+            cache_key = request_key
+            if bypass_cache:
+                self.cache.record_bypass()
+                logger.info("Analysis cache bypassed for this request")
+            else:
+                # The cache's SQLite tier blocks (up to its busy timeout); keep it off the event loop
+                cached = await asyncio.to_thread(self.cache.get, cache_key)
+                if cached is not None:
+                    logger.info("Returning cached analysis")
+                    cached.setdefault("metadata", {})["cached"] = True
+                    return cached
+        
+        scope = self._near_duplicate_scope(case_category)
+        if not bypass_cache:
+            reused = await self._reuse_near_duplicate(case_description, scope, cache_key)
+            if reused is not None:
+                return reused
+        
+        # Identical requests already being analysed share that call instead of starting another one
+        shared, joined = await self.single_flight.run(
+            (request_key, force_real_analysis),
+            lambda: self._analyze_uncached(case_description, case_category, force_real_analysis, cache_key, scope,
+                                           deadline or Deadline(ANALYSIS_DEADLINE_SECONDS),
+                                           wait_for_workers=not bypass_cache)
+        )
+        # Every caller gets its own copy because the API layer adds to the result
+        analysis_data = copy.deepcopy(shared)
+        if joined:
+            logger.info("Joined an in-flight analysis of the same case")
+            analysis_data.setdefault("metadata", {})["coalesced"] = True
+        return analysis_data
+    
+    async def _reuse_near_duplicate(self, case_description: str, scope: str,
+                                    cache_key: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        The analysis of a near-duplicate case, cached under this request's key, or None
+        """
+        if self.near_duplicates is None:
+            return None
+        # MinHash and the SQLite lookup are blocking; keep them off the event loop
+        match = await asyncio.to_thread(self.near_duplicates.find, case_description, scope)
+        if match is None:
+            return None
+        reused, similarity, source_case_id = match
+        logger.info(f"Reusing analysis of near-duplicate case {source_case_id} (similarity {similarity:.2f})")
+        reused.setdefault("metadata", {}).update(
+            {"reused": True, "similarity": round(similarity, 4), "source_case_id": source_case_id})
+        if cache_key:
+            await asyncio.to_thread(self.cache.set, cache_key, reused)
+        return reused
+    
+    async def _analyze_uncached(self, case_description: str, case_category: str, force_real_analysis: bool,
+                                cache_key: Optional[str], scope: str, deadline: Deadline,
+                                wait_for_workers: bool = True) -> Dict[str, Any]:
+        """
+        Run the analysis for a request that missed the caches
+        
+        With cross-worker coalescing enabled, a worker that finds another worker already analysing
+        the same case waits for that result in the shared cache instead of calling Gemini itself.
+        Requests that bypass the cache never wait, since the shared cache may hold the result they rejected.
+        """
+        if not (self.cross_worker_coalescing and cache_key and wait_for_workers):
+            return await self._run_analysis(case_description, case_category, force_real_analysis, cache_key, scope,
+                                            deadline)
+        
+        remote = await self._wait_for_other_worker(cache_key, deadline)
+        if remote is not None:
+            return remote
+        try:
+            return await self._run_analysis(case_description, case_category, force_real_analysis, cache_key, scope,
+                                            deadline)
+        finally:
+            await asyncio.to_thread(self.cache.release_lock, cache_key, self._lock_owner)
+    
+    async def _wait_for_other_worker(self, cache_key: str, deadline: Deadline) -> Optional[Dict[str, Any]]:
+        """
+        Take the cross-worker lock for a key, or wait for the worker holding it
+        
+        Args:
+            cache_key (str): Key from make_cache_key
+            deadline (Deadline): The request's deadline, which also bounds the wait
+        
+        Returns:
+            Optional[Dict[str, Any]]: The other worker's analysis, or None once this worker holds the lock
+            
+        Raises:
+            DeadlineExceededError: If the deadline passes first, e.g. because the holder died
+                and its lock has not expired yet
+        """
+        waited = False
+        while not await asyncio.to_thread(self.cache.acquire_lock, cache_key, self._lock_owner,
+                                          ANALYSIS_COALESCE_LOCK_TTL_SECONDS):
+            if not waited:
+                logger.info("Another worker is analysing this case, waiting for its result")
+                waited = True
+            # Poll until the holder publishes a result, or retry the lock once it is released or expires
+            while True:
+                if deadline.expired:
+                    raise DeadlineExceededError(
+                        f"Deadline of {deadline.seconds}s exceeded waiting for another worker's analysis")
+                await asyncio.sleep(min(ANALYSIS_COALESCE_POLL_SECONDS, deadline.remaining()))
+                result = await asyncio.to_thread(self.cache.peek, cache_key)
+                if result is not None:
+                    self._remote_coalesced += 1
+                    result.setdefault("metadata", {})["coalesced"] = True
+                    return result
+                if not await asyncio.to_thread(self.cache.lock_held, cache_key):
+                    break
+        return None
+    
+    async def _run_analysis(self, case_description: str, case_category: str, force_real_analysis: bool,
+                            cache_key: Optional[str], scope: str, deadline: Deadline) -> Dict[str, Any]:
+        """Call Gemini for the case and store complete results in the cache and near-duplicate index"""
         try:
             # Format the prompt for the AI
-            prompt = self._create_legal_analysis_prompt(case_description, case_category)
+            # BM25 and vector scans over mmap'd indexes block; keep them off the event loop
+            sources = await asyncio.to_thread(self._retrieve_sources, case_description)
+            prompt = self._create_legal_analysis_prompt(case_description, case_category, sources)
             logger.info(f"Created prompt for analysis, length: {len(prompt)} characters")
             
             # Get response from Gemini
-            analysis_data = await self._generate_analysis(prompt, case_category, force_real_analysis)
+            tier = self._route(case_description, case_category)
+            analysis_data = await self._generate_analysis(prompt, case_category, force_real_analysis, deadline, tier)
             logger.info(f"Received AI analysis data with {len(str(analysis_data))} characters")
+            self._ground_sections(analysis_data, sources)
+            self._verify_citations(analysis_data)
             
-            # If we have a valid analysis data dictionary, return it directly
-            if isinstance(analysis_data, dict) and "relevant_laws" in analysis_data:
-                logger.info("Successfully received AI analysis")
-                return analysis_data
-            
-            # If we got a string response (older version compatibility)
-            if isinstance(analysis_data, str):
-                logger.warning("Received string response, parsing as JSON")
-                # Parse the response
-                analysis_data = self._parse_ai_response(analysis_data)
-                logger.info("Successfully parsed AI response into structured data")
-                
+            logger.info("Successfully received AI analysis")
+            if self._is_cacheable(analysis_data):
+                if cache_key:
+                    await asyncio.to_thread(self.cache.set, cache_key, analysis_data)
+                if self.near_duplicates is not None:
+                    await asyncio.to_thread(self.near_duplicates.add, case_description, scope, analysis_data)
             return analysis_data
         except Exception as e:
             logger.error(f"Error analyzing case with AI: {str(e)}")
@@ -134,36 +449,289 @@ class AILegalAnalyzer:
             if API_USE_MOCK_DATA and not force_real_analysis:
                 logger.warning("Using mock data after error since mock data is allowed")
                 return self._get_mock_analysis(case_category)
-            else:
-                error_msg = f"AI analysis failed: {str(e)}"
-                logger.error(error_msg)
-                return {
-                    "summary": "AI analiz hatası",
-                    "relevant_laws": [
-                        {
-                            "title": "Analiz Hatası",
-                            "description": f"AI analizi sırasında bir hata oluştu: {str(e)}"
-                        }
-                    ],
-                    "relevant_decisions": [],
-                    "recommendations": "Lütfen sistem yöneticinizle iletişime geçin veya daha sonra tekrar deneyin."
-                }
+            # Callers decide how to degrade; an error must not look like an analysis
+            raise
+    
+    async def complete_missing_sections(self, case_description: str, case_category: str,
+                                        analysis_data: Dict[str, Any],
+                                        deadline: Optional[Deadline] = None) -> Dict[str, Any]:
+        """
+        Fill empty relevant_laws / relevant_decisions with a follow-up call for just those sections
+        
+        The summary and recommendations already produced are kept; the summary is sent as context
+        so the follow-up prompt and response stay small.
+        
+        Args:
+            case_description (str): The detailed description of the legal case
+            case_category (str): The category of law
+            analysis_data (Dict[str, Any]): An analysis with one or both source sections empty
+            deadline (Deadline, optional): Deadline for the Gemini call, defaults to ANALYSIS_DEADLINE_SECONDS from now
+            
+        Returns:
+            Dict[str, Any]: A copy of the analysis with the missing sections filled in where possible
+            
+        Raises:
+            ServiceUnavailableError: If Gemini did not answer within the deadline, retries or circuit breaker
+        """
+        missing = tuple(section for section in ("relevant_laws", "relevant_decisions") if not analysis_data.get(section))
+        if not missing or not self.api_configured:
+            return analysis_data
+        
+        case_category = self._correct_category(case_description, case_category)
+        completed = copy.deepcopy(analysis_data)
+        # Sections the local indexes can fill need no further model call
+        sources = await asyncio.to_thread(self._retrieve_sources, case_description)
+        grounded = self._ground_sections(completed, sources)
+        missing = tuple(section for section in missing if section not in grounded)
+        if not missing:
+            self._verify_citations(completed)
+            await asyncio.to_thread(self._store_complete, case_description, case_category, completed)
+            return completed
+        
+        deadline = deadline or Deadline(ANALYSIS_DEADLINE_SECONDS)
+        prompt = self._create_section_prompt(case_description, case_category, analysis_data.get("summary", ""), missing)
+        logger.info(f"Requesting missing sections {list(missing)}, prompt length: {len(prompt)} characters")
+        
+        tier = self._route(case_description, case_category)
+        safety_settings, generation_config = self._generation_settings(SECTION_SCHEMAS[missing], tier)
+        response = await self.retry_policy.call(
+            lambda: self._call_model(prompt, generation_config, safety_settings, tier),
+            deadline,
+            self.circuit_breaker,
+            slot=self._gemini_slot
+        )
+        data, _ = extract_json_object(response.text or "")
+        sections = validate_analysis(data if isinstance(data, dict) else {})
+        
+        for section in missing:
+            completed[section] = sections[section]
+        metadata = completed.setdefault("metadata", {})
+        metadata["completed_sections"] = [section for section in missing if sections[section]]
+        logger.info(f"Section follow-up filled {metadata['completed_sections']}")
+        
+        self._verify_citations(completed)
+        await asyncio.to_thread(self._store_complete, case_description, case_category, completed)
+        return completed
+    
+    def _store_complete(self, case_description: str, case_category: str, analysis_data: Dict[str, Any]) -> None:
+        """Cache an analysis completed after the fact, if it is now complete; blocking, run it in a thread"""
+        if self._is_cacheable(analysis_data):
+            if self.cache is not None:
+                cache_key = make_cache_key(case_description, case_category, self.prompt_version, self.model_key)
+                self.cache.set(cache_key, analysis_data)
+            if self.near_duplicates is not None:
+                self.near_duplicates.add(case_description, self._near_duplicate_scope(case_category), analysis_data)
     
-    def _create_legal_analysis_prompt(self, case_description: str, case_category: str) -> str:
-        """Create a prompt for the AI to analyze the legal case"""
+    def _create_section_prompt(self, case_description: str, case_category: str, summary: str,
+                               sections: tuple) -> str:
+        """Create a prompt asking only for the given sections of an existing analysis"""
+        category_turkish = CATEGORY_TRANSLATIONS.get(case_category, case_category)
+        instructions = "\n".join(f"- {_SECTION_INSTRUCTIONS[section]}" for section in sections)
+        keys = ", ".join(f'"{section}"' for section in sections)
+        
+        return f"""Bir hukuk uzmanı olarak, aşağıdaki olay için hazırlanmış hukuki analizin eksik bölümlerini tamamla.
+Analiz kategorisi: {category_turkish}
+
+Olay örgüsü:
+{case_description}
+
+Mevcut analiz özeti:
+{summary}
+
+Yalnızca şu bölümleri üret:
+{instructions}
+
+Yanıtını yalnızca {keys} anahtarlarını içeren bir JSON nesnesi olarak ver ve herhangi bir açıklama ekleme."""
+    
+    @staticmethod
+    def _correct_category(case_description: str, case_category: str) -> str:
+        """Move cases whose family-law keywords outnumber the chosen category's into aile_hukuku"""
+        scores = category_scores(case_description)
+        if case_category != FAMILY_LAW and scores[FAMILY_LAW] > scores.get(case_category, 0):
+            logger.warning(f"Divorce keywords detected but category is {case_category}. Forcing category to aile_hukuku.")
+            case_category = FAMILY_LAW
+        return case_category
+    
+    @property
+    def model_key(self) -> str:
+        """The model, or the tiers and routing rule, that cached analyses are keyed by"""
+        return self.router.fingerprint if self.router is not None else self.model.model_name
+    
+    def _route(self, case_description: str, case_category: str) -> Optional[ModelTier]:
+        """The model tier for a case, None when routing is off and self.model answers everything"""
+        return self.router.route(case_description, case_category) if self.router is not None else None
+    
+    def _escalate(self, tier: Optional[ModelTier], analysis_data: Optional[Dict[str, Any]]) -> Optional[ModelTier]:
+        """The tier to retry an incomplete answer on, if the router escalates it"""
+        return self.router.escalate(tier, analysis_data) if self.router is not None and tier is not None else None
+    
+    @property
+    def prompt_version(self) -> str:
+        """Prompt version, including the statute and decision corpora the candidates come from"""
+        corpora = [index.fingerprint for index in (self.statutes, self.decisions, self.vectors) if index is not None]
+        return "+".join([PROMPT_VERSION] + corpora)
+    
+    def _retrieve_sources(self, case_description: str) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Candidate statute articles and court decisions for the case, from the local indexes
+        
+        BM25 and vector rankings of each corpus are fused, then the candidates are
+        trimmed to fit RETRIEVAL_TOKEN_BUDGET in the prompt. Blocking; run it in a thread.
+        
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: Candidates keyed by the analysis section they belong to,
+            in the shape of that section
+        """
+        sources = {"relevant_laws": [], "relevant_decisions": []}
+        if self.statutes is not None:
+            try:
+                rankings = [self.statutes.search(case_description, STATUTE_CANDIDATES)]
+                rankings.append([self.statutes.get(doc) for doc, _ in self._similar("statutes", case_description,
+                                                                                    STATUTE_CANDIDATES)])
+                sources["relevant_laws"] = fuse_rankings(rankings, STATUTE_CANDIDATES)
+            except Exception as e:
+                logger.error(f"Statute index search failed: {str(e)}")
+        if self.decisions is not None:
+            try:
+                rankings = [self.decisions.search(case_description, DECISION_CANDIDATES)]
+                rankings.append([self.decisions.get(doc) for doc, _ in self._similar("decisions", case_description,
+                                                                                     DECISION_CANDIDATES)])
+                sources["relevant_decisions"] = [
+                    self.decisions.as_relevant_decision(decision)
+                    for decision in fuse_rankings(rankings, DECISION_CANDIDATES)
+                ]
+            except Exception as e:
+                logger.error(f"Decision index search failed: {str(e)}")
+        sources = self._fit_token_budget(sources, RETRIEVAL_TOKEN_BUDGET)
+        logger.info(f"Local indexes returned {len(sources['relevant_laws'])} articles and "
+                    f"{len(sources['relevant_decisions'])} decisions")
+        return sources
+    
+    def _similar(self, corpus: str, case_description: str, limit: int) -> List[Tuple[int, float]]:
+        """Vector search hits for a corpus; an unavailable vector index only loses the fusion"""
+        if self.vectors is None:
+            return []
+        try:
+            return self.vectors.search(corpus, case_description, limit)
+        except Exception as e:
+            logger.error(f"Vector search over {corpus} failed: {str(e)}")
+            return []
+    
+    @staticmethod
+    def _fit_token_budget(sources: Dict[str, List[Dict[str, Any]]], budget: int) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Keep the best candidates whose prompt lines fit in a token budget
+        
+        Sections take turns by rank, so a long article cannot crowd out every decision;
+        a candidate that does not fit is skipped and shorter ones after it may still be kept.
+        
+        Args:
+            sources (Dict[str, List[Dict[str, Any]]]): Ranked candidates per section
+            budget (int): Estimated prompt tokens available for the candidates
+        
+        Returns:
+            Dict[str, List[Dict[str, Any]]]: The kept candidates, in their original order
+        """
+        kept = {section: [] for section in sources}
+        remaining = budget
+        for rank in range(max((len(candidates) for candidates in sources.values()), default=0)):
+            for section, candidates in sources.items():
+                if rank >= len(candidates):
+                    continue
+                cost = estimate_tokens(_CANDIDATE_LINES[section](candidates[rank]))
+                if cost <= remaining:
+                    kept[section].append(candidates[rank])
+                    remaining -= cost
+        return kept
+    
+    @staticmethod
+    def _ground_sections(analysis_data: Dict[str, Any], sources: Dict[str, List[Dict[str, Any]]]) -> List[str]:
+        """
+        Fill sections the model left empty with the best retrieved candidates
+        
+        Returns:
+            List[str]: The sections that were filled from the local indexes
+        """
+        metadata = analysis_data.setdefault("metadata", {})
+        grounded = []
+        for section, (count_key, flag_key) in _GROUNDED_SECTIONS.items():
+            candidates = sources.get(section, [])
+            metadata[count_key] = len(candidates)
+            if analysis_data.get(section) or not candidates:
+                continue
+            if section == "relevant_laws":
+                candidates = [{"title": c["title"], "description": c["description"]} for c in candidates]
+            analysis_data[section] = candidates[:_INDEX_SECTION_FALLBACK]
+            metadata[flag_key] = True
+            grounded.append(section)
+        if grounded:
+            logger.info(f"Model returned no {grounded}, using the local index candidates")
+        return grounded
+    
+    def _verify_citations(self, analysis_data: Dict[str, Any]) -> None:
+        """Mark each law and decision of the analysis as verified or unverified; a failing check marks nothing"""
+        if self.verifier is None:
+            return
+        try:
+            self.verifier.verify_analysis(analysis_data)
+        except Exception as e:
+            logger.error(f"Error verifying citations: {str(e)}")
+    
+    def _verify_item(self, section: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        """Verify a single streamed law or decision before it is sent"""
+        if self.verifier is None:
+            return item
+        try:
+            return self.verifier.verify_law(item) if section == "relevant_laws" else self.verifier.verify_decision(item)
+        except Exception as e:
+            logger.error(f"Error verifying citation: {str(e)}")
+            return item
+    
+    def _near_duplicate_scope(self, case_category: str) -> str:
+        """Near-duplicates only match within the same category, prompt version and model"""
+        return f"{case_category}\x1f{self.prompt_version}\x1f{self.model_key}"
+    
+    @staticmethod
+    def _is_cacheable(analysis_data: Dict[str, Any]) -> bool:
+        """Only complete analyses produced by the model are cached"""
+        metadata = analysis_data.get("metadata", {})
+        return (
+            metadata.get("source") == "model"
+            and not metadata.get("repaired")
+            and bool(analysis_data.get("relevant_laws"))
+            and bool(analysis_data.get("relevant_decisions"))
+        )
+    
+    def _create_legal_analysis_prompt(self, case_description: str, case_category: str,
+                                      sources: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> str:
+        """
+        Create a prompt for the AI to analyze the legal case
+        
+        With candidate articles and decisions from the local indexes, the model is asked
+        to pick, rank and explain those instead of recalling them itself.
+        """
         
         # Translate the category for the prompt
-        category_translations = {
-            "aile_hukuku": "Aile Hukuku (Family Law)",
-            "borçlar_hukuku": "Borçlar Hukuku (Contract Law)",
-            "iş_hukuku": "İş Hukuku (Labor Law)",
-            "ceza_hukuku": "Ceza Hukuku (Criminal Law)",
-            "ticaret_hukuku": "Ticaret Hukuku (Commercial Law)",
-            "idare_hukuku": "İdare Hukuku (Administrative Law)",
-            "tüketici_hukuku": "Tüketici Hukuku (Consumer Law)"
-        }
+        category_turkish = CATEGORY_TRANSLATIONS.get(case_category, case_category)
+        sources = sources or {}
+        
+        if sources.get("relevant_laws"):
+            articles = "\n".join(_law_candidate_line(candidate) for candidate in sources["relevant_laws"])
+            laws_instruction = f"""İlgili Kanun Maddeleri (Relevant Laws): Aşağıdaki aday kanun maddelerinden bu durum için en ilgili 3-5 tanesini seç ve önem sırasına göre listele. Başlık olarak adayın başlığını aynen kullan; açıklamada maddenin bu duruma nasıl uygulanacağını belirt. Adaylar arasında uygun madde yoksa başka bir madde ekleyebilirsin.
+
+Aday kanun maddeleri:
+{articles}"""
+        else:
+            laws_instruction = "İlgili Kanun Maddeleri (Relevant Laws): Türk hukuk sisteminde bu durum için en ilgili ve önemli 3-5 kanun maddesini belirt. Türk Medeni Kanunu, Borçlar Kanunu, İş Kanunu, Ceza Kanunu, vb. kanunlarda ilgili maddeleri liste."
         
-        category_turkish = category_translations.get(case_category, case_category)
+        if sources.get("relevant_decisions"):
+            decisions = "\n".join(_decision_candidate_line(candidate) for candidate in sources["relevant_decisions"])
+            decisions_instruction = f"""İlgili Yargıtay Kararları (Relevant Court Decisions): Aşağıdaki aday Yargıtay kararlarından bu durumla ilgili 2-4 tanesini seç ve önem sırasına göre listele. Karar numarasını ve tarihini aynen kullan; özette kararın ilkesini ve bu duruma etkisini belirt. Aday listesinde olmayan karar numarası uydurma.
+
+Aday Yargıtay kararları:
+{decisions}"""
+        else:
+            decisions_instruction = "İlgili Yargıtay Kararları (Relevant Court Decisions): Bu durumla ilgili olabilecek 2-4 önemli Yargıtay kararını belirt. Her karar için mahkeme dairesi, karar numarası ve kararın ana sonucu veya ilkesi verilmelidir."
         
         # Create the prompt for the model
         prompt = f"""Bir hukuk uzmanı olarak, aşağıdaki olay örgüsüne dayalı olarak kapsamlı bir hukuki analiz yap.
@@ -176,9 +744,9 @@ Analiz aşağıdaki bölümleri içermelidir:
 
 1. Özet (Summary): Bu durum hakkında kısa bir değerlendirme yap.
 
-2. İlgili Kanun Maddeleri (Relevant Laws): Türk hukuk sisteminde bu durum için en ilgili ve önemli 3-5 kanun maddesini belirt. Türk Medeni Kanunu, Borçlar Kanunu, İş Kanunu, Ceza Kanunu, vb. kanunlarda ilgili maddeleri liste.
+2. {laws_instruction}
 
-3. İlgili Yargıtay Kararları (Relevant Court Decisions): Bu durumla ilgili olabilecek 2-4 önemli Yargıtay kararını belirt. Her karar için mahkeme dairesi, karar numarası ve kararın ana sonucu veya ilkesi verilmelidir.
+3. {decisions_instruction}
 
 4. Hukuki Öneriler (Recommendations): Bu durumla ilişkili hukuki tavsiyeler ve izlenecek yolu belirt.
 
@@ -203,9 +771,13 @@ Lütfen sadece belirtilen formatta JSON yanıt ver ve herhangi bir açıklama ek
 
         return prompt
     
-    async def _generate_analysis(self, prompt: str, case_category: str, force_real_analysis: bool) -> dict:
+    async def _generate_analysis(self, prompt: str, case_category: str, force_real_analysis: bool,
+                                 deadline: Optional[Deadline] = None, tier: Optional[ModelTier] = None) -> dict:
         """
         Generate analysis from Gemini API with improved error handling
+        
+        Transient Gemini errors are retried with backoff inside the deadline; everything else is raised.
+        An incomplete answer from the fast tier is asked again of the pro tier when the router escalates it.
         """
         if not self.api_configured:
             logger.warning("API not configured")
@@ -227,213 +799,446 @@ Lütfen sadece belirtilen formatta JSON yanıt ver ve herhangi bir açıklama ek
                     "recommendations": "Gerçek yapay zeka analizi için API anahtarını yapılandırın."
                 }
         
-        try:
-            logger.info(f"Sending prompt to Gemini model: {self.model.model_name}")
-            logger.debug(f"Prompt content: {prompt[:100]}...")
-            
-            # Configure safety settings to allow legal content
-            safety_settings = [
-                {
-                    "category": "HARM_CATEGORY_HARASSMENT",
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_HATE_SPEECH",
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_NONE"
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_NONE"
-                }
-            ]
-            
-            # Set generation config for structured output
-            generation_config = {
-                "temperature": 0.1,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 2048,
+        deadline = deadline or Deadline(ANALYSIS_DEADLINE_SECONDS)
+        escalated_from = None
+        while True:
+            try:
+                analysis_data = await self._generate_on_tier(prompt, deadline, tier)
+            except ValueError:
+                # No JSON could be recovered; the router may still hand the prompt to the pro tier
+                next_tier = self._escalate(tier, None)
+                if next_tier is None:
+                    raise
+            else:
+                next_tier = self._escalate(tier, analysis_data)
+                if next_tier is None:
+                    if escalated_from:
+                        analysis_data["metadata"]["escalated_from"] = escalated_from
+                    return analysis_data
+            escalated_from = tier.name
+            tier = next_tier
+    
+    async def _generate_on_tier(self, prompt: str, deadline: Deadline, tier: Optional[ModelTier]) -> Dict[str, Any]:
+        """
+        Send the analysis prompt to one model tier and parse its answer
+        
+        Raises:
+            ValueError: If the response is empty or contains no JSON object
+        """
+        logger.info(f"Sending prompt to Gemini model: {(tier.model if tier else self.model).model_name}")
+        logger.debug(f"Prompt content: {prompt[:100]}...")
+        
+        safety_settings, generation_config = self._generation_settings(tier=tier)
+        
+        # Send to Gemini API and get response; transient errors are retried until the deadline
+        response = await self.retry_policy.call(
+            lambda: self._call_model(prompt, generation_config, safety_settings, tier),
+            deadline,
+            self.circuit_breaker,
+            slot=self._gemini_slot
+        )
+        
+        # Check if we have a valid response
+        if not response or not response.text:
+            logger.error("Empty response from Gemini API")
+            raise ValueError("Empty response from Gemini API")
+        
+        # Log response length for debugging
+        logger.info(f"Received response from Gemini API: {len(response.text)} characters")
+        logger.debug(f"Response preview: {response.text[:200]}...")
+        
+        return self._parse_analysis_text(response.text, tier)
+    
+    @staticmethod
+    def _generation_settings(response_schema: type = GeminiLegalAnalysis, tier: Optional[ModelTier] = None) -> tuple:
+        """Safety settings and generation config used for every analysis call, with the tier's output limit"""
+        # Configure safety settings to allow legal content
+        safety_settings = [
+            {
+                "category": "HARM_CATEGORY_HARASSMENT",
+                "threshold": "BLOCK_NONE"
+            },
+            {
+                "category": "HARM_CATEGORY_HATE_SPEECH",
+                "threshold": "BLOCK_NONE"
+            },
+            {
+                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+                "threshold": "BLOCK_NONE"
+            },
+            {
+                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+                "threshold": "BLOCK_NONE"
             }
+        ]
+        
+        # Constrain the output to the analysis JSON schema
+        generation_config = {
+            "temperature": 0.1,
+            "top_p": 0.95,
+            "top_k": 40,
+            "max_output_tokens": tier.max_output_tokens if tier is not None else 2048,
+            "response_mime_type": "application/json",
+            "response_schema": response_schema,
+        }
+        
+        return safety_settings, generation_config
+    
+    def _parse_analysis_text(self, text: str, tier: Optional[ModelTier] = None) -> Dict[str, Any]:
+        """
+        Parse and normalize the analysis JSON in a Gemini response
+        
+        Schema-constrained responses are plain JSON; anything else (fences, prose,
+        truncation) goes through the same single-pass extractor.
+        
+        Raises:
+            ValueError: If no JSON object can be recovered from the text
+        """
+        data, repaired = extract_json_object(text)
+        if not isinstance(data, dict):
+            logger.error(f"No JSON object in Gemini response: {text[:500]}")
+            raise ValueError("Gemini response does not contain a JSON object")
+        if repaired:
+            logger.warning("Gemini response was truncated or malformed JSON and has been repaired")
+        
+        analysis_data = validate_analysis(data)
+        analysis_data["metadata"] = {
+            "source": "model",
+            "model": (tier.model if tier is not None else self.model).model_name,
+            "prompt_version": self.prompt_version
+        }
+        if tier is not None:
+            analysis_data["metadata"]["tier"] = tier.name
+        if repaired:
+            analysis_data["metadata"]["repaired"] = True
+        return analysis_data
+    
+    @asynccontextmanager
+    async def _gemini_slot(self, deadline: Optional[Deadline] = None):
+        """
+        Hold one of the bounded Gemini slots, recording queue wait, call time and errors
+        
+        Raises:
+            DeadlineExceededError: If no slot frees up before the deadline
+        """
+        queued_at = time.perf_counter()
+        self._gemini_waiting += 1
+        try:
+            if deadline is None:
+                await self._gemini_slots.acquire()
+            else:
+                await asyncio.wait_for(self._gemini_slots.acquire(), timeout=max(deadline.remaining(), 0))
+        except asyncio.TimeoutError:
+            raise DeadlineExceededError(f"Deadline of {deadline.seconds}s exceeded waiting for a Gemini slot") from None
+        finally:
+            self._gemini_waiting -= 1
+        self._gemini_queue_times.append(time.perf_counter() - queued_at)
+        
+        self._gemini_in_flight += 1
+        self._gemini_calls += 1
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self._gemini_errors += 1
+            raise
+        finally:
+            self._gemini_call_times.append(time.perf_counter() - started)
+            self._gemini_in_flight -= 1
+            self._gemini_slots.release()
+    
+    async def _call_model(self, prompt: str, generation_config: dict, safety_settings: list,
+                          tier: Optional[ModelTier] = None):
+        """
+        Send a prompt to Gemini with the async API
+        
+        Callers hold a Gemini slot around it, passing _gemini_slot to RetryPolicy.call.
+        
+        Args:
+            prompt (str): The prompt to send
+            generation_config (dict): Gemini generation settings
+            safety_settings (list): Gemini safety settings
+            tier (ModelTier, optional): Tier whose model answers and whose accounting records the call
             
-            # Send to Gemini API and get response
-            response = await asyncio.to_thread(
-                self.model.generate_content,
+        Returns:
+            The Gemini response object
+        """
+        model = tier.model if tier is not None else self.model
+        started = time.perf_counter()
+        try:
+            response = await model.generate_content_async(
                 prompt,
                 generation_config=generation_config,
                 safety_settings=safety_settings
             )
-            
-            # Check if we have a valid response
-            if not response or not response.text:
-                logger.error("Empty response from Gemini API")
-                return self._get_mock_analysis(case_category)
-            
-            # Log response length for debugging
-            logger.info(f"Received response from Gemini API: {len(response.text)} characters")
-            logger.debug(f"Response preview: {response.text[:200]}...")
-            
-            # Find the JSON part in the response
-            text = response.text
-            # Try to isolate JSON if it's wrapped in backticks or other markers
-            json_pattern = r'```(?:json)?\s*([\s\S]*?)\s*```'
-            json_matches = re.findall(json_pattern, text)
-            
-            if json_matches:
-                logger.info("Found JSON block in response")
-                text = json_matches[0]  # Use the first JSON block found
-            
-            # Try to parse the response as JSON
-            try:
-                # Clean up the text before parsing (remove any non-JSON characters)
-                text = text.strip()
-                if not (text.startswith('{') and text.endswith('}')):
-                    logger.warning("Response doesn't appear to be valid JSON, trying to extract JSON part")
-                    # Try to find anything that looks like a JSON object
-                    json_obj_pattern = r'(\{[\s\S]*\})'
-                    obj_matches = re.search(json_obj_pattern, text)
-                    if obj_matches:
-                        text = obj_matches.group(1)
-                
-                logger.info(f"Attempting to parse JSON: {text[:100]}...")
-                analysis_data = json.loads(text)
-                
-                # Validate the structure of the JSON
-                expected_keys = ["summary", "relevant_laws", "relevant_decisions", "recommendations"]
-                missing_keys = [key for key in expected_keys if key not in analysis_data]
-                
-                if missing_keys:
-                    logger.warning(f"Analysis data is missing these keys: {missing_keys}")
-                    # Add missing keys with empty values
-                    for key in missing_keys:
-                        if key in ["relevant_laws", "relevant_decisions"]:
-                            analysis_data[key] = []
-                        else:
-                            analysis_data[key] = ""
-                
-                # Ensure relevant_laws and relevant_decisions are lists
-                if not isinstance(analysis_data.get("relevant_laws"), list):
-                    logger.warning("relevant_laws is not a list, fixing it")
-                    analysis_data["relevant_laws"] = []
-                
-                if not isinstance(analysis_data.get("relevant_decisions"), list):
-                    logger.warning("relevant_decisions is not a list, fixing it")
-                    analysis_data["relevant_decisions"] = []
-                
-                # Ensure each law has title and description
-                for i, law in enumerate(analysis_data["relevant_laws"]):
-                    if not isinstance(law, dict):
-                        analysis_data["relevant_laws"][i] = {"title": "Kanun", "description": str(law)}
-                    elif "title" not in law:
-                        law["title"] = "Kanun"
-                    elif "description" not in law:
-                        law["description"] = "Detay bilgi bulunmamaktadır."
-                
-                # Ensure each decision has case_number, date, and summary
-                for i, decision in enumerate(analysis_data["relevant_decisions"]):
-                    if not isinstance(decision, dict):
-                        analysis_data["relevant_decisions"][i] = {
-                            "case_number": "Belirsiz",
-                            "date": "Belirsiz",
-                            "summary": str(decision)
-                        }
-                    else:
-                        if "case_number" not in decision:
-                            decision["case_number"] = "Belirsiz"
-                        if "date" not in decision:
-                            decision["date"] = "Belirsiz"
-                        if "summary" not in decision:
-                            decision["summary"] = "Detay bilgi bulunmamaktadır."
-                
-                logger.info("Successfully parsed and validated analysis data")
-                return analysis_data
-                
-            except json.JSONDecodeError as e:
-                logger.error(f"Failed to parse JSON response: {str(e)}")
-                logger.error(f"Raw response: {text}")
-                # Fall back to mock data if JSON parsing fails
-                return self._get_mock_analysis(case_category)
-                
-        except Exception as e:
-            logger.error(f"Error generating analysis: {str(e)}")
-            logger.exception(e)
-            return self._get_mock_analysis(case_category)
+        except Exception:
+            if tier is not None:
+                tier.record(time.perf_counter() - started, error=True)
+            raise
+        if tier is not None:
+            tier.record(time.perf_counter() - started, *usage_tokens(response, prompt))
+        return response
     
-    def _parse_ai_response(self, response: str) -> Dict[str, Any]:
-        """Parse the AI response into structured data"""
+    async def _stream_model(self, prompt: str, deadline: Deadline,
+                            tier: Optional[ModelTier] = None) -> AsyncIterator[str]:
+        """
+        Stream the text of a Gemini response chunk by chunk
+        
+        The provider stream is read by a separate task into a buffer, so the Gemini slot is
+        released as soon as the model has finished, however slowly the caller consumes the text.
+        
+        Raises:
+            DeadlineExceededError: If the stream is still running when the deadline passes
+        """
+        buffer: asyncio.Queue = asyncio.Queue()
+        reader = asyncio.create_task(self._read_model_stream(prompt, deadline, tier, buffer))
         try:
-            logger.info("Parsing AI response...")
-            # Extract JSON from the response
-            # The response might contain markdown code blocks
-            if "```json" in response:
-                logger.info("Found JSON code block with ```json marker")
-                json_content = response.split("```json")[1].split("```")[0].strip()
-            elif "```" in response:
-                logger.info("Found code block with ``` marker")
-                json_content = response.split("```")[1].strip()
-            else:
-                logger.info("No code block markers found, treating entire response as JSON")
-                json_content = response.strip()
-            
-            # Log the JSON content for debugging
-            preview = json_content[:100] + "..." if len(json_content) > 100 else json_content
-            logger.info(f"JSON content preview: {preview}")
-            
-            try:
-                # Parse the JSON
-                analysis_data = json.loads(json_content)
-                logger.info("JSON parsed successfully")
-            except json.JSONDecodeError as json_err:
-                logger.error(f"JSON parsing error: {str(json_err)}")
-                logger.error(f"JSON content that failed to parse: {json_content}")
-                # Return a simplified mock response if JSON parsing fails
-                return {
-                    "relevant_laws": [
-                        {
-                            "title": "JSON Parsing Error",
-                            "content": f"The AI response could not be parsed as JSON: {str(json_err)}"
-                        }
-                    ],
-                    "relevant_decisions": [],
-                    "recommendations": f"<p>Error processing AI response: {str(json_err)}</p><p>Raw response: {response[:500]}...</p>"
-                }
-            
-            # Make sure we have all required fields
-            if "relevant_laws" not in analysis_data:
-                logger.warning("Adding missing 'relevant_laws' field to analysis data")
-                analysis_data["relevant_laws"] = []
-            if "relevant_decisions" not in analysis_data:
-                logger.warning("Adding missing 'relevant_decisions' field to analysis data")
-                analysis_data["relevant_decisions"] = []
-            if "recommendations" not in analysis_data:
-                logger.warning("Adding missing 'recommendations' field to analysis data")
-                analysis_data["recommendations"] = ""
+            while True:
+                text = await buffer.get()
+                if text is None:
+                    break
+                yield text
+            await reader
+        finally:
+            if not reader.done():
+                reader.cancel()
+                await asyncio.gather(reader, return_exceptions=True)
+            elif not reader.cancelled():
+                reader.exception()
+    
+    async def _read_model_stream(self, prompt: str, deadline: Deadline, tier: Optional[ModelTier],
+                                 buffer: asyncio.Queue) -> None:
+        """
+        Read a Gemini stream into a buffer while holding a Gemini slot, ending the buffer with None
+        
+        Opening the stream is retried like a normal call; once text has been received, a failure
+        is raised because the chunks already buffered cannot be taken back.
+        """
+        model = tier.model if tier is not None else self.model
+        safety_settings, generation_config = self._generation_settings(tier=tier)
+        try:
+            async with self._gemini_slot(deadline):
+                started = time.perf_counter()
+                streamed = []
+                chunk = None
+                failed = True
+                try:
+                    response = await self.retry_policy.call(
+                        lambda: model.generate_content_async(
+                            prompt,
+                            generation_config=generation_config,
+                            safety_settings=safety_settings,
+                            stream=True
+                        ),
+                        deadline,
+                        self.circuit_breaker
+                    )
+                    chunks = response.__aiter__()
+                    while True:
+                        try:
+                            chunk = await asyncio.wait_for(chunks.__anext__(), timeout=max(deadline.remaining(), 0.001))
+                        except StopAsyncIteration:
+                            break
+                        except asyncio.TimeoutError:
+                            raise DeadlineExceededError(f"Deadline of {deadline.seconds}s exceeded while streaming")
+                        try:
+                            text = chunk.text
+                        except ValueError:
+                            # Chunks without text parts (e.g. the final one carrying only the finish reason)
+                            continue
+                        if text:
+                            streamed.append(text)
+                            buffer.put_nowait(text)
+                    failed = False
+                finally:
+                    if tier is not None:
+                        # The last chunk carries the usage of the whole response, if any
+                        tokens = usage_tokens(chunk, prompt, "".join(streamed)) if not failed else (0, 0)
+                        tier.record(time.perf_counter() - started, *tokens, error=failed)
+        finally:
+            buffer.put_nowait(None)
+    
+    async def stream_analysis(self, case_description: str, case_category: str,
+                              deadline: Optional[Deadline] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """
+        Analyze a case, yielding each part of the analysis as soon as it is complete
+        
+        Events are ("summary", str), ("law", dict), ("decision", dict), ("recommendations", str)
+        and finally ("complete", the full analysis as returned by analyze_case). Requests go through
+        the same cache, near-duplicate and coalescing steps as analyze_case: cached, reused and
+        shared analyses, and analyses without a configured API, are replayed as the same events.
+        If the fast tier's answer is escalated, what it streamed stays sent and "complete" carries
+        the pro tier's analysis.
+        
+        Args:
+            case_description (str): The detailed description of the legal case
+            case_category (str): The category of law (e.g., family, contract, labor)
+            deadline (Deadline, optional): Deadline for the Gemini call, defaults to ANALYSIS_DEADLINE_SECONDS from now
             
-            logger.info("Successfully processed AI response into structured data")
-            return analysis_data
-        except Exception as e:
-            logger.error(f"Error parsing AI response: {str(e)}")
-            logger.exception(e)
-            # Return error information in the analysis data
-            return {
-                "relevant_laws": [
-                    {
-                        "title": "Error Processing AI Response",
-                        "content": f"An error occurred while processing the AI response: {str(e)}"
-                    }
-                ],
-                "relevant_decisions": [
-                    {
-                        "court": "Error",
-                        "number": "N/A",
-                        "content": "Could not process AI response"
-                    }
-                ],
-                "recommendations": f"<p>Error: {str(e)}</p><p>Please try again with a different query.</p>"
-            }
+        Raises:
+            ServiceUnavailableError: If Gemini did not answer within the deadline, retries or circuit breaker
+        """
+        case_category = self._correct_category(case_description, case_category)
+        deadline = deadline or Deadline(ANALYSIS_DEADLINE_SECONDS)
+        
+        if not self.api_configured:
+            analysis_data = await self.analyze_case(case_description, case_category, force_real_analysis=True,
+                                                    deadline=deadline)
+            for event in self._analysis_events(analysis_data):
+                yield event
+            return
+        
+        request_key = make_cache_key(case_description, case_category, self.prompt_version, self.model_key)
+        cache_key = request_key if self.cache is not None else None
+        scope = self._near_duplicate_scope(case_category)
+        analysis_data = None
+        if cache_key:
+            analysis_data = await asyncio.to_thread(self.cache.get, cache_key)
+            if analysis_data is not None:
+                analysis_data.setdefault("metadata", {})["cached"] = True
+        if analysis_data is None:
+            analysis_data = await self._reuse_near_duplicate(case_description, scope, cache_key)
+        if analysis_data is not None:
+            for event in self._analysis_events(analysis_data):
+                yield event
+            return
+        
+        # The stream is the in-flight analysis of the case: identical requests, streamed or not,
+        # share its result instead of calling Gemini again, and it joins one already running
+        events: asyncio.Queue = asyncio.Queue()
+        task, joined = self.single_flight.start(
+            (request_key, True),
+            lambda: self._stream_uncached(case_description, case_category, cache_key, scope, deadline, events)
+        )
+        if joined:
+            logger.info("Joined an in-flight analysis of the same case")
+            analysis_data = copy.deepcopy(await asyncio.shield(task))
+            analysis_data.setdefault("metadata", {})["coalesced"] = True
+            for event in self._analysis_events(analysis_data):
+                yield event
+            return
+        
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        yield "complete", copy.deepcopy(await asyncio.shield(task))
+    
+    async def _stream_uncached(self, case_description: str, case_category: str, cache_key: Optional[str],
+                               scope: str, deadline: Deadline, events: asyncio.Queue) -> Dict[str, Any]:
+        """
+        Stream the analysis of a case that missed the caches, putting its events on a queue
+        
+        The events are those of stream_analysis except "complete", followed by None once the
+        analysis is done or has failed; the analysis itself is returned. With cross-worker
+        coalescing enabled, another worker's analysis of the same case is waited for and replayed.
+        """
+        try:
+            if self.cross_worker_coalescing and cache_key:
+                remote = await self._wait_for_other_worker(cache_key, deadline)
+                if remote is not None:
+                    for event in self._analysis_events(remote):
+                        if event[0] != "complete":
+                            events.put_nowait(event)
+                    return remote
+                try:
+                    return await self._stream_to_queue(case_description, case_category, cache_key, scope,
+                                                       deadline, events)
+                finally:
+                    await asyncio.to_thread(self.cache.release_lock, cache_key, self._lock_owner)
+            return await self._stream_to_queue(case_description, case_category, cache_key, scope, deadline, events)
+        finally:
+            events.put_nowait(None)
+    
+    async def _stream_to_queue(self, case_description: str, case_category: str, cache_key: Optional[str],
+                               scope: str, deadline: Deadline, events: asyncio.Queue) -> Dict[str, Any]:
+        """Call Gemini in streaming mode, queue each part as it completes and store the complete result"""
+        sources = await asyncio.to_thread(self._retrieve_sources, case_description)
+        prompt = self._create_legal_analysis_prompt(case_description, case_category, sources)
+        logger.info(f"Streaming analysis for category {case_category}, prompt length: {len(prompt)} characters")
+        tier = self._route(case_description, case_category)
+        parser = IncrementalJSONParser()
+        normalizers = {"relevant_laws": ("law", validate_law),
+                       "relevant_decisions": ("decision", validate_decision)}
+        async for text in self._stream_model(prompt, deadline, tier):
+            for kind, key, value in parser.feed(text):
+                if kind == "item" and key in normalizers:
+                    event, normalize = normalizers[key]
+                    events.put_nowait((event, self._verify_item(key, normalize(value))))
+                elif kind == "field" and key in ("summary", "recommendations"):
+                    events.put_nowait((key, value))
+        
+        try:
+            analysis_data = self._parse_analysis_text(parser.text, tier)
+        except ValueError:
+            escalated = self._escalate(tier, None)
+            if escalated is None:
+                raise
+        else:
+            escalated = self._escalate(tier, analysis_data)
+        if escalated is not None:
+            analysis_data = await self._generate_analysis(prompt, case_category, True, deadline, escalated)
+            analysis_data["metadata"]["escalated_from"] = tier.name
+        grounded = self._ground_sections(analysis_data, sources)
+        self._verify_citations(analysis_data)
+        for section in grounded:
+            event = "law" if section == "relevant_laws" else "decision"
+            for item in analysis_data[section]:
+                events.put_nowait((event, item))
+        if self._is_cacheable(analysis_data):
+            if cache_key:
+                await asyncio.to_thread(self.cache.set, cache_key, analysis_data)
+            if self.near_duplicates is not None:
+                await asyncio.to_thread(self.near_duplicates.add, case_description, scope, analysis_data)
+        return analysis_data
+    
+    @staticmethod
+    def _analysis_events(analysis_data: Dict[str, Any]) -> Iterator[Tuple[str, Any]]:
+        """Split a finished analysis into the events stream_analysis yields"""
+        yield "summary", analysis_data.get("summary", "")
+        for law in analysis_data.get("relevant_laws", []):
+            yield "law", law
+        for decision in analysis_data.get("relevant_decisions", []):
+            yield "decision", decision
+        yield "recommendations", analysis_data.get("recommendations", "")
+        yield "complete", analysis_data
+    
+    def _coalescing_metrics(self) -> Dict[str, Any]:
+        """Single-flight counters, including analyses taken over from other workers"""
+        metrics = self.single_flight.get_metrics()
+        calls = metrics["calls"]
+        metrics["cross_worker"] = self.cross_worker_coalescing
+        metrics["remote_coalesced"] = self._remote_coalesced
+        metrics["coalescing_rate"] = round((metrics["coalesced"] + self._remote_coalesced) / calls, 4) if calls else 0.0
+        return metrics
+    
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return Gemini concurrency, latency and cache statistics
+        
+        Returns:
+            Dict[str, Any]: Counters plus queue-wait and call-time percentiles in milliseconds
+        """
+        return {
+            "cache": self.cache.get_metrics() if self.cache is not None else None,
+            "near_duplicates": self.near_duplicates.get_metrics() if self.near_duplicates is not None else None,
+            "statutes": self.statutes.get_metrics() if self.statutes is not None else None,
+            "decisions": self.decisions.get_metrics() if self.decisions is not None else None,
+            "vectors": self.vectors.get_metrics() if self.vectors is not None else None,
+            "citations": self.verifier.get_metrics() if self.verifier is not None else None,
+            "router": self.router.get_metrics() if self.router is not None else None,
+            "coalescing": self._coalescing_metrics(),
+            "retries": self.retry_policy.get_metrics(),
+            "circuit_breaker": self.circuit_breaker.get_metrics(),
+            "max_concurrency": self.max_concurrency,
+            "waiting": self._gemini_waiting,
+            "in_flight": self._gemini_in_flight,
+            "calls": self._gemini_calls,
+            "errors": self._gemini_errors,
+            "queue_wait_ms": summarize_durations(self._gemini_queue_times),
+            "call_time_ms": summarize_durations(self._gemini_call_times),
+        }
     
     def _get_mock_analysis(self, category: str) -> Dict[str, Any]:
         """
@@ -446,7 +1251,7 @@ Lütfen sadece belirtilen formatta JSON yanıt ver ve herhangi bir açıklama ek
             Dict[str, Any]: Mock analysis data
         """
         if category == "aile_hukuku":
-            return {
+            analysis = {
                 "summary": "Bu aile hukuku vakasında, evlilik birliğinin temelinden sarsıldığı ve boşanma davası açılabileceği görülmektedir. Çocukların velayeti, nafaka hakları ve mal paylaşımı konuları değerlendirilmelidir.",
                 "relevant_laws": [
                     {
@@ -495,7 +1300,7 @@ Lütfen sadece belirtilen formatta JSON yanıt ver ve herhangi bir açıklama ek
                 """
             }
         elif category == "borçlar_hukuku":
-            return {
+            analysis = {
                 "summary": "Bu borçlar hukuku vakasında, sözleşmeden doğan yükümlülüklerin yerine getirilmemesi durumu söz konusudur. Borcun ifa edilmemesi nedeniyle tazminat talep edilebilir.",
                 "relevant_laws": [
                     {
@@ -530,7 +1335,7 @@ Lütfen sadece belirtilen formatta JSON yanıt ver ve herhangi bir açıklama ek
                 """
             }
         else:
-            return {
+            analysis = {
                 "summary": "Bu vaka için gerçek yapay zeka analizi yapılamadı.",
                 "relevant_laws": [
                     {
@@ -553,4 +1358,7 @@ Lütfen sadece belirtilen formatta JSON yanıt ver ve herhangi bir açıklama ek
                 
                 Şu anda örnek veriler görüntülenmektedir.
                 """
-            } 
\ No newline at end of file
+            }
+        
+        analysis["metadata"] = {"source": "mock"}
+        return analysis
@@ -0,0 +1,254 @@
+"""
+Analysis Cache Service
+This module caches analyze_case results in two tiers: an in-process LRU with TTL
+and an on-disk SQLite (WAL) store shared by all uvicorn workers.
+
+Lookups and writes may wait on the SQLite busy timeout, so async callers run them
+with asyncio.to_thread.
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from app.core.config import (
+    ANALYSIS_CACHE_PATH,
+    ANALYSIS_CACHE_MEMORY_SIZE,
+    ANALYSIS_CACHE_MEMORY_TTL_SECONDS,
+    ANALYSIS_CACHE_DISK_TTL_SECONDS,
+)
+from app.utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Expired disk rows are purged every this many writes
+_PURGE_INTERVAL = 500
+
+
+def make_cache_key(case_description: str, case_category: str, prompt_version: str, model_name: str) -> str:
+    """
+    Build the cache key for an analysis request
+
+    Descriptions that differ only in case or whitespace map to the same key.
+
+    Args:
+        case_description (str): The case description
+        case_category (str): The (corrected) case category
+        prompt_version (str): Version of the analysis prompt
+        model_name (str): The Gemini model name
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = "\x1f".join([normalize_text(case_description), case_category, prompt_version, model_name])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Two-tier cache for legal analysis results"""
+
+    def __init__(self, db_path: Optional[str] = None, memory_size: Optional[int] = None,
+                 memory_ttl: Optional[float] = None, disk_ttl: Optional[float] = None):
+        """
+        Initialize the analysis cache
+
+        Args:
+            db_path (str, optional): Path of the SQLite database for the shared tier
+            memory_size (int, optional): Maximum number of entries kept in process
+            memory_ttl (float, optional): Seconds an entry stays in the in-process tier
+            disk_ttl (float, optional): Seconds an entry stays in the SQLite tier
+        """
+        self.db_path = str(db_path or ANALYSIS_CACHE_PATH)
+        self.memory_size = memory_size or ANALYSIS_CACHE_MEMORY_SIZE
+        self.memory_ttl = memory_ttl if memory_ttl is not None else ANALYSIS_CACHE_MEMORY_TTL_SECONDS
+        self.disk_ttl = disk_ttl if disk_ttl is not None else ANALYSIS_CACHE_DISK_TTL_SECONDS
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._writes = 0
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.bypasses = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the shared SQLite tier on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS analysis_locks (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached analysis
+
+        Args:
+            key (str): Key from make_cache_key
+
+        Returns:
+            Optional[Dict[str, Any]]: A copy of the cached analysis, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(value)
+                del self._memory[key]
+                self.expirations += 1
+
+            row = self._connection().execute(
+                "SELECT value, expires_at FROM analysis_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[1] <= now:
+                self.misses += 1
+                return None
+
+            self.disk_hits += 1
+            self._remember(key, row[0], now)
+            return json.loads(row[0])
+
+    def set(self, key: str, analysis: Dict[str, Any]) -> None:
+        """
+        Store an analysis in both tiers
+
+        Args:
+            key (str): Key from make_cache_key
+            analysis (Dict[str, Any]): The analysis to cache
+        """
+        value = json.dumps(analysis, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO analysis_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, now + self.disk_ttl)
+            )
+            self._writes += 1
+            if self._writes % _PURGE_INTERVAL == 0:
+                conn.execute("DELETE FROM analysis_cache WHERE expires_at <= ?", (now,))
+            conn.commit()
+
+    def peek(self, key: str) -> Optional[Dict[str, Any]]:
+        """Look up a cached analysis without touching the hit/miss counters"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[1] > now:
+                return json.loads(entry[0])
+            row = self._connection().execute(
+                "SELECT value FROM analysis_cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            return json.loads(row[0]) if row else None
+
+    def acquire_lock(self, key: str, owner: str, ttl: float) -> bool:
+        """
+        Claim the cross-worker lock for computing an analysis
+
+        Args:
+            key (str): Key from make_cache_key
+            owner (str): Identifies the claiming worker
+            ttl (float): Seconds after which the lock is considered abandoned
+
+        Returns:
+            bool: True if this worker now holds the lock
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM analysis_locks WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO analysis_locks (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + ttl)
+            )
+            conn.commit()
+            return cursor.rowcount == 1
+
+    def lock_held(self, key: str) -> bool:
+        """Return whether another worker still holds an unexpired lock for the key"""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT 1 FROM analysis_locks WHERE key = ? AND expires_at > ?", (key, time.time())
+            ).fetchone()
+            return row is not None
+
+    def release_lock(self, key: str, owner: str) -> None:
+        """Release a lock taken with acquire_lock"""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM analysis_locks WHERE key = ? AND owner = ?", (key, owner))
+            conn.commit()
+
+    def record_bypass(self) -> None:
+        """Count a request that skipped the cache lookup"""
+        self.bypasses += 1
+
+    def _remember(self, key: str, value: str, now: float) -> None:
+        """Insert into the in-process LRU tier, evicting the least recently used entry if full"""
+        self._memory[key] = (value, now + self.memory_ttl)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return hit/miss/eviction counters
+
+        Returns:
+            Dict[str, Any]: Cache counters and the overall hit rate
+        """
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            "memory_entries": len(self._memory),
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "bypasses": self.bypasses,
+            "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """Close the SQLite connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,285 @@
+"""
+BM25 Index
+An on-disk inverted index with BM25 ranking. Terms, postings and document lengths
+are NumPy arrays opened with mmap, and stored records are JSON lines read through
+mmap, so opening an index is cheap and only the pages a query touches are read.
+
+Each posting stores its precomputed BM25 impact (the term's score contribution to
+that document), and postings are ordered by impact, so a query only adds up scores
+and can stop early on very common terms.
+"""
+
+import os
+import json
+import mmap
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 2
+# Terms are stored as fixed-width bytes so the sorted vocabulary can be binary-searched in place
+TERM_BYTES = 16
+DEFAULT_K1 = 1.2
+DEFAULT_B = 0.75
+# Postings scanned per query, shared between its terms; longer lists only contribute their highest-impact documents
+DEFAULT_POSTINGS_BUDGET = 150_000
+
+
+def _encode_term(term: str) -> bytes:
+    return term.encode("utf-8")[:TERM_BYTES]
+
+
+def build_bm25_index(directory: str, documents: Iterable[Sequence[str]], k1: float = DEFAULT_K1,
+                     b: float = DEFAULT_B) -> Dict[str, Any]:
+    """
+    Build an inverted index over tokenized documents
+
+    Documents are numbered in iteration order; that number is what search() returns.
+    Postings are grouped by term and ordered by BM25 impact, highest first.
+
+    Args:
+        directory (str): Directory to write the index files to
+        documents (Iterable[Sequence[str]]): The terms of each document
+        k1 (float): BM25 term-frequency saturation
+        b (float): BM25 length normalization
+
+    Returns:
+        Dict[str, Any]: The index metadata
+    """
+    os.makedirs(directory, exist_ok=True)
+    vocabulary: Dict[bytes, int] = {}
+    term_ids: List[np.ndarray] = []
+    frequencies: List[np.ndarray] = []
+    doc_lengths: List[int] = []
+
+    for terms in documents:
+        ids = np.fromiter((vocabulary.setdefault(_encode_term(term), len(vocabulary)) for term in terms),
+                          dtype=np.int64, count=len(terms))
+        unique, counts = np.unique(ids, return_counts=True)
+        term_ids.append(unique)
+        frequencies.append(np.minimum(counts, np.iinfo(np.uint16).max))
+        doc_lengths.append(len(terms))
+
+    postings_terms = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+    postings_tf = np.concatenate(frequencies).astype(np.uint16) if frequencies else np.zeros(0, dtype=np.uint16)
+    postings_docs = np.repeat(np.arange(len(doc_lengths), dtype=np.uint32),
+                              [len(ids) for ids in term_ids]) if term_ids else np.zeros(0, dtype=np.uint32)
+
+    # Renumber terms in sorted order so the vocabulary can be binary-searched
+    terms_by_id = np.array(list(vocabulary), dtype=f"S{TERM_BYTES}")
+    order = np.argsort(terms_by_id, kind="stable")
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    postings_terms = rank[postings_terms]
+    document_frequency = np.bincount(postings_terms, minlength=len(order))
+    offsets = np.zeros(len(order) + 1, dtype=np.int64)
+    np.cumsum(document_frequency, out=offsets[1:])
+
+    lengths = np.asarray(doc_lengths, dtype=np.uint32)
+    size = len(lengths)
+    avg_length = float(lengths.mean()) if size else 0.0
+    idf = np.log1p((size - document_frequency + 0.5) / (document_frequency + 0.5))
+    tf = postings_tf.astype(np.float32)
+    norm = k1 * (1 - b + b * lengths[postings_docs] / (avg_length or 1.0))
+    impact = (idf[postings_terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+    # Group postings by term, highest impact first within each term
+    grouping = np.lexsort((-impact, postings_terms))
+
+    np.save(os.path.join(directory, "terms.npy"), terms_by_id[order])
+    np.save(os.path.join(directory, "term_offsets.npy"), offsets)
+    np.save(os.path.join(directory, "postings_docs.npy"), postings_docs[grouping])
+    np.save(os.path.join(directory, "postings_impact.npy"), impact[grouping].astype(np.float16))
+    np.save(os.path.join(directory, "doc_lengths.npy"), lengths)
+
+    meta = {
+        "format": INDEX_FORMAT_VERSION,
+        "documents": len(doc_lengths),
+        "terms": len(order),
+        "postings": int(len(postings_docs)),
+        "avg_doc_length": avg_length,
+        "k1": k1,
+        "b": b,
+    }
+    with open(os.path.join(directory, "bm25.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    return meta
+
+
+class BM25Index:
+    """Read-only BM25 index opened with mmap"""
+
+    def __init__(self, directory: str, postings_budget: int = DEFAULT_POSTINGS_BUDGET):
+        """
+        Open an index written by build_bm25_index
+
+        Args:
+            directory (str): The index directory
+            postings_budget (int): Postings scanned per query, split evenly between its terms
+        """
+        self.directory = directory
+        with open(os.path.join(directory, "bm25.json"), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported BM25 index format in {directory}: {self.meta.get('format')}")
+
+        self._terms = self._load("terms.npy")
+        self._offsets = self._load("term_offsets.npy")
+        self._docs = self._load("postings_docs.npy")
+        self._impact = self._load("postings_impact.npy")
+        self._lengths = self._load("doc_lengths.npy")
+
+        self.size = self.meta["documents"]
+        self.postings_budget = postings_budget
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, name), mmap_mode="r")
+
+    def postings(self, term: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the documents containing a term and the term's BM25 impact in each
+
+        Args:
+            term (str): An analysed term
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Document ids and impacts, highest impact first (views into the mmap)
+        """
+        key = _encode_term(term)
+        position = int(np.searchsorted(self._terms, key))
+        if position >= len(self._terms) or self._terms[position] != key:
+            return self._docs[:0], self._impact[:0]
+        start, end = self._offsets[position], self._offsets[position + 1]
+        return self._docs[start:end], self._impact[start:end]
+
+    def search(self, terms: Sequence[str], limit: int = 10,
+               allowed: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Rank documents for a query with BM25
+
+        Args:
+            terms (Sequence[str]): Analysed query terms; repeats weigh a term more
+            limit (int): Maximum number of results
+            allowed (np.ndarray, optional): Boolean mask over documents; others are never returned
+
+        Returns:
+            List[Tuple[int, float]]: (document id, score), best first
+        """
+        if not self.size or not terms or limit <= 0:
+            return []
+        weights: Dict[str, int] = {}
+        for term in terms:
+            weights[term] = weights.get(term, 0) + 1
+
+        hits, truncated = self._rank(weights, limit, allowed, max(1, self.postings_budget // len(weights)))
+        if truncated and allowed is not None and len(hits) < limit:
+            # A narrow filter can exclude every top-impact posting; score the complete lists instead
+            hits, _ = self._rank(weights, limit, allowed, None)
+        return hits
+
+    def _rank(self, weights: Dict[str, int], limit: int, allowed: Optional[np.ndarray],
+              max_postings: Optional[int]) -> Tuple[List[Tuple[int, float]], bool]:
+        """Accumulate impacts term by term and return the top documents, and whether any list was cut short"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        touched = []
+        truncated = False
+        for term, weight in weights.items():
+            docs, impact = self.postings(term)
+            if max_postings is not None and len(docs) > max_postings:
+                docs, impact = docs[:max_postings], impact[:max_postings]
+                truncated = True
+            if len(docs):
+                scores[docs] += weight * impact.astype(np.float32)
+                touched.append(np.asarray(docs))
+        if not touched:
+            return [], truncated
+
+        # Only documents reached by some posting can score; select among those rather than over the whole corpus.
+        # A document appears once per matching term, so the best limit * terms entries hold the top documents.
+        candidates = np.concatenate(touched) if len(touched) > 1 else touched[0]
+        if allowed is not None:
+            candidates = candidates[allowed[candidates]]
+        keep = limit * len(touched)
+        if len(candidates) > keep:
+            candidates = candidates[np.argpartition(scores[candidates], -keep)[-keep:]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        hits = list(dict.fromkeys(candidates.tolist()))[:limit]
+        return [(doc, float(scores[doc])) for doc in hits], truncated
+
+
+class RecordWriter:
+    """Appends records as JSON lines, tracking offsets for random access"""
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path (str): Path of the JSON lines file; offsets go to path + ".offsets.npy"
+        """
+        self.path = path
+        self._file = open(path, "wb")
+        self._offsets = [0]
+
+    def add(self, record: Dict[str, Any]) -> int:
+        """Append a record and return its document id"""
+        self._file.write(json.dumps(record, ensure_ascii=False).encode("utf-8") + b"\n")
+        self._offsets.append(self._file.tell())
+        return len(self._offsets) - 2
+
+    def close(self) -> int:
+        """Finish the file and write the offsets; returns the number of records"""
+        self._file.close()
+        np.save(self.path + ".offsets.npy", np.asarray(self._offsets, dtype=np.int64))
+        return len(self._offsets) - 1
+
+    def __enter__(self) -> "RecordWriter":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def write_records(path: str, records: Iterable[Dict[str, Any]]) -> int:
+    """
+    Write records as JSON lines with an offsets file for random access
+
+    Args:
+        path (str): Path of the JSON lines file; offsets go to path + ".offsets.npy"
+        records (Iterable[Dict[str, Any]]): Records in document id order
+
+    Returns:
+        int: Number of records written
+    """
+    writer = RecordWriter(path)
+    for record in records:
+        writer.add(record)
+    return writer.close()
+
+
+class RecordReader:
+    """Random access to records written by write_records, through mmap"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._offsets = np.load(path + ".offsets.npy", mmap_mode="r")
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if os.path.getsize(path) else b""
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def get(self, index: int) -> Dict[str, Any]:
+        """Return the record with the given document id"""
+        start, end = int(self._offsets[index]), int(self._offsets[index + 1])
+        return json.loads(self._map[start:end])
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        for index in range(len(self)):
+            yield self.get(index)
+
+    def close(self) -> None:
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+        self._file.close()
+
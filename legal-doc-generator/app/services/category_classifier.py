@@ -0,0 +1,78 @@
+"""
+Category Classifier
+Scores a case description against keyword lists for every law category. The
+keywords are compiled once, at import, into one KeywordMatcher, so scoring a
+description is a single pass over its text whatever the number of keywords.
+"""
+
+from typing import Dict, Optional
+
+from app.utils.keyword_matcher import KeywordMatcher
+
+FAMILY_LAW = "aile_hukuku"
+
+# Keywords per category; "*" marks a stem that also matches inflected words. A keyword must not be the
+# start of another one (after folding), or texts using the longer one count twice. Stems whose final
+# k or t softens before a vowel (çocuk -> çocuğum, senet -> senedi) are listed in both forms.
+CATEGORY_KEYWORDS = {
+    "aile_hukuku": (
+        "boşan*", "nafaka*", "velayet*", "çocuk*", "çocuğ*", "evlilik*", "evliliğ*", "evlen*", "evli", "eş",
+        "eşi", "eşim*", "eşin*", "aile*", "mal paylaşım*", "mal rejim*", "nikah*", "mehir*", "ayrılık*",
+        "ayrılığ*", "ziynet*", "medeni kanun*", "tmk",
+    ),
+    "borçlar_hukuku": (
+        "sözleşme*", "kira*", "borç*", "alacak*", "alacağ*", "senet*", "sened*", "kefil*", "kefalet*", "satış*",
+        "tahliye*", "temerrüt*", "cezai şart*", "vekalet*", "tbk",
+    ),
+    "iş_hukuku": (
+        "işçi*", "işveren*", "kıdem*", "ihbar tazminat*", "fazla mesai*", "maaş*", "ücret*", "işten çıkar*",
+        "işe iade*", "iş sözleşme*", "iş kaza*", "mobbing*", "yıllık izin*", "sigortasız*", "sgk", "iş kanun*",
+    ),
+    "ceza_hukuku": (
+        "suç*", "savcı*", "sanık*", "mağdur*", "şüpheli*", "hırsızlık*", "hırsızlığ*", "dolandırıcılık*",
+        "dolandırıcılığ*", "darp*", "tehdit*", "hakaret*", "yaralama*", "cinayet*", "öldür*", "gözaltı*",
+        "tutuklu*", "hapis*", "türk ceza kanun*", "ceza muhakeme*", "tck", "cmk",
+    ),
+    "ticaret_hukuku": (
+        "şirket*", "ortaklık*", "ortaklığ*", "limited*", "anonim*", "ticari*", "tacir*", "karşılıksız çek*",
+        "bono*", "iflas*", "konkordato*", "fatura*", "marka*", "haksız rekabet*", "ticaret kanun*", "ttk",
+    ),
+    "idare_hukuku": (
+        "belediye*", "idare*", "idari*", "kamu*", "memur*", "bakanlık*", "bakanlığ*", "iptal dava*", "tam yargı*",
+        "imar*", "ruhsat*", "disiplin*", "vergi*", "iyuk",
+    ),
+    "tüketici_hukuku": (
+        "tüketici*", "ayıplı*", "garanti*", "cayma*", "satıcı*", "mesafeli*", "abonelik*", "aboneliğ*",
+        "kredi kart*", "ürün*", "tkhk",
+    ),
+}
+
+_MATCHER = KeywordMatcher(CATEGORY_KEYWORDS)
+
+
+def category_scores(text: str) -> Dict[str, int]:
+    """
+    Score text against every category's keywords
+
+    Args:
+        text (str): A case description, law title or any other text
+
+    Returns:
+        Dict[str, int]: Keyword occurrences per category, every category included
+    """
+    return _MATCHER.scores(text)
+
+
+def best_category(text: str) -> Optional[str]:
+    """
+    Return the category whose keywords occur most often in the text
+
+    Args:
+        text (str): Text to classify
+
+    Returns:
+        Optional[str]: The best-scoring category, or None if no keyword occurs
+    """
+    scores = category_scores(text)
+    category = max(scores, key=scores.get)
+    return category if scores[category] else None
@@ -0,0 +1,308 @@
+"""
+Citation Verifier
+This module checks the law articles and Yargıtay decisions cited in an analysis
+against a local catalog, and marks every item as verified or unverified.
+
+Law titles are normalized to a law number and article number, then checked with a
+hash lookup (articles in the statute corpus) and interval lookups (the article
+ranges of known laws in app/data/statutes/laws.json). Decision E/K numbers are
+checked for plausibility and looked up in the decision index by binary search.
+The catalog is built once, so a whole analysis is checked in well under a millisecond.
+"""
+
+import re
+import json
+import time
+import bisect
+import logging
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import LAW_CATALOG_PATH
+from app.services.decision_index import number_key, normalize_daire, parse_case_number, parse_date
+from app.utils.metrics import summarize_durations
+from app.utils.text import fold_ascii, turkish_lower
+
+logger = logging.getLogger(__name__)
+
+# Reasons recorded in each item's "verification" field
+STATUTE_CORPUS = "statute_corpus"
+ARTICLE_RANGE = "article_range"
+DECISION_INDEX = "decision_index"
+UNKNOWN_LAW = "unknown_law"
+LAW_MISMATCH = "law_mismatch"
+NO_ARTICLE = "no_article"
+ARTICLE_OUT_OF_RANGE = "article_out_of_range"
+NO_CASE_NUMBER = "no_case_number"
+IMPLAUSIBLE_CASE_NUMBER = "implausible_case_number"
+NO_DECISION_CORPUS = "no_decision_corpus"
+NOT_IN_DECISION_INDEX = "not_in_decision_index"
+CHAMBER_MISMATCH = "chamber_mismatch"
+DATE_MISMATCH = "date_mismatch"
+
+_PUNCTUATION = re.compile(r"[^\w\s]+")
+# "madde 166" is tried before "166. maddesi", so a law number in front of "madde" is not taken for the article
+_ARTICLE_PATTERNS = (
+    re.compile(r"\b(?:madde|maddesi|md|m)\s+(\d{1,4})\b"),
+    re.compile(r"\b(\d{1,4})\s+(?:madde|maddesi|md)\b"),
+)
+_NUMBER = re.compile(r"\b\d{3,4}\b")
+_NUMBERED_NAME = re.compile(r"^\d+ sayili ")
+_FIRST_DECISION_YEAR = 1950
+
+
+def normalize_citation(text: str) -> str:
+    """Turkish lower-case, fold to ASCII and replace punctuation with spaces"""
+    return _PUNCTUATION.sub(" ", fold_ascii(turkish_lower(text or "")))
+
+
+class CitationCatalog:
+    """Known laws, their article intervals and the statute corpus articles, keyed by law number"""
+
+    def __init__(self, laws: List[Dict[str, Any]], corpus_articles: List[Tuple[str, str, str]] = ()):
+        """
+        Args:
+            laws (List[Dict[str, Any]]): Entries with name, number, aliases and articles ([[first, last], ...])
+            corpus_articles (List[Tuple[str, str, str]]): (law name, law number, article) of each statute corpus article
+        """
+        self.names: Dict[str, str] = {}
+        # "1475 sayılı İş Kanunu" and "İş Kanunu" share a base name, so naming one and numbering the other is consistent
+        self._base_names: Dict[str, str] = {}
+        self.intervals: Dict[str, Tuple[List[int], List[int]]] = {}
+        self.articles = set()
+        aliases: Dict[str, str] = {}
+        abbreviations: Dict[str, str] = {}
+
+        for law in laws:
+            number = str(law["number"])
+            self.names[number] = law["name"]
+            self._base_names[number] = _NUMBERED_NAME.sub("", normalize_citation(law["name"]))
+            ranges = sorted(law.get("articles", []))
+            self.intervals[number] = ([first for first, _ in ranges], [last for _, last in ranges])
+            aliases[normalize_citation(law["name"])] = number
+            for alias in law.get("aliases", []):
+                # Upper-case abbreviations must match a whole word; names also match inflected ("Kanunu'nun")
+                (abbreviations if alias.isupper() else aliases)[normalize_citation(alias).strip()] = number
+        for name, number, article in corpus_articles:
+            if number not in self.names:
+                self.names[number] = name
+                self._base_names[number] = _NUMBERED_NAME.sub("", normalize_citation(name))
+            aliases.setdefault(normalize_citation(name), number)
+            self.articles.add((number, str(article)))
+
+        # One alternation, longest alias first, finds the law in a single regex pass
+        patterns = [rf"\b{re.escape(alias)}\b" for alias in abbreviations]
+        patterns += [rf"\b{re.escape(alias)}" for alias in aliases]
+        patterns.sort(key=len, reverse=True)
+        self._aliases = {**aliases, **abbreviations}
+        self._alias_pattern = re.compile("|".join(patterns)) if patterns else None
+
+    @classmethod
+    def load(cls, path: Optional[str] = None, statutes=None) -> "CitationCatalog":
+        """
+        Build the catalog from the law list and, if given, the statute index
+
+        Args:
+            path (str, optional): Law list, defaults to LAW_CATALOG_PATH
+            statutes (StatuteIndex, optional): Statute index whose articles count as verified
+
+        Returns:
+            CitationCatalog: The catalog
+        """
+        try:
+            with open(str(path or LAW_CATALOG_PATH), encoding="utf-8") as f:
+                laws = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Law catalog could not be loaded, only statute corpus articles will verify: {str(e)}")
+            laws = []
+        corpus = []
+        if statutes is not None:
+            for doc in range(len(statutes)):
+                article = statutes.get(doc)
+                corpus.append((article["law"], article["law_number"], article["article"]))
+        return cls(laws, corpus)
+
+    def find_law(self, normalized: str, skip: Tuple[int, int] = (0, 0)) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Law number named in a normalized title, by number and by name
+
+        Returns:
+            Tuple[Optional[str], Optional[str]]: (law number from a known number, law number from a name or alias)
+        """
+        by_number = None
+        for match in _NUMBER.finditer(normalized):
+            if match.group() in self.names and not (skip[0] <= match.start() < skip[1]):
+                by_number = match.group()
+                break
+        by_name = None
+        if self._alias_pattern is not None:
+            match = self._alias_pattern.search(normalized)
+            if match:
+                by_name = self._aliases.get(match.group())
+        return by_number, by_name
+
+    def same_law(self, first: str, second: str) -> bool:
+        """Whether two law numbers name the same law, allowing for superseded laws of the same name"""
+        return first == second or self._base_names.get(first) == self._base_names.get(second)
+
+    def in_range(self, number: str, article: int) -> bool:
+        """Whether an article number falls in one of the law's article intervals"""
+        firsts, lasts = self.intervals.get(number, ([], []))
+        position = bisect.bisect_right(firsts, article) - 1
+        return position >= 0 and article <= lasts[position]
+
+
+class CitationVerifier:
+    """Marks cited laws and decisions as verified or unverified against the local catalog"""
+
+    def __init__(self, catalog: Optional[CitationCatalog] = None, statutes=None, decisions=None):
+        """
+        Args:
+            catalog (CitationCatalog, optional): Law catalog, loaded from LAW_CATALOG_PATH and the statutes when not given
+            statutes (StatuteIndex, optional): Statute index for the catalog
+            decisions (DecisionIndex, optional): Decision index that cited E/K numbers are looked up in
+        """
+        self.catalog = catalog if catalog is not None else CitationCatalog.load(statutes=statutes)
+        self.decisions = decisions
+        self._chambers = set(decisions.manifest["chambers"]) if decisions is not None else set()
+
+        self.checked = 0
+        self.verified = 0
+        self._check_times = deque(maxlen=1000)
+
+    def verify_law(self, law: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Annotate a relevant law with "verified" and the "verification" reason
+
+        Args:
+            law (Dict[str, Any]): An item of relevant_laws
+
+        Returns:
+            Dict[str, Any]: The same item, annotated in place
+        """
+        normalized = normalize_citation(law.get("title", ""))
+        match = None
+        for pattern in _ARTICLE_PATTERNS:
+            match = pattern.search(normalized)
+            if match:
+                break
+        article = int(match.group(1)) if match else None
+        by_number, by_name = self.catalog.find_law(normalized, match.span() if match else (0, 0))
+
+        if by_number and by_name and not self.catalog.same_law(by_number, by_name):
+            reason = LAW_MISMATCH
+        elif not (by_number or by_name):
+            reason = UNKNOWN_LAW
+        elif article is None:
+            reason = NO_ARTICLE
+        elif (by_number or by_name, str(article)) in self.catalog.articles:
+            reason = STATUTE_CORPUS
+        elif self.catalog.in_range(by_number or by_name, article):
+            reason = ARTICLE_RANGE
+        else:
+            reason = ARTICLE_OUT_OF_RANGE
+        return self._annotate(law, reason, reason in (STATUTE_CORPUS, ARTICLE_RANGE))
+
+    def verify_decision(self, decision: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Annotate a relevant decision with "verified" and the "verification" reason
+
+        Args:
+            decision (Dict[str, Any]): An item of relevant_decisions
+
+        Returns:
+            Dict[str, Any]: The same item, annotated in place
+        """
+        case_number = decision.get("case_number", "")
+        esas, karar = parse_case_number(case_number)
+        decided = parse_date(decision.get("date"))
+
+        if not (esas or karar):
+            reason = NO_CASE_NUMBER
+        elif not self._plausible(esas, karar, decided):
+            reason = IMPLAUSIBLE_CASE_NUMBER
+        elif self.decisions is None:
+            reason = NO_DECISION_CORPUS
+        else:
+            reason = self._look_up(esas, karar, decided, f"{case_number} {decision.get('summary', '')}")
+        return self._annotate(decision, reason, reason == DECISION_INDEX)
+
+    def _plausible(self, esas: Optional[str], karar: Optional[str], decided: Optional[int]) -> bool:
+        """Years in range, the karar not older than the esas, and the date in the karar year"""
+        current_year = datetime.now().year
+        years = {}
+        for name, number in (("esas", esas), ("karar", karar)):
+            if number:
+                years[name] = number_key(number) // 10_000_000
+                if not _FIRST_DECISION_YEAR <= years[name] <= current_year or number_key(number) % 10_000_000 == 0:
+                    return False
+        if "esas" in years and "karar" in years and years["karar"] < years["esas"]:
+            return False
+        if decided and "karar" in years and decided // 10_000 != years["karar"]:
+            return False
+        return True
+
+    def _look_up(self, esas: Optional[str], karar: Optional[str], decided: Optional[int], text: str) -> str:
+        """Find the decision in the index and compare the chamber and date the citation gives"""
+        found = self.decisions.find(esas=esas, karar=karar)
+        if not found:
+            return NOT_IN_DECISION_INDEX
+        daire = normalize_daire(text)
+        if daire in self._chambers:
+            found = [(chamber, date) for chamber, date in found if chamber == daire]
+            if not found:
+                return CHAMBER_MISMATCH
+        if decided and all(date not in (0, decided) for _, date in found):
+            return DATE_MISMATCH
+        return DECISION_INDEX
+
+    @staticmethod
+    def _annotate(item: Dict[str, Any], reason: str, verified: bool) -> Dict[str, Any]:
+        item["verified"] = verified
+        item["verification"] = reason
+        return item
+
+    def verify_analysis(self, analysis_data: Dict[str, Any]) -> Dict[str, int]:
+        """
+        Annotate every law and decision of an analysis, and record the counts in its metadata
+
+        Args:
+            analysis_data (Dict[str, Any]): The analysis, annotated in place
+
+        Returns:
+            Dict[str, int]: Verified and unverified citation counts
+        """
+        started = time.perf_counter()
+        verified = 0
+        items = 0
+        for law in analysis_data.get("relevant_laws") or []:
+            verified += self.verify_law(law)["verified"]
+            items += 1
+        for decision in analysis_data.get("relevant_decisions") or []:
+            verified += self.verify_decision(decision)["verified"]
+            items += 1
+        counts = {"verified": verified, "unverified": items - verified}
+        analysis_data.setdefault("metadata", {})["citations"] = counts
+
+        self.checked += items
+        self.verified += verified
+        self._check_times.append(time.perf_counter() - started)
+        if items - verified:
+            logger.info(f"{items - verified} of {items} citations could not be verified")
+        return counts
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return verification counters and per-analysis check time
+
+        Returns:
+            Dict[str, Any]: Citations checked and verified, and check time percentiles in milliseconds
+        """
+        return {
+            "laws": len(self.catalog.names),
+            "checked": self.checked,
+            "verified": self.verified,
+            "verified_rate": round(self.verified / self.checked, 4) if self.checked else 0.0,
+            "check_time_ms": summarize_durations(self._check_times),
+        }
@@ -0,0 +1,465 @@
+"""
+Decision Index
+This module ingests a local corpus of Yargıtay decisions into an on-disk index with
+exact esas/karar number lookup, daire and date-range filters, and BM25 full-text
+ranking. Every part of the index is a NumPy array or JSON lines file opened with
+mmap, so loading it does not read the corpus into memory.
+
+The source is a JSON lines file with one decision per line:
+    {"daire": "2. Hukuk Dairesi", "esas": "2019/8754", "karar": "2020/3421",
+     "date": "12.05.2020", "summary": "...", "text": "..."}
+
+Ingest (or re-ingest) a corpus with:
+    python -m app.services.decision_index source.jsonl [index_dir]
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import deque
+from datetime import date, datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.config import DECISION_INDEX_DIR, DECISION_CANDIDATES
+from app.services.bm25_index import BM25Index, RecordReader, RecordWriter, build_bm25_index
+from app.utils.index_build import staged_directory
+from app.utils.metrics import summarize_durations
+from app.utils.text import search_terms, turkish_lower
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = "decisions.json"
+_RECORDS = "decisions.jsonl"
+# Summaries handed to the prompt are cut to this many characters
+SUMMARY_CHARS = 600
+
+# "2019/8754 E., 2020/3421 K."; an E or K followed by a number belongs to that number instead
+_CASE_NUMBER = re.compile(r"(\d{4})\s*/\s*(\d{1,7})\s*(E|K)\b(?!\s*[.:]?\s*\d{4}\s*/)", re.IGNORECASE)
+# "E. 2019/8754, K. 2020/3421" and "Esas No: 2019/8754"
+_PREFIXED_CASE_NUMBER = re.compile(r"\b(E|K)(?:sas|arar)?\s*(?:No)?\s*[.:]?\s*(\d{4})\s*/\s*(\d{1,7})\b", re.IGNORECASE)
+_NUMBER_ONLY = re.compile(r"^\s*(\d{4})\s*/\s*(\d{1,7})\s*$")
+_CHAMBER = re.compile(r"(\d{1,2})\s*\.?\s*(hukuk|ceza|h|c)\s*(dairesi|d)?\b")
+_GENERAL_ASSEMBLY = {"hgk": "Hukuk Genel Kurulu", "hukuk genel kurulu": "Hukuk Genel Kurulu",
+                     "cgk": "Ceza Genel Kurulu", "ceza genel kurulu": "Ceza Genel Kurulu",
+                     "ibk": "İçtihadı Birleştirme Kurulu", "içtihadı birleştirme": "İçtihadı Birleştirme Kurulu"}
+
+DateLike = Union[str, date, None]
+
+
+def number_key(number: str) -> int:
+    """
+    Encode an esas or karar number ("2019/8754") as a sortable integer
+
+    Raises:
+        ValueError: If the number is not in year/sequence form
+    """
+    match = _NUMBER_ONLY.match(number or "")
+    if not match:
+        raise ValueError(f"Not a year/sequence number: {number!r}")
+    return int(match.group(1)) * 10_000_000 + int(match.group(2))
+
+
+def parse_case_number(text: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Extract the esas and karar numbers from a citation such as "2019/8754 E., 2020/3421 K."
+    or "E. 2019/8754, K. 2020/3421"
+
+    Args:
+        text (str): Citation text
+
+    Returns:
+        Tuple[Optional[str], Optional[str]]: (esas, karar) as "year/sequence", None where absent
+    """
+    numbers = {"E": None, "K": None}
+    found = _CASE_NUMBER.findall(text or "")
+    if not found:
+        found = [(year, sequence, kind) for kind, year, sequence in _PREFIXED_CASE_NUMBER.findall(text or "")]
+    for year, sequence, kind in found:
+        numbers[kind.upper()] = numbers[kind.upper()] or f"{year}/{int(sequence)}"
+    return numbers["E"], numbers["K"]
+
+
+def normalize_daire(text: str) -> str:
+    """
+    Canonical chamber name: "2. HD", "Yargıtay 2. Hukuk Dairesi" -> "2. Hukuk Dairesi"
+
+    Args:
+        text (str): Chamber name as written
+
+    Returns:
+        str: The canonical name, or the stripped input if it is not recognised
+    """
+    lowered = turkish_lower(text or "").replace("yargıtay", " ").strip()
+    for key, name in _GENERAL_ASSEMBLY.items():
+        if key in lowered:
+            return name
+    match = _CHAMBER.search(lowered)
+    if match:
+        kind = "Hukuk" if match.group(2).startswith("h") else "Ceza"
+        return f"{int(match.group(1))}. {kind} Dairesi"
+    return (text or "").strip()
+
+
+def parse_date(value: DateLike) -> Optional[int]:
+    """
+    Turn "12.05.2020", "2020-05-12" or a date into the yyyymmdd integer stored in the index
+
+    Returns:
+        Optional[int]: The date as yyyymmdd, or None if it cannot be parsed
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, date):
+        return value.year * 10000 + value.month * 100 + value.day
+    for fmt in ("%d.%m.%Y", "%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return parse_date(datetime.strptime(value.strip(), fmt).date())
+        except ValueError:
+            continue
+    return None
+
+
+def _format_date(value: int) -> str:
+    return f"{value % 100:02d}.{value // 100 % 100:02d}.{value // 10000}" if value else ""
+
+
+def ingest_decisions(source_path: str, index_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the decision index from a JSON lines corpus in one streaming pass
+
+    Records without a parsable esas or karar number are still indexed for
+    full-text search; a missing date sorts as the oldest. The files are built in a
+    staging directory and renamed into place, so servers using the previous index
+    keep reading it undisturbed.
+
+    Args:
+        source_path (str): The decision corpus
+        index_dir (str, optional): Output directory, defaults to DECISION_INDEX_DIR
+
+    Returns:
+        Dict[str, Any]: The index manifest
+    """
+    index_dir = str(index_dir or DECISION_INDEX_DIR)
+    with staged_directory(index_dir, last=(_MANIFEST,)) as staging:
+        manifest = _ingest(source_path, staging)
+    logger.info(f"Ingested {manifest['decisions']} decisions into {index_dir} in {manifest['build_seconds']}s")
+    return manifest
+
+
+def _ingest(source_path: str, index_dir: str) -> Dict[str, Any]:
+    """Write the files of ingest_decisions into the given directory"""
+    started = time.perf_counter()
+
+    digest = hashlib.sha256()
+    chambers: Dict[str, int] = {}
+    chamber_codes: List[int] = []
+    dates: List[int] = []
+    esas_keys: List[int] = []
+    karar_keys: List[int] = []
+    skipped = 0
+
+    writer = RecordWriter(os.path.join(index_dir, _RECORDS))
+
+    def documents():
+        nonlocal skipped
+        with open(source_path, "rb") as f:
+            for line_number, raw in enumerate(f, 1):
+                digest.update(raw)
+                if not raw.strip():
+                    continue
+                try:
+                    decision = json.loads(raw)
+                except json.JSONDecodeError:
+                    logger.warning(f"{source_path}:{line_number}: invalid JSON, skipped")
+                    skipped += 1
+                    continue
+                text = decision.get("text") or decision.get("summary") or ""
+                daire = normalize_daire(decision.get("daire", ""))
+                esas, karar = decision.get("esas"), decision.get("karar")
+                if not (esas and karar):
+                    parsed_esas, parsed_karar = parse_case_number(decision.get("case_number", ""))
+                    esas, karar = esas or parsed_esas, karar or parsed_karar
+                decided = parse_date(decision.get("date")) or 0
+
+                writer.add({
+                    "daire": daire,
+                    "esas": esas or "",
+                    "karar": karar or "",
+                    "date": _format_date(decided),
+                    "summary": (decision.get("summary") or text)[:SUMMARY_CHARS],
+                    "text": text,
+                })
+                chamber_codes.append(chambers.setdefault(daire, len(chambers)))
+                dates.append(decided)
+                esas_keys.append(_safe_key(esas))
+                karar_keys.append(_safe_key(karar))
+                yield search_terms(f"{daire} {text}")
+
+    try:
+        bm25 = build_bm25_index(index_dir, documents())
+    finally:
+        count = writer.close()
+
+    np.save(os.path.join(index_dir, "chambers.npy"), np.asarray(chamber_codes, dtype=np.uint16))
+    np.save(os.path.join(index_dir, "dates.npy"), np.asarray(dates, dtype=np.int32))
+    for name, keys in (("esas", esas_keys), ("karar", karar_keys)):
+        keys = np.asarray(keys, dtype=np.int64)
+        order = np.argsort(keys, kind="stable").astype(np.uint32)
+        np.save(os.path.join(index_dir, f"{name}_keys.npy"), keys[order])
+        np.save(os.path.join(index_dir, f"{name}_docs.npy"), order)
+
+    manifest = {
+        "source_sha256": digest.hexdigest(),
+        "decisions": count,
+        "skipped": skipped,
+        "chambers": sorted(chambers, key=chambers.get),
+        "terms": bm25["terms"],
+        "built_at": datetime.now().isoformat(),
+        "build_seconds": round(time.perf_counter() - started, 1),
+    }
+    with open(os.path.join(index_dir, _MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False)
+    return manifest
+
+
+def _safe_key(number: Optional[str]) -> int:
+    try:
+        return number_key(number)
+    except ValueError:
+        return -1
+
+
+class DecisionIndex:
+    """Read-only, memory-mapped index over a Yargıtay decision corpus"""
+
+    def __init__(self, index_dir: Optional[str] = None):
+        """
+        Open an index built by ingest_decisions
+
+        Args:
+            index_dir (str, optional): Index directory, defaults to DECISION_INDEX_DIR
+        """
+        self.index_dir = str(index_dir or DECISION_INDEX_DIR)
+        with open(os.path.join(self.index_dir, _MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self._bm25 = BM25Index(self.index_dir)
+        self._records = RecordReader(os.path.join(self.index_dir, _RECORDS))
+        self._chambers = self._load("chambers.npy")
+        self._dates = self._load("dates.npy")
+        # Plain ndarray views of the mmaps; exact lookups are small enough that np.memmap's per-call overhead shows
+        self._keys = {name: (np.asarray(self._load(f"{name}_keys.npy")), np.asarray(self._load(f"{name}_docs.npy")))
+                      for name in ("esas", "karar")}
+        self._chamber_codes = {name: code for code, name in enumerate(self.manifest["chambers"])}
+
+        self.queries = 0
+        self._query_times = deque(maxlen=1000)
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.index_dir, name), mmap_mode="r")
+
+    @property
+    def size(self) -> int:
+        return self.manifest["decisions"]
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the corpus the index was built from"""
+        return self.manifest["source_sha256"][:12]
+
+    def get(self, doc: int) -> Dict[str, Any]:
+        """Return a stored decision by document id"""
+        decision = self._records.get(doc)
+        decision["id"] = doc
+        return decision
+
+    def documents(self) -> Iterator[str]:
+        """The indexed text of each decision, in document id order"""
+        for decision in self._records:
+            yield f"{decision['daire']} {decision['text']}"
+
+    def lookup(self, esas: Optional[str] = None, karar: Optional[str] = None,
+               daire: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find decisions by exact esas and/or karar number
+
+        Args:
+            esas (str, optional): Esas number, e.g. "2019/8754"
+            karar (str, optional): Karar number, e.g. "2020/3421"
+            daire (str, optional): Restrict to a chamber ("2. HD", "2. Hukuk Dairesi", ...)
+
+        Returns:
+            List[Dict[str, Any]]: Matching decisions; the same numbers can exist in different chambers
+        """
+        started = time.perf_counter()
+        matches = self._matching_docs(esas, karar)
+        if matches is None:
+            return []
+        if daire:
+            code = self._chamber_codes.get(normalize_daire(daire))
+            matches = matches[np.asarray(self._chambers[matches]) == code] if code is not None else matches[:0]
+        results = [self.get(int(doc)) for doc in np.sort(matches)]
+        self._record_query(started)
+        return results
+
+    def find(self, esas: Optional[str] = None, karar: Optional[str] = None) -> List[Tuple[str, int]]:
+        """
+        Check which decisions carry these numbers without reading their records
+
+        Args:
+            esas (str, optional): Esas number, e.g. "2019/8754"
+            karar (str, optional): Karar number, e.g. "2020/3421"
+
+        Returns:
+            List[Tuple[str, int]]: (chamber, yyyymmdd date or 0) of each matching decision
+        """
+        matches = self._matching_docs(esas, karar)
+        if matches is None or not len(matches):
+            return []
+        chambers = self.manifest["chambers"]
+        return [(chambers[int(self._chambers[doc])], int(self._dates[doc])) for doc in matches]
+
+    def _matching_docs(self, esas: Optional[str], karar: Optional[str]) -> Optional[np.ndarray]:
+        """Documents with both given numbers, None if neither number was given"""
+        matches: Optional[np.ndarray] = None
+        for name, number in (("esas", esas), ("karar", karar)):
+            if not number:
+                continue
+            try:
+                key = number_key(number)
+            except ValueError:
+                return np.zeros(0, dtype=np.int64)
+            keys, docs = self._keys[name]
+            start, end = np.searchsorted(keys, key, side="left"), np.searchsorted(keys, key, side="right")
+            found = docs[start:end]
+            # Both sides hold a few documents at most, so a set beats np.intersect1d's sorting
+            matches = found if matches is None else np.asarray(sorted(set(matches.tolist()) & set(found.tolist())),
+                                                                 dtype=found.dtype)
+        return matches
+
+    def _filter_mask(self, daire: Optional[str], date_from: DateLike, date_to: DateLike) -> Optional[np.ndarray]:
+        """Boolean mask of decisions passing the chamber and date filters, None if there are none"""
+        mask = None
+        if daire:
+            code = self._chamber_codes.get(normalize_daire(daire))
+            mask = self._chambers == code if code is not None else np.zeros(self.size, dtype=bool)
+        start, end = parse_date(date_from), parse_date(date_to)
+        if start:
+            mask = (self._dates >= start) if mask is None else mask & (self._dates >= start)
+        if end:
+            mask = (self._dates <= end) if mask is None else mask & (self._dates <= end)
+        return mask
+
+    def search(self, query: str = "", limit: Optional[int] = None, daire: Optional[str] = None,
+               date_from: DateLike = None, date_to: DateLike = None) -> List[Dict[str, Any]]:
+        """
+        Rank decisions for a text, optionally within a chamber and date range
+
+        Without query terms, the most recent decisions passing the filters are returned.
+
+        Args:
+            query (str): Case description or keywords
+            limit (int, optional): Maximum number of decisions, defaults to DECISION_CANDIDATES
+            daire (str, optional): Chamber filter
+            date_from (str | date, optional): Earliest decision date (inclusive)
+            date_to (str | date, optional): Latest decision date (inclusive)
+
+        Returns:
+            List[Dict[str, Any]]: Decisions, best first, each with a score
+        """
+        started = time.perf_counter()
+        limit = limit or DECISION_CANDIDATES
+        allowed = self._filter_mask(daire, date_from, date_to)
+        terms = search_terms(query)
+        if terms:
+            hits = self._bm25.search(terms, limit, allowed)
+        else:
+            candidates = np.flatnonzero(allowed) if allowed is not None else np.arange(self.size)
+            if len(candidates) > limit:
+                candidates = candidates[np.argpartition(-self._dates[candidates], limit)[:limit]]
+            candidates = candidates[np.argsort(-self._dates[candidates], kind="stable")]
+            hits = [(int(doc), 0.0) for doc in candidates]
+
+        results = []
+        for doc, score in hits:
+            decision = self.get(doc)
+            decision["score"] = round(score, 4)
+            results.append(decision)
+        self._record_query(started)
+        return results
+
+    def _record_query(self, started: float) -> None:
+        self.queries += 1
+        self._query_times.append(time.perf_counter() - started)
+
+    @staticmethod
+    def as_relevant_decision(decision: Dict[str, Any]) -> Dict[str, str]:
+        """Convert a stored decision to the relevant_decisions shape of an analysis"""
+        numbers = ", ".join(part for part in (
+            f"{decision['esas']} E" if decision.get("esas") else "",
+            f"{decision['karar']} K" if decision.get("karar") else "",
+        ) if part)
+        prefix = f"Yargıtay {decision['daire']}: " if decision.get("daire") else ""
+        return {
+            "case_number": numbers or "Belirsiz",
+            "date": decision.get("date") or "Belirsiz",
+            "summary": prefix + decision.get("summary", ""),
+        }
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return corpus size and query latency
+
+        Returns:
+            Dict[str, Any]: Decisions, chambers, terms, queries served and query time percentiles in milliseconds
+        """
+        return {
+            "decisions": self.size,
+            "chambers": len(self.manifest["chambers"]),
+            "terms": self.manifest["terms"],
+            "fingerprint": self.fingerprint,
+            "queries": self.queries,
+            "query_time_ms": summarize_durations(self._query_times),
+        }
+
+    def close(self) -> None:
+        """Release the mapped record file"""
+        self._records.close()
+
+
+_decision_index: Optional[DecisionIndex] = None
+_decision_index_lock = threading.Lock()
+
+
+def get_decision_index() -> Optional[DecisionIndex]:
+    """
+    Return the process-wide decision index
+
+    Returns:
+        Optional[DecisionIndex]: The index, or None when no corpus has been ingested
+    """
+    global _decision_index
+    if _decision_index is None:
+        with _decision_index_lock:
+            if _decision_index is None:
+                if not os.path.exists(os.path.join(str(DECISION_INDEX_DIR), _MANIFEST)):
+                    logger.info(f"No decision index at {DECISION_INDEX_DIR}, decision retrieval is disabled")
+                    return None
+                _decision_index = DecisionIndex()
+                logger.info(f"Decision index loaded: {_decision_index.size} decisions")
+    return _decision_index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("Usage: python -m app.services.decision_index source.jsonl [index_dir]")
+        sys.exit(1)
+    manifest = ingest_decisions(*sys.argv[1:3])
+    print(json.dumps({key: value for key, value in manifest.items() if key != "chambers"}, ensure_ascii=False, indent=2))
@@ -3,39 +3,83 @@ Document Generator Service
 This module handles the generation of legal documents from templates.
 """
 
+import io
 import os
 import re
 import json
 import uuid
+import hashlib
 from datetime import datetime
-from docx import Document
-from docx.shared import Pt, Cm
-from docx.enum.text import WD_ALIGN_PARAGRAPH
 import logging
+from app.core.config import LAZY_DOCX_ENABLED
+from app.services.document_index import get_document_index
+from app.services.document_layout import DocumentLayout, NumberedList, Run, layout_docx, layout_html
+from app.services.docx_html import document_xml_html
+from app.services.render_engine import get_render_engine
+from app.services.template_compiler import current_document_date, get_template_cache, template_values
+from app.utils.concurrency import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+def docx_path(output_dir, template_name, document_id):
+    """Path of a document's .docx file"""
+    return os.path.join(output_dir, f"{template_name}_{document_id}.docx")
+
+
+def template_version(template_name):
+    """
+    Version of the template a document is rendered from
+    
+    Returns:
+        str: The compiled template's content hash, or None for documents given the generic layout
+    """
+    template = get_template_cache().get(template_name)
+    return template.version if template is not None else None
+
+
+def recipe_hash(recipe):
+    """Hash identifying what a render recipe produces; stands in for the content hash of a lazy document"""
+    canonical = json.dumps(recipe, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
 class DocumentGenerator:
     """Handles the generation of legal documents from templates"""
 
-    def __init__(self):
-        """Initialize the document generator service"""
+    def __init__(self, lazy_docx=None):
+        """
+        Initialize the document generator service
+        
+        Args:
+            lazy_docx (bool, optional): Store render recipes and build each DOCX on its first download,
+                defaults to LAZY_DOCX_ENABLED
+        """
         self.output_dir = os.path.join("app", "output")
         # Ensure output directory exists
         os.makedirs(self.output_dir, exist_ok=True)
-        logger.info("DocumentGenerator initialized")
+        self.document_index = get_document_index()
+        self.render_engine = get_render_engine()
+        self.lazy_docx = LAZY_DOCX_ENABLED if lazy_docx is None else lazy_docx
+        # Concurrent first downloads of a lazy document share one build
+        self._materializing = SingleFlight()
+        self.materialized = 0
+        logger.info(f"DocumentGenerator initialized ({'lazy' if self.lazy_docx else 'eager'} DOCX)")
 
-    async def generate_document(self, template_name, template_data, output_format="docx"):
+    async def generate_document(self, template_name, template_data, output_format="docx", document_id=None):
         """
         Generate a document based on a template and provided data.
         
+        In lazy mode only the render recipe is stored and the HTML preview is rendered in memory;
+        the DOCX is built by materialize_document when it is first downloaded.
+        
         Args:
             template_name (str): The name of the template to use
             template_data (dict): The data to fill the template with
             output_format (str): The output format (currently only 'docx' is supported)
+            document_id (str, optional): The document ID to use, generated if not provided
             
         Returns:
-            dict: Results including the document path
+            dict: Results including the document path, its HTML preview and whether the file exists yet
         """
         logger.info(f"Generating document for template: {template_name}")
         
@@ -43,337 +87,286 @@ class DocumentGenerator:
         template_name = self._sanitize_filename(template_name)
         
         # Generate a unique document ID
-        document_id = str(uuid.uuid4())
-        
-        # Generate the document
-        docx_file_path = await self._generate_docx(template_name, template_data, document_id)
+        document_id = document_id or str(uuid.uuid4())
+        
+        if self.lazy_docx:
+            recipe = {
+                "template_name": template_name,
+                "template_data": template_data,
+                "template_version": template_version(template_name),
+                "document_date": current_document_date(),
+            }
+            docx_file_path = docx_path(self.output_dir, template_name, document_id)
+            document_html = await self.render_engine.submit(
+                render_html, template_name, template_data, recipe["document_date"]
+            )
+            created_at = datetime.now().isoformat()
+            entry = self.document_index.register(document_id, docx_file_path, template_name, created_at,
+                                                 content_hash=recipe_hash(recipe), recipe=recipe)
+        else:
+            # Generate the document
+            docx_file_path, document_html = await self._generate_docx(template_name, template_data, document_id)
+            created_at = datetime.now().isoformat()
+            
+            # Register the file so downloads can find it without scanning the output directory
+            entry = self.document_index.register(document_id, docx_file_path, template_name, created_at)
         
         # Return the result
         return {
             "document_id": document_id,
             "document_path": docx_file_path,
             "template_name": template_name,
-            "created_at": datetime.now().isoformat()
+            "created_at": created_at,
+            "content_hash": entry["content_hash"],
+            "html": document_html,
+            "materialized": not self.lazy_docx
         }
 
-    async def _generate_docx(self, template_name, template_data, document_id):
+    async def materialize_document(self, entry):
         """
-        Generate a Microsoft Word document from template data
+        Build the DOCX of a lazily generated document from its recipe, unless it already exists
+        
+        The file is written under a temporary name and renamed into place, so a download never
+        sees a partial file, even when several workers build the same document at once.
         
         Args:
-            template_name (str): The name of the template to use
-            template_data (dict): The data to fill the template with
-            document_id (str): The unique document ID
+            entry (dict): The document's index entry
             
         Returns:
             str: The path to the generated document
         """
-        # Create a new Word document
-        doc = Document()
-        
-        # Set margin
-        for section in doc.sections:
-            section.left_margin = Cm(2.5)
-            section.right_margin = Cm(2.5)
-            section.top_margin = Cm(2.5)
-            section.bottom_margin = Cm(2.5)
-        
-        if template_name == "dilekce":
-            return await self._generate_dilekce(doc, template_data, document_id)
-        elif template_name == "ihtarname":
-            return await self._generate_ihtarname(doc, template_data, document_id)
-        elif template_name == "vekaletname":
-            return await self._generate_vekaletname(doc, template_data, document_id)
-        elif template_name == "dava_dilekce":
-            return await self._generate_dava_dilekce(doc, template_data, document_id)
-        else:
-            return await self._generate_generic(doc, template_name, template_data, document_id)
-    
-    async def _generate_dilekce(self, doc, template_data, document_id):
-        """Generate a petition document"""
-        # Title
-        title = doc.add_paragraph()
-        title_run = title.add_run("DİLEKÇE")
-        title_run.bold = True
-        title_run.font.size = Pt(14)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Recipient
-        recipient = doc.add_paragraph()
-        recipient_run = recipient.add_run(template_data.get("kurum", "").upper())
-        recipient_run.bold = True
-        recipient.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        
-        # Subject
-        subject = doc.add_paragraph()
-        subject.add_run("Konu: ").bold = True
-        subject.add_run(template_data.get("konu", ""))
+        file_path = entry["path"]
+        if os.path.exists(file_path):
+            return file_path
+        
+        recipe = entry["recipe"]
+        current_version = template_version(recipe["template_name"])
+        if current_version != recipe["template_version"]:
+            logger.warning(f"Template {recipe['template_name']} changed since document {entry['document_id']} "
+                           f"was previewed ({recipe['template_version']} -> {current_version}); "
+                           f"building it with the current template")
+        
+        async def build():
+            path, _ = await self.render_engine.submit(
+                render_docx, os.path.dirname(file_path), recipe["template_name"], recipe["template_data"],
+                entry["document_id"], recipe["document_date"]
+            )
+            self.materialized += 1
+            logger.info(f"Built lazy document {entry['document_id']} on first download: {path}")
+            return path
+        
+        path, _ = await self._materializing.run(entry["document_id"], build)
+        return path
+
+    async def render_recipe_html(self, entry):
+        """
+        Render the HTML of a lazily generated document from its recipe, without writing anything
         
-        # Content
-        doc.add_paragraph().add_run()  # Empty line
-        content = doc.add_paragraph()
-        content.add_run(template_data.get("icerik", ""))
+        Args:
+            entry (dict): The document's index entry
+            
+        Returns:
+            str: The document's HTML
+        """
+        recipe = entry["recipe"]
+        return await self.render_engine.submit(
+            render_html, recipe["template_name"], recipe["template_data"], recipe["document_date"]
+        )
+
+    async def render_document_bytes(self, template_name, template_data):
+        """
+        Render a document in the worker pool and return its content, without saving or indexing it
         
-        # Signature
-        doc.add_paragraph().add_run()  # Empty line
-        signature = doc.add_paragraph()
-        signature.add_run("Saygılarımla,")
-        signature.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        Used for batch exports, where the documents only exist inside the archive.
         
-        # Name
-        name = doc.add_paragraph()
-        name.add_run(template_data.get("ad_soyad", ""))
-        name.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        Args:
+            template_name (str): The name of the template to use
+            template_data (dict): The data to fill the template with
+            
+        Returns:
+            bytes: The .docx file content
+        """
+        return await self.render_engine.submit(
+            render_docx_bytes, self._sanitize_filename(template_name), template_data
+        )
+
+    def get_metrics(self):
+        """
+        Return document generation counters
         
-        # Attachments
-        if "ekler" in template_data and template_data["ekler"]:
-            doc.add_paragraph().add_run()  # Empty line
-            attachments = doc.add_paragraph()
-            attachments.add_run("Ekler:").bold = True
-            if isinstance(template_data["ekler"], list):
-                for i, attachment in enumerate(template_data["ekler"], 1):
-                    attachments.add_run(f"\n{i}. {attachment}")
-            else:
-                attachments.add_run(f"\n{template_data['ekler']}")
+        Returns:
+            dict: Whether DOCX files are built lazily, how many lazy documents have been built on download,
+            and how many of those downloads shared a build already in progress
+        """
+        return {
+            "lazy_docx": self.lazy_docx,
+            "materialized": self.materialized,
+            "materialize_coalesced": self._materializing.coalesced,
+        }
+
+    async def _generate_docx(self, template_name, template_data, document_id):
+        """
+        Generate a Microsoft Word document from template data
         
-        # Save the document
-        file_path = os.path.join(self.output_dir, f"dilekce_{document_id}.docx")
-        doc.save(file_path)
+        Rendering runs in the render engine's worker pool so the event loop is not blocked.
         
-        return file_path
+        Args:
+            template_name (str): The name of the template to use
+            template_data (dict): The data to fill the template with
+            document_id (str): The unique document ID
+            
+        Returns:
+            tuple: (path of the generated document, its HTML preview)
+        """
+        return await self.render_engine.submit(
+            render_docx, self.output_dir, template_name, template_data, document_id
+        )
     
-    async def _generate_ihtarname(self, doc, template_data, document_id):
-        """Generate a formal warning document"""
-        # Title
-        title = doc.add_paragraph()
-        title_run = title.add_run("İHTARNAME")
-        title_run.bold = True
-        title_run.font.size = Pt(14)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Sender
-        sender_title = doc.add_paragraph()
-        sender_title.add_run("Gönderen: ").bold = True
-        sender = doc.add_paragraph()
-        sender.add_run(template_data.get("gonderen", ""))
-        
-        # Recipient
-        recipient_title = doc.add_paragraph()
-        recipient_title.add_run("Muhatap: ").bold = True
-        recipient = doc.add_paragraph()
-        recipient.add_run(template_data.get("alici", ""))
-        
-        # Subject
-        subject = doc.add_paragraph()
-        subject.add_run("Konu: ").bold = True
-        subject.add_run(template_data.get("konu", ""))
-        
-        # Content
-        doc.add_paragraph().add_run()  # Empty line
-        content = doc.add_paragraph()
-        content.add_run(template_data.get("icerik", ""))
-        
-        # Conclusion
-        doc.add_paragraph().add_run()  # Empty line
-        conclusion = doc.add_paragraph()
-        conclusion.add_run("Sonuç ve Talep: ").bold = True
-        conclusion.add_run(template_data.get("sonuc_talep", ""))
-        
-        # Signature
-        doc.add_paragraph().add_run()  # Empty line
-        signature = doc.add_paragraph()
-        signature.add_run("Saygılarımla,")
-        signature.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        
-        # Name
-        name = doc.add_paragraph()
-        name.add_run(template_data.get("ad_soyad", ""))
-        name.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    def _sanitize_filename(self, filename):
+        """
+        Sanitize a filename to prevent path traversal attacks
+        """
+        # Remove any directory components
+        filename = os.path.basename(filename)
         
-        # Save the document
-        file_path = os.path.join(self.output_dir, f"ihtarname_{document_id}.docx")
-        doc.save(file_path)
+        # Remove any potentially dangerous characters
+        filename = re.sub(r'[^\w\-_.]', '_', filename)
         
-        return file_path
+        return filename
+
+
+def render_docx(output_dir, template_name, template_data, document_id, document_date=None):
+    """
+    Render and save a document; executed inside a render engine worker
     
-    async def _generate_vekaletname(self, doc, template_data, document_id):
-        """Generate a power of attorney document"""
-        # Title
-        title = doc.add_paragraph()
-        title_run = title.add_run("VEKALETNAME")
-        title_run.bold = True
-        title_run.font.size = Pt(14)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Principal
-        principal_title = doc.add_paragraph()
-        principal_title.add_run("Vekil Eden: ").bold = True
-        principal = doc.add_paragraph()
-        principal.add_run(template_data.get("vekil_eden", ""))
-        
-        # Attorney
-        attorney_title = doc.add_paragraph()
-        attorney_title.add_run("Vekil: ").bold = True
-        attorney = doc.add_paragraph()
-        attorney.add_run(template_data.get("vekil", ""))
-        
-        # Content
-        doc.add_paragraph().add_run()  # Empty line
-        content = doc.add_paragraph()
-        content.add_run(template_data.get("icerik", ""))
-        
-        # Powers
-        doc.add_paragraph().add_run()  # Empty line
-        powers_title = doc.add_paragraph()
-        powers_title.add_run("Verilen Yetkiler:").bold = True
-        
-        if "yetkiler" in template_data:
-            powers = doc.add_paragraph()
-            if isinstance(template_data["yetkiler"], list):
-                for i, power in enumerate(template_data["yetkiler"], 1):
-                    powers.add_run(f"{i}. {power}\n")
-            else:
-                powers.add_run(template_data["yetkiler"])
-        
-        # Signature
-        doc.add_paragraph().add_run()  # Empty line
-        signature = doc.add_paragraph()
-        signature.add_run("Tarih: " + datetime.now().strftime("%d/%m/%Y"))
-        signature.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        
-        # Name
-        name = doc.add_paragraph()
-        name.add_run(template_data.get("ad_soyad", ""))
-        name.alignment = WD_ALIGN_PARAGRAPH.RIGHT
-        
-        # Save the document
-        file_path = os.path.join(self.output_dir, f"vekaletname_{document_id}.docx")
-        doc.save(file_path)
-        
-        return file_path
+    Returns:
+        tuple: (path of the generated document, its HTML preview)
+    """
+    return DocxRenderer(output_dir).render(template_name, template_data, document_id, document_date)
+
+
+def render_docx_bytes(template_name, template_data, document_date=None):
+    """
+    Render a document to .docx bytes without saving it; executed inside a render engine worker
     
-    async def _generate_dava_dilekce(self, doc, template_data, document_id):
-        """Generate a lawsuit petition document"""
-        # Title
-        title = doc.add_paragraph()
-        title_run = title.add_run(template_data.get("mahkeme", "").upper())
-        title_run.bold = True
-        title_run.font.size = Pt(12)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        subtitle = doc.add_paragraph()
-        subtitle_run = subtitle.add_run(template_data.get("dava_turu", "").upper() + " DAVASI DİLEKÇESİ")
-        subtitle_run.bold = True
-        subtitle.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        
-        # Parties
-        doc.add_paragraph().add_run()  # Empty line
-        plaintiff_title = doc.add_paragraph()
-        plaintiff_title.add_run("Davacı: ").bold = True
-        plaintiff = doc.add_paragraph()
-        plaintiff.add_run(template_data.get("davaci", ""))
-        
-        defendant_title = doc.add_paragraph()
-        defendant_title.add_run("Davalı: ").bold = True
-        defendant = doc.add_paragraph()
-        defendant.add_run(template_data.get("davali", ""))
-        
-        # Subject
-        subject = doc.add_paragraph()
-        subject.add_run("Konu: ").bold = True
-        subject.add_run(template_data.get("konu", ""))
-        
-        # Value
-        value = doc.add_paragraph()
-        value.add_run("Dava Değeri: ").bold = True
-        value.add_run(template_data.get("deger", ""))
-        
-        # Content
-        doc.add_paragraph().add_run()  # Empty line
-        content = doc.add_paragraph()
-        content.add_run(template_data.get("aciklamalar", ""))
-        
-        # Evidence
-        if "deliller" in template_data:
-            doc.add_paragraph().add_run()  # Empty line
-            evidence_title = doc.add_paragraph()
-            evidence_title.add_run("Deliller:").bold = True
-            evidence = doc.add_paragraph()
-            if isinstance(template_data["deliller"], list):
-                for i, item in enumerate(template_data["deliller"], 1):
-                    evidence.add_run(f"{i}. {item}\n")
-            else:
-                evidence.add_run(template_data["deliller"])
-        
-        # Legal basis
-        if "hukuki_sebepler" in template_data:
-            doc.add_paragraph().add_run()  # Empty line
-            legal_title = doc.add_paragraph()
-            legal_title.add_run("Hukuki Sebepler:").bold = True
-            legal = doc.add_paragraph()
-            legal.add_run(template_data.get("hukuki_sebepler", ""))
+    Returns:
+        bytes: The .docx file content
+    """
+    return DocxRenderer(None).build(template_name, template_data, document_date, with_html=False)[0]
+
+
+def render_html(template_name, template_data, document_date=None):
+    """
+    Render a document's HTML preview without saving the document; executed inside a render engine worker
+    
+    Returns:
+        str: The document's HTML
+    """
+    return DocxRenderer(None).render_html(template_name, template_data, document_date)
+
+
+class DocxRenderer:
+    """Renders legal documents from compiled templates, or from a document layout when no template exists"""
+
+    def __init__(self, output_dir):
+        """Initialize the renderer for the given output directory"""
+        self.output_dir = output_dir
+
+    def render(self, template_name, template_data, document_id, document_date=None):
+        """
+        Generate a Microsoft Word document from template data, and its HTML preview
         
-        # Request
-        doc.add_paragraph().add_run()  # Empty line
-        request_title = doc.add_paragraph()
-        request_title.add_run("Sonuç ve Talep:").bold = True
-        request = doc.add_paragraph()
-        request.add_run(template_data.get("talep", ""))
+        The file is written under a temporary name and renamed into place.
         
-        # Signature
-        doc.add_paragraph().add_run()  # Empty line
-        signature = doc.add_paragraph()
-        signature.add_run("Saygılarımla,")
-        signature.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        Args:
+            template_name (str): The name of the template to use
+            template_data (dict): The data to fill the template with
+            document_id (str): The unique document ID
+            document_date (str, optional): The date printed on the document, today if not given
+            
+        Returns:
+            tuple: (path of the generated document, its HTML preview)
+        """
+        content, document_html = self.build(template_name, template_data, document_date)
+        file_path = docx_path(self.output_dir, template_name, document_id)
+        temporary = f"{file_path}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(content)
+            os.replace(temporary, file_path)
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+        return file_path, document_html
+
+    def build(self, template_name, template_data, document_date=None, with_html=True):
+        """
+        Render a document in memory
         
-        # Name
-        name = doc.add_paragraph()
-        name.add_run(template_data.get("ad_soyad", ""))
-        name.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+        The HTML comes from what was rendered (the template's document.xml, or the document
+        layout), so the document is never read back to produce it.
         
-        # Save the document
-        file_path = os.path.join(self.output_dir, f"dava_dilekce_{document_id}.docx")
-        doc.save(file_path)
+        Args:
+            template_name (str): The name of the template to use
+            template_data (dict): The data to fill the template with
+            document_date (str, optional): The date printed on the document, today if not given
+            with_html (bool): Also render the HTML preview
+            
+        Returns:
+            tuple: (.docx bytes, HTML preview or None)
+        """
+        template = get_template_cache().get(template_name)
+        if template is not None:
+            document_xml = template.render_xml(template_values(template_data, document_date))
+            return template.package(document_xml), document_xml_html(document_xml) if with_html else None
+        
+        layout = self._layout(template_name, template_data, document_date)
+        buffer = io.BytesIO()
+        layout_docx(layout).save(buffer)
+        return buffer.getvalue(), layout_html(layout) if with_html else None
+
+    def render_html(self, template_name, template_data, document_date=None):
+        """
+        Render only the HTML preview of a document
         
-        return file_path
+        Args:
+            template_name (str): The name of the template to use
+            template_data (dict): The data to fill the template with
+            document_date (str, optional): The date printed on the document, today if not given
+            
+        Returns:
+            str: The same HTML render() returns with the saved document
+        """
+        template = get_template_cache().get(template_name)
+        if template is not None:
+            return document_xml_html(template.render_xml(template_values(template_data, document_date)))
+        return layout_html(self._layout(template_name, template_data, document_date))
+
+    def _layout(self, template_name, template_data, document_date=None):
+        """
+        Lay out a document that has no compiled template
+
+        Every built-in template is compiled from templates/*.docx, so this only handles
+        templates the app has no file for.
+        """
+        return self._generate_generic(template_name, template_data)
     
-    async def _generate_generic(self, doc, template_name, template_data, document_id):
-        """Generate a generic document based on template data"""
+    def _generate_generic(self, template_name, template_data):
+        """Lay out a generic document based on template data"""
+        layout = DocumentLayout()
+        
         # Title
-        title = doc.add_paragraph()
-        title_run = title.add_run(template_name.upper().replace("_", " "))
-        title_run.bold = True
-        title_run.font.size = Pt(14)
-        title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+        layout.paragraph(Run(template_name.upper().replace("_", " "), bold=True, size=14), alignment="center")
         
         # Add all template data as content
-        doc.add_paragraph().add_run()  # Empty line
+        layout.blank()
         
         for key, value in template_data.items():
             if value:
-                field = doc.add_paragraph()
-                field.add_run(key.replace("_", " ").title() + ": ").bold = True
-                
+                label = Run(key.replace("_", " ").title() + ": ", bold=True)
                 if isinstance(value, list):
-                    for i, item in enumerate(value, 1):
-                        field.add_run(f"\n{i}. {item}")
+                    layout.add(NumberedList(value, label=label))
                 else:
-                    field.add_run(str(value))
-        
-        # Save the document
-        file_path = os.path.join(self.output_dir, f"{template_name}_{document_id}.docx")
-        doc.save(file_path)
-        
-        return file_path
-    
-    def _sanitize_filename(self, filename):
-        """
-        Sanitize a filename to prevent path traversal attacks
-        """
-        # Remove any directory components
-        filename = os.path.basename(filename)
-        
-        # Remove any potentially dangerous characters
-        filename = re.sub(r'[^\w\-_.]', '_', filename)
+                    layout.paragraph(label, str(value))
         
-        return filename 
\ No newline at end of file
+        return layout
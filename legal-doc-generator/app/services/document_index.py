@@ -0,0 +1,295 @@
+"""
+Document Index Service
+This module keeps a persistent document_id -> file path index so generated
+documents can be located without scanning the output directories. Each entry
+also records a hash of the file's content, which identifies the rendered
+document for HTTP caching. Documents generated lazily are indexed with their
+render recipe instead, and their file only exists once it has been downloaded.
+"""
+
+import os
+import re
+import json
+import hashlib
+import sqlite3
+import argparse
+import threading
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Iterable, Optional
+
+from app.core.config import DOCUMENT_INDEX_CACHE_SIZE, DOCUMENT_INDEX_PATH, OUTPUT_DIR, STORAGE_DIR
+
+logger = logging.getLogger(__name__)
+
+# Generated files are named "<template>_<uuid>.docx" (app/output) or "<uuid>.docx" (storage/documents)
+_UUID_FILENAME_PATTERN = re.compile(
+    r'^(?:(?P<template>.+?)_)?(?P<id>[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12})\.docx$'
+)
+
+
+def file_content_hash(path: str) -> Optional[str]:
+    """
+    Hash a file's content
+
+    Args:
+        path (str): Path of the file
+
+    Returns:
+        Optional[str]: Hex SHA-256 digest, or None if the file does not exist
+    """
+    digest = hashlib.sha256()
+    try:
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    except FileNotFoundError:
+        return None
+    return digest.hexdigest()
+
+
+class DocumentIndex:
+    """Maps document ids to generated files, backed by an in-process LRU and SQLite"""
+
+    def __init__(self, db_path: Optional[str] = None, cache_size: Optional[int] = None):
+        """
+        Initialize the document index
+
+        Args:
+            db_path (str, optional): Path of the SQLite database holding the index
+            cache_size (int, optional): Entries kept in process, defaults to DOCUMENT_INDEX_CACHE_SIZE;
+                older ones are read back from SQLite when needed
+        """
+        self.db_path = str(db_path or DOCUMENT_INDEX_PATH)
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        self.cache_size = max(1, cache_size or DOCUMENT_INDEX_CACHE_SIZE)
+
+        self._cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # A single connection is shared by the event loop and executor threads, guarded by the lock
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS document_index (
+                document_id TEXT PRIMARY KEY,
+                path TEXT NOT NULL,
+                template_name TEXT,
+                created_at TEXT,
+                content_hash TEXT,
+                recipe TEXT
+            )
+            """
+        )
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(document_index)")}
+        if "content_hash" not in columns:
+            # Indexes created before content hashes were recorded; hashes are filled in on first use
+            self._conn.execute("ALTER TABLE document_index ADD COLUMN content_hash TEXT")
+        if "recipe" not in columns:
+            self._conn.execute("ALTER TABLE document_index ADD COLUMN recipe TEXT")
+        self._conn.commit()
+        logger.info(f"DocumentIndex initialized at {self.db_path}")
+
+    def register(self, document_id: str, path: str, template_name: Optional[str] = None,
+                 created_at: Optional[str] = None, content_hash: Optional[str] = None,
+                 recipe: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Add or replace the index entry for a document
+
+        Args:
+            document_id (str): The unique document ID
+            path (str): Path of the generated file, or where it will be built for a lazy document
+            template_name (str, optional): The template used to generate the document
+            created_at (str, optional): ISO timestamp of the generation
+            content_hash (str, optional): Hash of the file's content, computed from the file if not given
+            recipe (Dict[str, Any], optional): What the document is rendered from, for documents built on download
+
+        Returns:
+            Dict[str, Any]: The stored index entry
+        """
+        entry = {
+            "document_id": document_id,
+            "path": os.path.abspath(path),
+            "template_name": template_name,
+            "created_at": created_at or datetime.now().isoformat(),
+            "content_hash": content_hash or file_content_hash(path),
+            "recipe": recipe,
+        }
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO document_index "
+                "(document_id, path, template_name, created_at, content_hash, recipe) "
+                "VALUES (:document_id, :path, :template_name, :created_at, :content_hash, :recipe)",
+                {**entry, "recipe": json.dumps(recipe, ensure_ascii=False) if recipe is not None else None}
+            )
+            self._conn.commit()
+            self._remember(entry)
+        return entry
+
+    def _remember(self, entry: Dict[str, Any]) -> None:
+        """Keep an entry in the LRU, dropping the least recently used beyond cache_size; call with the lock held"""
+        self._cache[entry["document_id"]] = entry
+        self._cache.move_to_end(entry["document_id"])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def lookup(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a document by id
+
+        Entries registered by other workers are picked up from SQLite on a cache miss.
+
+        Args:
+            document_id (str): The unique document ID
+
+        Returns:
+            Optional[Dict[str, Any]]: The index entry, or None if the id is unknown
+        """
+        with self._lock:
+            entry = self._cache.get(document_id)
+            if entry is not None:
+                self._cache.move_to_end(document_id)
+                return entry
+
+            row = self._conn.execute(
+                "SELECT document_id, path, template_name, created_at, content_hash, recipe FROM document_index "
+                "WHERE document_id = ?",
+                (document_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = dict(row)
+            if entry["recipe"] is not None:
+                entry["recipe"] = json.loads(entry["recipe"])
+            self._remember(entry)
+        return entry
+
+    def content_hash(self, document_id: str) -> Optional[str]:
+        """
+        Return the content hash of a document
+
+        Entries indexed before hashes were recorded get theirs computed and stored here, once.
+
+        Args:
+            document_id (str): The unique document ID
+
+        Returns:
+            Optional[str]: Hex SHA-256 of the file, or None if the id is unknown or the file is gone
+        """
+        entry = self.lookup(document_id)
+        if entry is None:
+            return None
+        if entry.get("content_hash") is None:
+            content_hash = file_content_hash(entry["path"])
+            if content_hash is None:
+                return None
+            with self._lock:
+                self._conn.execute("UPDATE document_index SET content_hash = ? WHERE document_id = ?",
+                                   (content_hash, document_id))
+                self._conn.commit()
+                entry["content_hash"] = content_hash
+        return entry["content_hash"]
+
+    def remove(self, document_id: str) -> None:
+        """Remove a document from the index"""
+        with self._lock:
+            self._conn.execute("DELETE FROM document_index WHERE document_id = ?", (document_id,))
+            self._conn.commit()
+            self._cache.pop(document_id, None)
+
+    def rebuild(self, directories: Optional[Iterable[str]] = None) -> int:
+        """
+        Rebuild the index from the documents found on disk
+
+        Lazy documents are kept: their recipe is all there is of them until they are downloaded.
+
+        Args:
+            directories (Iterable[str], optional): Directories to scan, defaults to app/output and storage/documents
+
+        Returns:
+            int: Number of indexed documents
+        """
+        directories = list(directories or [str(OUTPUT_DIR), str(STORAGE_DIR)])
+        entries = []
+
+        for directory in directories:
+            if not os.path.isdir(directory):
+                logger.warning(f"Skipping missing directory during index rebuild: {directory}")
+                continue
+            with os.scandir(directory) as it:
+                for dir_entry in it:
+                    if not dir_entry.is_file() or not dir_entry.name.endswith(".docx"):
+                        continue
+                    document_id, template_name = self._parse_filename(dir_entry.name)
+                    entries.append({
+                        "document_id": document_id,
+                        "path": os.path.abspath(dir_entry.path),
+                        "template_name": template_name,
+                        "created_at": datetime.fromtimestamp(dir_entry.stat().st_mtime).isoformat(),
+                        "content_hash": file_content_hash(dir_entry.path),
+                    })
+
+        with self._lock:
+            self._conn.execute("DELETE FROM document_index WHERE recipe IS NULL")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO document_index (document_id, path, template_name, created_at, content_hash) "
+                "VALUES (:document_id, :path, :template_name, :created_at, :content_hash)",
+                entries
+            )
+            self._conn.commit()
+            # Entries are read back from SQLite on demand, lazy documents included
+            self._cache.clear()
+
+        logger.info(f"Rebuilt document index with {len(entries)} documents from {directories}")
+        return len(entries)
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
+
+    @staticmethod
+    def _parse_filename(filename: str):
+        """
+        Extract the document id and template name from a generated file name
+
+        Files without a UUID (e.g. the older timestamp-named outputs) are indexed by their stem.
+        """
+        match = _UUID_FILENAME_PATTERN.match(filename)
+        if match:
+            return match.group("id"), match.group("template")
+        return os.path.splitext(filename)[0], None
+
+
+_document_index: Optional[DocumentIndex] = None
+_document_index_lock = threading.Lock()
+
+
+def get_document_index() -> DocumentIndex:
+    """
+    Return the process-wide document index, creating it on first use
+    """
+    global _document_index
+    if _document_index is None:
+        with _document_index_lock:
+            if _document_index is None:
+                _document_index = DocumentIndex()
+    return _document_index
+
+
+if __name__ == "__main__":
+    # Usage: python -m app.services.document_index rebuild [--dir DIR ...]
+    parser = argparse.ArgumentParser(description="Manage the generated document index")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    rebuild_parser = subparsers.add_parser("rebuild", help="Backfill the index from the output directories")
+    rebuild_parser.add_argument("--dir", dest="directories", action="append",
+                                help="Directory to scan (may be repeated); defaults to app/output and storage/documents")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    if args.command == "rebuild":
+        count = get_document_index().rebuild(args.directories)
+        print(f"Indexed {count} documents")
@@ -0,0 +1,206 @@
+"""
+Document Layout
+An intermediate representation of a generated document: paragraphs of formatted
+runs, numbered lists and tables. A builder describes a document once as a
+DocumentLayout, which is then rendered to DOCX with python-docx and to HTML
+directly. The HTML is exactly what app.services.docx_html gives for the DOCX, so
+the preview never has to read the saved file back.
+"""
+
+from typing import List, Optional, Sequence, Union
+
+from docx import Document
+from docx.shared import Pt, Cm
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+
+from app.services.docx_html import DOCUMENT_CLOSE, DOCUMENT_OPEN, runs_html, text_html
+from app.services.template_compiler import format_value
+
+# Layout alignments and the python-docx value each is written as; left is Word's default and is not written
+_DOCX_ALIGNMENTS = {
+    "left": None,
+    "center": WD_ALIGN_PARAGRAPH.CENTER,
+    "right": WD_ALIGN_PARAGRAPH.RIGHT,
+    "justify": WD_ALIGN_PARAGRAPH.JUSTIFY,
+}
+
+
+class Run:
+    """A piece of paragraph text with uniform formatting"""
+
+    def __init__(self, text=None, bold: bool = False, italic: bool = False, size: Optional[float] = None):
+        """
+        Args:
+            text (optional): The text; None gives an empty run and other values are converted with str
+            bold (bool): Bold text
+            italic (bool): Italic text
+            size (float, optional): Font size in points; not shown in the HTML preview
+        """
+        self.text = "" if text is None else str(text)
+        self.bold = bold
+        self.italic = italic
+        self.size = size
+
+
+class Paragraph:
+    """A paragraph of runs with an alignment"""
+
+    def __init__(self, *runs: Union[Run, str], alignment: str = "left"):
+        """
+        Args:
+            runs (Run or str): The paragraph's runs; plain strings become unformatted runs
+            alignment (str): "left", "center", "right" or "justify"
+        """
+        if alignment not in _DOCX_ALIGNMENTS:
+            raise ValueError(f"Unknown paragraph alignment: {alignment}")
+        self.runs = [run if isinstance(run, Run) else Run(run) for run in runs]
+        self.alignment = alignment
+
+
+class NumberedList:
+    """Items numbered 1., 2., ... on the lines of one paragraph, under an optional label"""
+
+    def __init__(self, items: Sequence, label: Optional[Run] = None, alignment: str = "left"):
+        """
+        Args:
+            items (Sequence): The list items
+            label (Run, optional): A run put on the line above the first item, such as a bold "Ekler:"
+            alignment (str): Alignment of the paragraph
+        """
+        self.items = list(items)
+        self.label = label
+        self.alignment = alignment
+
+    def as_paragraph(self) -> Paragraph:
+        """The paragraph both backends render the list as, numbered like the compiled templates number lists"""
+        lines = format_value(self.items)
+        if self.label is None:
+            return Paragraph(lines, alignment=self.alignment)
+        return Paragraph(self.label, "\n" + lines, alignment=self.alignment)
+
+
+class Table:
+    """A grid of plain-text cells"""
+
+    def __init__(self, rows: Sequence[Sequence]):
+        """
+        Args:
+            rows (Sequence[Sequence]): Cell values row by row; short rows are padded with empty cells
+        """
+        self.rows = [["" if cell is None else str(cell) for cell in row] for row in rows]
+        if not self.rows or not any(self.rows):
+            raise ValueError("A table needs at least one cell")
+        self.columns = max(len(row) for row in self.rows)
+
+
+Block = Union[Paragraph, NumberedList, Table]
+
+
+class DocumentLayout:
+    """The content of a document in order, ready for the DOCX and HTML backends"""
+
+    def __init__(self, margin_cm: float = 2.5):
+        """
+        Args:
+            margin_cm (float): Page margin on every side, in centimetres
+        """
+        self.margin_cm = margin_cm
+        self.blocks: List[Block] = []
+
+    def add(self, block: Block) -> Block:
+        """Append a block and return it"""
+        self.blocks.append(block)
+        return block
+
+    def paragraph(self, *runs: Union[Run, str], alignment: str = "left") -> Paragraph:
+        """Append a paragraph of the given runs"""
+        return self.add(Paragraph(*runs, alignment=alignment))
+
+    def blank(self) -> Paragraph:
+        """Append an empty line"""
+        return self.add(Paragraph(Run()))
+
+
+def _add_docx_paragraph(doc, paragraph: Paragraph) -> None:
+    """Write a layout paragraph to a python-docx document"""
+    docx_paragraph = doc.add_paragraph()
+    for run in paragraph.runs:
+        docx_run = docx_paragraph.add_run(run.text)
+        if run.bold:
+            docx_run.bold = True
+        if run.italic:
+            docx_run.italic = True
+        if run.size:
+            docx_run.font.size = Pt(run.size)
+    if _DOCX_ALIGNMENTS[paragraph.alignment] is not None:
+        docx_paragraph.alignment = _DOCX_ALIGNMENTS[paragraph.alignment]
+
+
+def layout_docx(layout: DocumentLayout):
+    """
+    Render a layout to a python-docx document
+
+    Args:
+        layout (DocumentLayout): The document layout
+
+    Returns:
+        docx.document.Document: The document, ready to be saved
+    """
+    doc = Document()
+    for section in doc.sections:
+        section.left_margin = Cm(layout.margin_cm)
+        section.right_margin = Cm(layout.margin_cm)
+        section.top_margin = Cm(layout.margin_cm)
+        section.bottom_margin = Cm(layout.margin_cm)
+
+    for block in layout.blocks:
+        if isinstance(block, Table):
+            table = doc.add_table(rows=len(block.rows), cols=block.columns)
+            table.style = "Table Grid"
+            for docx_row, row in zip(table.rows, block.rows):
+                for cell, value in zip(docx_row.cells, row):
+                    cell.text = value
+        else:
+            if isinstance(block, NumberedList):
+                block = block.as_paragraph()
+            _add_docx_paragraph(doc, block)
+    return doc
+
+
+def _as_read_back(text: str) -> str:
+    """Text as the DOCX converter reads it back: python-docx writes carriage returns as line breaks"""
+    return text.replace("\r", "\n")
+
+
+def _paragraph_html(paragraph: Paragraph) -> str:
+    return runs_html(((_as_read_back(run.text), run.bold, run.italic) for run in paragraph.runs), paragraph.alignment)
+
+
+def _table_html(table: Table) -> str:
+    rows = []
+    for row in table.rows:
+        cells = row + [""] * (table.columns - len(row))
+        rows.append("<tr>" + "".join(f"<td>{text_html(_as_read_back(cell))}</td>" for cell in cells) + "</tr>")
+    return f"<table class='table table-bordered'>{''.join(rows)}</table>"
+
+
+def layout_html(layout: DocumentLayout) -> str:
+    """
+    Render a layout to the HTML shown as the document preview
+
+    Args:
+        layout (DocumentLayout): The document layout
+
+    Returns:
+        str: The same HTML docx_html produces from the layout's DOCX
+    """
+    parts = [DOCUMENT_OPEN]
+    for block in layout.blocks:
+        if isinstance(block, Table):
+            parts.append(_table_html(block))
+        elif isinstance(block, NumberedList):
+            parts.append(_paragraph_html(block.as_paragraph()))
+        else:
+            parts.append(_paragraph_html(block))
+    parts.append(DOCUMENT_CLOSE)
+    return "".join(parts)
@@ -0,0 +1,291 @@
+"""
+DOCX to HTML Converter
+Streams word/document.xml with lxml's iterparse and emits HTML for the body in
+document order: paragraphs with their alignment and bold/italic runs, and tables.
+Each top-level paragraph or table is converted as soon as it has been parsed and
+then cleared, so memory stays flat however long the petition is.
+"""
+
+import io
+import asyncio
+import html
+import logging
+import zipfile
+from typing import IO, AsyncIterator, Iterable, Iterator, List, Tuple
+
+from lxml import etree
+
+from app.services.template_compiler import DOCUMENT_PART, W_NS
+
+logger = logging.getLogger(__name__)
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+_P = _w("p")
+_R = _w("r")
+_T = _w("t")
+_TBL = _w("tbl")
+_TR = _w("tr")
+_TC = _w("tc")
+_VAL = _w("val")
+
+# w:jc values and the CSS alignment they map to; anything else is left-aligned
+_ALIGNMENTS = {"center": "center", "right": "right", "end": "right", "both": "justify", "distribute": "justify"}
+# Run content that python-docx's run.text turns into characters
+_RUN_TEXT = {_w("tab"): "\t", _w("br"): "\n", _w("cr"): "\n", _w("noBreakHyphen"): "-"}
+_OFF = ("0", "false", "off")
+
+# Bump when the HTML produced for a document changes, so cached HTML and its ETags are not reused
+HTML_FORMAT_VERSION = "1"
+
+DOCUMENT_OPEN = "<div class='document-content'>"
+DOCUMENT_CLOSE = "</div>"
+# Size of the pieces stream_docx_html yields, in characters
+STREAM_CHUNK_CHARS = 64 * 1024
+
+
+def _is_on(properties, tag: str) -> bool:
+    """Whether a toggle property (w:b, w:i) is set in run properties"""
+    element = properties.find(tag) if properties is not None else None
+    return element is not None and element.get(_VAL, "true").lower() not in _OFF
+
+
+def _run_text(run) -> str:
+    parts = []
+    for child in run:
+        if child.tag == _T:
+            parts.append(child.text or "")
+        elif child.tag in _RUN_TEXT:
+            parts.append(_RUN_TEXT[child.tag])
+    return "".join(parts)
+
+
+def _paragraph_text(paragraph) -> str:
+    return "".join(_run_text(run) for run in paragraph.iter(_R))
+
+
+def text_html(text: str) -> str:
+    """Escape document text for HTML, turning line breaks into <br>"""
+    return html.escape(text, quote=False).replace("\n", "<br>")
+
+
+def runs_html(runs: Iterable[Tuple[str, bool, bool]], alignment: str) -> str:
+    """
+    HTML for a paragraph given its runs
+
+    Args:
+        runs (Iterable[Tuple[str, bool, bool]]): (text, bold, italic) for each run
+        alignment (str): CSS text alignment
+
+    Returns:
+        str: A <p> with the runs, bold and italic kept; a non-breaking space if it has no visible text
+    """
+    parts = []
+    for text, bold, italic in runs:
+        if not text:
+            continue
+        text = text_html(text)
+        if italic:
+            text = f"<em>{text}</em>"
+        if bold:
+            text = f"<strong>{text}</strong>"
+        parts.append(text)
+
+    if not "".join(parts).strip():
+        return "<p>&nbsp;</p>"
+    return f"<p style='text-align: {alignment};'>{''.join(parts)}</p>"
+
+
+def paragraph_html(paragraph) -> str:
+    """
+    HTML for a w:p element
+
+    Args:
+        paragraph: The w:p element
+
+    Returns:
+        str: A <p> with the paragraph's alignment and its runs, bold and italic kept
+    """
+    runs = []
+    for run in paragraph.iter(_R):
+        properties = run.find(_w("rPr"))
+        runs.append((_run_text(run), _is_on(properties, _w("b")), _is_on(properties, _w("i"))))
+    justification = paragraph.find(f"{_w('pPr')}/{_w('jc')}")
+    alignment = _ALIGNMENTS.get(justification.get(_VAL) if justification is not None else None, "left")
+    return runs_html(runs, alignment)
+
+
+def table_html(table) -> str:
+    """
+    HTML for a w:tbl element
+
+    Args:
+        table: The w:tbl element
+
+    Returns:
+        str: A bordered <table>; cell paragraphs are separated by line breaks and
+        horizontally merged cells get a colspan
+    """
+    rows = []
+    for row in table.iterchildren(_TR):
+        cells = []
+        for cell in row.iterchildren(_TC):
+            span = cell.find(f"{_w('tcPr')}/{_w('gridSpan')}")
+            colspan = f" colspan='{span.get(_VAL)}'" if span is not None and span.get(_VAL, "1") != "1" else ""
+            content = []
+            for child in cell:
+                if child.tag == _P:
+                    content.append(text_html(_paragraph_text(child)))
+                elif child.tag == _TBL:
+                    content.append(table_html(child))
+            cells.append(f"<td{colspan}>{'<br>'.join(content)}</td>")
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    return f"<table class='table table-bordered'>{''.join(rows)}</table>"
+
+
+def iter_document_xml_html(part: IO[bytes]) -> Iterator[str]:
+    """
+    Convert a word/document.xml part to HTML piece by piece, in document order
+
+    Args:
+        part (IO[bytes]): The document part, as a binary file object
+
+    Yields:
+        str: The opening <div>, then one piece per top-level paragraph or table, then the closing </div>
+
+    Raises:
+        etree.XMLSyntaxError: If the part is not well-formed XML
+    """
+    yield DOCUMENT_OPEN
+    table_depth = 0
+    for event, element in etree.iterparse(part, events=("start", "end"), tag=(_P, _TBL)):
+        if element.tag == _TBL:
+            table_depth += 1 if event == "start" else -1
+            if event == "start" or table_depth:
+                continue
+            yield table_html(element)
+        elif event == "start" or table_depth:
+            # Paragraphs inside tables are converted with their table
+            continue
+        else:
+            yield paragraph_html(element)
+
+        # Drop what has been converted, and the siblings skipped before it
+        element.clear(keep_tail=False)
+        parent = element.getparent()
+        while element.getprevious() is not None:
+            del parent[0]
+    yield DOCUMENT_CLOSE
+
+
+def iter_docx_html(file_path: str) -> Iterator[str]:
+    """
+    Convert a DOCX file to HTML piece by piece, in document order
+
+    Args:
+        file_path (str): Path of the .docx file
+
+    Yields:
+        str: The opening <div>, then one piece per top-level paragraph or table, then the closing </div>
+
+    Raises:
+        KeyError, zipfile.BadZipFile, etree.XMLSyntaxError: If the file is not a readable DOCX
+    """
+    with zipfile.ZipFile(file_path) as archive, archive.open(DOCUMENT_PART) as part:
+        yield from iter_document_xml_html(part)
+
+
+def document_xml_html(document_xml: str) -> str:
+    """
+    Convert a rendered word/document.xml to HTML without packaging it first
+
+    Args:
+        document_xml (str): The document part, as rendered by a compiled template
+
+    Returns:
+        str: The whole document as HTML, the same as docx_to_html gives for the packaged file
+    """
+    return "".join(iter_document_xml_html(io.BytesIO(document_xml.encode("utf-8"))))
+
+
+def docx_to_html(file_path: str) -> str:
+    """
+    Convert a DOCX file to HTML
+
+    Args:
+        file_path (str): Path of the .docx file
+
+    Returns:
+        str: The whole document as HTML
+    """
+    return "".join(iter_docx_html(file_path))
+
+
+def _next_chunk(pieces: Iterator[str], size: int) -> str:
+    """Join pieces until they reach size characters; empty once the pieces run out"""
+    chunk: List[str] = []
+    length = 0
+    for piece in pieces:
+        chunk.append(piece)
+        length += len(piece)
+        if length >= size:
+            break
+    return "".join(chunk)
+
+
+def error_html(error: Exception) -> str:
+    """The block shown in place of a document that could not be converted"""
+    return f"<div class='error'>Error converting document: {html.escape(str(error))}</div>"
+
+
+async def stream_docx_html(file_path: str, chunk_chars: int = STREAM_CHUNK_CHARS) -> AsyncIterator[str]:
+    """
+    Convert a DOCX file to HTML as an async stream
+
+    Parsing runs in a worker thread one chunk at a time, so the event loop is never
+    blocked and at most one chunk is held in memory.
+
+    Args:
+        file_path (str): Path of the .docx file
+        chunk_chars (int): Characters per yielded chunk
+
+    Yields:
+        str: Chunks of the document's HTML
+
+    Raises:
+        KeyError, zipfile.BadZipFile, etree.XMLSyntaxError: If the file is not a readable DOCX;
+        a response already started should then be ended with error_html
+    """
+    pieces = iter_docx_html(file_path)
+    chunk = await asyncio.to_thread(_next_chunk, pieces, chunk_chars)
+    while chunk:
+        yield chunk
+        chunk = await asyncio.to_thread(_next_chunk, pieces, chunk_chars)
+
+
+async def open_docx_html_stream(file_path: str, chunk_chars: int = STREAM_CHUNK_CHARS) -> AsyncIterator[str]:
+    """
+    Start streaming a DOCX file as HTML, for a StreamingResponse
+
+    The first chunk is converted before returning, so a missing or unreadable file
+    raises here, before the response has started.
+
+    Args:
+        file_path (str): Path of the .docx file
+        chunk_chars (int): Characters per yielded chunk
+
+    Returns:
+        AsyncIterator[str]: Chunks of the document's HTML, the first one included
+    """
+    chunks = stream_docx_html(file_path, chunk_chars)
+    first = await chunks.__anext__()
+
+    async def body() -> AsyncIterator[str]:
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    return body()
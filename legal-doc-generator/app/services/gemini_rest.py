@@ -0,0 +1,190 @@
+"""
+Gemini REST Model
+A minimal async client for the Gemini generateContent REST API, used in place of
+genai.GenerativeModel when GEMINI_API_ENDPOINT points at a Gemini-compatible
+server, such as the local stand-in used for load tests (python -m app.loadtest.fake_gemini).
+
+The google.generativeai async client only speaks gRPC, which cannot be pointed at a
+plain local HTTP server. This class offers the part of the GenerativeModel
+interface the analyzer uses, and raises the same google.api_core exceptions, so
+retries and the circuit breaker behave as they do against Gemini.
+"""
+
+import json
+import logging
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+from google.api_core import exceptions as google_exceptions
+
+logger = logging.getLogger(__name__)
+
+API_VERSION = "v1beta"
+# generation_config keys as the SDK takes them, and as the REST API names them
+_CONFIG_KEYS = {
+    "temperature": "temperature",
+    "top_p": "topP",
+    "top_k": "topK",
+    "max_output_tokens": "maxOutputTokens",
+    "response_mime_type": "responseMimeType",
+}
+
+
+def response_schema(model: type) -> Dict[str, Any]:
+    """
+    Convert a pydantic model into the OpenAPI subset the REST API takes as responseSchema
+
+    Args:
+        model (type): A pydantic model without defaults or validators
+
+    Returns:
+        Dict[str, Any]: The schema with references inlined and types upper-cased
+    """
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+
+    def convert(node: Dict[str, Any]) -> Dict[str, Any]:
+        if "$ref" in node:
+            node = definitions[node["$ref"].rsplit("/", 1)[-1]]
+        converted = {"type": node["type"].upper()}
+        if "properties" in node:
+            converted["properties"] = {name: convert(value) for name, value in node["properties"].items()}
+            converted["required"] = node.get("required", [])
+        if "items" in node:
+            converted["items"] = convert(node["items"])
+        return converted
+
+    return convert(schema)
+
+
+def _request_body(prompt: str, generation_config: Optional[dict], safety_settings: Optional[list]) -> Dict[str, Any]:
+    """The generateContent request for a single text prompt"""
+    config = {}
+    for key, value in (generation_config or {}).items():
+        if key == "response_schema":
+            config["responseSchema"] = response_schema(value)
+        elif key in _CONFIG_KEYS:
+            config[_CONFIG_KEYS[key]] = value
+    body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}], "generationConfig": config}
+    if safety_settings:
+        body["safetySettings"] = safety_settings
+    return body
+
+
+class RestResponse:
+    """A generateContent response, or one chunk of a streamed one"""
+
+    def __init__(self, data: Dict[str, Any]):
+        self.data = data
+        usage = data.get("usageMetadata", {})
+        self.usage_metadata = SimpleNamespace(prompt_token_count=usage.get("promptTokenCount", 0),
+                                              candidates_token_count=usage.get("candidatesTokenCount", 0))
+
+    @property
+    def text(self) -> str:
+        """
+        Text of the first candidate
+
+        Raises:
+            ValueError: If the response has no text parts, as the SDK's response does
+        """
+        candidates = self.data.get("candidates") or []
+        parts = candidates[0].get("content", {}).get("parts", []) if candidates else []
+        texts = [part["text"] for part in parts if "text" in part]
+        if not texts:
+            raise ValueError("The response does not contain any text parts")
+        return "".join(texts)
+
+
+class RestStream:
+    """Chunks of a streamGenerateContent response read as server-sent events"""
+
+    def __init__(self, response: httpx.Response):
+        self._response = response
+
+    async def __aiter__(self) -> AsyncIterator[RestResponse]:
+        try:
+            async for line in self._response.aiter_lines():
+                if line.startswith("data:"):
+                    yield RestResponse(json.loads(line[5:]))
+        except httpx.TransportError as e:
+            raise google_exceptions.ServiceUnavailable(f"Gemini stream interrupted: {str(e)}") from e
+        finally:
+            await self._response.aclose()
+
+
+class RestGenerativeModel:
+    """The generate_content_async part of genai.GenerativeModel, over the REST API"""
+
+    def __init__(self, model_name: str, endpoint: str, api_key: str = "", timeout: Optional[float] = None,
+                 client: Optional[httpx.AsyncClient] = None):
+        """
+        Args:
+            model_name (str): Model to request, e.g. "gemini-1.5-pro"
+            endpoint (str): Base URL of the API, e.g. "http://127.0.0.1:8765"
+            api_key (str): Sent as x-goog-api-key when given
+            timeout (float, optional): Per-request timeout in seconds; the analyzer's deadline applies in any case
+            client (httpx.AsyncClient, optional): HTTP client to use, created on first call when not given
+        """
+        self.model_name = model_name
+        self.endpoint = endpoint.rstrip("/")
+        self._headers = {"x-goog-api-key": api_key} if api_key else {}
+        self._timeout = timeout
+        self._client = client
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self._timeout, limits=httpx.Limits(max_connections=None))
+        return self._client
+
+    def _url(self, method: str) -> str:
+        return f"{self.endpoint}/{API_VERSION}/models/{self.model_name}:{method}"
+
+    async def generate_content_async(self, prompt: str, generation_config: Optional[dict] = None,
+                                     safety_settings: Optional[List[dict]] = None, stream: bool = False):
+        """
+        Generate content for a text prompt
+
+        Args:
+            prompt (str): The prompt
+            generation_config (dict, optional): Generation settings as the SDK takes them
+            safety_settings (List[dict], optional): Safety settings as the SDK takes them
+            stream (bool): Return the response as an async iterable of chunks
+
+        Returns:
+            RestResponse, or RestStream when streaming
+
+        Raises:
+            google_exceptions.GoogleAPICallError: For error statuses, timeouts and connection failures
+        """
+        body = _request_body(prompt, generation_config, safety_settings)
+        url = self._url("streamGenerateContent") if stream else self._url("generateContent")
+        request = self.client.build_request("POST", url, json=body, headers=self._headers,
+                                            params={"alt": "sse"} if stream else None)
+        try:
+            response = await self.client.send(request, stream=stream)
+        except httpx.TimeoutException as e:
+            raise google_exceptions.DeadlineExceeded(f"Gemini request timed out: {str(e)}") from e
+        except httpx.TransportError as e:
+            raise google_exceptions.ServiceUnavailable(f"Gemini endpoint unreachable: {str(e)}") from e
+
+        if response.status_code >= 400:
+            await response.aread()
+            await response.aclose()
+            raise google_exceptions.from_http_status(response.status_code, self._error_message(response))
+        if stream:
+            return RestStream(response)
+        return RestResponse(response.json())
+
+    @staticmethod
+    def _error_message(response: httpx.Response) -> str:
+        try:
+            return response.json()["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            return response.text[:200] or response.reason_phrase
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
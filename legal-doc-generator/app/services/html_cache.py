@@ -0,0 +1,266 @@
+"""
+HTML Cache Service
+This module caches the HTML of generated documents for /documents/{id}/content.
+Generated documents never change, so their HTML is kept in an in-process LRU
+(bounded in bytes) over an .html sidecar written next to each DOCX, which every
+worker shares. Entries are keyed by document id and content hash, and the same
+hash makes up the strong ETag sent to clients.
+"""
+
+import os
+import uuid
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
+
+from app.core.config import HTML_CACHE_ENABLED, HTML_CACHE_MEMORY_BYTES, HTML_CACHE_MAX_ENTRY_BYTES
+from app.services.docx_html import HTML_FORMAT_VERSION, error_html
+
+logger = logging.getLogger(__name__)
+
+# Sent with cached HTML: a document id's content never changes, so clients may keep it for a year unrevalidated
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Sent with HTML streamed during a conversion: it may still end in an error block, so it is never stored
+STREAMED_CACHE_CONTROL = "no-store"
+
+
+def make_etag(content_hash: str) -> str:
+    """
+    Build the strong ETag of a document's HTML
+
+    Args:
+        content_hash (str): Hash of the DOCX content
+
+    Returns:
+        str: The quoted ETag, which also changes when the HTML format does
+    """
+    return f'"{content_hash[:32]}-{HTML_FORMAT_VERSION}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag
+
+    Args:
+        if_none_match (str, optional): The header value: "*" or a list of (possibly weak) ETags
+        etag (str): The current ETag
+
+    Returns:
+        bool: True if the client's copy is current (weak comparison, as RFC 9110 requires for If-None-Match)
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+class HTMLCache:
+    """In-process LRU over on-disk sidecars for the HTML of generated documents"""
+
+    def __init__(self, memory_bytes: Optional[int] = None, max_entry_bytes: Optional[int] = None,
+                 enabled: Optional[bool] = None):
+        """
+        Initialize the HTML cache
+
+        Args:
+            memory_bytes (int, optional): Total size of the HTML kept in process
+            max_entry_bytes (int, optional): Largest HTML kept in process; larger documents are served from their sidecar
+            enabled (bool, optional): Cache at all; when off, every request converts the DOCX
+        """
+        self.memory_bytes = memory_bytes if memory_bytes is not None else HTML_CACHE_MEMORY_BYTES
+        self.max_entry_bytes = min(self.memory_bytes,
+                                   max_entry_bytes if max_entry_bytes is not None else HTML_CACHE_MAX_ENTRY_BYTES)
+        self.enabled = HTML_CACHE_ENABLED if enabled is None else enabled
+
+        self._memory: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.sidecar_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    @staticmethod
+    def sidecar_path(docx_path: str, content_hash: str) -> str:
+        """Path of the HTML sidecar for a DOCX file with the given content"""
+        return f"{os.path.splitext(docx_path)[0]}.{content_hash[:16]}-{HTML_FORMAT_VERSION}.html"
+
+    def _remember(self, key: Tuple[str, str], body: bytes) -> None:
+        """Keep HTML in the LRU, evicting the least recently used entries beyond the byte budget"""
+        if len(body) > self.max_entry_bytes:
+            return
+        with self._lock:
+            previous = self._memory.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._memory[key] = body
+            self._size += len(body)
+            while self._size > self.memory_bytes:
+                _, evicted = self._memory.popitem(last=False)
+                self._size -= len(evicted)
+                self.evictions += 1
+
+    async def get(self, document_id: str, content_hash: str, docx_path: str) -> Tuple[Optional[bytes], Optional[str]]:
+        """
+        Look up the HTML of a document
+
+        Memory hits return at once; a sidecar is read in a worker thread.
+
+        Args:
+            document_id (str): The document ID
+            content_hash (str): Hash of the DOCX content
+            docx_path (str): Path of the DOCX, next to which the sidecar lives
+
+        Returns:
+            Tuple[Optional[bytes], Optional[str]]: (UTF-8 HTML, None) from memory or a small sidecar,
+            (None, sidecar path) for a sidecar too large to keep in memory, (None, None) on a miss
+        """
+        if not self.enabled:
+            return None, None
+        key = (document_id, content_hash)
+        with self._lock:
+            body = self._memory.get(key)
+            if body is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return body, None
+
+        sidecar = self.sidecar_path(docx_path, content_hash)
+        try:
+            body = await asyncio.to_thread(self._read_sidecar, sidecar)
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None, None
+        with self._lock:
+            self.sidecar_hits += 1
+        if body is None:
+            return None, sidecar
+        self._remember(key, body)
+        return body, None
+
+    def _read_sidecar(self, sidecar: str) -> Optional[bytes]:
+        """Read a sidecar, or return None if it is too large to keep in memory; raises OSError if missing"""
+        if os.path.getsize(sidecar) > self.max_entry_bytes:
+            return None
+        with open(sidecar, "rb") as f:
+            return f.read()
+
+    async def set(self, document_id: str, content_hash: str, docx_path: str, html: str,
+                  write_sidecar: bool = True) -> None:
+        """
+        Store the HTML of a document in memory and in its sidecar
+
+        The sidecar is written in a worker thread.
+
+        Args:
+            document_id (str): The document ID
+            content_hash (str): Hash of the DOCX content
+            docx_path (str): Path of the DOCX, next to which the sidecar is written
+            html (str): The document's HTML
+            write_sidecar (bool): Also write the sidecar; off for lazy documents, which are
+                re-rendered from their recipe instead of being read from disk
+        """
+        if not self.enabled:
+            return
+        body = html.encode("utf-8")
+        if write_sidecar:
+            await asyncio.to_thread(self._write_sidecar, self.sidecar_path(docx_path, content_hash), body)
+        self._remember((document_id, content_hash), body)
+
+    @staticmethod
+    def _write_sidecar(sidecar: str, body: bytes) -> None:
+        """Write a sidecar under a temporary name and rename it into place; failures are only logged"""
+        temporary = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temporary, "wb") as f:
+                f.write(body)
+            os.replace(temporary, sidecar)
+        except OSError as e:
+            logger.warning(f"Could not write HTML sidecar {sidecar}: {str(e)}")
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    async def stream_and_store(self, document_id: str, content_hash: str, docx_path: str,
+                               chunks: AsyncIterator[str]) -> AsyncIterator[str]:
+        """
+        Pass a conversion stream through, storing the HTML once the stream has completed
+
+        The HTML goes to a temporary file as it streams and becomes the sidecar only if
+        the conversion finished; a failed conversion ends the stream with an error block
+        and a dropped client leaves nothing behind.
+
+        Args:
+            document_id (str): The document ID
+            content_hash (str): Hash of the DOCX content
+            docx_path (str): Path of the DOCX
+            chunks (AsyncIterator[str]): The conversion stream, from open_docx_html_stream
+
+        Yields:
+            str: The chunks, unchanged
+        """
+        sidecar = self.sidecar_path(docx_path, content_hash)
+        temporary = f"{sidecar}.{uuid.uuid4().hex}.tmp"
+        body = bytearray()
+        size = 0
+        completed = False
+        f = None
+        if self.enabled:
+            try:
+                f = open(temporary, "wb")
+            except OSError as e:
+                logger.warning(f"Could not write HTML sidecar {sidecar}: {str(e)}")
+        try:
+            try:
+                async for chunk in chunks:
+                    encoded = chunk.encode("utf-8")
+                    size += len(encoded)
+                    if f is not None:
+                        f.write(encoded)
+                        if size <= self.max_entry_bytes:
+                            body += encoded
+                    yield chunk
+            except Exception as e:
+                logger.error(f"Error streaming document {document_id} as HTML: {str(e)}")
+                yield error_html(e)
+                return
+            completed = True
+        finally:
+            if f is not None:
+                f.close()
+                if completed:
+                    os.replace(temporary, sidecar)
+                    if size <= self.max_entry_bytes:
+                        self._remember((document_id, content_hash), bytes(body))
+                else:
+                    os.remove(temporary)
+
+    def record_not_modified(self) -> None:
+        with self._lock:
+            self.not_modified += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return cache counters and memory use
+
+        Returns:
+            Dict[str, Any]: Hit, miss, 304 and eviction counts, entries and bytes in memory
+        """
+        with self._lock:
+            lookups = self.memory_hits + self.sidecar_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "memory_hits": self.memory_hits,
+                "sidecar_hits": self.sidecar_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.sidecar_hits) / lookups, 4) if lookups else 0.0,
+                "not_modified": self.not_modified,
+                "evictions": self.evictions,
+                "entries": len(self._memory),
+                "memory_bytes": self._size,
+            }
@@ -0,0 +1,461 @@
+"""
+Job Queue Service
+This module keeps long-running document generation jobs in a persistent SQLite
+queue and runs them in a pool of asyncio workers, so HTTP requests only enqueue
+a job and poll (or subscribe to) its status.
+
+JobStore calls are blocking (another process may hold the write lock for up to the
+busy timeout), so async code runs them with asyncio.to_thread.
+"""
+
+import os
+import json
+import time
+import uuid
+import socket
+import asyncio
+import sqlite3
+import threading
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.core.config import (
+    JOB_QUEUE_PATH,
+    JOB_WORKER_CONCURRENCY,
+    JOB_LEASE_SECONDS,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_SECONDS,
+    JOB_RECOVER_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+TERMINAL_STATUSES = (SUCCEEDED, FAILED)
+
+# handler(payload, report_progress) -> result; report_progress(partial) merges into the job's partial results
+JobHandler = Callable[[Dict[str, Any], Callable[[Dict[str, Any]], None]], Awaitable[Dict[str, Any]]]
+
+
+class JobStore:
+    """Persistent job table in SQLite (WAL), shared by every web and worker process"""
+
+    def __init__(self, db_path: Optional[str] = None, lease_seconds: Optional[float] = None,
+                 max_attempts: Optional[int] = None):
+        """
+        Initialize the job store
+
+        Args:
+            db_path (str, optional): Path of the SQLite database
+            lease_seconds (float, optional): How long a claimed job may run without progress before it is requeued
+            max_attempts (int, optional): Attempts before a job whose worker keeps dying is failed
+        """
+        self.db_path = str(db_path or JOB_QUEUE_PATH)
+        self.lease_seconds = lease_seconds if lease_seconds is not None else JOB_LEASE_SECONDS
+        self.max_attempts = max_attempts or JOB_MAX_ATTEMPTS
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the SQLite store on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    partial TEXT NOT NULL DEFAULT '{}',
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    worker TEXT,
+                    lease_expires_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    finished_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at)")
+            self._conn = conn
+        return self._conn
+
+    def enqueue(self, kind: str, payload: Dict[str, Any]) -> str:
+        """
+        Add a job to the queue
+
+        Args:
+            kind (str): Job type, used to pick the handler
+            payload (Dict[str, Any]): JSON-serializable job input
+
+        Returns:
+            str: The new job id
+        """
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._connection().execute(
+                "INSERT INTO jobs (id, kind, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, QUEUED, json.dumps(payload, ensure_ascii=False), now, now)
+            )
+        return job_id
+
+    def claim(self, worker: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically take the oldest queued job
+
+        Args:
+            worker (str): Identifies the claiming worker
+
+        Returns:
+            Optional[Dict[str, Any]]: The claimed job, or None if the queue is empty
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, lease_expires_at = ?, "
+                    "updated_at = ? WHERE id = ?",
+                    (RUNNING, worker, now + self.lease_seconds, now, row["id"])
+                )
+                job = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self._to_dict(job)
+
+    def report_progress(self, job_id: str, worker: str, partial: Dict[str, Any]) -> bool:
+        """
+        Merge partial results into a running job and extend its lease
+
+        Args:
+            job_id (str): The job
+            worker (str): The worker that claimed it
+            partial (Dict[str, Any]): Partial results to merge
+
+        Returns:
+            bool: False if the worker no longer holds the job (its lease expired and it was requeued)
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT partial FROM jobs WHERE id = ? AND worker = ? AND status = ?", (job_id, worker, RUNNING)
+                ).fetchone()
+                if row is not None:
+                    merged = json.loads(row["partial"])
+                    merged.update(partial)
+                    conn.execute(
+                        "UPDATE jobs SET partial = ?, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                        (json.dumps(merged, ensure_ascii=False), now + self.lease_seconds, now, job_id)
+                    )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return row is not None
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        """
+        Mark a job as succeeded with its result
+
+        Returns:
+            bool: False if the worker no longer holds the job; the result is then discarded
+        """
+        now = time.time()
+        with self._lock:
+            return self._connection().execute(
+                "UPDATE jobs SET status = ?, result = ?, lease_expires_at = NULL, updated_at = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (SUCCEEDED, json.dumps(result, ensure_ascii=False), now, now, job_id, worker, RUNNING)
+            ).rowcount == 1
+
+    def fail(self, job_id: str, worker: str, error: str) -> bool:
+        """
+        Mark a job as failed
+
+        Returns:
+            bool: False if the worker no longer holds the job; the error is then discarded
+        """
+        now = time.time()
+        with self._lock:
+            return self._connection().execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ?, finished_at = ? "
+                "WHERE id = ? AND worker = ? AND status = ?",
+                (FAILED, error, now, now, job_id, worker, RUNNING)
+            ).rowcount == 1
+
+    def recover_expired(self) -> int:
+        """
+        Requeue running jobs whose worker stopped reporting, failing those out of attempts
+
+        Returns:
+            int: Number of jobs recovered
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            failed = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ?, finished_at = ? "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (FAILED, "Worker stopped while running the job", now, now, RUNNING, now, self.max_attempts)
+            ).rowcount
+            requeued = conn.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_expires_at < ?",
+                (QUEUED, now, RUNNING, now)
+            ).rowcount
+        if failed or requeued:
+            logger.warning(f"Recovered expired jobs: {requeued} requeued, {failed} failed")
+        return failed + requeued
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a job by id, or None"""
+        with self._lock:
+            row = self._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["partial"] = json.loads(job["partial"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def close(self) -> None:
+        """Close the SQLite connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class JobWorkerPool:
+    """Asyncio workers that claim jobs from a JobStore and run the handler registered for their kind"""
+
+    def __init__(self, store: JobStore, handlers: Dict[str, JobHandler], concurrency: Optional[int] = None,
+                 poll_interval: Optional[float] = None, recover_interval: Optional[float] = None):
+        """
+        Initialize the worker pool
+
+        Args:
+            store (JobStore): The job store to consume
+            handlers (Dict[str, JobHandler]): Handler coroutine per job kind
+            concurrency (int, optional): Number of jobs run at once, defaults to JOB_WORKER_CONCURRENCY
+            poll_interval (float, optional): Seconds between polls of an empty queue, defaults to JOB_POLL_SECONDS
+            recover_interval (float, optional): Seconds between sweeps for expired leases, defaults to JOB_RECOVER_SECONDS
+        """
+        self.store = store
+        self.handlers = handlers
+        self.concurrency = max(1, concurrency or JOB_WORKER_CONCURRENCY)
+        self.poll_interval = poll_interval if poll_interval is not None else JOB_POLL_SECONDS
+        self.recover_interval = recover_interval if recover_interval is not None else JOB_RECOVER_SECONDS
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}"
+
+        self._tasks: List[asyncio.Task] = []
+        self._recovery: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        # job_id -> [event, number of waiters on it]
+        self._updates: Dict[str, list] = {}
+
+        self.completed = 0
+        self.failed = 0
+        self.lost = 0
+
+    def start(self) -> None:
+        """Start the workers on the running event loop"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._work(index)) for index in range(self.concurrency)]
+        self._recovery = asyncio.ensure_future(self._recover())
+        logger.info(f"JobWorkerPool started {self.concurrency} workers as {self.worker_id}")
+
+    async def stop(self) -> None:
+        """Cancel the workers; jobs they were running are requeued once their lease expires"""
+        tasks, self._tasks = self._tasks, []
+        if self._recovery is not None:
+            tasks.append(self._recovery)
+            self._recovery = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if tasks:
+            logger.info("JobWorkerPool stopped")
+
+    def notify(self) -> None:
+        """Wake an idle worker after a job was enqueued in this process"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_for_update(self, job_id: str, timeout: float) -> None:
+        """
+        Wait until a worker in this process updates the job, or the timeout passes
+
+        Jobs run by other processes are only seen by polling, so callers re-read the store either way.
+        """
+        entry = self._updates.get(job_id)
+        if entry is None or entry[0].is_set():
+            entry = self._updates[job_id] = [asyncio.Event(), 0]
+        event = entry[0]
+        entry[1] += 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            entry[1] -= 1
+            # Drop the event once it has fired (every waiter on it was woken) or nobody waits on it;
+            # a process that does not run the job never sets it
+            if self._updates.get(job_id) is entry and (event.is_set() or not entry[1]):
+                del self._updates[job_id]
+
+    def _updated(self, job_id: str) -> None:
+        entry = self._updates.get(job_id)
+        if entry is not None:
+            entry[0].set()
+
+    async def _work(self, index: int) -> None:
+        """Claim and run jobs until cancelled"""
+        worker = f"{self.worker_id}-{index}"
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim, worker)
+            except Exception as e:
+                logger.error(f"Error claiming job: {str(e)}")
+                job = None
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._run(job)
+
+    async def _recover(self) -> None:
+        """Requeue jobs with expired leases, once on start and then every recover_interval, until cancelled"""
+        while True:
+            try:
+                if await asyncio.to_thread(self.store.recover_expired):
+                    self.notify()
+            except Exception as e:
+                logger.error(f"Error recovering expired jobs: {str(e)}")
+            await asyncio.sleep(self.recover_interval)
+
+    async def _run(self, job: Dict[str, Any]) -> None:
+        """Run one claimed job and record its outcome"""
+        job_id = job["id"]
+        worker = job["worker"]
+        handler = self.handlers.get(job["kind"])
+        self._updated(job_id)
+        if handler is None:
+            error = f"No handler for job kind {job['kind']}"
+            if self._held(job_id, await asyncio.to_thread(self.store.fail, job_id, worker, error)):
+                self.failed += 1
+            self._updated(job_id)
+            return
+
+        # Progress is written in the background, one write at a time and in order,
+        # so a handler never waits on the store; the outcome is stored after it
+        progress: List[asyncio.Task] = []
+
+        async def store_progress(previous: Optional[asyncio.Task], partial: Dict[str, Any]) -> None:
+            if previous is not None:
+                await asyncio.gather(previous, return_exceptions=True)
+            try:
+                if await asyncio.to_thread(self.store.report_progress, job_id, worker, partial):
+                    self._updated(job_id)
+            except Exception as e:
+                logger.error(f"Error storing progress of job {job_id}: {str(e)}")
+
+        def report_progress(partial: Dict[str, Any]) -> None:
+            previous = progress[-1] if progress else None
+            progress.append(asyncio.ensure_future(store_progress(previous, partial)))
+
+        started = time.perf_counter()
+        try:
+            try:
+                result = await handler(job["payload"], report_progress)
+            finally:
+                await asyncio.gather(*progress, return_exceptions=True)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}")
+            logger.exception(e)
+            if self._held(job_id, await asyncio.to_thread(self.store.fail, job_id, worker, str(e))):
+                self.failed += 1
+        else:
+            if self._held(job_id, await asyncio.to_thread(self.store.complete, job_id, worker, result)):
+                self.completed += 1
+                logger.info(f"Job {job_id} finished in {time.perf_counter() - started:.2f}s")
+        finally:
+            self._updated(job_id)
+
+    def _held(self, job_id: str, stored: bool) -> bool:
+        """Pass through whether an outcome was stored, counting it as lost if the lease had passed on"""
+        if not stored:
+            self.lost += 1
+            logger.warning(f"Job {job_id} finished after its lease expired; its outcome was discarded")
+        return stored
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return worker and queue counters
+
+        Returns:
+            Dict[str, Any]: Workers, jobs finished by this process, results discarded because the lease
+                had passed on, and jobs per status in the store
+        """
+        return {
+            "workers": len(self._tasks),
+            "completed": self.completed,
+            "failed": self.failed,
+            "lost": self.lost,
+            "jobs": self.store.counts(),
+        }
+
+
+_job_store: Optional[JobStore] = None
+_job_store_lock = threading.Lock()
+
+
+def get_job_store() -> JobStore:
+    """
+    Return the process-wide job store, creating it on first use
+    """
+    global _job_store
+    if _job_store is None:
+        with _job_store_lock:
+            if _job_store is None:
+                _job_store = JobStore()
+    return _job_store
@@ -0,0 +1,225 @@
+"""
+Model Router
+Picks the Gemini model tier for each case and keeps per-tier call, latency, token
+and cost accounting. Short descriptions whose category the keyword classifier
+agrees with go to the fast tier; long, ambiguous or listed-category cases go to the
+pro tier. A fast-tier answer that comes back incomplete can be retried on the pro tier.
+"""
+
+import logging
+from collections import deque
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.core.config import (
+    ROUTER_FAST_MAX_CHARS,
+    ROUTER_PRO_CATEGORIES,
+    ROUTER_MIN_CONFIDENCE,
+    ROUTER_ESCALATE_ON,
+)
+from app.services.category_classifier import category_scores
+from app.utils.metrics import summarize_durations
+from app.utils.text import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+FAST = "fast"
+PRO = "pro"
+
+# Reasons a fast-tier answer is escalated, as listed in ROUTER_ESCALATE_ON
+INVALID = "invalid"
+REPAIRED = "repaired"
+MISSING_SECTIONS = "missing_sections"
+ESCALATION_REASONS = (INVALID, REPAIRED, MISSING_SECTIONS)
+
+
+def usage_tokens(response: Any, prompt: str, text: str = "") -> Tuple[int, int]:
+    """
+    Prompt and output token counts of a Gemini response
+
+    Args:
+        response: The Gemini response (or last stream chunk); its usage_metadata is used when present
+        prompt (str): The prompt sent, estimated when there is no usage metadata
+        text (str): The response text, estimated when there is no usage metadata
+
+    Returns:
+        Tuple[int, int]: (prompt tokens, output tokens)
+    """
+    usage = getattr(response, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", 0) or estimate_tokens(prompt)
+    output_tokens = getattr(usage, "candidates_token_count", 0)
+    if not output_tokens:
+        try:
+            output_tokens = estimate_tokens(text or getattr(response, "text", "") or "")
+        except ValueError:
+            # Responses without text parts (e.g. blocked by safety filters)
+            output_tokens = 0
+    return int(prompt_tokens), int(output_tokens)
+
+
+class ModelTier:
+    """A Gemini model with its output limit and prices, and the accounting of its calls"""
+
+    def __init__(self, name: str, model: Any, max_output_tokens: int, input_price: float, output_price: float):
+        """
+        Args:
+            name (str): Tier name, FAST or PRO
+            model: The genai.GenerativeModel of this tier
+            max_output_tokens (int): Output token limit for analysis calls
+            input_price (float): USD per million prompt tokens
+            output_price (float): USD per million output tokens
+        """
+        self.name = name
+        self.model = model
+        self.max_output_tokens = max_output_tokens
+        self.input_price = input_price
+        self.output_price = output_price
+
+        self.calls = 0
+        self.errors = 0
+        self.prompt_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self._call_times = deque(maxlen=1000)
+
+    @property
+    def model_name(self) -> str:
+        return self.model.model_name
+
+    def record(self, seconds: float, prompt_tokens: int = 0, output_tokens: int = 0, error: bool = False) -> None:
+        """Account one call: its duration, tokens and cost"""
+        self.calls += 1
+        self.errors += error
+        self._call_times.append(seconds)
+        self.prompt_tokens += prompt_tokens
+        self.output_tokens += output_tokens
+        self.cost += (prompt_tokens * self.input_price + output_tokens * self.output_price) / 1_000_000
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return the tier's call counters, token usage, cost and latency
+
+        Returns:
+            Dict[str, Any]: Counters, cost in USD and call-time percentiles in milliseconds
+        """
+        return {
+            "model": self.model_name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6),
+            "avg_cost_usd": round(self.cost / self.calls, 6) if self.calls else 0.0,
+            "call_time_ms": summarize_durations(self._call_times),
+        }
+
+
+class ModelRouter:
+    """Routes cases to the fast or pro tier and escalates incomplete fast-tier answers"""
+
+    def __init__(self, fast: ModelTier, pro: ModelTier, fast_max_chars: int = ROUTER_FAST_MAX_CHARS,
+                 pro_categories: Iterable[str] = ROUTER_PRO_CATEGORIES, min_confidence: float = ROUTER_MIN_CONFIDENCE,
+                 escalate_on: Iterable[str] = ROUTER_ESCALATE_ON):
+        """
+        Args:
+            fast (ModelTier): Tier for short, clear-cut cases
+            pro (ModelTier): Tier for everything else, and for escalations
+            fast_max_chars (int): Longest description the fast tier takes
+            pro_categories (Iterable[str]): Categories that always go to the pro tier
+            min_confidence (float): Least classifier agreement with the category for the fast tier
+            escalate_on (Iterable[str]): Escalation reasons in effect (INVALID, REPAIRED, MISSING_SECTIONS)
+        """
+        self.fast = fast
+        self.pro = pro
+        self.fast_max_chars = fast_max_chars
+        self.pro_categories = frozenset(pro_categories)
+        self.min_confidence = min_confidence
+        self.escalate_on = frozenset(escalate_on)
+        unknown = self.escalate_on.difference(ESCALATION_REASONS)
+        if unknown:
+            raise ValueError(f"Unknown escalation reasons: {sorted(unknown)}")
+
+        self.routed = {FAST: 0, PRO: 0}
+        self.escalations = {reason: 0 for reason in ESCALATION_REASONS}
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the models and routing rule, so cached analyses are not shared across configurations"""
+        categories = ",".join(sorted(self.pro_categories))
+        return f"{self.fast.model_name}|{self.pro.model_name}|{self.fast_max_chars}|{self.min_confidence}|{categories}"
+
+    @staticmethod
+    def confidence(case_description: str, case_category: str) -> float:
+        """
+        How strongly the keyword classifier agrees with the category
+
+        The category's share of keyword hits, add-one smoothed so a description without
+        any category keywords counts as agreeing and one pointing elsewhere does not.
+
+        Returns:
+            float: Between 0 and 1
+        """
+        scores = category_scores(case_description)
+        return (scores.get(case_category, 0) + 1) / (sum(scores.values()) + 1)
+
+    def route(self, case_description: str, case_category: str) -> ModelTier:
+        """
+        Pick the tier for a case
+
+        Args:
+            case_description (str): The case description
+            case_category (str): The (corrected) case category
+
+        Returns:
+            ModelTier: The fast tier for short cases of an unlisted category the classifier agrees with,
+            otherwise the pro tier
+        """
+        tier = self.pro
+        if (len(case_description) <= self.fast_max_chars and case_category not in self.pro_categories
+                and self.confidence(case_description, case_category) >= self.min_confidence):
+            tier = self.fast
+        self.routed[tier.name] += 1
+        logger.info(f"Routing {len(case_description)}-character {case_category} case to the {tier.name} tier "
+                    f"({tier.model_name})")
+        return tier
+
+    def escalate(self, tier: ModelTier, analysis_data: Optional[Dict[str, Any]]) -> Optional[ModelTier]:
+        """
+        Decide whether a fast-tier answer should be retried on the pro tier
+
+        Args:
+            tier (ModelTier): The tier that answered
+            analysis_data (Dict[str, Any], optional): The parsed analysis, None if no JSON could be recovered
+
+        Returns:
+            Optional[ModelTier]: The pro tier if the answer is incomplete in a way ROUTER_ESCALATE_ON lists
+        """
+        if tier is not self.fast:
+            return None
+        if analysis_data is None:
+            reason = INVALID
+        elif analysis_data.get("metadata", {}).get("repaired"):
+            reason = REPAIRED
+        elif not (analysis_data.get("relevant_laws") and analysis_data.get("relevant_decisions")):
+            reason = MISSING_SECTIONS
+        else:
+            return None
+        if reason not in self.escalate_on:
+            return None
+        self.escalations[reason] += 1
+        logger.warning(f"Escalating the fast tier's answer to the pro tier ({reason})")
+        return self.pro
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return routing decisions, escalations and per-tier accounting
+
+        Returns:
+            Dict[str, Any]: Routed and escalated counts, and each tier's metrics
+        """
+        routed = sum(self.routed.values())
+        return {
+            "routed": dict(self.routed),
+            "fast_rate": round(self.routed[FAST] / routed, 4) if routed else 0.0,
+            "escalations": dict(self.escalations),
+            "tiers": {FAST: self.fast.get_metrics(), PRO: self.pro.get_metrics()},
+        }
@@ -0,0 +1,297 @@
+"""
+Near-Duplicate Case Index
+This module finds previously analysed case descriptions that are almost identical
+to a new one (MinHash over character shingles, with LSH banding in SQLite) so their
+analysis can be reused without another Gemini call.
+"""
+
+import os
+import re
+import json
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    NEAR_DUPLICATE_INDEX_PATH,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_NUM_PERM,
+    NEAR_DUPLICATE_BANDS,
+    NEAR_DUPLICATE_TTL_SECONDS,
+    NEAR_DUPLICATE_MAX_CASES,
+)
+from app.utils.text import normalize_text
+
+logger = logging.getLogger(__name__)
+
+SHINGLE_SIZE = 5
+# Buckets this large are almost always boilerplate; scanning all of them would not be fast
+_MAX_BUCKET_CANDIDATES = 64
+# Expired and excess cases are purged every this many additions
+_PURGE_INTERVAL = 200
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize_case_text(text: str) -> str:
+    """Turkish lower-case, drop punctuation, collapse whitespace"""
+    return _NON_WORD.sub(" ", normalize_text(text)).strip()
+
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """
+    Hash the character shingles of normalized text
+
+    Args:
+        text (str): The raw case description
+        size (int): Shingle length in characters
+
+    Returns:
+        np.ndarray: Unique 32-bit shingle hashes
+    """
+    normalized = normalize_case_text(text)
+    if len(normalized) <= size:
+        shingles = {normalized} if normalized else set()
+    else:
+        shingles = {normalized[i:i + size] for i in range(len(normalized) - size + 1)}
+    return np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+
+
+class MinHasher:
+    """Computes MinHash signatures with a fixed family of universal hash functions"""
+
+    def __init__(self, num_perm: int, seed: int = 1):
+        generator = np.random.RandomState(seed)
+        # a < 2^29 and x < 2^32 keep a * x + b inside uint64 before the modulo
+        self.a = generator.randint(1, 1 << 29, size=num_perm).astype(np.uint64)
+        self.b = generator.randint(0, 1 << 29, size=num_perm).astype(np.uint64)
+        self.num_perm = num_perm
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """Return the uint32 MinHash signature for a set of shingle hashes"""
+        if hashes.size == 0:
+            return np.full(self.num_perm, _MAX_HASH, dtype=np.uint32)
+        values = (np.outer(hashes, self.a) + self.b) % _MERSENNE_PRIME & _MAX_HASH
+        return values.min(axis=0).astype(np.uint32)
+
+
+class NearDuplicateIndex:
+    """LSH index over MinHash signatures of analysed case descriptions"""
+
+    def __init__(self, db_path: Optional[str] = None, threshold: Optional[float] = None,
+                 num_perm: Optional[int] = None, bands: Optional[int] = None,
+                 ttl: Optional[float] = None, max_cases: Optional[int] = None):
+        """
+        Initialize the near-duplicate index
+
+        Args:
+            db_path (str, optional): Path of the SQLite database holding signatures and buckets
+            threshold (float, optional): Minimum estimated Jaccard similarity to reuse an analysis
+            num_perm (int, optional): Number of MinHash permutations
+            bands (int, optional): Number of LSH bands; must divide num_perm
+            ttl (float, optional): Seconds a stored case stays reusable
+            max_cases (int, optional): Number of most recent cases kept
+        """
+        self.db_path = str(db_path or NEAR_DUPLICATE_INDEX_PATH)
+        self.threshold = threshold if threshold is not None else NEAR_DUPLICATE_THRESHOLD
+        self.num_perm = num_perm or NEAR_DUPLICATE_NUM_PERM
+        self.bands = bands or NEAR_DUPLICATE_BANDS
+        if self.num_perm % self.bands:
+            raise ValueError(f"num_perm ({self.num_perm}) must be a multiple of bands ({self.bands})")
+        self.rows = self.num_perm // self.bands
+        self.hasher = MinHasher(self.num_perm)
+        self.ttl = ttl if ttl is not None else NEAR_DUPLICATE_TTL_SECONDS
+        self.max_cases = max_cases or NEAR_DUPLICATE_MAX_CASES
+
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.lookups = 0
+        self.reuses = 0
+        self.purged = 0
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        """Open the SQLite store on first use"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS cases (
+                    id INTEGER PRIMARY KEY,
+                    scope TEXT NOT NULL,
+                    signature BLOB NOT NULL,
+                    analysis BLOB NOT NULL,
+                    created_at REAL NOT NULL DEFAULT 0
+                );
+                CREATE TABLE IF NOT EXISTS lsh_buckets (
+                    band INTEGER NOT NULL,
+                    bucket INTEGER NOT NULL,
+                    case_id INTEGER NOT NULL,
+                    PRIMARY KEY (band, bucket, case_id)
+                ) WITHOUT ROWID;
+                CREATE INDEX IF NOT EXISTS idx_lsh_buckets_case ON lsh_buckets (case_id);
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(cases)")}
+            if "created_at" not in columns:
+                conn.execute("ALTER TABLE cases ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cases_created_at ON cases (created_at)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _band_keys(self, signature: np.ndarray, scope: str) -> List[int]:
+        """Hash each band of the signature, scoped so different categories never share a bucket"""
+        keys = []
+        prefix = scope.encode("utf-8") + b"\x1f"
+        for band in range(self.bands):
+            chunk = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+            digest = hashlib.blake2b(prefix + chunk, digest_size=8).digest()
+            keys.append(int.from_bytes(digest, "big", signed=True))
+        return keys
+
+    def signature(self, case_description: str) -> np.ndarray:
+        """Return the MinHash signature of a case description"""
+        return self.hasher.signature(shingle_hashes(case_description))
+
+    def find(self, case_description: str, scope: str) -> Optional[Tuple[Dict[str, Any], float, int]]:
+        """
+        Find a stored analysis for a near-duplicate description
+
+        Args:
+            case_description (str): The new case description
+            scope (str): Only cases stored under the same scope (category, prompt version, model) match
+
+        Returns:
+            Optional[tuple]: (analysis, estimated similarity, stored case id), or None
+        """
+        signature = self.signature(case_description)
+        keys = self._band_keys(signature, scope)
+        self.lookups += 1
+
+        with self._lock:
+            conn = self._connection()
+            candidates = set()
+            for band, bucket in enumerate(keys):
+                rows = conn.execute(
+                    "SELECT case_id FROM lsh_buckets WHERE band = ? AND bucket = ? ORDER BY case_id DESC LIMIT ?",
+                    (band, bucket, _MAX_BUCKET_CANDIDATES)
+                ).fetchall()
+                candidates.update(row[0] for row in rows)
+            if not candidates:
+                return None
+
+            best_id, best_similarity = None, 0.0
+            placeholders = ",".join("?" * len(candidates))
+            for case_id, stored in conn.execute(
+                f"SELECT id, signature FROM cases WHERE id IN ({placeholders}) AND created_at > ?",
+                (*candidates, time.time() - self.ttl)
+            ):
+                similarity = float(np.count_nonzero(np.frombuffer(stored, dtype=np.uint32) == signature)) / self.num_perm
+                if similarity > best_similarity:
+                    best_id, best_similarity = case_id, similarity
+
+            if best_id is None or best_similarity < self.threshold:
+                return None
+            blob = conn.execute("SELECT analysis FROM cases WHERE id = ?", (best_id,)).fetchone()[0]
+
+        self.reuses += 1
+        return json.loads(zlib.decompress(blob).decode("utf-8")), best_similarity, best_id
+
+    def add(self, case_description: str, scope: str, analysis: Dict[str, Any]) -> int:
+        """
+        Store an analysed case
+
+        Args:
+            case_description (str): The case description
+            scope (str): Scope the case is stored under, see find()
+            analysis (Dict[str, Any]): The analysis to reuse for near-duplicates
+
+        Returns:
+            int: The stored case id
+        """
+        signature = self.signature(case_description)
+        keys = self._band_keys(signature, scope)
+        blob = zlib.compress(json.dumps(analysis, ensure_ascii=False).encode("utf-8"))
+
+        with self._lock:
+            conn = self._connection()
+            cursor = conn.execute(
+                "INSERT INTO cases (scope, signature, analysis, created_at) VALUES (?, ?, ?, ?)",
+                (scope, signature.tobytes(), blob, time.time())
+            )
+            case_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT OR IGNORE INTO lsh_buckets (band, bucket, case_id) VALUES (?, ?, ?)",
+                [(band, bucket, case_id) for band, bucket in enumerate(keys)]
+            )
+            self._writes += 1
+            if self._writes % _PURGE_INTERVAL == 0:
+                self._purge(conn)
+            conn.commit()
+        return case_id
+
+    def purge(self) -> int:
+        """
+        Drop expired cases and the oldest cases beyond max_cases, with their buckets
+
+        Returns:
+            int: Number of cases removed
+        """
+        with self._lock:
+            conn = self._connection()
+            removed = self._purge(conn)
+            conn.commit()
+        return removed
+
+    def _purge(self, conn: sqlite3.Connection) -> int:
+        """Purge with the lock held; ids grow with insertion time, so everything up to one id goes"""
+        expired = conn.execute(
+            "SELECT MAX(id) FROM cases WHERE created_at <= ?", (time.time() - self.ttl,)
+        ).fetchone()[0]
+        excess = conn.execute(
+            "SELECT id FROM cases ORDER BY id DESC LIMIT 1 OFFSET ?", (self.max_cases,)
+        ).fetchone()
+        cutoff = max(expired or 0, excess[0] if excess else 0)
+        if not cutoff:
+            return 0
+        removed = conn.execute("DELETE FROM cases WHERE id <= ?", (cutoff,)).rowcount
+        conn.execute("DELETE FROM lsh_buckets WHERE case_id <= ?", (cutoff,))
+        self.purged += removed
+        if removed:
+            logger.info(f"Purged {removed} near-duplicate cases up to id {cutoff}")
+        return removed
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return lookup, reuse and purge counters
+
+        Returns:
+            Dict[str, Any]: Lookups, reuses, purged cases and the reuse rate
+        """
+        return {
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "reuses": self.reuses,
+            "purged": self.purged,
+            "reuse_rate": round(self.reuses / self.lookups, 4) if self.lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        """Close the SQLite connection"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
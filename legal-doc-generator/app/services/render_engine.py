@@ -0,0 +1,259 @@
+"""
+Render Engine Service
+This module runs CPU-bound document rendering in a bounded worker pool so the
+event loop stays responsive while documents are built and serialized.
+"""
+
+import time
+import asyncio
+import threading
+import logging
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import RENDER_POOL_SIZE, RENDER_JOB_TIMEOUT_SECONDS, RENDER_USE_PROCESSES
+from app.utils.metrics import summarize_durations
+
+logger = logging.getLogger(__name__)
+
+
+def _timed_call(fn: Callable, *args) -> tuple:
+    """Run a render job inside the worker and report how long it took"""
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class RenderEngine:
+    """Bounded worker pool for document rendering jobs, exposed as awaitables"""
+
+    def __init__(self, pool_size: Optional[int] = None, job_timeout: Optional[float] = None,
+                 use_processes: Optional[bool] = None, initializer: Optional[Callable] = None):
+        """
+        Initialize the render engine
+
+        Args:
+            pool_size (int, optional): Number of workers, defaults to RENDER_POOL_SIZE
+            job_timeout (float, optional): Per-job timeout in seconds, defaults to RENDER_JOB_TIMEOUT_SECONDS
+            use_processes (bool, optional): Use a process pool (True) or a thread pool (False)
+            initializer (Callable, optional): Picklable function run once in each worker on startup
+        """
+        self.pool_size = max(1, pool_size or RENDER_POOL_SIZE)
+        self.job_timeout = job_timeout if job_timeout is not None else RENDER_JOB_TIMEOUT_SECONDS
+        self.use_processes = RENDER_USE_PROCESSES if use_processes is None else use_processes
+        self.initializer = initializer
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        # Jobs beyond pool_size wait on this semaphore instead of piling up inside the executor;
+        # it is created by start(), on the loop that uses the engine
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._waiting = 0
+        self._running = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._timed_out = 0
+        self._recycled = 0
+        self._render_times = deque(maxlen=1000)
+        self._queue_times = deque(maxlen=1000)
+
+        logger.info(f"RenderEngine initialized with {self.pool_size} "
+                    f"{'process' if self.use_processes else 'thread'} workers, timeout {self.job_timeout}s")
+
+    def start(self) -> None:
+        """
+        Bind the engine to the running event loop
+
+        Called on application startup, and by submit() when it first runs on a loop, so the
+        job semaphore belongs to the loop that uses it rather than to whichever loop first
+        touched the module-level engine.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._slots = asyncio.Semaphore(self.pool_size)
+            self._loop = loop
+
+    def _get_executor(self):
+        """Create the worker pool on first use"""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    if self.use_processes:
+                        self._executor = ProcessPoolExecutor(
+                            max_workers=self.pool_size,
+                            mp_context=multiprocessing.get_context("spawn"),
+                            initializer=self.initializer
+                        )
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.pool_size,
+                                                            thread_name_prefix="render",
+                                                            initializer=self.initializer)
+        return self._executor
+
+    def _reset_executor(self, executor=None) -> None:
+        """
+        Drop a pool so the next job starts a fresh one
+
+        Args:
+            executor (optional): The pool to drop; nothing happens if it has already been replaced
+        """
+        with self._executor_lock:
+            if executor is not None and executor is not self._executor:
+                return
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _recycle_executor(self, executor) -> None:
+        """
+        Kill the workers of a pool whose job timed out and start a fresh pool for the next jobs
+
+        A worker process cannot be interrupted, so a stuck render would otherwise keep its
+        worker, and its slot, until it finished. Jobs still running in the old pool fail with
+        BrokenProcessPool, and jobs still queued in it are cancelled; submit() resubmits both.
+        Thread workers cannot be killed; their slots stay held until the render returns.
+        """
+        if not self.use_processes:
+            return
+        with self._executor_lock:
+            if executor is not self._executor:
+                return
+            self._executor = None
+        self._recycled += 1
+        for process in list((getattr(executor, "_processes", None) or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        logger.warning("Recycled the render worker pool after a job timeout")
+
+    async def submit(self, fn: Callable, *args) -> Any:
+        """
+        Run a render job in the pool
+
+        Args:
+            fn (Callable): A picklable module-level function
+            *args: Picklable arguments for the function
+
+        Returns:
+            Any: The value returned by the job
+
+        Raises:
+            TimeoutError: If the job runs longer than the configured timeout
+        """
+        self._submitted += 1
+        queued_at = time.perf_counter()
+        self.start()
+        slots = self._slots
+
+        self._waiting += 1
+        try:
+            await slots.acquire()
+        finally:
+            self._waiting -= 1
+        self._queue_times.append(time.perf_counter() - queued_at)
+
+        # A job whose pool is recycled by another job's timeout is run again once, in the new pool
+        for attempt in range(2):
+            self._running += 1
+            try:
+                executor = self._get_executor()
+                future = asyncio.wrap_future(executor.submit(_timed_call, fn, *args))
+            except Exception:
+                self._running -= 1
+                slots.release()
+                self._failed += 1
+                raise
+
+            # The slot is held until the worker actually finishes or is killed, even if the
+            # caller times out, so a stuck render cannot push the pool past its bound
+            def _release(done):
+                self._running -= 1
+                slots.release()
+                # Nobody awaits a job that already timed out; mark its outcome as seen
+                if not done.cancelled():
+                    done.exception()
+            future.add_done_callback(_release)
+
+            try:
+                result, render_time = await asyncio.wait_for(asyncio.shield(future), timeout=self.job_timeout)
+                break
+            except asyncio.TimeoutError:
+                self._timed_out += 1
+                logger.error(f"Render job {getattr(fn, '__name__', fn)} exceeded {self.job_timeout}s")
+                self._recycle_executor(executor)
+                raise TimeoutError(f"Render job exceeded the {self.job_timeout}s timeout")
+            except (BrokenProcessPool, asyncio.CancelledError) as e:
+                cancelled = isinstance(e, asyncio.CancelledError)
+                if cancelled and not future.cancelled():
+                    # The caller was cancelled, not the job
+                    raise
+                recycled = executor is not self._executor
+                if recycled and attempt == 0:
+                    await slots.acquire()
+                    continue
+                self._failed += 1
+                logger.error("Render worker pool is broken, restarting it for the next job")
+                self._reset_executor(executor)
+                if cancelled:
+                    raise BrokenProcessPool("Render job was cancelled by a shutdown of its worker pool") from None
+                raise
+            except Exception:
+                self._failed += 1
+                raise
+
+        self._completed += 1
+        self._render_times.append(render_time)
+        return result
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return queue depth and render time statistics
+
+        Returns:
+            Dict[str, Any]: Counters plus render/queue-wait percentiles in milliseconds
+        """
+        return {
+            "pool_size": self.pool_size,
+            "mode": "process" if self.use_processes else "thread",
+            "queue_depth": self._waiting,
+            "running": self._running,
+            "submitted": self._submitted,
+            "completed": self._completed,
+            "failed": self._failed,
+            "timed_out": self._timed_out,
+            "recycled": self._recycled,
+            "render_time_ms": summarize_durations(self._render_times),
+            "queue_wait_ms": summarize_durations(self._queue_times),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker pool"""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+            logger.info("RenderEngine worker pool shut down")
+
+
+_render_engine: Optional[RenderEngine] = None
+_render_engine_lock = threading.Lock()
+
+
+def get_render_engine() -> RenderEngine:
+    """
+    Return the process-wide render engine, creating it on first use
+
+    Workers compile the .docx templates once when they start.
+    """
+    global _render_engine
+    if _render_engine is None:
+        with _render_engine_lock:
+            if _render_engine is None:
+                from app.services.template_compiler import load_templates
+                _render_engine = RenderEngine(initializer=load_templates)
+    return _render_engine
@@ -0,0 +1,246 @@
+"""
+Statute Index
+This module keeps a local store of Turkish statute articles (TMK, TBK, İş Kanunu, ...)
+with a BM25 index over them, so candidate articles for a case are found locally in
+milliseconds and the model only has to rank and explain them.
+
+The source is a JSON lines file with one article per line:
+    {"law": "Türk Medeni Kanunu", "law_number": "4721", "article": "166", "heading": "...", "text": "..."}
+
+Rebuild the index after editing the source with:
+    python -m app.services.statute_index [source.jsonl] [index_dir]
+"""
+
+import os
+import sys
+import json
+import time
+import hashlib
+import threading
+import logging
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from app.core.config import STATUTE_SOURCE_PATH, STATUTE_INDEX_DIR, STATUTE_CANDIDATES
+from app.services.bm25_index import INDEX_FORMAT_VERSION, BM25Index, RecordReader, build_bm25_index, write_records
+from app.utils.index_build import build_lock, staged_directory
+from app.utils.metrics import summarize_durations
+from app.utils.text import search_terms, turkish_lower
+
+logger = logging.getLogger(__name__)
+
+_MANIFEST = "statutes.json"
+_RECORDS = "articles.jsonl"
+
+
+def article_title(article: Dict[str, Any]) -> str:
+    """Citation title of an article, in the form used by relevant_laws"""
+    return f"{article['law']} Madde {article['article']}"
+
+
+def _article_text(article: Dict[str, Any]) -> str:
+    # The heading is short and specific, so it is counted twice
+    heading = article.get("heading", "")
+    return f"{article_title(article)} {heading} {heading} {article.get('text', '')}"
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_statute_index(source_path: Optional[str] = None, index_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Build the statute index from a JSON lines source
+
+    The files are built in a staging directory and renamed into place, so processes
+    serving the previous index keep reading it undisturbed.
+
+    Args:
+        source_path (str, optional): Statute source, defaults to STATUTE_SOURCE_PATH
+        index_dir (str, optional): Output directory, defaults to STATUTE_INDEX_DIR
+
+    Returns:
+        Dict[str, Any]: The index manifest
+    """
+    source_path = str(source_path or STATUTE_SOURCE_PATH)
+    index_dir = str(index_dir or STATUTE_INDEX_DIR)
+    started = time.perf_counter()
+
+    articles = []
+    with open(source_path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            article = json.loads(line)
+            if not article.get("law") or not article.get("article") or not article.get("text"):
+                raise ValueError(f"{source_path}:{line_number}: law, article and text are required")
+            articles.append(article)
+
+    with staged_directory(index_dir, last=(_MANIFEST,)) as staging:
+        bm25 = build_bm25_index(staging, (search_terms(_article_text(article)) for article in articles))
+        write_records(os.path.join(staging, _RECORDS), articles)
+        manifest = {
+            "source_sha256": _file_digest(source_path),
+            "articles": len(articles),
+            "laws": sorted({article["law"] for article in articles}),
+            "terms": bm25["terms"],
+        }
+        with open(os.path.join(staging, _MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+    logger.info(f"Built statute index with {len(articles)} articles in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return manifest
+
+
+class StatuteIndex:
+    """Searches statute articles with BM25 over Turkish-stemmed terms"""
+
+    def __init__(self, index_dir: Optional[str] = None):
+        """
+        Open a statute index built by build_statute_index
+
+        Args:
+            index_dir (str, optional): Index directory, defaults to STATUTE_INDEX_DIR
+        """
+        self.index_dir = str(index_dir or STATUTE_INDEX_DIR)
+        with open(os.path.join(self.index_dir, _MANIFEST), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self._bm25 = BM25Index(self.index_dir)
+        self._articles = RecordReader(os.path.join(self.index_dir, _RECORDS))
+        self._law_masks: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+        self.queries = 0
+        self._query_times = deque(maxlen=1000)
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the statute source the index was built from"""
+        return self.manifest["source_sha256"][:12]
+
+    def __len__(self) -> int:
+        return len(self._articles)
+
+    def get(self, doc: int) -> Dict[str, Any]:
+        """Return an article by document id, in the shape search() returns (without a score)"""
+        article = self._articles.get(doc)
+        return {
+            "id": doc,
+            "title": article_title(article),
+            "description": article["text"],
+            "law": article["law"],
+            "law_number": article.get("law_number", ""),
+            "article": article["article"],
+            "heading": article.get("heading", ""),
+        }
+
+    def documents(self) -> Iterator[str]:
+        """The indexed text of each article, in document id order"""
+        for article in self._articles:
+            yield _article_text(article)
+
+    def _law_mask(self, law: str) -> np.ndarray:
+        """Boolean mask of articles of one law, matched on the law name or number"""
+        wanted = turkish_lower(law.strip())
+        with self._lock:
+            if wanted not in self._law_masks:
+                self._law_masks[wanted] = np.fromiter(
+                    (wanted in (turkish_lower(article["law"]), article.get("law_number", ""))
+                     for article in self._articles),
+                    dtype=bool, count=len(self._articles))
+            return self._law_masks[wanted]
+
+    def search(self, query: str, limit: Optional[int] = None, law: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Find the articles most relevant to a text
+
+        Args:
+            query (str): Case description or other free text
+            limit (int, optional): Maximum number of articles, defaults to STATUTE_CANDIDATES
+            law (str, optional): Only return articles of this law (name or number, e.g. "4721")
+
+        Returns:
+            List[Dict[str, Any]]: Articles with id, title, description, law, law_number, article, heading and score
+        """
+        started = time.perf_counter()
+        allowed = self._law_mask(law) if law else None
+        hits = self._bm25.search(search_terms(query), limit or STATUTE_CANDIDATES, allowed)
+        results = []
+        for doc, score in hits:
+            result = self.get(doc)
+            result["score"] = round(score, 4)
+            results.append(result)
+        self.queries += 1
+        self._query_times.append(time.perf_counter() - started)
+        return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return index size and query latency
+
+        Returns:
+            Dict[str, Any]: Articles, terms, queries served and query time percentiles in milliseconds
+        """
+        return {
+            "articles": self.manifest["articles"],
+            "terms": self.manifest["terms"],
+            "fingerprint": self.fingerprint,
+            "queries": self.queries,
+            "query_time_ms": summarize_durations(self._query_times),
+        }
+
+    def close(self) -> None:
+        """Release the mapped record file"""
+        self._articles.close()
+
+
+_statute_index: Optional[StatuteIndex] = None
+_statute_index_lock = threading.Lock()
+
+
+def _index_is_current(source_path: str, index_dir: str) -> bool:
+    try:
+        with open(os.path.join(index_dir, _MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        with open(os.path.join(index_dir, "bm25.json"), encoding="utf-8") as f:
+            index_format = json.load(f).get("format")
+    except (OSError, ValueError):
+        return False
+    return index_format == INDEX_FORMAT_VERSION and manifest.get("source_sha256") == _file_digest(source_path)
+
+
+def get_statute_index() -> Optional[StatuteIndex]:
+    """
+    Return the process-wide statute index, building it first if the source changed
+
+    The check and build run under a file lock, so of several processes starting
+    together only one builds and the others open its result.
+
+    Returns:
+        Optional[StatuteIndex]: The index, or None when there is no statute source
+    """
+    global _statute_index
+    if _statute_index is None:
+        with _statute_index_lock:
+            if _statute_index is None:
+                source_path, index_dir = str(STATUTE_SOURCE_PATH), str(STATUTE_INDEX_DIR)
+                if not os.path.exists(source_path):
+                    logger.warning(f"No statute source at {source_path}, statute retrieval is disabled")
+                    return None
+                with build_lock(index_dir):
+                    if not _index_is_current(source_path, index_dir):
+                        build_statute_index(source_path, index_dir)
+                    _statute_index = StatuteIndex(index_dir)
+                logger.info(f"Statute index loaded: {_statute_index.manifest['articles']} articles")
+    return _statute_index
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    manifest = build_statute_index(*sys.argv[1:3])
+    print(json.dumps(manifest, ensure_ascii=False, indent=2))
@@ -0,0 +1,306 @@
+"""
+Template Compiler Service
+This module compiles the .docx templates in app/templates once and renders
+documents by substituting escaped values straight into the cached XML.
+"""
+
+import io
+import os
+import re
+import glob
+import hashlib
+import logging
+import threading
+import zipfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from app.core.config import TEMPLATES_DIR
+
+logger = logging.getLogger(__name__)
+
+DOCUMENT_PART = "word/document.xml"
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+# {{name}}, {{name|filter}}, and the section markers {{#name}} / {{/name}}
+_PLACEHOLDER_PATTERN = re.compile(r'\{\{\s*(?P<op>[#/]?)(?P<name>\w+)(?:\|(?P<filter>\w+))?\s*\}\}')
+# Marker paragraphs are collapsed to comments at compile time so a section can span whole paragraphs
+_TOKEN_PATTERN = re.compile(r'<!--tpl:(?P<section_op>[#/])(?P<section>\w+)-->|' + _PLACEHOLDER_PATTERN.pattern)
+_INVALID_XML_CHARS = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_LINE_BREAK = '</w:t><w:br/><w:t xml:space="preserve">'
+
+_TURKISH_UPPER = str.maketrans({"i": "İ", "ı": "I"})
+
+_FILTERS = {
+    "upper": lambda text: text.translate(_TURKISH_UPPER).upper(),
+}
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+def format_value(value: Any) -> str:
+    """
+    Convert a template_data value to display text
+
+    Lists become numbered lines, matching NumberedList in the generic layout.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (list, tuple)):
+        return "\n".join(f"{i}. {item}" for i, item in enumerate(value, 1))
+    return str(value)
+
+
+def escape_text(text: str) -> str:
+    """Escape text for use inside a <w:t> element, turning newlines into line breaks"""
+    text = _INVALID_XML_CHARS.sub("", text)
+    text = text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+    if "\n" in text:
+        text = text.replace("\r\n", "\n").replace("\n", _LINE_BREAK)
+    return text
+
+
+class CompiledTemplate:
+    """A .docx template reduced to literal XML segments and placeholder slots"""
+
+    def __init__(self, name: str, version: str, tokens: List[Tuple[str, str, Optional[str]]], package_prefix: bytes):
+        """
+        Args:
+            name (str): Template name (file stem)
+            version (str): Short content hash of the source .docx
+            tokens (list): ("text", xml, None), ("var", name, filter), ("open"/"close", name, None)
+            package_prefix (bytes): Zip archive holding every part except word/document.xml
+        """
+        self.name = name
+        self.version = version
+        self.tokens = tokens
+        self.placeholders = sorted({value for kind, value, _ in tokens if kind == "var"})
+        self._package_prefix = package_prefix
+
+    def render_xml(self, values: Dict[str, Any]) -> str:
+        """
+        Produce word/document.xml for the given values
+
+        Args:
+            values (Dict[str, Any]): Placeholder values; missing placeholders render empty
+
+        Returns:
+            str: The rendered document part
+        """
+        parts = []
+        skip_depth = 0
+        for kind, value, filter_name in self.tokens:
+            if kind == "open":
+                if skip_depth or not values.get(value):
+                    skip_depth += 1
+            elif kind == "close":
+                if skip_depth:
+                    skip_depth -= 1
+            elif skip_depth:
+                continue
+            elif kind == "text":
+                parts.append(value)
+            else:
+                text = format_value(values.get(value))
+                if filter_name in _FILTERS:
+                    text = _FILTERS[filter_name](text)
+                parts.append(escape_text(text))
+        return "".join(parts)
+
+    def render(self, values: Dict[str, Any]) -> bytes:
+        """Render the template to .docx bytes"""
+        return self.package(self.render_xml(values))
+
+    def package(self, document_xml: str) -> bytes:
+        """
+        Build the .docx bytes around a rendered word/document.xml
+
+        Only word/document.xml is compressed per call; the other parts are copied from the cached package.
+        """
+        buffer = io.BytesIO(self._package_prefix)
+        with zipfile.ZipFile(buffer, "a", compression=zipfile.ZIP_DEFLATED) as package:
+            package.writestr(DOCUMENT_PART, document_xml.encode("utf-8"))
+        return buffer.getvalue()
+
+
+def _merge_runs(root) -> None:
+    """
+    Merge adjacent runs with identical formatting so placeholders split by Word become contiguous
+    """
+    for proof in list(root.iter(_w("proofErr"))):
+        proof.getparent().remove(proof)
+
+    text_only = {_w("rPr"), _w("t")}
+    for paragraph in root.iter(_w("p")):
+        previous, previous_key = None, None
+        for child in list(paragraph):
+            is_text_run = (
+                child.tag == _w("r")
+                and len(child)
+                and all(grandchild.tag in text_only for grandchild in child)
+            )
+            if not is_text_run:
+                previous, previous_key = None, None
+                continue
+
+            run_properties = child.find(_w("rPr"))
+            key = etree.tostring(run_properties) if run_properties is not None else b""
+            texts = child.findall(_w("t"))
+            if previous is not None and key == previous_key:
+                target = previous.findall(_w("t"))[-1]
+                target.text = (target.text or "") + "".join(t.text or "" for t in texts)
+                target.set(XML_SPACE, "preserve")
+                paragraph.remove(child)
+                continue
+
+            # Collapse multiple <w:t> inside a single run as well
+            if len(texts) > 1:
+                texts[0].text = "".join(t.text or "" for t in texts)
+                for extra in texts[1:]:
+                    child.remove(extra)
+            if texts:
+                texts[0].set(XML_SPACE, "preserve")
+            previous, previous_key = child, key
+
+
+def _collapse_section_markers(root) -> None:
+    """Replace paragraphs that only hold {{#name}} or {{/name}} with comment markers"""
+    for paragraph in list(root.iter(_w("p"))):
+        text = "".join(t.text or "" for t in paragraph.iter(_w("t"))).strip()
+        match = _PLACEHOLDER_PATTERN.fullmatch(text)
+        if match and match.group("op"):
+            marker = etree.Comment(f"tpl:{match.group('op')}{match.group('name')}")
+            marker.tail = paragraph.tail
+            paragraph.getparent().replace(paragraph, marker)
+
+
+def _tokenize(xml: str) -> List[Tuple[str, str, Optional[str]]]:
+    """Split the document XML into literal segments and placeholder/section tokens"""
+    tokens = []
+    position = 0
+    for match in _TOKEN_PATTERN.finditer(xml):
+        if match.start() > position:
+            tokens.append(("text", xml[position:match.start()], None))
+        op = match.group("section_op") or match.group("op")
+        name = match.group("section") or match.group("name")
+        if op == "#":
+            tokens.append(("open", name, None))
+        elif op == "/":
+            tokens.append(("close", name, None))
+        else:
+            tokens.append(("var", name, match.group("filter")))
+        position = match.end()
+    if position < len(xml):
+        tokens.append(("text", xml[position:], None))
+    return tokens
+
+
+def compile_template(path: str) -> CompiledTemplate:
+    """
+    Compile a .docx template
+
+    Args:
+        path (str): Path of the template file
+
+    Returns:
+        CompiledTemplate: The compiled template
+    """
+    with open(path, "rb") as f:
+        source = f.read()
+
+    prefix = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(source)) as package, \
+            zipfile.ZipFile(prefix, "w", compression=zipfile.ZIP_DEFLATED) as static_parts:
+        document_xml = package.read(DOCUMENT_PART)
+        for info in package.infolist():
+            if info.filename != DOCUMENT_PART:
+                static_parts.writestr(info, package.read(info.filename), compress_type=zipfile.ZIP_DEFLATED)
+
+    root = etree.fromstring(document_xml)
+    _merge_runs(root)
+    _collapse_section_markers(root)
+    xml = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True).decode("utf-8")
+
+    name = os.path.splitext(os.path.basename(path))[0]
+    version = hashlib.sha256(source).hexdigest()[:12]
+    template = CompiledTemplate(name, version, _tokenize(xml), prefix.getvalue())
+    logger.info(f"Compiled template {name} (version {version}) with placeholders {template.placeholders}")
+    return template
+
+
+class TemplateCache:
+    """Compiled templates keyed by template name"""
+
+    def __init__(self, template_dir: Optional[str] = None):
+        """
+        Args:
+            template_dir (str, optional): Directory holding the .docx templates
+        """
+        self.template_dir = str(template_dir or TEMPLATES_DIR)
+        self._templates: Dict[str, CompiledTemplate] = {}
+
+    def load(self) -> "TemplateCache":
+        """Compile every template in the template directory"""
+        templates = {}
+        for path in sorted(glob.glob(os.path.join(self.template_dir, "*.docx"))):
+            try:
+                template = compile_template(path)
+                templates[template.name] = template
+            except Exception as e:
+                logger.error(f"Error compiling template {path}: {str(e)}")
+        self._templates = templates
+        return self
+
+    def get(self, name: str) -> Optional[CompiledTemplate]:
+        """Return the compiled template for a name, if one exists"""
+        return self._templates.get(name)
+
+    def names(self) -> List[str]:
+        return sorted(self._templates)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+
+def current_document_date() -> str:
+    """Today's date as generated documents print it"""
+    return datetime.now().strftime("%d/%m/%Y")
+
+
+def template_values(template_data: Dict[str, Any], document_date: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Template values with the defaults every template may reference
+
+    Args:
+        template_data (Dict[str, Any]): The data to fill the template with
+        document_date (str, optional): The date printed as {{tarih}}, today if not given
+    """
+    values = {"tarih": document_date or current_document_date()}
+    values.update(template_data or {})
+    return values
+
+
+_template_cache: Optional[TemplateCache] = None
+_template_cache_lock = threading.Lock()
+
+
+def get_template_cache() -> TemplateCache:
+    """
+    Return the process-wide template cache, compiling the templates on first use
+    """
+    global _template_cache
+    if _template_cache is None:
+        with _template_cache_lock:
+            if _template_cache is None:
+                _template_cache = TemplateCache().load()
+    return _template_cache
+
+
+def load_templates() -> None:
+    """Warm the template cache; used as the render worker initializer"""
+    get_template_cache()
@@ -0,0 +1,762 @@
+"""
+Vector Index
+Dense-vector retrieval of similar statute articles and decisions. Vectors are
+L2-normalized float16 rows of a memory-mapped .npy matrix, so an index opens in
+milliseconds and a query only pages in the rows it reads.
+
+Two backends share one interface:
+- "flat": exact inner-product search, scanned in blocks; for small corpora
+- "ivfpq": k-means inverted lists with product-quantized residuals; a query scores
+  only the nprobe nearest lists from 8-bit codes, then re-ranks the best candidates
+  against the exact float16 vectors
+
+Texts are embedded locally as signed feature-hashed TF-IDF vectors of stemmed
+terms and adjacent term pairs; the IDF weights are fitted on the indexed corpus
+and stored with the index.
+
+Build the decision vectors after ingesting a corpus, and measure latency and recall, with:
+    python -m app.services.vector_index build [decision_index_dir] [vector_index_dir] [--backend flat|ivfpq]
+    python -m app.services.vector_index bench [--size 200000] [--dim 256] [--index vector_index_dir]
+"""
+
+import os
+import json
+import time
+import zlib
+import argparse
+import threading
+import logging
+from collections import deque
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    VECTOR_INDEX_DIR,
+    VECTOR_DIMENSIONS,
+    VECTOR_IVF_MIN_SIZE,
+    VECTOR_IVF_NPROBE,
+    DECISION_INDEX_DIR,
+)
+from app.utils.index_build import build_lock, staged_directory
+from app.utils.metrics import summarize_durations
+from app.utils.text import search_terms
+
+logger = logging.getLogger(__name__)
+
+VECTOR_FORMAT_VERSION = 1
+FLAT = "flat"
+IVFPQ = "ivfpq"
+
+_META = "vectors.json"
+_VECTORS = "vectors.npy"
+_IDF = "idf.npy"
+# Rows converted to float32 at a time while scanning or re-weighting
+_BLOCK_ROWS = 32768
+_EMBED_BATCH = 4096
+# Flat indexes up to this many elements keep a float32 copy in memory; casting float16 costs more than the product
+_FLAT_CACHE_ELEMENTS = 16_000_000
+_HASH_MASK = np.uint64(0xFFFFFFFF)
+_PAIR_MULTIPLIER = np.uint64(0x9E3779B1)
+_KMEANS_ITERATIONS = 12
+# Candidates re-ranked with exact vectors, per requested result
+_RERANK_FACTOR = 30
+_MIN_RERANK = 300
+# Reciprocal rank fusion constant; larger values flatten the difference between ranks
+_RRF_K = 60
+
+
+@lru_cache(maxsize=200_000)
+def _term_hash(term: str) -> int:
+    return zlib.crc32(term.encode("utf-8"))
+
+
+class HashingEmbedder:
+    """
+    Embeds text as a signed feature-hashed TF-IDF vector
+
+    Features are the stemmed search terms and adjacent term pairs, so word order
+    counts a little; no model or network is needed.
+    """
+
+    name = "hashing-tfidf"
+
+    def __init__(self, dim: int, idf: Optional[np.ndarray] = None):
+        """
+        Args:
+            dim (int): Vector dimensions
+            idf (np.ndarray, optional): Per-dimension IDF weights fitted on the corpus; uniform when omitted
+        """
+        self.dim = dim
+        self.idf = idf
+
+    def term_frequencies(self, text: str) -> np.ndarray:
+        """Sublinear, signed term frequencies of a text over the hashed dimensions"""
+        terms = search_terms(text)
+        if not terms:
+            return np.zeros(self.dim, dtype=np.float32)
+        hashes = np.fromiter((_term_hash(term) for term in terms), dtype=np.uint64, count=len(terms))
+        if len(hashes) > 1:
+            hashes = np.concatenate([hashes, (hashes[:-1] * _PAIR_MULTIPLIER + hashes[1:]) & _HASH_MASK])
+        # The low bits pick the dimension and bit 31 the sign, so collisions cancel out on average
+        signs = np.where((hashes >> np.uint64(31)) & np.uint64(1), -1.0, 1.0)
+        counts = np.bincount((hashes % np.uint64(self.dim)).astype(np.intp), weights=signs, minlength=self.dim)
+        return (np.sign(counts) * np.log1p(np.abs(counts))).astype(np.float32)
+
+    def weight(self, frequencies: np.ndarray) -> np.ndarray:
+        """Apply the IDF weights to rows of term frequencies and L2-normalize them"""
+        vectors = frequencies * self.idf if self.idf is not None else frequencies
+        return _normalize(vectors)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """
+        Embed texts
+
+        Args:
+            texts (Sequence[str]): Texts to embed
+
+        Returns:
+            np.ndarray: float32 matrix of unit-length rows, one per text
+        """
+        frequencies = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            frequencies[row] = self.term_frequencies(text)
+        return self.weight(frequencies)
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+
+def _nearest(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid (L2) for each row, computed in blocks"""
+    norms = (centroids * centroids).sum(axis=1)
+    nearest = np.empty(len(data), dtype=np.int64)
+    for start in range(0, len(data), _BLOCK_ROWS):
+        block = np.asarray(data[start:start + _BLOCK_ROWS], dtype=np.float32)
+        nearest[start:start + len(block)] = np.argmin(norms - 2 * block @ centroids.T, axis=1)
+    return nearest
+
+
+def _kmeans(data: np.ndarray, k: int, seed: int, iterations: int = _KMEANS_ITERATIONS) -> np.ndarray:
+    """Lloyd's k-means on float32 rows; empty clusters are re-seeded from random rows"""
+    generator = np.random.default_rng(seed)
+    centroids = data[generator.choice(len(data), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest(data, centroids)
+        counts = np.bincount(assignment, minlength=k)
+        sums = np.stack([np.bincount(assignment, weights=data[:, j], minlength=k) for j in range(data.shape[1])], axis=1)
+        filled = counts > 0
+        centroids[filled] = (sums[filled] / counts[filled, None]).astype(np.float32)
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[generator.choice(len(data), len(empty), replace=False)]
+    return centroids
+
+
+def _ranges(starts: np.ndarray, ends: np.ndarray) -> np.ndarray:
+    """Concatenate arange(start, end) for each pair without a Python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if not total:
+        return np.zeros(0, dtype=np.int64)
+    shifts = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+    return np.arange(total, dtype=np.int64) + shifts
+
+
+def _train_ivfpq(directory: str, vectors: np.ndarray, nlist: Optional[int], subspaces: Optional[int],
+                 seed: int) -> Dict[str, Any]:
+    """Train the coarse quantizer and residual product quantizer, and write the inverted lists"""
+    count, dim = vectors.shape
+    nlist = min(count, nlist or max(1, min(4096, int(np.sqrt(count)))))
+    subspaces = subspaces or max(1, dim // 8)
+    if dim % subspaces:
+        raise ValueError(f"{subspaces} subspaces do not divide {dim} dimensions")
+    dsub = dim // subspaces
+    ksub = min(256, count)
+    generator = np.random.default_rng(seed)
+
+    # Coarse centroids are trained on a sample; 50 rows per list is plenty for k-means
+    sample = np.sort(generator.choice(count, min(count, max(50 * nlist, 10_000)), replace=False))
+    centroids = _kmeans(np.asarray(vectors[sample], dtype=np.float32), nlist, seed)
+    assignment = _nearest(vectors, centroids)
+    order = np.argsort(assignment, kind="stable")
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+
+    # One product quantizer, shared by all lists, encodes residuals from the list centroid
+    sample = np.sort(generator.choice(count, min(count, 65_536), replace=False))
+    residuals = np.asarray(vectors[sample], dtype=np.float32) - centroids[assignment[sample]]
+    codebooks = np.stack([
+        _kmeans(np.ascontiguousarray(residuals[:, j * dsub:(j + 1) * dsub]), ksub, seed + j)
+        for j in range(subspaces)
+    ])
+
+    codes = np.lib.format.open_memmap(os.path.join(directory, "pq_codes.npy"), mode="w+",
+                                      dtype=np.uint8, shape=(count, subspaces))
+    for start in range(0, count, _BLOCK_ROWS):
+        rows = order[start:start + _BLOCK_ROWS]
+        residual = np.asarray(vectors[rows], dtype=np.float32) - centroids[assignment[rows]]
+        for j in range(subspaces):
+            codes[start:start + len(rows), j] = _nearest(residual[:, j * dsub:(j + 1) * dsub], codebooks[j])
+    codes.flush()
+    del codes
+
+    np.save(os.path.join(directory, "ivf_centroids.npy"), centroids)
+    np.save(os.path.join(directory, "ivf_offsets.npy"), offsets)
+    np.save(os.path.join(directory, "ivf_ids.npy"), order.astype(np.uint32))
+    np.save(os.path.join(directory, "pq_codebooks.npy"), codebooks.astype(np.float32))
+    return {"nlist": nlist, "subspaces": subspaces, "ksub": ksub}
+
+
+def _finish_index(directory: str, backend: str, embedder: Optional[Dict[str, Any]], source: str,
+                  nlist: Optional[int], subspaces: Optional[int], seed: int, started: float) -> Dict[str, Any]:
+    vectors = np.load(os.path.join(directory, _VECTORS), mmap_mode="r")
+    count, dim = vectors.shape
+    if backend == "auto":
+        backend = IVFPQ if count >= VECTOR_IVF_MIN_SIZE else FLAT
+    if backend not in (FLAT, IVFPQ):
+        raise ValueError(f"Unknown vector backend: {backend}")
+    meta = {"format": VECTOR_FORMAT_VERSION, "backend": backend, "count": count, "dim": dim,
+            "embedder": embedder, "source": source}
+    if backend == IVFPQ and count:
+        meta.update(_train_ivfpq(directory, vectors, nlist, subspaces, seed))
+    meta["build_seconds"] = round(time.perf_counter() - started, 2)
+    with open(os.path.join(directory, _META), "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    logger.info(f"Built {backend} vector index with {count} vectors in {meta['build_seconds']}s")
+    return meta
+
+
+def build_vector_index(directory: str, texts: Iterable[str], count: int, dim: int = VECTOR_DIMENSIONS,
+                       backend: str = "auto", source: str = "", nlist: Optional[int] = None,
+                       subspaces: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Embed texts and build a vector index over them
+
+    Documents are numbered in iteration order, matching the statute or decision index they come from.
+    The files are built in a staging directory and renamed into place, so processes searching
+    the previous index keep reading it undisturbed.
+
+    Args:
+        directory (str): Directory to write the index files to
+        texts (Iterable[str]): The text of each document
+        count (int): Number of texts
+        dim (int): Vector dimensions
+        backend (str): "flat", "ivfpq", or "auto" to choose by corpus size
+        source (str): Fingerprint of the corpus, used to detect a stale index
+        nlist (int, optional): IVF lists, defaults to sqrt(count)
+        subspaces (int, optional): PQ subspaces, defaults to dim / 8
+        seed (int): Seed for k-means sampling
+
+    Returns:
+        Dict[str, Any]: The index metadata
+    """
+    with staged_directory(directory, last=(_META,)) as staging:
+        return _embed_texts(staging, texts, count, dim, backend, source, nlist, subspaces, seed)
+
+
+def _embed_texts(directory: str, texts: Iterable[str], count: int, dim: int, backend: str, source: str,
+                 nlist: Optional[int], subspaces: Optional[int], seed: int) -> Dict[str, Any]:
+    """Write the vectors and metadata of build_vector_index into the given directory"""
+    started = time.perf_counter()
+    embedder = HashingEmbedder(dim)
+    vectors = np.lib.format.open_memmap(os.path.join(directory, _VECTORS), mode="w+",
+                                        dtype=np.float16, shape=(count, dim))
+    document_frequency = np.zeros(dim, dtype=np.int64)
+    batch: List[np.ndarray] = []
+    row = 0
+
+    def flush_batch():
+        nonlocal row, batch
+        if batch:
+            block = np.stack(batch)
+            document_frequency[:] += (block != 0).sum(axis=0)
+            vectors[row:row + len(block)] = block
+            row += len(block)
+            batch = []
+
+    # First pass stores raw term frequencies; the IDF weights are only known once the corpus has been seen
+    for text in texts:
+        batch.append(embedder.term_frequencies(text))
+        if len(batch) >= _EMBED_BATCH:
+            flush_batch()
+    flush_batch()
+    if row != count:
+        raise ValueError(f"Expected {count} texts, got {row}")
+
+    embedder.idf = (np.log((count + 1) / (document_frequency + 1)) + 1).astype(np.float32)
+    for start in range(0, count, _BLOCK_ROWS):
+        vectors[start:start + _BLOCK_ROWS] = embedder.weight(vectors[start:start + _BLOCK_ROWS]).astype(np.float16)
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(directory, _IDF), embedder.idf)
+    return _finish_index(directory, backend, {"name": embedder.name}, source, nlist, subspaces, seed, started)
+
+
+def index_vectors(directory: str, vectors: np.ndarray, backend: str = "auto", source: str = "",
+                  nlist: Optional[int] = None, subspaces: Optional[int] = None, seed: int = 0) -> Dict[str, Any]:
+    """
+    Build a vector index over precomputed vectors, which are L2-normalized and stored as float16
+
+    Like build_vector_index, the files are built in a staging directory and renamed into place.
+
+    Args:
+        directory (str): Directory to write the index files to
+        vectors (np.ndarray): One row per document
+        backend (str): "flat", "ivfpq", or "auto" to choose by corpus size
+        source (str): Fingerprint of the vectors' source
+        nlist (int, optional): IVF lists, defaults to sqrt(count)
+        subspaces (int, optional): PQ subspaces, defaults to dim / 8
+        seed (int): Seed for k-means sampling
+
+    Returns:
+        Dict[str, Any]: The index metadata
+    """
+    started = time.perf_counter()
+    with staged_directory(directory, last=(_META,)) as staging:
+        stored = np.lib.format.open_memmap(os.path.join(staging, _VECTORS), mode="w+",
+                                           dtype=np.float16, shape=vectors.shape)
+        for start in range(0, len(vectors), _BLOCK_ROWS):
+            stored[start:start + _BLOCK_ROWS] = _normalize(vectors[start:start + _BLOCK_ROWS]).astype(np.float16)
+        stored.flush()
+        del stored
+        return _finish_index(staging, backend, None, source, nlist, subspaces, seed, started)
+
+
+class VectorIndex:
+    """Read-only vector index opened with mmap; subclasses implement search() for one backend"""
+
+    def __init__(self, directory: str):
+        """
+        Open an index written by build_vector_index or index_vectors
+
+        Args:
+            directory (str): The index directory
+        """
+        self.directory = directory
+        with open(os.path.join(directory, _META), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("format") != VECTOR_FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector index format in {directory}: {self.meta.get('format')}")
+        self.vectors = self._load(_VECTORS)
+        self.size, self.dim = self.vectors.shape
+        self.embedder = None
+        if self.meta.get("embedder"):
+            self.embedder = HashingEmbedder(self.dim, self._load(_IDF))
+
+        self.queries = 0
+        self._query_times = deque(maxlen=1000)
+
+    def _load(self, name: str) -> np.ndarray:
+        return np.load(os.path.join(self.directory, name), mmap_mode="r")
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the corpus and backend the index was built with"""
+        return f"{self.meta.get('source', '')}:{self.meta['backend']}"
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest vectors (by inner product) for a batch of queries
+
+        Args:
+            queries (np.ndarray): (queries, dim) unit-length float32 rows
+            k (int): Results per query
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (queries, k) document ids and scores, best first; ids are -1 past the corpus
+        """
+        raise NotImplementedError
+
+    def search_texts(self, texts: Sequence[str], k: int) -> List[List[Tuple[int, float]]]:
+        """
+        Embed texts with the index's embedder and search for each
+
+        Args:
+            texts (Sequence[str]): Query texts
+            k (int): Results per query
+
+        Returns:
+            List[List[Tuple[int, float]]]: (document id, similarity) per text, best first
+        """
+        if self.embedder is None:
+            raise ValueError(f"Vector index {self.directory} was built from precomputed vectors and cannot embed text")
+        started = time.perf_counter()
+        queries = self.embedder.embed(texts)
+        ids, scores = self.search(queries, k)
+        results = [
+            [(int(doc), float(score)) for doc, score in zip(row_ids, row_scores) if doc >= 0 and score > 0]
+            for row_ids, row_scores in zip(ids, scores)
+        ]
+        self.queries += len(texts)
+        self._query_times.append(time.perf_counter() - started)
+        return results
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return index size and query latency
+
+        Returns:
+            Dict[str, Any]: Backend, vectors, dimensions, queries served and query time percentiles in milliseconds
+        """
+        return {
+            "backend": self.meta["backend"],
+            "vectors": self.size,
+            "dim": self.dim,
+            "queries": self.queries,
+            "query_time_ms": summarize_durations(self._query_times),
+        }
+
+
+def _merge_top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Keep the k best columns of each row (unordered)"""
+    if scores.shape[1] <= k:
+        return scores, ids
+    keep = np.argpartition(scores, -k, axis=1)[:, -k:]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(ids, keep, axis=1)
+
+
+def _sorted_top_k(scores: np.ndarray, ids: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Order each row best first and pad to k columns"""
+    order = np.argsort(-scores, axis=1, kind="stable")
+    scores, ids = np.take_along_axis(scores, order, axis=1), np.take_along_axis(ids, order, axis=1)
+    if scores.shape[1] < k:
+        padding = k - scores.shape[1]
+        scores = np.pad(scores, ((0, 0), (0, padding)), constant_values=-np.inf)
+        ids = np.pad(ids, ((0, 0), (0, padding)), constant_values=-1)
+    return ids, scores
+
+
+class FlatVectorIndex(VectorIndex):
+    """Exact search: every vector is scored, block by block, for the whole query batch at once"""
+
+    def __init__(self, directory: str):
+        super().__init__(directory)
+        self._dense: Optional[np.ndarray] = None
+        self._dense_lock = threading.Lock()
+
+    def _matrix(self) -> np.ndarray:
+        """float32 copy of a small index, made on first use; larger indexes are cast block by block"""
+        if self._dense is None and self.size * self.dim <= _FLAT_CACHE_ELEMENTS:
+            with self._dense_lock:
+                if self._dense is None:
+                    self._dense = np.asarray(self.vectors, dtype=np.float32)
+        return self._dense if self._dense is not None else self.vectors
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        matrix = self._matrix()
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        best_ids = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.size, _BLOCK_ROWS):
+            block = np.asarray(matrix[start:start + _BLOCK_ROWS], dtype=np.float32)
+            scores = queries @ block.T
+            ids = np.broadcast_to(np.arange(start, start + len(block)), scores.shape)
+            scores, ids = _merge_top_k(scores, ids, k)
+            best_scores, best_ids = _merge_top_k(np.concatenate([best_scores, scores], axis=1),
+                                                 np.concatenate([best_ids, ids], axis=1), k)
+        return _sorted_top_k(best_scores, best_ids, k)
+
+
+class IVFPQVectorIndex(VectorIndex):
+    """
+    Approximate search: probe the nearest inverted lists, score their members from
+    PQ codes with per-query lookup tables, and re-rank the best with exact vectors
+    """
+
+    def __init__(self, directory: str, nprobe: int = VECTOR_IVF_NPROBE):
+        """
+        Args:
+            directory (str): The index directory
+            nprobe (int): Inverted lists scanned per query; more lists raise recall and latency
+        """
+        super().__init__(directory)
+        self.centroids = np.asarray(self._load("ivf_centroids.npy"))
+        self._centroid_norms = (self.centroids * self.centroids).sum(axis=1)
+        self.offsets = np.asarray(self._load("ivf_offsets.npy"))
+        self.ids = self._load("ivf_ids.npy")
+        self.codebooks = np.asarray(self._load("pq_codebooks.npy"))
+        self.codes = self._load("pq_codes.npy")
+        self.nprobe = min(nprobe, len(self.centroids))
+        self._subspace_offsets = np.arange(self.meta["subspaces"]) * self.meta["ksub"]
+
+    def search(self, queries: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        count, subspaces = len(queries), self.meta["subspaces"]
+        # Coarse scores and lookup tables are computed for the whole batch with matrix products
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(self._centroid_norms - 2 * coarse, self.nprobe - 1, axis=1)[:, :self.nprobe]
+        tables = np.einsum("qmd,mkd->qmk", queries.reshape(count, subspaces, -1), self.codebooks)
+        tables = tables.reshape(count, -1)
+
+        all_ids = np.full((count, k), -1, dtype=np.int64)
+        all_scores = np.full((count, k), -np.inf, dtype=np.float32)
+        for row in range(count):
+            lists = probes[row]
+            starts, ends = self.offsets[lists], self.offsets[lists + 1]
+            positions = _ranges(starts, ends)
+            if not len(positions):
+                continue
+            approximate = np.repeat(coarse[row, lists], ends - starts)
+            approximate += tables[row][np.asarray(self.codes[positions], dtype=np.intp) + self._subspace_offsets].sum(axis=1)
+
+            rerank = min(len(positions), max(k * _RERANK_FACTOR, _MIN_RERANK))
+            if len(positions) > rerank:
+                positions = positions[np.argpartition(approximate, -rerank)[-rerank:]]
+            candidates = np.sort(np.asarray(self.ids[positions], dtype=np.int64))
+            exact = np.asarray(self.vectors[candidates], dtype=np.float32) @ queries[row]
+            ids, scores = _sorted_top_k(*_merge_top_k(exact[None, :], candidates[None, :], k), k)
+            all_ids[row], all_scores[row] = ids[0], scores[0]
+        return all_ids, all_scores
+
+
+def open_vector_index(directory: str, **options) -> VectorIndex:
+    """
+    Open a vector index with the backend it was built for
+
+    Args:
+        directory (str): The index directory
+        **options: Backend options, e.g. nprobe for IVF-PQ
+
+    Returns:
+        VectorIndex: The opened index
+    """
+    with open(os.path.join(directory, _META), encoding="utf-8") as f:
+        backend = json.load(f).get("backend")
+    if backend == IVFPQ:
+        return IVFPQVectorIndex(directory, **options)
+    return FlatVectorIndex(directory)
+
+
+def fuse_rankings(rankings: Sequence[Sequence[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Merge ranked result lists with reciprocal rank fusion
+
+    Args:
+        rankings (Sequence[Sequence[Dict[str, Any]]]): Result lists, best first; items are matched on "id"
+        limit (int): Maximum number of results
+
+    Returns:
+        List[Dict[str, Any]]: The fused results, the first occurrence of each item kept
+    """
+    scores: Dict[Any, float] = {}
+    items: Dict[Any, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking):
+            scores[item["id"]] = scores.get(item["id"], 0.0) + 1.0 / (_RRF_K + rank + 1)
+            items.setdefault(item["id"], item)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [items[key] for key in ordered[:limit]]
+
+
+class VectorRetriever:
+    """Dense retrieval over named corpora ("statutes", "decisions"), each with its own vector index"""
+
+    def __init__(self, indexes: Dict[str, VectorIndex]):
+        """
+        Args:
+            indexes (Dict[str, VectorIndex]): Vector index per corpus; document ids match that corpus' index
+        """
+        self.indexes = indexes
+
+    @property
+    def fingerprint(self) -> str:
+        """Identifies the corpora and backends behind the retriever"""
+        return ",".join(f"{name}={index.fingerprint}" for name, index in sorted(self.indexes.items()))
+
+    def search(self, corpus: str, query: str, limit: int) -> List[Tuple[int, float]]:
+        """
+        Find documents of a corpus similar to a text
+
+        Args:
+            corpus (str): Corpus name
+            query (str): Case description or other free text
+            limit (int): Maximum number of documents
+
+        Returns:
+            List[Tuple[int, float]]: (document id, cosine similarity), best first; empty for an unknown corpus
+        """
+        index = self.indexes.get(corpus)
+        if index is None:
+            return []
+        return index.search_texts([query], limit)[0]
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return the metrics of each corpus index
+
+        Returns:
+            Dict[str, Any]: Index metrics keyed by corpus name
+        """
+        return {name: index.get_metrics() for name, index in self.indexes.items()}
+
+
+def _current_meta(directory: str, source: str) -> Optional[Dict[str, Any]]:
+    """The index metadata if an index of this format exists for this source, else None"""
+    try:
+        with open(os.path.join(directory, _META), encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format") != VECTOR_FORMAT_VERSION or meta.get("source") != source:
+        return None
+    return meta
+
+
+def build_decision_vectors(decisions, directory: Optional[str] = None, backend: str = "auto") -> Dict[str, Any]:
+    """
+    Build the vector index of an ingested decision corpus
+
+    Args:
+        decisions (DecisionIndex): The decision index to embed
+        directory (str, optional): Output directory, defaults to VECTOR_INDEX_DIR/decisions
+        backend (str): "flat", "ivfpq", or "auto"
+
+    Returns:
+        Dict[str, Any]: The index metadata
+    """
+    directory = directory or os.path.join(str(VECTOR_INDEX_DIR), "decisions")
+    return build_vector_index(directory, decisions.documents(), decisions.size, backend=backend,
+                              source=decisions.fingerprint)
+
+
+_vector_retriever: Optional[VectorRetriever] = None
+_vector_retriever_lock = threading.Lock()
+
+
+def get_vector_retriever(statutes=None, decisions=None) -> Optional[VectorRetriever]:
+    """
+    Return the process-wide vector retriever
+
+    The statute vectors are small and rebuilt whenever the statute corpus changes,
+    checked and built under a file lock so only one process builds them; decision
+    vectors are built with the CLI and only used while they match the ingested
+    decision corpus.
+
+    Args:
+        statutes (StatuteIndex, optional): The statute index
+        decisions (DecisionIndex, optional): The decision index
+
+    Returns:
+        Optional[VectorRetriever]: The retriever, or None when neither corpus has vectors
+    """
+    global _vector_retriever
+    if _vector_retriever is None:
+        with _vector_retriever_lock:
+            if _vector_retriever is None:
+                indexes: Dict[str, VectorIndex] = {}
+                if statutes is not None:
+                    directory = os.path.join(str(VECTOR_INDEX_DIR), "statutes")
+                    with build_lock(directory):
+                        if _current_meta(directory, statutes.fingerprint) is None:
+                            build_vector_index(directory, statutes.documents(), len(statutes), backend=FLAT,
+                                               source=statutes.fingerprint)
+                        indexes["statutes"] = open_vector_index(directory)
+                if decisions is not None:
+                    directory = os.path.join(str(VECTOR_INDEX_DIR), "decisions")
+                    if _current_meta(directory, decisions.fingerprint) is not None:
+                        indexes["decisions"] = open_vector_index(directory)
+                    else:
+                        logger.warning("Decision vectors are missing or stale, build them with "
+                                       "python -m app.services.vector_index build")
+                if not indexes:
+                    return None
+                _vector_retriever = VectorRetriever(indexes)
+                logger.info(f"Vector retriever loaded: {_vector_retriever.fingerprint}")
+    return _vector_retriever
+
+
+def run_benchmark(size: int, dim: int, queries: int, k: int, directory: str,
+                  index_dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Measure build time, query latency and recall@k of the IVF-PQ backend against exact search
+
+    Without index_dir the corpus is synthetic: unit vectors drawn around random topic
+    centres, with queries perturbed from corpus vectors. With index_dir, queries are
+    perturbed vectors of that index, and its flat search is the ground truth.
+
+    Args:
+        size (int): Synthetic corpus size
+        dim (int): Synthetic vector dimensions
+        queries (int): Number of queries
+        k (int): Results per query
+        directory (str): Scratch directory for the synthetic indexes
+        index_dir (str, optional): An existing vector index to measure instead
+
+    Returns:
+        Dict[str, Any]: Build seconds, latency percentiles (single and batched) and recall per backend and nprobe
+    """
+    generator = np.random.default_rng(7)
+    if index_dir:
+        source = np.load(os.path.join(index_dir, _VECTORS), mmap_mode="r")
+        indexes = {"flat": FlatVectorIndex(index_dir)}
+        if open_vector_index(index_dir).meta["backend"] == IVFPQ:
+            indexes["ivfpq"] = IVFPQVectorIndex(index_dir)
+        build = {"ivfpq": indexes["flat"].meta["build_seconds"]}
+    else:
+        centres = _normalize(generator.standard_normal((max(1, size // 500), dim)))
+        source = _normalize(centres[generator.integers(len(centres), size=size)]
+                            + 0.6 / np.sqrt(dim) * generator.standard_normal((size, dim)).astype(np.float32))
+        build = {
+            "flat": index_vectors(os.path.join(directory, "flat"), source, backend=FLAT)["build_seconds"],
+            "ivfpq": index_vectors(os.path.join(directory, "ivfpq"), source, backend=IVFPQ)["build_seconds"],
+        }
+        indexes = {name: open_vector_index(os.path.join(directory, name)) for name in ("flat", "ivfpq")}
+
+    picks = np.sort(generator.choice(len(source), queries, replace=False))
+    batch = _normalize(np.asarray(source[picks], dtype=np.float32)
+                       + 0.3 / np.sqrt(source.shape[1]) * generator.standard_normal((queries, source.shape[1])))
+    truth, _ = indexes["flat"].search(batch, k)
+
+    def measure(index: VectorIndex) -> Dict[str, Any]:
+        single = []
+        for query in batch:
+            started = time.perf_counter()
+            index.search(query[None, :], k)
+            single.append(time.perf_counter() - started)
+        started = time.perf_counter()
+        found, _ = index.search(batch, k)
+        batched = time.perf_counter() - started
+        recall = np.mean([len(set(found[row]) & set(truth[row])) / k for row in range(queries)])
+        return {"single_query_ms": summarize_durations(single),
+                "batched_ms_per_query": round(batched / queries * 1000, 3),
+                f"recall_at_{k}": round(float(recall), 4)}
+
+    report = {"vectors": len(source), "dim": source.shape[1], "queries": queries, "build_seconds": build,
+              "flat": measure(indexes["flat"])}
+    if "ivfpq" in indexes:
+        ivfpq = indexes["ivfpq"]
+        for nprobe in sorted({4, 8, VECTOR_IVF_NPROBE, 32}):
+            ivfpq.nprobe = min(nprobe, len(ivfpq.centroids))
+            report[f"ivfpq_nprobe_{nprobe}"] = measure(ivfpq)
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(prog="python -m app.services.vector_index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build = commands.add_parser("build", help="embed an ingested decision corpus")
+    build.add_argument("decision_index_dir", nargs="?", default=str(DECISION_INDEX_DIR))
+    build.add_argument("vector_index_dir", nargs="?", default=os.path.join(str(VECTOR_INDEX_DIR), "decisions"))
+    build.add_argument("--backend", default="auto", choices=("auto", FLAT, IVFPQ))
+    bench = commands.add_parser("bench", help="measure latency and recall")
+    bench.add_argument("--size", type=int, default=200_000)
+    bench.add_argument("--dim", type=int, default=VECTOR_DIMENSIONS)
+    bench.add_argument("--queries", type=int, default=200)
+    bench.add_argument("--k", type=int, default=10)
+    bench.add_argument("--index", help="benchmark an existing vector index instead of synthetic vectors")
+    bench.add_argument("--scratch", default=os.path.join(str(VECTOR_INDEX_DIR), "bench"))
+    args = parser.parse_args()
+
+    if args.command == "build":
+        from app.services.decision_index import DecisionIndex
+        meta = build_decision_vectors(DecisionIndex(args.decision_index_dir), args.vector_index_dir, args.backend)
+        print(json.dumps(meta, indent=2))
+    else:
+        report = run_benchmark(args.size, args.dim, args.queries, args.k, args.scratch, args.index)
+        print(json.dumps(report, indent=2))
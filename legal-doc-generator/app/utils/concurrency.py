@@ -0,0 +1,105 @@
+"""
+Asyncio helpers shared by the API and services
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Tuple
+
+
+async def run_concurrently(*awaitables: Awaitable) -> List[Any]:
+    """
+    Run awaitables concurrently and return their results in order
+
+    If any of them raises, the others are cancelled and the first error is re-raised.
+    Cancelling the caller cancels all of them.
+
+    Args:
+        *awaitables: Coroutines or futures to run
+
+    Returns:
+        List[Any]: The results, in the order the awaitables were given
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        failed = [task for task in tasks if task in done and not task.cancelled() and task.exception()]
+        if failed:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise failed[0].exception()
+        return [task.result() for task in tasks]
+    except asyncio.CancelledError:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key onto one in-flight task
+
+    The work runs in its own task, so a leader that is cancelled (for example
+    because its client disconnected) does not cancel the callers waiting on it.
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run factory() for the key unless a call for it is already in flight
+
+        Args:
+            key (Hashable): Identifies identical calls
+            factory (Callable): Returns the awaitable doing the work; only called by the leader
+
+        Returns:
+            Tuple[Any, bool]: The shared result and whether this call joined an existing one
+        """
+        task, joined = self.start(key, factory)
+        return await asyncio.shield(task), joined
+
+    def start(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Tuple[asyncio.Task, bool]:
+        """
+        Like run(), but return the shared task instead of awaiting it
+
+        For a leader that consumes what the work produces while it runs, such as a stream.
+        Await the task through asyncio.shield so leaving early does not cancel it for the others.
+
+        Returns:
+            Tuple[asyncio.Task, bool]: The in-flight task and whether this call joined it
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+        joined = task is not None
+        if joined:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return task, joined
+
+    def _finish(self, key: Hashable, task: asyncio.Task) -> None:
+        """Forget a finished call; its exception is retrieved here in case every caller went away"""
+        self._in_flight.pop(key, None)
+        if not task.cancelled():
+            task.exception()
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return coalescing counters
+
+        Returns:
+            Dict[str, Any]: Calls, coalesced calls, the coalescing rate and the number in flight
+        """
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "coalescing_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+        }
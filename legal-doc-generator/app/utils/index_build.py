@@ -0,0 +1,66 @@
+"""
+Safe rebuilds of on-disk indexes that other processes read through mmap.
+
+An index is written to a staging directory and its files are renamed into place,
+so a process that has the old files mapped keeps reading the old inodes instead
+of pages that are being truncated under it. A lock file next to the index lets
+one process check and build while the others wait for the result.
+"""
+
+import os
+import fcntl
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+
+@contextmanager
+def build_lock(directory: str) -> Iterator[None]:
+    """
+    Hold an exclusive lock on an index directory, across processes
+
+    Args:
+        directory (str): The index directory; the lock file is created beside it
+    """
+    directory = os.path.abspath(directory)
+    os.makedirs(os.path.dirname(directory), exist_ok=True)
+    with open(f"{directory}.lock", "a") as handle:
+        fcntl.flock(handle, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+
+
+@contextmanager
+def staged_directory(directory: str, last: Sequence[str] = ()) -> Iterator[str]:
+    """
+    Yield an empty staging directory whose files replace those of `directory` when the block succeeds
+
+    The files named in `last` (the manifest a reader checks first) are removed from
+    `directory` before anything is moved and renamed into place after everything else,
+    so an interrupted move is never taken for a complete index. If the block raises,
+    `directory` is left untouched.
+
+    Args:
+        directory (str): The index directory to publish to
+        last (Sequence[str]): File names to move after all others
+
+    Yields:
+        str: The staging directory to build the index in
+    """
+    directory = os.path.abspath(directory)
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(prefix=f".{os.path.basename(directory)}.", dir=parent)
+    try:
+        yield staging
+        os.makedirs(directory, exist_ok=True)
+        for name in last:
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+        for name in sorted(os.listdir(staging), key=lambda name: name in last):
+            os.replace(os.path.join(staging, name), os.path.join(directory, name))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
@@ -0,0 +1,113 @@
+"""
+Single-pass extraction of a JSON object from model output, with repair of
+truncated or slightly malformed JSON
+"""
+
+import re
+import json
+from typing import Any, List, Optional, Tuple
+
+_CLOSERS = {"{": "}", "[": "]"}
+# A string cut off inside a \uXXXX escape would not parse once closed
+_INCOMPLETE_UNICODE_ESCAPE = re.compile(r'\\u[0-9a-fA-F]{0,3}$')
+
+
+def extract_json_object(text: str) -> Tuple[Optional[Any], bool]:
+    """
+    Extract the first JSON object in text in one left-to-right pass
+
+    Prose and code fences around the object are ignored. Trailing commas are
+    dropped, and if the text ends before the object closes (a truncated
+    response), it is cut back to the last complete value, or the open string
+    is closed, and the open containers are closed.
+
+    Args:
+        text (str): Model output containing a JSON object
+
+    Returns:
+        Tuple[Optional[Any], bool]: The parsed object (None if none could be
+        recovered) and whether it had to be repaired
+    """
+    start = text.find("{")
+    if start < 0:
+        return None, False
+
+    out: List[str] = []
+    stack: List[str] = []
+    in_string = False
+    escape = False
+    string_is_key = False
+    expect_key = False
+    repaired = False
+    # Output length and open containers at the last point where the object could be closed
+    safe_length, safe_stack = 0, []
+
+    for c in text[start:]:
+        if in_string:
+            out.append(c)
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+                if not string_is_key:
+                    safe_length, safe_stack = len(out), stack[:]
+            continue
+
+        if c in "{[":
+            stack.append(c)
+            out.append(c)
+            expect_key = c == "{"
+            safe_length, safe_stack = len(out), stack[:]
+        elif c in "}]":
+            if not stack:
+                break
+            # Drop a trailing comma before the closing bracket
+            while out and out[-1] in " \t\r\n":
+                out.pop()
+            if out and out[-1] == ",":
+                out.pop()
+                repaired = True
+            if _CLOSERS[stack[-1]] != c:
+                repaired = True
+            out.append(_CLOSERS[stack.pop()])
+            if not stack:
+                break
+            expect_key = False
+            safe_length, safe_stack = len(out), stack[:]
+        elif c == '"':
+            in_string = True
+            string_is_key = expect_key and stack[-1] == "{"
+            out.append(c)
+        elif c == ",":
+            # Everything before a comma is complete
+            safe_length, safe_stack = len(out), stack[:]
+            out.append(c)
+            expect_key = stack[-1] == "{"
+        elif c == ":":
+            out.append(c)
+            expect_key = False
+        else:
+            # Whitespace, or part of a number or literal (only known to be complete at the next delimiter)
+            out.append(c)
+
+    if stack:
+        repaired = True
+        if in_string and not string_is_key:
+            if escape:
+                out.pop()
+            partial = _INCOMPLETE_UNICODE_ESCAPE.sub("", "".join(out))
+            candidate = partial + '"' + "".join(_CLOSERS[opener] for opener in reversed(stack))
+        else:
+            candidate = "".join(out[:safe_length]).rstrip(" \t\r\n,") + \
+                "".join(_CLOSERS[opener] for opener in reversed(safe_stack))
+        try:
+            return json.loads(candidate), repaired
+        except json.JSONDecodeError:
+            return None, repaired
+
+    try:
+        return json.loads("".join(out)), repaired
+    except json.JSONDecodeError:
+        return None, repaired
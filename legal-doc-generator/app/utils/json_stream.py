@@ -0,0 +1,147 @@
+"""
+Incremental parser for a JSON object that arrives in chunks, such as a streamed
+LLM response. It reports each top-level field, and each element of a top-level
+array, as soon as that value is complete.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple
+
+_WHITESPACE = " \t\r\n"
+
+
+class IncrementalJSONParser:
+    """
+    Single-pass scanner over a streamed JSON object
+
+    Text before the first "{" (for example a ```json fence) is ignored, as is
+    anything after the object closes. feed() returns events of the form:
+        ("field", key, value)  a complete top-level value that is not an array
+        ("item", key, value)   a complete element of the top-level array under key
+        ("end", key, None)     the top-level array under key is closed
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._position = 0
+        self._started = False
+        self.done = False
+
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string_is_key = False
+
+        self._expect_key = True
+        self._key_start: Optional[int] = None
+        self._key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        # (start index, depth, kind) of the value being collected; kind is "string", "container" or "scalar"
+        self._value: Optional[Tuple[int, int, str]] = None
+
+    def feed(self, chunk: str) -> List[Tuple[str, Optional[str], Any]]:
+        """
+        Consume the next chunk of text
+
+        Args:
+            chunk (str): The next piece of the response
+
+        Returns:
+            List[tuple]: Events completed by this chunk, in document order
+        """
+        events = []
+        if self.done or not chunk:
+            return events
+        self._text += chunk
+        text = self._text
+
+        while self._position < len(text) and not self.done:
+            i = self._position
+            c = text[i]
+            self._position += 1
+
+            if not self._started:
+                if c == "{":
+                    self._started = True
+                    self._stack.append("{")
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        self._key = json.loads(text[self._key_start:i + 1])
+                        self._string_is_key = False
+                    elif self._value and self._value[2] == "string" and len(self._stack) == self._value[1]:
+                        self._complete(text, i + 1, events)
+                continue
+
+            depth = len(self._stack)
+            if self._value and self._value[2] == "scalar" and depth == self._value[1] \
+                    and (c in _WHITESPACE or c in ",}]"):
+                self._complete(text, i, events)
+
+            if c in _WHITESPACE:
+                continue
+            if c == '"':
+                self._in_string = True
+                if depth == 1 and self._expect_key:
+                    self._string_is_key = True
+                    self._key_start = i
+                elif self._value is None and self._tracked(depth):
+                    self._value = (i, depth, "string")
+            elif c in "{[":
+                if depth == 1 and c == "[" and not self._expect_key:
+                    self._array_key = self._key
+                elif self._value is None and self._tracked(depth):
+                    self._value = (i, depth, "container")
+                self._stack.append(c)
+            elif c in "}]":
+                if len(self._stack) == 1 and c == "]":
+                    continue
+                self._stack.pop()
+                depth = len(self._stack)
+                if self._value and self._value[2] == "container" and depth == self._value[1]:
+                    self._complete(text, i + 1, events)
+                elif c == "]" and depth == 1 and self._array_key is not None:
+                    events.append(("end", self._array_key, None))
+                    self._array_key = None
+                if depth == 0:
+                    self.done = True
+            elif c == ",":
+                if depth == 1:
+                    self._expect_key = True
+            elif c == ":":
+                if depth == 1:
+                    self._expect_key = False
+            elif self._value is None and self._tracked(depth):
+                self._value = (i, depth, "scalar")
+
+        return events
+
+    def _tracked(self, depth: int) -> bool:
+        """Whether a value starting at this depth is reported: a top-level value or a top-level array element"""
+        if depth == 1:
+            return not self._expect_key
+        return depth == 2 and self._array_key is not None and self._stack[-1] == "["
+
+    def _complete(self, text: str, end: int, events: list) -> None:
+        start, depth, _ = self._value
+        self._value = None
+        try:
+            value = json.loads(text[start:end])
+        except json.JSONDecodeError:
+            return
+        if depth == 1:
+            events.append(("field", self._key, value))
+        else:
+            events.append(("item", self._array_key, value))
+
+    @property
+    def text(self) -> str:
+        """All text fed so far"""
+        return self._text
@@ -0,0 +1,104 @@
+"""
+Keyword Matcher
+Aho–Corasick automaton over keyword lists grouped by label. All keywords are found
+in one pass over the text, however many there are, and each label is scored by the
+number of its keyword occurrences.
+
+Text and keywords are folded the same way: Turkish lower-case, ASCII-folded, with
+every run of non-word characters turned into a single space. Keywords are matched
+at the start of a word; a keyword ending in "*" also matches longer words
+("boşan*" matches "boşanmak"), any other keyword only matches whole words.
+"""
+
+import re
+from collections import deque
+from typing import Dict, Iterable, List, Tuple
+
+from app.utils.text import fold_ascii, turkish_lower
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+
+def fold_keyword_text(text: str) -> str:
+    """
+    Fold text for keyword matching: Turkish lower-case, ASCII letters, single spaces, padded with a space
+
+    Args:
+        text (str): Text to fold
+
+    Returns:
+        str: The folded text, starting and ending with a space so word boundaries are characters
+    """
+    return f" {_NON_WORD.sub(' ', fold_ascii(turkish_lower(text or ''))).strip()} "
+
+
+class KeywordMatcher:
+    """Finds the keywords of every label in a single pass over the text"""
+
+    def __init__(self, keywords: Dict[str, Iterable[str]]):
+        """
+        Build the automaton
+
+        Args:
+            keywords (Dict[str, Iterable[str]]): Keywords of each label; a trailing "*" allows longer words
+        """
+        self.labels: List[str] = list(keywords)
+        # State 0 is the root; each state has its transitions, failure link and the labels ending there
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        for label_id, label in enumerate(self.labels):
+            for keyword in keywords[label]:
+                prefix = keyword.endswith("*")
+                pattern = fold_keyword_text(keyword.rstrip("*"))
+                self._add(pattern[:-1] if prefix else pattern, label_id)
+        self._link()
+
+    def _add(self, pattern: str, label_id: int) -> None:
+        state = 0
+        for char in pattern:
+            following = self._goto[state].get(char)
+            if following is None:
+                following = len(self._goto)
+                self._goto[state][char] = following
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(())
+            state = following
+        self._output[state] += (label_id,)
+
+    def _link(self) -> None:
+        """Set failure links breadth-first, and merge each state's outputs with its failure state's"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, following in self._goto[state].items():
+                queue.append(following)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[following] = target if target != following else 0
+                self._output[following] += self._output[self._fail[following]]
+
+    def scores(self, text: str) -> Dict[str, int]:
+        """
+        Count keyword occurrences per label
+
+        Args:
+            text (str): Text to scan
+
+        Returns:
+            Dict[str, int]: Occurrences of each label's keywords, every label included
+        """
+        counts = [0] * len(self.labels)
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in fold_keyword_text(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for label_id in output[state]:
+                counts[label_id] += 1
+        return dict(zip(self.labels, counts))
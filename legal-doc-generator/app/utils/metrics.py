@@ -0,0 +1,46 @@
+"""
+Metric helpers shared by the services
+"""
+
+from typing import Dict, Iterable
+
+
+def summarize_durations(samples: Iterable[float]) -> Dict[str, float]:
+    """
+    Summarize a window of durations (seconds) as millisecond percentiles
+
+    Args:
+        samples (Iterable[float]): Recent durations in seconds
+
+    Returns:
+        Dict[str, float]: count, avg, p50, p95 and max in milliseconds
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0, "avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    count = len(ordered)
+    return {
+        "count": count,
+        "avg": round(sum(ordered) / count * 1000, 2),
+        "p50": round(ordered[int(count * 0.50)] * 1000, 2),
+        "p95": round(ordered[min(count - 1, int(count * 0.95))] * 1000, 2),
+        "max": round(ordered[-1] * 1000, 2),
+    }
+
+
+def percentiles(samples: Iterable[float], points: Iterable[int] = (50, 95, 99)) -> Dict[str, float]:
+    """
+    Nearest-rank percentiles of a set of samples
+
+    Args:
+        samples (Iterable[float]): The samples, in any order
+        points (Iterable[int]): Percentiles to report
+
+    Returns:
+        Dict[str, float]: "p50", "p95", ... keyed values, 0.0 for every point when there are no samples
+    """
+    ordered = sorted(samples)
+    if not ordered:
+        return {f"p{point}": 0.0 for point in points}
+    count = len(ordered)
+    return {f"p{point}": ordered[min(count - 1, max(0, -(-count * point // 100) - 1))] for point in points}
@@ -0,0 +1,257 @@
+"""
+Resilience helpers for calls to external services: request deadlines,
+retries with exponential backoff and jitter, and a circuit breaker
+"""
+
+import time
+import random
+import asyncio
+import logging
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, AsyncContextManager, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceUnavailableError(Exception):
+    """The service could not produce a result within the retry budget"""
+
+
+class DeadlineExceededError(ServiceUnavailableError):
+    """The request deadline passed before the service answered"""
+
+
+class CircuitOpenError(ServiceUnavailableError):
+    """The circuit breaker is open and calls fail fast"""
+
+
+class Deadline:
+    """A point in time by which a request must finish"""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+
+class CircuitBreaker:
+    """
+    Opens when the failure rate over the last calls crosses a threshold
+
+    While open every call fails fast. After open_seconds a single probe call is let
+    through (half-open); its outcome closes the circuit or opens it again.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_rate: float, window: int, min_calls: int, open_seconds: float):
+        """
+        Args:
+            failure_rate (float): Failure ratio (0-1) in the window that opens the circuit
+            window (int): Number of recent calls considered
+            min_calls (int): Calls needed in the window before the circuit can open
+            open_seconds (float): How long the circuit stays open before a probe is allowed
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+        self.opened = 0
+        self.rejected = 0
+
+    def before_call(self) -> None:
+        """
+        Check whether a call may proceed
+
+        Raises:
+            CircuitOpenError: If the circuit is open, or half-open with a probe already running
+        """
+        if self.state == self.OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit breaker is open")
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError("Circuit breaker is half-open and a probe call is running")
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        if self.state == self.HALF_OPEN:
+            logger.info("Circuit breaker probe succeeded, closing the circuit")
+            self.state = self.CLOSED
+            self._outcomes.clear()
+        self._probe_in_flight = False
+        self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            self._open()
+            return
+        self._outcomes.append(False)
+        failures = self._outcomes.count(False)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def abandon(self) -> None:
+        """Forget a call that was cancelled before it finished"""
+        self._probe_in_flight = False
+
+    def _open(self) -> None:
+        logger.error(f"Circuit breaker opened for {self.open_seconds}s")
+        self.state = self.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return the breaker state and counters
+
+        Returns:
+            Dict[str, Any]: State, recent failure rate, times opened and calls rejected
+        """
+        calls = len(self._outcomes)
+        return {
+            "state": self.state,
+            "recent_calls": calls,
+            "recent_failure_rate": round(self._outcomes.count(False) / calls, 4) if calls else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class RetryPolicy:
+    """Retries retryable failures with exponential backoff and full jitter, within a deadline"""
+
+    def __init__(self, max_attempts: int, base_delay: float, max_delay: float,
+                 attempt_timeout: Optional[float] = None,
+                 is_retryable: Callable[[BaseException], bool] = lambda error: False):
+        """
+        Args:
+            max_attempts (int): Maximum number of attempts, including the first
+            base_delay (float): Backoff before the first retry, doubled for each further retry
+            max_delay (float): Upper bound of a single backoff
+            attempt_timeout (float, optional): Timeout of a single attempt; timeouts are retryable
+            is_retryable (Callable): Decides whether an exception is worth retrying
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.is_retryable = is_retryable
+
+        self.retries = 0
+        self.exhausted = 0
+        self.deadline_exceeded = 0
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter delay before the given retry (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (retry - 1))))
+
+    async def call(self, fn: Callable[[], Awaitable[Any]], deadline: Deadline,
+                   breaker: Optional[CircuitBreaker] = None,
+                   slot: Optional[Callable[[Deadline], AsyncContextManager]] = None) -> Any:
+        """
+        Call fn until it succeeds, fails permanently, or the retry budget runs out
+
+        Args:
+            fn (Callable): Returns a new awaitable for every attempt
+            deadline (Deadline): Overall deadline; no attempt or backoff runs past it
+            breaker (CircuitBreaker, optional): Breaker consulted before and updated after each attempt
+            slot (Callable, optional): Given the deadline, returns a context manager holding a concurrency
+                slot for one attempt; the attempt timeout starts once the slot is held, so time spent
+                queued for it is never taken for a slow service
+
+        Returns:
+            Any: The result of the first successful attempt
+
+        Raises:
+            CircuitOpenError: If the breaker rejects an attempt
+            DeadlineExceededError: If the deadline passes first
+            ServiceUnavailableError: If every attempt failed with a retryable error
+            Exception: Non-retryable errors are re-raised unchanged
+        """
+        attempt = 0
+        while True:
+            remaining = deadline.remaining()
+            if remaining <= 0:
+                self.deadline_exceeded += 1
+                raise DeadlineExceededError(f"Deadline of {deadline.seconds}s exceeded after {attempt} attempts")
+
+            async with (slot(deadline) if slot is not None else nullcontext()):
+                remaining = deadline.remaining()
+                if remaining <= 0:
+                    # The wait for the slot used up the deadline; the service was never called
+                    self.deadline_exceeded += 1
+                    raise DeadlineExceededError(
+                        f"Deadline of {deadline.seconds}s exceeded waiting for a slot after {attempt} attempts")
+                if breaker is not None:
+                    breaker.before_call()
+
+                timeout = min(self.attempt_timeout, remaining) if self.attempt_timeout else remaining
+                try:
+                    result = await asyncio.wait_for(fn(), timeout=timeout)
+                except asyncio.CancelledError:
+                    if breaker is not None:
+                        breaker.abandon()
+                    raise
+                except Exception as e:
+                    error = e
+                    if not isinstance(e, asyncio.TimeoutError) and not self.is_retryable(e):
+                        # The service answered; the request itself is at fault
+                        if breaker is not None:
+                            breaker.record_success()
+                        raise
+                else:
+                    if breaker is not None:
+                        breaker.record_success()
+                    return result
+
+            if breaker is not None:
+                breaker.record_failure()
+            attempt += 1
+            logger.warning(f"Attempt {attempt}/{self.max_attempts} failed: {type(error).__name__}: {error}")
+            if attempt >= self.max_attempts:
+                self.exhausted += 1
+                raise ServiceUnavailableError(f"All {attempt} attempts failed: {error}") from error
+
+            delay = self.backoff(attempt)
+            if delay >= deadline.remaining():
+                self.deadline_exceeded += 1
+                raise DeadlineExceededError(
+                    f"Deadline of {deadline.seconds}s leaves no time to retry after {attempt} attempts"
+                ) from error
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """
+        Return retry counters
+
+        Returns:
+            Dict[str, Any]: Retries made, calls that ran out of attempts, and deadline hits
+        """
+        return {
+            "max_attempts": self.max_attempts,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+            "deadline_exceeded": self.deadline_exceeded,
+        }
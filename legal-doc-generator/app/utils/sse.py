@@ -0,0 +1,21 @@
+"""
+Server-Sent Events helpers
+"""
+
+import json
+from typing import Any
+
+
+def format_sse(event: str, data: Any) -> str:
+    """
+    Format one Server-Sent Event
+
+    Args:
+        event (str): The event name
+        data (Any): JSON-serializable payload
+
+    Returns:
+        str: The event, terminated by a blank line
+    """
+    payload = json.dumps(data, ensure_ascii=False)
+    return f"event: {event}\ndata: {payload}\n\n"
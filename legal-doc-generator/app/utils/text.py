@@ -0,0 +1,134 @@
+"""
+Turkish-aware text helpers shared by the services
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List
+
+# str.lower() maps "I" to "i" and "İ" to "i̇" (with a combining dot); Turkish needs I -> ı and İ -> i
+_WHITESPACE = re.compile(r"\s+")
+_WORD = re.compile(r"\w+")
+# Folds the Turkish letters to ASCII so queries typed without them still match
+_ASCII_FOLD = str.maketrans("çğıöşüâîû", "cgiosuaiu")
+
+# Inflectional endings stripped before truncation: case and relative, possessive, then plural
+_SUFFIX_GROUPS = (
+    ("ndaki", "ndeki", "ndan", "nden", "daki", "deki", "taki", "teki", "yla", "yle",
+     "nın", "nin", "nun", "nün", "dan", "den", "tan", "ten", "nda", "nde",
+     "da", "de", "ta", "te", "ya", "ye", "yı", "yi", "yu", "yü", "na", "ne",
+     "nı", "ni", "nu", "nü", "la", "le"),
+    ("ları", "leri", "sı", "si", "su", "sü"),
+    ("lar", "ler"),
+)
+_MIN_STEM = 4
+STEM_LENGTH = 5
+
+STOPWORDS = frozenset("""
+acaba ama ancak artık aslında az bana bazı belki ben beni benim beri bile bir birçok biri birkaç birşey biz bize
+bizi bizim bu buna bunda bundan bunu bunun burada çok çünkü da daha dahi de defa değil diğer diye doğru en gibi
+göre hem hep hepsi her herhangi hiç için ile ilgili ise işte kadar ki kim kime kimse mi mı mu mü ne neden nasıl
+nerede niye o olan olarak oldu olduğu olduğunu olmak olması olup olur on ona onda ondan onlar onu onun öyle
+sadece sanki siz şey şu şuna şunu tüm ve veya ya yani yine zaten
+""".split())
+
+
+def turkish_lower(text: str) -> str:
+    """
+    Lower-case text with Turkish dotted/dotless i rules
+
+    Args:
+        text (str): Text to lower-case
+
+    Returns:
+        str: The lower-cased text
+    """
+    # Two str.replace calls are much faster than str.translate with a mapping on long texts
+    return unicodedata.normalize("NFC", text).replace("I", "ı").replace("İ", "i").lower()
+
+
+def normalize_text(text: str) -> str:
+    """
+    Normalize free text for hashing and matching: Turkish lower-case, collapsed whitespace
+
+    Args:
+        text (str): Text to normalize
+
+    Returns:
+        str: The normalized text
+    """
+    return _WHITESPACE.sub(" ", turkish_lower(text or "")).strip()
+
+
+def fold_ascii(text: str) -> str:
+    """
+    Fold Turkish letters in lower-cased text to their ASCII base letters
+
+    Args:
+        text (str): Lower-cased text
+
+    Returns:
+        str: The folded text
+    """
+    return text.translate(_ASCII_FOLD)
+
+
+def stem(word: str) -> str:
+    """
+    Light Turkish stemmer for search: strip common inflectional suffixes, then keep the first five letters
+
+    Truncating to a fixed prefix is about as effective for Turkish retrieval as a
+    full morphological analyser, and much faster. Numbers are returned unchanged.
+
+    Args:
+        word (str): A lower-cased word
+
+    Returns:
+        str: The stem
+    """
+    if word.isdigit():
+        return word
+    for group in _SUFFIX_GROUPS:
+        for suffix in group:
+            if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+                word = word[:-len(suffix)]
+                break
+    return word[:STEM_LENGTH]
+
+
+@lru_cache(maxsize=200_000)
+def _term(word: str) -> str:
+    # Word frequencies are heavily skewed, so most words of a large corpus hit this cache
+    return fold_ascii(stem(word))
+
+
+def search_terms(text: str) -> List[str]:
+    """
+    Turn text into index terms: Turkish lower-case, drop stopwords, stem and fold to ASCII
+
+    Args:
+        text (str): Text to analyse
+
+    Returns:
+        List[str]: The terms in document order (with repeats)
+    """
+    return [
+        _term(word)
+        for word in _WORD.findall(turkish_lower(text or ""))
+        if word not in STOPWORDS and (len(word) > 1 or word.isdigit())
+    ]
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimate the model tokens of a text without calling a tokenizer
+
+    Args:
+        text (str): Prompt text
+
+    Returns:
+        int: Estimated token count, rounded up
+    """
+    # Turkish words are long and split into several tokens; three characters per token is a safe average
+    return -(-len(text or "") // 3)
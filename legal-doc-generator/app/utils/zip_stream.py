@@ -0,0 +1,78 @@
+"""
+Streaming ZIP writer: builds an archive member by member and hands back its bytes
+as they are produced, so an archive can be sent while it is being built, without
+a temporary file or the whole archive in memory.
+"""
+
+import time
+import zipfile
+from typing import List
+
+
+class _Sink:
+    """Write-only file object that keeps what ZipFile writes until it is drained"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class ZipStream:
+    """
+    A ZIP archive written to an unseekable stream
+
+    ZipFile then records each member's sizes in a data descriptor after its data, so
+    nothing already handed out has to be rewritten. Only the central directory, one
+    small record per member, is kept until the archive is closed.
+    """
+
+    def __init__(self):
+        self._sink = _Sink()
+        self._archive = zipfile.ZipFile(self._sink, "w")
+        self.members = 0
+        self.bytes_written = 0
+
+    def add(self, name: str, data: bytes, compress: bool = True) -> bytes:
+        """
+        Add a member to the archive
+
+        Args:
+            name (str): The member's path inside the archive
+            data (bytes): The member's content
+            compress (bool): Deflate the content; pointless for content that is already compressed, like .docx
+
+        Returns:
+            bytes: The archive bytes produced for the member
+        """
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        self._archive.writestr(info, data)
+        self.members += 1
+        return self._drain()
+
+    def close(self) -> bytes:
+        """
+        Finish the archive
+
+        Returns:
+            bytes: The remaining archive bytes: the central directory and end record
+        """
+        self._archive.close()
+        return self._drain()
+
+    def _drain(self) -> bytes:
+        data = self._sink.drain()
+        self.bytes_written += len(data)
+        return data
@@ -0,0 +1,37 @@
+"""
+Standalone job worker
+Runs the document generation job queue outside the web process, so web servers
+can be started with JOB_RUN_WORKERS_IN_WEB=False and scaled separately:
+
+    python -m app.worker
+"""
+
+import signal
+import asyncio
+import logging
+
+from app.main import job_worker_pool, get_render_engine
+
+logger = logging.getLogger(__name__)
+
+
+async def run_worker() -> None:
+    """
+    Consume jobs until SIGINT or SIGTERM
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    get_render_engine().start()
+    job_worker_pool.start()
+    try:
+        await stop.wait()
+    finally:
+        await job_worker_pool.stop()
+        get_render_engine().shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -0,0 +1,52 @@
+# tests/loadtest/test_load_generator.py
+import random
+
+import pytest
+
+from app.loadtest.fake_gemini import parse_error_mix, parse_latency
+from app.loadtest.load_generator import FAILED_ANALYSIS_SUMMARY, LoadReport, classify_response
+
+
+def response(summary="Özet", laws=1, decisions=1, using_mock_data=False):
+    return {
+        "metadata": {"using_mock_data": using_mock_data},
+        "analysis": {"summary": summary, "relevant_laws": [{}] * laws, "relevant_decisions": [{}] * decisions},
+    }
+
+
+class TestLoadGenerator:
+    def test_latency_distributions(self):
+        """Every distribution draws non-negative latencies around its parameters"""
+        rng = random.Random(7)
+        assert parse_latency("fixed:0.25")(rng) == 0.25
+        assert all(1 <= parse_latency("uniform:1,2")(rng) <= 2 for _ in range(100))
+        assert all(parse_latency("normal:0.1,1")(rng) >= 0 for _ in range(100))
+        draws = sorted(parse_latency("lognormal:1.5,0.4")(rng) for _ in range(1001))
+        assert 1.3 < draws[500] < 1.7
+        for spec in ("gamma:1,2", "uniform:1", "fixed:-1", "lognormal:0,1", "fixed:x"):
+            with pytest.raises(ValueError):
+                parse_latency(spec)
+        assert parse_error_mix("429:3, 503") == {429: 3.0, 503: 1.0}
+
+    def test_responses_are_classified_by_stage(self):
+        """HTTP errors, mock data, failed and incomplete analyses are told apart"""
+        assert classify_response(200, response()) is None
+        assert classify_response(500, None) == ("api", "http_500")
+        assert classify_response(200, None) == ("api", "invalid_body")
+        assert classify_response(200, response(using_mock_data=True)) == ("analysis", "mock_data")
+        assert classify_response(200, response(summary=FAILED_ANALYSIS_SUMMARY)) == ("analysis", "failed")
+        assert classify_response(200, response(decisions=0)) == ("analysis", "incomplete")
+
+    def test_report_summary(self):
+        """Percentiles cover the client and each server stage; errors are grouped by stage"""
+        report = LoadReport()
+        report.sent = 102
+        for number in range(1, 101):
+            report.record(number / 1000, {"analysis": number, "render": 1, "unknown": 5})
+        report.record(0.5, error=("client", "ReadTimeout"))
+        report.record(0.2, {"total": 200}, error=("api", "http_500"))
+        summary = report.summary()
+        assert (summary["sent"], summary["completed"], summary["succeeded"], summary["failed"]) == (102, 102, 100, 2)
+        assert summary["latency_ms"]["analysis"] == {"p50": 50, "p95": 95, "p99": 99}
+        assert set(summary["latency_ms"]) == {"client", "analysis", "render", "total"}
+        assert summary["errors"] == {"api": {"http_500": 1}, "client": {"ReadTimeout": 1}}
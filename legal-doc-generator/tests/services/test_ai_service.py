@@ -0,0 +1,469 @@
+# tests/services/test_ai_service.py
+import json
+import time
+import asyncio
+import pytest
+from app.services.ai_service import AILegalAnalyzer
+from app.services.analysis_cache import AnalysisCache, make_cache_key
+from app.services.near_duplicate import NearDuplicateIndex
+from app.services.statute_index import StatuteIndex, build_statute_index
+from app.services.decision_index import DecisionIndex, ingest_decisions
+from app.services.citation_verifier import CitationCatalog, CitationVerifier
+from app.services.model_router import FAST, PRO, ModelRouter, ModelTier
+from app.utils.resilience import Deadline, DeadlineExceededError, ServiceUnavailableError
+from google.api_core import exceptions as google_exceptions
+
+ANALYSIS = {
+    "summary": "Özet",
+    "relevant_laws": [{"title": "Türk Medeni Kanunu Madde 166", "description": "Boşanma sebepleri"}],
+    "relevant_decisions": [{"case_number": "2019/8754 E, 2020/3421 K", "date": "12.05.2020", "summary": "Karar"}],
+    "recommendations": "Öneriler",
+}
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeModel:
+    """Stands in for genai.GenerativeModel and records concurrency"""
+
+    model_name = "fake-model"
+
+    def __init__(self, payload=None, delay=0.01):
+        self.payload = payload or ANALYSIS
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.calls = 0
+
+    async def generate_content_async(self, prompt, generation_config=None, safety_settings=None):
+        self.calls += 1
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            return FakeResponse("```json\n" + json.dumps(self.payload, ensure_ascii=False) + "\n```")
+        finally:
+            self.active -= 1
+
+
+class FakeChunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class FakeStream:
+    """Stands in for the async streaming response of generate_content_async(stream=True)"""
+
+    def __init__(self, text, size):
+        self.chunks = [FakeChunk(text[i:i + size]) for i in range(0, len(text), size)]
+
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            await asyncio.sleep(0)
+            yield chunk
+
+
+class FakeStreamingModel(FakeModel):
+    async def generate_content_async(self, prompt, generation_config=None, safety_settings=None, stream=False):
+        if not stream:
+            return await super().generate_content_async(prompt, generation_config, safety_settings)
+        self.calls += 1
+        text = "```json\n" + json.dumps(self.payload, ensure_ascii=False) + "\n```"
+        return FakeStream(text, 16)
+
+
+def make_analyzer(model, cache=None, near_duplicates=None, statutes=None, decisions=None, vectors=None, verifier=None,
+                  router=None, **kwargs):
+    analyzer = AILegalAnalyzer(api_key=None, **kwargs)
+    analyzer.api_configured = True
+    analyzer.model = model
+    analyzer.cache = cache
+    analyzer.near_duplicates = near_duplicates
+    analyzer.statutes = statutes
+    analyzer.decisions = decisions
+    analyzer.vectors = vectors
+    analyzer.verifier = verifier
+    analyzer.router = router
+    return analyzer
+
+
+class TestAILegalAnalyzer:
+    @pytest.mark.asyncio
+    async def test_analyze_case_uses_async_api(self):
+        """analyze_case awaits the async Gemini API and parses the JSON block"""
+        model = FakeModel()
+        analyzer = make_analyzer(model)
+
+        result = await analyzer.analyze_case("Kira alacağı davası", "borçlar_hukuku")
+
+        assert model.calls == 1
+        assert result["relevant_laws"][0]["title"] == "Türk Medeni Kanunu Madde 166"
+
+    @pytest.mark.asyncio
+    async def test_concurrency_is_bounded(self):
+        """No more than max_concurrency Gemini calls are outstanding at once"""
+        model = FakeModel(delay=0.02)
+        analyzer = make_analyzer(model, max_concurrency=3)
+
+        await asyncio.gather(*(
+            analyzer.analyze_case(f"Kira alacağı {i}", "borçlar_hukuku") for i in range(12)
+        ))
+
+        assert model.peak == 3
+        metrics = analyzer.get_metrics()
+        assert metrics["calls"] == 12
+        assert metrics["queue_wait_ms"]["max"] > 0
+
+    @pytest.mark.asyncio
+    async def test_queue_wait_does_not_trip_the_breaker(self):
+        """Time spent waiting for a saturated Gemini slot is not counted against the attempt timeout"""
+        model = FakeModel(delay=0.03)
+        analyzer = make_analyzer(model, max_concurrency=1)
+        analyzer.retry_policy.attempt_timeout = 0.1
+
+        results = await asyncio.gather(*(
+            analyzer.analyze_case(f"Kira alacağı {i}", "borçlar_hukuku", force_real_analysis=True) for i in range(8)
+        ))
+
+        assert len(results) == 8 and model.calls == 8
+        metrics = analyzer.get_metrics()
+        assert metrics["queue_wait_ms"]["max"] > 100
+        assert metrics["retries"]["retries"] == 0
+        assert metrics["circuit_breaker"]["state"] == "closed"
+        assert metrics["circuit_breaker"]["recent_failure_rate"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_repeat_cases_are_served_from_cache(self, tmp_path):
+        """Whitespace-different repeats hit the cache; bypass_cache forces a new call"""
+        model = FakeModel()
+        analyzer = make_analyzer(model, cache=AnalysisCache(db_path=str(tmp_path / "cache.db")))
+
+        first = await analyzer.analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku")
+        second = await analyzer.analyze_case("  kira  bedeli ödenmedi. ", "borçlar_hukuku")
+        assert model.calls == 1
+        assert second["metadata"]["cached"] is True
+        assert second["summary"] == first["summary"]
+
+        await analyzer.analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku", bypass_cache=True)
+        assert model.calls == 2
+        assert analyzer.get_metrics()["cache"]["bypasses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_near_duplicate_reuses_analysis(self, tmp_path):
+        """A lightly edited description reuses the earlier analysis without calling Gemini"""
+        model = FakeModel()
+        analyzer = make_analyzer(model, near_duplicates=NearDuplicateIndex(db_path=str(tmp_path / "near.db")))
+        description = ("Kiracım altı aydır kira bedelini ödemiyor, noter kanalıyla ihtarname gönderdim "
+                       "ancak herhangi bir ödeme yapılmadı. Tahliye davası açmak istiyorum.")
+
+        await analyzer.analyze_case(description, "borçlar_hukuku")
+        reused = await analyzer.analyze_case(description.replace("altı aydır", "altı aydır,"), "borçlar_hukuku")
+
+        assert model.calls == 1
+        assert reused["metadata"]["reused"] is True
+        assert reused["metadata"]["similarity"] >= 0.9
+        assert analyzer.get_metrics()["near_duplicates"]["reuses"] == 1
+
+    @pytest.mark.asyncio
+    async def test_identical_concurrent_requests_are_coalesced(self):
+        """Concurrent identical requests cost one Gemini call and get independent copies"""
+        model = FakeModel(delay=0.05)
+        analyzer = make_analyzer(model)
+
+        results = await asyncio.gather(*(
+            analyzer.analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku") for _ in range(5)
+        ))
+
+        assert model.calls == 1
+        assert sum(bool(r.get("metadata", {}).get("coalesced")) for r in results) == 4
+        results[0]["relevant_laws"].clear()
+        assert results[1]["relevant_laws"]
+        assert analyzer.get_metrics()["coalescing"]["coalescing_rate"] == 0.8
+
+    @pytest.mark.asyncio
+    async def test_cross_worker_coalescing(self, tmp_path, monkeypatch):
+        """A second worker sharing the cache database waits for the first worker's result"""
+        monkeypatch.setattr("app.services.ai_service.ANALYSIS_COALESCE_POLL_SECONDS", 0.01)
+        db_path = str(tmp_path / "cache.db")
+        model = FakeModel(delay=0.1)
+        workers = [make_analyzer(model, cache=AnalysisCache(db_path=db_path)) for _ in range(2)]
+        for worker in workers:
+            worker.cross_worker_coalescing = True
+
+        first, second = await asyncio.gather(
+            workers[0].analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku"),
+            workers[1].analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku"),
+        )
+
+        assert model.calls == 1
+        assert first["summary"] == second["summary"]
+        assert sum(w.get_metrics()["coalescing"]["remote_coalesced"] for w in workers) == 1
+
+    @pytest.mark.asyncio
+    async def test_wait_for_a_dead_worker_ends_at_the_deadline(self, tmp_path, monkeypatch):
+        """A lock left by a worker that died is waited on only until the request's deadline"""
+        monkeypatch.setattr("app.services.ai_service.ANALYSIS_COALESCE_POLL_SECONDS", 0.01)
+        cache = AnalysisCache(db_path=str(tmp_path / "cache.db"))
+        model = FakeModel()
+        analyzer = make_analyzer(model, cache=cache)
+        analyzer.cross_worker_coalescing = True
+        key = make_cache_key("Kira bedeli ödenmedi.", "borçlar_hukuku", analyzer.prompt_version, analyzer.model_key)
+        assert cache.acquire_lock(key, "dead-worker", 90)
+
+        started = time.monotonic()
+        with pytest.raises(DeadlineExceededError):
+            await analyzer.analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku", force_real_analysis=True,
+                                        deadline=Deadline(0.1))
+        assert time.monotonic() - started < 1
+        assert model.calls == 0
+
+    @pytest.mark.asyncio
+    async def test_outage_raises_instead_of_returning_mock_data(self):
+        """Transient Gemini errors are retried, then surface as ServiceUnavailableError"""
+        class FailingModel(FakeModel):
+            async def generate_content_async(self, prompt, generation_config=None, safety_settings=None):
+                self.calls += 1
+                raise google_exceptions.ServiceUnavailable("overloaded")
+
+        model = FailingModel()
+        analyzer = make_analyzer(model)
+        analyzer.retry_policy.base_delay = 0.001
+
+        with pytest.raises(ServiceUnavailableError):
+            await analyzer.analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku", force_real_analysis=True)
+        assert model.calls == analyzer.retry_policy.max_attempts
+        assert analyzer.get_metrics()["circuit_breaker"]["recent_failure_rate"] == 1.0
+
+    @pytest.mark.asyncio
+    async def test_stream_analysis_emits_items_then_complete(self, tmp_path):
+        """Each law and decision is yielded as it completes, followed by the full analysis"""
+        model = FakeStreamingModel()
+        analyzer = make_analyzer(model, cache=AnalysisCache(db_path=str(tmp_path / "cache.db")))
+
+        events = [event async for event in analyzer.stream_analysis("Kira bedeli ödenmedi.", "borçlar_hukuku")]
+
+        assert [name for name, _ in events] == ["summary", "law", "decision", "recommendations", "complete"]
+        assert events[1][1] == ANALYSIS["relevant_laws"][0]
+        assert events[-1][1]["metadata"]["source"] == "model"
+
+        replayed = [event async for event in analyzer.stream_analysis("Kira bedeli ödenmedi.", "borçlar_hukuku")]
+        assert model.calls == 1
+        assert replayed[-1][1]["metadata"]["cached"] is True
+
+    @pytest.mark.asyncio
+    async def test_streams_share_in_flight_and_near_duplicate_analyses(self, tmp_path):
+        """Identical streams coalesce onto one Gemini call, and a near-duplicate stream replays the analysis"""
+        model = FakeStreamingModel()
+        analyzer = make_analyzer(model, near_duplicates=NearDuplicateIndex(db_path=str(tmp_path / "near.db")))
+        description = ("Kiracım altı aydır kira bedelini ödemiyor, noter kanalıyla ihtarname gönderdim "
+                       "ancak herhangi bir ödeme yapılmadı. Tahliye davası açmak istiyorum.")
+
+        async def stream(text):
+            return [event async for event in analyzer.stream_analysis(text, "borçlar_hukuku")]
+
+        first, second, third = await asyncio.gather(
+            stream(description), stream(description),
+            analyzer.analyze_case(description, "borçlar_hukuku", force_real_analysis=True))
+        assert model.calls == 1
+        assert [name for name, _ in first] == [name for name, _ in second]
+        assert second[-1][1]["metadata"]["coalesced"] is True
+        assert third["metadata"]["coalesced"] is True
+
+        reused = await stream(description.replace("altı aydır", "altı aydır,"))
+        assert model.calls == 1
+        assert [name for name, _ in reused] == ["summary", "law", "decision", "recommendations", "complete"]
+        assert reused[-1][1]["metadata"]["reused"] is True
+
+    @pytest.mark.asyncio
+    async def test_slow_stream_reader_does_not_hold_the_gemini_slot(self):
+        """The slot is released once the model has finished, while the caller is still reading"""
+        model = FakeStreamingModel()
+        analyzer = make_analyzer(model, max_concurrency=1)
+
+        events = analyzer.stream_analysis("Kira bedeli ödenmedi.", "borçlar_hukuku")
+        assert (await events.__anext__())[0] == "summary"
+        await asyncio.sleep(0.05)
+        assert analyzer.get_metrics()["in_flight"] == 0
+
+        other = await analyzer.analyze_case("Aidat ödenmedi.", "borçlar_hukuku")
+        assert other["relevant_laws"]
+        assert [name async for name, _ in events][-1] == "complete"
+
+    @pytest.mark.asyncio
+    async def test_truncated_response_is_repaired_without_another_call(self):
+        """A response cut off mid-object is repaired and normalized instead of failing"""
+        class TruncatingModel(FakeModel):
+            async def generate_content_async(self, prompt, generation_config=None, safety_settings=None):
+                self.calls += 1
+                text = json.dumps(self.payload, ensure_ascii=False)
+                return FakeResponse(text[:text.index('"recommendations"') + 25])
+
+        model = TruncatingModel()
+        analyzer = make_analyzer(model)
+
+        result = await analyzer.analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku", force_real_analysis=True)
+
+        assert model.calls == 1
+        assert result["relevant_decisions"][0]["case_number"] == "2019/8754 E, 2020/3421 K"
+        assert result["recommendations"] == "Öneri"
+        assert result["metadata"]["repaired"] is True
+
+    @pytest.mark.asyncio
+    async def test_missing_section_is_requested_alone(self, tmp_path):
+        """Only the empty section is requested again, with the summary as context, and merged"""
+        prompts = []
+
+        class SectionModel(FakeModel):
+            async def generate_content_async(self, prompt, generation_config=None, safety_settings=None):
+                self.calls += 1
+                prompts.append((prompt, generation_config["response_schema"].__name__))
+                if self.calls == 1:
+                    payload = dict(ANALYSIS, relevant_decisions=[])
+                else:
+                    payload = {"relevant_decisions": ANALYSIS["relevant_decisions"]}
+                return FakeResponse(json.dumps(payload, ensure_ascii=False))
+
+        cache = AnalysisCache(db_path=str(tmp_path / "cache.db"))
+        analyzer = make_analyzer(SectionModel(), cache=cache)
+
+        partial = await analyzer.analyze_case("Kira bedeli ödenmedi.", "borçlar_hukuku")
+        assert partial["relevant_decisions"] == []
+
+        completed = await analyzer.complete_missing_sections("Kira bedeli ödenmedi.", "borçlar_hukuku", partial)
+
+        section_prompt, schema = prompts[1]
+        assert schema == "GeminiDecisionsSection"
+        assert ANALYSIS["summary"] in section_prompt
+        assert "relevant_laws" not in section_prompt
+        assert completed["summary"] == ANALYSIS["summary"]
+        assert completed["relevant_laws"] == partial["relevant_laws"]
+        assert completed["relevant_decisions"][0]["case_number"] == "2019/8754 E, 2020/3421 K"
+        assert completed["metadata"]["completed_sections"] == ["relevant_decisions"]
+        assert cache.get_metrics()["memory_entries"] == 1
+
+    @pytest.mark.asyncio
+    async def test_statute_candidates_ground_relevant_laws(self, tmp_path):
+        """Candidate articles go into the prompt, and fill relevant_laws when the model returns none"""
+        source = tmp_path / "statutes.jsonl"
+        source.write_text(json.dumps({
+            "law": "Türk Borçlar Kanunu", "law_number": "6098", "article": "315", "heading": "Kiracının temerrüdü",
+            "text": "Kiracı muaccel olan kira bedelini ödemezse kiraya veren sözleşmeyi feshedebilir."
+        }, ensure_ascii=False), encoding="utf-8")
+        build_statute_index(str(source), str(tmp_path / "statutes"))
+        statutes = StatuteIndex(str(tmp_path / "statutes"))
+
+        prompts = []
+
+        class NoLawsModel(FakeModel):
+            async def generate_content_async(self, prompt, generation_config=None, safety_settings=None):
+                self.calls += 1
+                prompts.append(prompt)
+                return FakeResponse(json.dumps(dict(ANALYSIS, relevant_laws=[]), ensure_ascii=False))
+
+        model = NoLawsModel()
+        analyzer = make_analyzer(model, statutes=statutes)
+        result = await analyzer.analyze_case("Kiracım aylardır kira bedelini ödemiyor.", "borçlar_hukuku")
+
+        assert "Aday kanun maddeleri" in prompts[0]
+        assert "Türk Borçlar Kanunu Madde 315 (Kiracının temerrüdü)" in prompts[0]
+        assert result["relevant_laws"][0]["title"] == "Türk Borçlar Kanunu Madde 315"
+        assert result["metadata"]["laws_from_index"] is True
+        assert model.calls == 1
+        statutes.close()
+
+    @pytest.mark.asyncio
+    async def test_decision_candidates_ground_relevant_decisions(self, tmp_path):
+        """Candidate decisions go into the prompt, and fill relevant_decisions when the model returns none"""
+        source = tmp_path / "decisions.jsonl"
+        source.write_text(json.dumps({
+            "daire": "3. HD", "esas": "2021/112", "karar": "2021/5400", "date": "02.11.2021",
+            "summary": "Kira bedelinin ödenmemesi nedeniyle tahliye.",
+            "text": "Kiracı muaccel kira bedelini ödemediğinden tahliyeye karar verildi."
+        }, ensure_ascii=False), encoding="utf-8")
+        ingest_decisions(str(source), str(tmp_path / "decisions"))
+        decisions = DecisionIndex(str(tmp_path / "decisions"))
+
+        prompts = []
+
+        class NoDecisionsModel(FakeModel):
+            async def generate_content_async(self, prompt, generation_config=None, safety_settings=None):
+                self.calls += 1
+                prompts.append(prompt)
+                return FakeResponse(json.dumps(dict(ANALYSIS, relevant_decisions=[]), ensure_ascii=False))
+
+        model = NoDecisionsModel()
+        analyzer = make_analyzer(model, decisions=decisions)
+        result = await analyzer.analyze_case("Kiracım aylardır kira bedelini ödemiyor.", "borçlar_hukuku")
+
+        assert "Aday Yargıtay kararları" in prompts[0]
+        assert "2021/112 E, 2021/5400 K (02.11.2021)" in prompts[0]
+        assert result["relevant_decisions"][0]["case_number"] == "2021/112 E, 2021/5400 K"
+        assert result["metadata"]["decisions_from_index"] is True
+        assert model.calls == 1
+        decisions.close()
+
+    def test_retrieved_sources_fit_token_budget(self):
+        """Candidates are kept by alternating rank until the prompt budget is used up"""
+        law = {"title": "Türk Borçlar Kanunu Madde 315", "heading": "Kiracının temerrüdü", "description": "x " * 100}
+        decision = {"case_number": "2021/112 E, 2021/5400 K", "date": "02.11.2021", "summary": "y " * 100}
+        sources = {"relevant_laws": [law] * 4, "relevant_decisions": [decision] * 4}
+
+        kept = AILegalAnalyzer._fit_token_budget(sources, 330)
+        assert len(kept["relevant_laws"]) == 2
+        assert len(kept["relevant_decisions"]) == 2
+
+        assert AILegalAnalyzer._fit_token_budget(sources, 10) == {"relevant_laws": [], "relevant_decisions": []}
+
+    @pytest.mark.asyncio
+    async def test_citations_are_marked_verified_or_unverified(self, tmp_path):
+        """Every returned law and decision carries the verifier's verdict, counted in the metadata"""
+        source = tmp_path / "decisions.jsonl"
+        source.write_text(json.dumps({"daire": "2. HD", "esas": "2019/8754", "karar": "2020/3421",
+                                      "date": "12.05.2020", "text": "Boşanma"}, ensure_ascii=False), encoding="utf-8")
+        ingest_decisions(str(source), str(tmp_path / "decisions"))
+        decisions = DecisionIndex(str(tmp_path / "decisions"))
+        catalog = CitationCatalog([{"name": "Türk Medeni Kanunu", "number": "4721", "aliases": ["TMK"],
+                                    "articles": [[1, 1030]]}])
+        payload = dict(ANALYSIS, relevant_laws=ANALYSIS["relevant_laws"] + [
+            {"title": "Türk Medeni Kanunu Madde 1200", "description": "Yok"}])
+        analyzer = make_analyzer(FakeModel(payload), verifier=CitationVerifier(catalog, decisions=decisions))
+
+        result = await analyzer.analyze_case("Eşimle boşanmak istiyorum.", "aile_hukuku")
+
+        assert [law["verified"] for law in result["relevant_laws"]] == [True, False]
+        assert result["relevant_laws"][1]["verification"] == "article_out_of_range"
+        assert result["relevant_decisions"][0]["verification"] == "decision_index"
+        assert result["metadata"]["citations"] == {"verified": 2, "unverified": 1}
+        assert analyzer.get_metrics()["citations"]["checked"] == 3
+        decisions.close()
+
+    @pytest.mark.asyncio
+    async def test_truncated_fast_tier_answer_is_escalated(self):
+        """A simple case goes to the fast tier; its truncated JSON is asked again of the pro tier"""
+        class TruncatingModel(FakeModel):
+            model_name = "fast-model"
+
+            async def generate_content_async(self, prompt, generation_config=None, safety_settings=None):
+                self.calls += 1
+                self.max_output_tokens = generation_config["max_output_tokens"]
+                return FakeResponse(json.dumps(ANALYSIS, ensure_ascii=False)[:120])
+
+        fast, pro = TruncatingModel(), FakeModel()
+        router = ModelRouter(ModelTier(FAST, fast, 1024, 0.1, 0.4), ModelTier(PRO, pro, 2048, 1.0, 5.0),
+                             escalate_on=["repaired"])
+        analyzer = make_analyzer(pro, router=router)
+
+        result = await analyzer.analyze_case("Eşimle boşanmak istiyorum.", "aile_hukuku")
+
+        assert (fast.calls, pro.calls, fast.max_output_tokens) == (1, 1, 1024)
+        assert result["relevant_decisions"] == ANALYSIS["relevant_decisions"]
+        assert result["metadata"]["model"] == "fake-model"
+        assert (result["metadata"]["tier"], result["metadata"]["escalated_from"]) == (PRO, FAST)
+        metrics = analyzer.get_metrics()["router"]
+        assert metrics["routed"] == {FAST: 1, PRO: 0}
+        assert metrics["escalations"]["repaired"] == 1
+        assert metrics["tiers"][FAST]["calls"] == metrics["tiers"][PRO]["calls"] == 1
+        assert metrics["tiers"][PRO]["cost_usd"] > metrics["tiers"][FAST]["cost_usd"] > 0
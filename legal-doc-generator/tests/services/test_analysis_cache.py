@@ -0,0 +1,63 @@
+# tests/services/test_analysis_cache.py
+import time
+import pytest
+from app.services.analysis_cache import AnalysisCache, make_cache_key
+
+ANALYSIS = {
+    "summary": "Özet",
+    "relevant_laws": [{"title": "TBK Madde 112", "description": "Borca aykırılık"}],
+    "relevant_decisions": [{"case_number": "2019/1234 E, 2019/5678 K", "date": "18.06.2019", "summary": "Karar"}],
+    "recommendations": "Öneriler",
+    "metadata": {"source": "model"},
+}
+
+
+class TestAnalysisCache:
+    @pytest.fixture
+    def cache(self, tmp_path):
+        cache = AnalysisCache(db_path=str(tmp_path / "cache.db"), memory_size=2, memory_ttl=60, disk_ttl=60)
+        yield cache
+        cache.close()
+
+    def test_key_ignores_case_and_whitespace(self):
+        """Whitespace and Turkish case differences map to the same key"""
+        first = make_cache_key("Kira  bedeli ÖDENMEDİ\n", "borçlar_hukuku", "1", "gemini")
+        second = make_cache_key("kira bedeli ödenmedi", "borçlar_hukuku", "1", "gemini")
+        assert first == second
+        assert first != make_cache_key("kira bedeli ödenmedi", "iş_hukuku", "1", "gemini")
+        assert first != make_cache_key("kira bedeli ödenmedi", "borçlar_hukuku", "2", "gemini")
+
+    def test_memory_then_disk_hits(self, cache):
+        """Values are served from memory, then from SQLite once evicted from the LRU"""
+        assert cache.get("a") is None
+        cache.set("a", ANALYSIS)
+        assert cache.get("a")["summary"] == "Özet"
+
+        cache.set("b", ANALYSIS)
+        cache.set("c", ANALYSIS)
+        assert cache.get("a")["summary"] == "Özet"
+
+        metrics = cache.get_metrics()
+        assert metrics["memory_hits"] == 1
+        assert metrics["disk_hits"] == 1
+        assert metrics["misses"] == 1
+        assert metrics["evictions"] >= 1
+
+    def test_shared_between_instances(self, cache):
+        """A second worker sees entries written by the first through SQLite"""
+        cache.set("shared", ANALYSIS)
+        other = AnalysisCache(db_path=cache.db_path)
+        try:
+            assert other.get("shared")["relevant_laws"][0]["title"] == "TBK Madde 112"
+        finally:
+            other.close()
+
+    def test_expired_entries_miss(self, tmp_path):
+        """Entries past their TTL are not returned"""
+        cache = AnalysisCache(db_path=str(tmp_path / "ttl.db"), memory_ttl=0.01, disk_ttl=0.01)
+        try:
+            cache.set("a", ANALYSIS)
+            time.sleep(0.02)
+            assert cache.get("a") is None
+        finally:
+            cache.close()
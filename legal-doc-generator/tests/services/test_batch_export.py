@@ -0,0 +1,76 @@
+# tests/services/test_batch_export.py
+import io
+import json
+import asyncio
+import zipfile
+import pytest
+from app.services.batch_export import iter_rendered, member_name, parse_records, stream_batch_zip
+
+
+async def _collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+class TestBatchExport:
+    @pytest.mark.asyncio
+    async def test_archive_holds_documents_and_manifest_of_failures(self):
+        """Each good record becomes a member; failures only appear in the manifest"""
+        async def render(record):
+            if record.get("fail"):
+                raise ValueError("Geçersiz veri")
+            return f"docx for {record['ad_soyad']}".encode("utf-8")
+
+        records = [{"ad_soyad": "Ayşe Yılmaz"}, {"ad_soyad": "x", "fail": True}, "not a record", {"ad_soyad": "Ali/Kaya"}]
+        data = await _collect(stream_batch_zip("ihtarname", records, render, filename_field="ad_soyad", concurrency=2))
+
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            assert archive.testzip() is None
+            assert sorted(archive.namelist()) == ["0001_Ayşe_Yılmaz.docx", "0004_Ali_Kaya.docx", "manifest.json"]
+            assert archive.namelist()[-1] == "manifest.json"
+            assert archive.read("0001_Ayşe_Yılmaz.docx") == "docx for Ayşe Yılmaz".encode("utf-8")
+            manifest = json.loads(archive.read("manifest.json"))
+
+        assert (manifest["total"], manifest["succeeded"], manifest["failed"]) == (4, 2, 2)
+        assert [outcome["status"] for outcome in manifest["records"]] == ["ok", "error", "error", "ok"]
+        assert manifest["records"][1]["error"] == "Geçersiz veri"
+        assert "str" in manifest["records"][2]["error"]
+        assert manifest["records"][3]["file"] == "0004_Ali_Kaya.docx"
+
+    @pytest.mark.asyncio
+    async def test_rendering_is_bounded_and_follows_completion_order(self):
+        """At most `concurrency` records render at once, and finished ones are yielded first"""
+        active = 0
+        peak = 0
+
+        async def render(record):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(record["delay"])
+            active -= 1
+            return b"x"
+
+        records = [{"delay": 0.05}, {"delay": 0.01}, {"delay": 0.01}, {"delay": 0.01}, {"delay": 0.01}]
+        order = [index async for index, _, _ in iter_rendered(records, render, concurrency=2)]
+
+        assert peak == 2
+        assert order[0] == 1
+        assert sorted(order) == [0, 1, 2, 3, 4]
+
+    def test_uploads_are_parsed_by_format(self):
+        """CSV (any of the usual delimiters, Excel's encodings) and JSONL uploads become records"""
+        csv_data = "﻿ad_soyad;konu\nAyşe Yılmaz;Kira\nMehmet Demir;Aidat\n".encode("utf-8")
+        assert parse_records(csv_data, "musteriler.csv") == [
+            {"ad_soyad": "Ayşe Yılmaz", "konu": "Kira"},
+            {"ad_soyad": "Mehmet Demir", "konu": "Aidat"},
+        ]
+        assert parse_records("ad_soyad,konu\nŞule,Kira\n".encode("cp1254"), "m.csv") == [{"ad_soyad": "Şule", "konu": "Kira"}]
+
+        jsonl_data = b'{"ad_soyad": "A", "yetkiler": ["Dava"]}\n\n[1]\n'
+        assert parse_records(jsonl_data, content_type="application/x-ndjson") == [{"ad_soyad": "A", "yetkiler": ["Dava"]}, [1]]
+
+        with pytest.raises(ValueError, match="Line 2"):
+            parse_records(b'{"a": 1}\n{"a": \n', "batch.jsonl")
+        with pytest.raises(ValueError):
+            parse_records(b"a,b", "batch.xlsx")
+        assert member_name(11, "vekaletname", {"ad": ""}, filename_field="ad") == "0012_vekaletname.docx"
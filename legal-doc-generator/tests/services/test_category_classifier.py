@@ -0,0 +1,32 @@
+# tests/services/test_category_classifier.py
+from app.services.ai_service import AILegalAnalyzer, CATEGORY_TRANSLATIONS
+from app.services.category_classifier import CATEGORY_KEYWORDS, best_category, category_scores
+
+
+class TestCategoryClassifier:
+    def test_every_category_is_scored(self):
+        """All prompt categories have keywords and appear in the scores"""
+        assert set(CATEGORY_KEYWORDS) == set(CATEGORY_TRANSLATIONS)
+        assert set(category_scores("")) == set(CATEGORY_TRANSLATIONS)
+        assert best_category("Hava bugün güzel") is None
+
+    def test_descriptions_are_classified(self):
+        """Typical descriptions, in any case and without Turkish letters, land in their category"""
+        assert best_category("İşverenim beni işten çıkardı, kıdem tazminatımı ödemedi") == "iş_hukuku"
+        assert best_category("Kiracım kira bedelini ödemiyor, tahliye istiyorum") == "borçlar_hukuku"
+        assert best_category("ESIMLE BOSANMAK VE COCUGUMUN VELAYETINI ISTIYORUM") == "aile_hukuku"
+        assert best_category("Belediye imar ruhsatımı iptal etti") == "idare_hukuku"
+
+    def test_softened_stems_match(self):
+        """Inflections whose final k or t softens to ğ or d still count for their stem's category"""
+        assert category_scores("Çocuğumun ve çocuğun velayeti")["aile_hukuku"] == 3
+        assert category_scores("Alacağımı ödemedi, senedi protesto ettim")["borçlar_hukuku"] == 2
+        assert category_scores("Evde hırsızlığa uğradım")["ceza_hukuku"] == 1
+        assert best_category("Ortaklığımdan çıkarıldım") == "ticaret_hukuku"
+
+    def test_category_correction(self):
+        """Family-law keywords move a case into aile_hukuku only when they outnumber the chosen category's"""
+        correct = AILegalAnalyzer._correct_category
+        assert correct("Eşimle boşanmak istiyorum, velayet bende kalsın", "borçlar_hukuku") == "aile_hukuku"
+        assert correct("İşverenim çocuğum hastayken izin vermedi", "iş_hukuku") == "iş_hukuku"
+        assert correct("Beş yıldır eşya kiralıyorum", "borçlar_hukuku") == "borçlar_hukuku"
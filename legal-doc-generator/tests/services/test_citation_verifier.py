@@ -0,0 +1,73 @@
+# tests/services/test_citation_verifier.py
+import json
+import pytest
+from app.services.citation_verifier import CitationCatalog, CitationVerifier
+from app.services.decision_index import DecisionIndex, ingest_decisions, parse_case_number
+
+LAWS = [
+    {"name": "Türk Medeni Kanunu", "number": "4721", "aliases": ["TMK", "Medeni Kanun"], "articles": [[1, 1030]]},
+    {"name": "Türk Borçlar Kanunu", "number": "6098", "aliases": ["TBK"], "articles": [[1, 649]]},
+    {"name": "İş Kanunu", "number": "4857", "aliases": [], "articles": [[1, 121]]},
+    {"name": "1475 sayılı İş Kanunu", "number": "1475", "aliases": [], "articles": [[14, 14]]},
+]
+CORPUS = [("Türk Medeni Kanunu", "4721", "166")]
+
+
+def verdict(verifier, title):
+    law = verifier.verify_law({"title": title, "description": ""})
+    return law["verified"], law["verification"]
+
+
+class TestCitationVerifier:
+    @pytest.fixture
+    def verifier(self):
+        return CitationVerifier(CitationCatalog(LAWS, CORPUS))
+
+    def test_law_titles_are_normalized(self, verifier):
+        """Names, abbreviations, law numbers and article spellings resolve to the same article"""
+        assert verdict(verifier, "Türk Medeni Kanunu Madde 166") == (True, "statute_corpus")
+        assert verdict(verifier, "TMK m. 166/1") == (True, "statute_corpus")
+        assert verdict(verifier, "4721 sayılı Türk Medeni Kanunu'nun 185. maddesi") == (True, "article_range")
+        assert verdict(verifier, "1475 sayılı İş Kanunu Madde 14") == (True, "article_range")
+
+    def test_unverifiable_laws(self, verifier):
+        """Unknown laws, contradicting numbers and articles outside the law are unverified"""
+        assert verdict(verifier, "Uzay Kanunu Madde 3") == (False, "unknown_law")
+        assert verdict(verifier, "Türk Medeni Kanunu (6098) Madde 5") == (False, "law_mismatch")
+        assert verdict(verifier, "Türk Borçlar Kanunu Madde 700") == (False, "article_out_of_range")
+        assert verdict(verifier, "Türk Medeni Kanunu - Aile Hukuku") == (False, "no_article")
+
+    def test_decision_numbers_are_checked_for_plausibility(self, verifier):
+        """Malformed and impossible E/K numbers are rejected before any lookup"""
+        check = lambda **decision: verifier.verify_decision(decision)["verification"]
+        assert check(case_number="Belirsiz") == "no_case_number"
+        assert check(case_number="2021/8754 E, 2020/3421 K") == "implausible_case_number"
+        assert check(case_number="2019/8754 E, 2020/3421 K", date="12.05.2019") == "implausible_case_number"
+        # Plausible, but without an ingested corpus it cannot be confirmed
+        assert check(case_number="E. 2019/8754, K. 2020/3421") == "no_decision_corpus"
+        assert parse_case_number("E. 2019/8754, K. 2020/3421") == ("2019/8754", "2020/3421")
+
+    def test_decisions_are_looked_up_in_the_index(self, tmp_path):
+        """Cited decisions must exist in the index, in the cited chamber and on the cited date"""
+        source = tmp_path / "decisions.jsonl"
+        source.write_text(json.dumps({"daire": "2. HD", "esas": "2019/8754", "karar": "2020/3421",
+                                      "date": "12.05.2020", "text": "Boşanma"}, ensure_ascii=False) + "\n" +
+                          json.dumps({"daire": "9. HD", "esas": "2020/1", "karar": "2020/2", "text": "Kıdem"}),
+                          encoding="utf-8")
+        ingest_decisions(str(source), str(tmp_path / "index"))
+        decisions = DecisionIndex(str(tmp_path / "index"))
+        verifier = CitationVerifier(CitationCatalog(LAWS), decisions=decisions)
+        check = lambda **decision: verifier.verify_decision(decision)["verification"]
+
+        assert check(case_number="2019/8754 E, 2020/3421 K", date="12.05.2020",
+                     summary="Yargıtay 2. Hukuk Dairesi: Boşanma") == "decision_index"
+        assert check(case_number="2019/8754 E, 2020/3422 K") == "not_in_decision_index"
+        assert check(case_number="2019/8754 E, 2020/3421 K", summary="Yargıtay 9. HD") == "chamber_mismatch"
+        assert check(case_number="2019/8754 E, 2020/3421 K", date="13.05.2020") == "date_mismatch"
+
+        analysis = {"relevant_laws": [{"title": "TMK Madde 166"}, {"title": "TBK Madde 900"}],
+                    "relevant_decisions": [{"case_number": "2020/1 E., 2020/2 K.", "date": "01.01.2020"}]}
+        assert verifier.verify_analysis(analysis) == {"verified": 2, "unverified": 1}
+        assert analysis["metadata"]["citations"] == {"verified": 2, "unverified": 1}
+        assert verifier.get_metrics()["check_time_ms"]["count"] == 1
+        decisions.close()
@@ -0,0 +1,82 @@
+# tests/services/test_decision_index.py
+import json
+import pytest
+from app.services.decision_index import DecisionIndex, ingest_decisions, normalize_daire, parse_case_number
+
+DECISIONS = [
+    {"daire": "2. HD", "esas": "2019/8754", "karar": "2020/3421", "date": "12.05.2020",
+     "summary": "Evlilik birliğinin temelinden sarsılması nedeniyle boşanma ve yoksulluk nafakası.",
+     "text": "Evlilik birliğinin temelinden sarsılması nedeniyle boşanma davası kabul edildi, nafaka takdir edildi."},
+    {"daire": "Yargıtay 3. Hukuk Dairesi", "case_number": "2021/112 E., 2021/5400 K.", "date": "2021-11-02",
+     "summary": "Kira bedelinin ödenmemesi nedeniyle tahliye.",
+     "text": "Kiracı muaccel kira bedelini süresinde ödemediğinden temerrüt nedeniyle tahliyeye karar verildi."},
+    {"daire": "9. Hukuk Dairesi", "esas": "2020/3421", "karar": "2020/9000", "date": "03.02.2020",
+     "summary": "Kıdem tazminatı ve haklı fesih.",
+     "text": "İşçinin iş sözleşmesini haklı nedenle feshettiği, kıdem tazminatına hak kazandığı anlaşıldı."},
+    {"daire": "2. Hukuk Dairesi", "esas": "2022/100", "karar": "2022/2000", "date": "15.06.2022",
+     "summary": "Velayet ve iştirak nafakası.",
+     "text": "Boşanma sonrası velayetin anneye verilmesi ve iştirak nafakası hakkında karar."},
+]
+
+
+class TestDecisionIndex:
+    @pytest.fixture
+    def index(self, tmp_path):
+        source = tmp_path / "decisions.jsonl"
+        source.write_text("\n".join(json.dumps(d, ensure_ascii=False) for d in DECISIONS) + "\n{bozuk\n",
+                          encoding="utf-8")
+        manifest = ingest_decisions(str(source), str(tmp_path / "index"))
+        assert manifest["decisions"] == 4
+        assert manifest["skipped"] == 1
+        index = DecisionIndex(str(tmp_path / "index"))
+        yield index
+        index.close()
+
+    def test_case_number_and_chamber_parsing(self):
+        """Citations and chamber abbreviations normalize to one form"""
+        assert parse_case_number("2019/08754 E., 2020/3421 K.") == ("2019/8754", "2020/3421")
+        assert parse_case_number("2020/3421 K.") == (None, "2020/3421")
+        assert normalize_daire("2. HD") == "2. Hukuk Dairesi"
+        assert normalize_daire("Yargıtay 12. Ceza Dairesi") == "12. Ceza Dairesi"
+        assert normalize_daire("HGK") == "Hukuk Genel Kurulu"
+
+    def test_exact_lookup(self, index):
+        """Esas and karar numbers are looked up exactly, optionally within a chamber"""
+        assert [d["daire"] for d in index.lookup(esas="2019/8754")] == ["2. Hukuk Dairesi"]
+        assert index.lookup(karar="2021/5400")[0]["esas"] == "2021/112"
+        # The same number can be an esas in one chamber and a karar in another
+        assert len(index.lookup(karar="2020/3421")) == 1
+        assert index.lookup(esas="2019/8754", karar="2020/3421", daire="2. HD")[0]["date"] == "12.05.2020"
+        assert index.lookup(esas="2019/8754", daire="9. HD") == []
+        assert index.lookup(esas="2019") == []
+
+    def test_full_text_search_with_filters(self, index):
+        """Full-text hits are ranked, and chamber and date filters narrow them"""
+        results = index.search("boşanma nafakası talebi")
+        assert {d["esas"] for d in results[:2]} == {"2019/8754", "2022/100"}
+        assert results[0]["score"] >= results[1]["score"] > 0
+
+        assert [d["esas"] for d in index.search("nafaka", date_from="01.01.2021")] == ["2022/100"]
+        assert [d["esas"] for d in index.search("haklı fesih", daire="9. HD")] == ["2020/3421"]
+        assert index.search("nafaka", daire="3. HD") == []
+
+    def test_filters_without_query_return_recent_decisions(self, index):
+        """Without query terms the newest decisions in range come first"""
+        results = index.search("", limit=2, date_to="31.12.2021")
+        assert [d["date"] for d in results] == ["02.11.2021", "12.05.2020"]
+
+        relevant = DecisionIndex.as_relevant_decision(results[0])
+        assert relevant["case_number"] == "2021/112 E, 2021/5400 K"
+        assert relevant["summary"].startswith("Yargıtay 3. Hukuk Dairesi: ")
+
+    def test_reingest_leaves_open_index_readable(self, index, tmp_path):
+        """Re-ingesting replaces the files instead of rewriting the mapped ones"""
+        source = tmp_path / "update.jsonl"
+        source.write_text(json.dumps(DECISIONS[2], ensure_ascii=False), encoding="utf-8")
+        ingest_decisions(str(source), str(tmp_path / "index"))
+
+        assert index.lookup(esas="2019/8754")[0]["date"] == "12.05.2020"
+        reingested = DecisionIndex(str(tmp_path / "index"))
+        assert reingested.size == 1
+        assert reingested.lookup(esas="2019/8754") == []
+        reingested.close()
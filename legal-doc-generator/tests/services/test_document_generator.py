@@ -0,0 +1,69 @@
+# tests/services/test_document_generator.py
+import io
+import os
+import asyncio
+import pytest
+from docx import Document
+from app.services import document_generator as generator_module
+from app.services.document_generator import DocumentGenerator
+from app.services.document_index import DocumentIndex
+from app.services.docx_html import docx_to_html
+from app.services.render_engine import RenderEngine
+
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    index = DocumentIndex(db_path=str(tmp_path / "index.db"))
+    engine = RenderEngine(pool_size=2, use_processes=False)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(generator_module, "get_document_index", lambda: index)
+    monkeypatch.setattr(generator_module, "get_render_engine", lambda: engine)
+    yield DocumentGenerator(lazy_docx=True)
+    engine.shutdown()
+    index.close()
+
+
+class TestLazyDocuments:
+    @pytest.mark.asyncio
+    async def test_preview_writes_no_file_until_downloaded(self, generator):
+        """A lazy document is a recipe until materialized, and builds into the document it previewed as"""
+        result = await generator.generate_document("vekaletname", {"vekil": "Av. Ali Kaya", "yetkiler": ["Dava"]})
+
+        assert result["materialized"] is False
+        assert not os.path.exists(result["document_path"])
+        assert os.listdir(generator.output_dir) == []
+
+        entry = generator.document_index.lookup(result["document_id"])
+        assert entry["recipe"]["template_data"]["vekil"] == "Av. Ali Kaya"
+        assert entry["content_hash"] == result["content_hash"]
+        assert await generator.render_recipe_html(entry) == result["html"]
+
+        path = await generator.materialize_document(entry)
+        assert path == os.path.abspath(result["document_path"])
+        assert docx_to_html(path) == result["html"]
+        assert generator.get_metrics()["materialized"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_downloads_share_one_build(self, generator):
+        """Simultaneous first downloads build the file once, and later downloads reuse it"""
+        result = await generator.generate_document("kira_sozlesmesi", {"kiraci": "Ayşe Yılmaz"})
+        entry = generator.document_index.lookup(result["document_id"])
+
+        paths = await asyncio.gather(*(generator.materialize_document(entry) for _ in range(5)))
+        assert set(paths) == {os.path.abspath(result["document_path"])}
+        await generator.materialize_document(entry)
+
+        metrics = generator.get_metrics()
+        assert metrics["materialized"] == 1
+        assert metrics["materialize_coalesced"] == 4
+        assert [name for name in os.listdir(generator.output_dir) if name.endswith(".tmp")] == []
+
+
+class TestBatchRendering:
+    @pytest.mark.asyncio
+    async def test_document_bytes_are_rendered_without_saving(self, generator):
+        """Batch documents come back as .docx bytes and never touch the output directory or the index"""
+        content = await generator.render_document_bytes("ihtarname", {"gonderen": "Ayşe Yılmaz"})
+
+        assert "Ayşe Yılmaz" in "\n".join(p.text for p in Document(io.BytesIO(content)).paragraphs)
+        assert os.listdir(generator.output_dir) == []
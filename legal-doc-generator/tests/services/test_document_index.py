@@ -0,0 +1,107 @@
+# tests/services/test_document_index.py
+import os
+import hashlib
+import sqlite3
+import pytest
+from app.services.document_index import DocumentIndex
+
+
+class TestDocumentIndex:
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = DocumentIndex(db_path=str(tmp_path / "index.db"))
+        yield index
+        index.close()
+
+    def test_register_and_lookup(self, index, tmp_path):
+        """Registered documents are found by id"""
+        file_path = tmp_path / "dilekce_abc.docx"
+        file_path.write_bytes(b"docx")
+
+        index.register("abc", str(file_path), "dilekce")
+        entry = index.lookup("abc")
+
+        assert entry is not None
+        assert entry["path"] == os.path.abspath(file_path)
+        assert entry["template_name"] == "dilekce"
+        assert index.lookup("missing") is None
+
+    def test_lookup_survives_restart(self, index, tmp_path):
+        """Entries are persisted to SQLite and visible to a fresh instance"""
+        index.register("abc", str(tmp_path / "a.docx"), "dilekce")
+
+        other = DocumentIndex(db_path=index.db_path)
+        try:
+            assert other.lookup("abc")["template_name"] == "dilekce"
+        finally:
+            other.close()
+
+    def test_rebuild_parses_generated_filenames(self, index, tmp_path):
+        """Rebuild backfills uuid-named and legacy timestamp-named outputs"""
+        output_dir = tmp_path / "output"
+        storage_dir = tmp_path / "storage"
+        output_dir.mkdir()
+        storage_dir.mkdir()
+        doc_id = "1c994509-afd4-4f98-9053-61c8c77d19be"
+        (output_dir / f"dava_dilekce_{doc_id}.docx").write_bytes(b"x")
+        (output_dir / "dilekce_20250322_152940.docx").write_bytes(b"x")
+        (output_dir / "notes.txt").write_bytes(b"x")
+        (storage_dir / "9b10ee37-06ed-4d96-9372-5cb0c05de180.docx").write_bytes(b"x")
+
+        count = index.rebuild([str(output_dir), str(storage_dir), str(tmp_path / "absent")])
+
+        assert count == 3
+        assert index.lookup(doc_id)["template_name"] == "dava_dilekce"
+        assert index.lookup("dilekce_20250322_152940") is not None
+        assert index.lookup("9b10ee37-06ed-4d96-9372-5cb0c05de180")["template_name"] is None
+
+    def test_content_hash_is_recorded_and_backfilled(self, tmp_path):
+        """Registration hashes the file; entries of an older index get their hash on first use"""
+        file_path = tmp_path / "dilekce_abc.docx"
+        file_path.write_bytes(b"docx")
+        db_path = str(tmp_path / "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE document_index (document_id TEXT PRIMARY KEY, path TEXT NOT NULL, "
+                     "template_name TEXT, created_at TEXT)")
+        conn.execute("INSERT INTO document_index VALUES ('old', ?, 'dilekce', '2025-01-01')", (str(file_path),))
+        conn.commit()
+        conn.close()
+
+        index = DocumentIndex(db_path=db_path)
+        try:
+            expected = hashlib.sha256(b"docx").hexdigest()
+            assert index.lookup("old")["content_hash"] is None
+            assert index.content_hash("old") == expected
+            assert index.register("new", str(file_path), "dilekce")["content_hash"] == expected
+            assert index.content_hash("missing") is None
+        finally:
+            index.close()
+
+    def test_recipes_persist_and_survive_rebuild(self, index, tmp_path):
+        """Lazy documents keep their recipe across restarts and are not dropped by a rebuild"""
+        recipe = {"template_name": "dilekce", "template_data": {"konu": "Kira"}, "template_version": "abc",
+                  "document_date": "01/01/2026"}
+        index.register("lazy", str(tmp_path / "dilekce_lazy.docx"), "dilekce", content_hash="h", recipe=recipe)
+
+        other = DocumentIndex(db_path=index.db_path)
+        try:
+            assert other.lookup("lazy")["recipe"] == recipe
+        finally:
+            other.close()
+
+        assert index.rebuild([str(tmp_path / "absent")]) == 0
+        assert index.lookup("lazy")["recipe"] == recipe
+        assert index.content_hash("lazy") == "h"
+
+    def test_cache_is_bounded_and_falls_back_to_sqlite(self, tmp_path):
+        """Only the most recently used entries stay in process; evicted ones are still found"""
+        index = DocumentIndex(db_path=str(tmp_path / "bounded.db"), cache_size=2)
+        try:
+            for document_id in ["a", "b", "c"]:
+                index.register(document_id, str(tmp_path / f"{document_id}.docx"), "dilekce", content_hash="h")
+            assert list(index._cache) == ["b", "c"]
+
+            assert index.lookup("a")["template_name"] == "dilekce"
+            assert list(index._cache) == ["c", "a"]
+        finally:
+            index.close()
@@ -0,0 +1,80 @@
+# tests/services/test_document_layout.py
+import pytest
+from docx import Document
+from app.services.document_generator import DocxRenderer, template_version
+from app.services.document_layout import DocumentLayout, NumberedList, Paragraph, Run, Table, layout_docx, layout_html
+from app.services.docx_html import docx_to_html
+
+
+SAMPLE_DATA = {
+    "kurum": "istanbul valiliği",
+    "konu": "Kira <bedeli> & aidat",
+    "icerik": "Birinci satır\nİkinci satır",
+    "gonderen": "Ayşe Yılmaz",
+    "alici": "Mehmet Demir",
+    "sonuc_talep": "Ödemenin yapılması",
+    "vekil_eden": "Ayşe Yılmaz",
+    "vekil": "Av. Ali Kaya",
+    "yetkiler": ["Dava açmak", "Sulh olmak"],
+    "mahkeme": "istanbul asliye hukuk mahkemesi",
+    "dava_turu": "alacak",
+    "davaci": "Ayşe Yılmaz",
+    "davali": "Mehmet Demir",
+    "deger": 15000,
+    "aciklamalar": "Açıklamalar",
+    "deliller": ["Sözleşme", "Tanık"],
+    "hukuki_sebepler": "TBK",
+    "talep": "Davanın kabulü",
+    "ad_soyad": "Ayşe Yılmaz",
+    "ekler": ["Kira sözleşmesi", "Dekont"],
+}
+
+
+def _saved_html(layout, tmp_path):
+    path = tmp_path / "layout.docx"
+    layout_docx(layout).save(path)
+    return docx_to_html(str(path))
+
+
+class TestDocumentLayout:
+    def test_html_matches_the_converted_docx(self, tmp_path):
+        """Both backends agree: the HTML is what converting the DOCX gives"""
+        layout = DocumentLayout()
+        layout.paragraph(Run("DİLEKÇE", bold=True, size=14), alignment="center")
+        layout.paragraph(Run("Konu: ", bold=True), Run("Kira <bedeli> & aidat", italic=True))
+        layout.blank()
+        layout.paragraph("Satır\r\nsonu\tsekme", alignment="justify")
+        layout.add(NumberedList(["Sözleşme", "Dekont"], label=Run("Ekler:", bold=True)))
+        layout.add(Table([["Davacı", "Ayşe\nYılmaz"], ["Tek"]]))
+        layout.paragraph(Run("İmza", bold=True), alignment="right")
+
+        html = layout_html(layout)
+        assert html == _saved_html(layout, tmp_path)
+        assert "<strong>Ekler:</strong><br>1. Sözleşme<br>2. Dekont" in html
+        assert "<tr><td>Tek</td><td></td></tr>" in html
+
+    def test_generic_layout_renders_the_same_html_as_its_docx(self, tmp_path):
+        """Templates without a compiled file preview exactly as their saved document"""
+        layout = DocxRenderer(str(tmp_path))._layout("kira_sozlesmesi", SAMPLE_DATA)
+        assert layout_html(layout) == _saved_html(layout, tmp_path)
+
+    @pytest.mark.parametrize("template_name", ["dilekce", "ihtarname", "vekaletname", "dava_dilekce"])
+    def test_built_in_templates_are_compiled(self, template_name):
+        """Every built-in template renders from its compiled .docx, never from a layout"""
+        assert template_version(template_name) is not None
+
+    def test_renderer_returns_the_html_of_what_it_saved(self, tmp_path):
+        """Compiled templates and layouts both hand back the preview without rereading the file"""
+        renderer = DocxRenderer(str(tmp_path))
+        for template_name in ["dilekce", "kira_sozlesmesi"]:
+            path, html = renderer.render(template_name, SAMPLE_DATA, "doc-1")
+            assert html == docx_to_html(path)
+            assert "Kira &lt;bedeli&gt; &amp; aidat" in html
+        assert "İSTANBUL VALİLİĞİ" in [p.text for p in Document(str(tmp_path / "dilekce_doc-1.docx")).paragraphs]
+
+    def test_invalid_blocks_are_rejected(self):
+        """Unknown alignments and empty tables fail when the layout is built"""
+        with pytest.raises(ValueError):
+            Paragraph("metin", alignment="middle")
+        with pytest.raises(ValueError):
+            Table([[]])
@@ -0,0 +1,65 @@
+# tests/services/test_docx_html.py
+import zipfile
+import pytest
+from docx import Document
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from app.services.docx_html import docx_to_html, iter_docx_html, open_docx_html_stream, stream_docx_html
+
+
+@pytest.fixture
+def petition(tmp_path):
+    doc = Document()
+    title = doc.add_paragraph()
+    title.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    title.add_run("DİLEKÇE").bold = True
+    body = doc.add_paragraph("Konu: ")
+    body.add_run("Kira <bedeli> & aidat").italic = True
+    doc.add_paragraph()
+    table = doc.add_table(rows=2, cols=2)
+    table.cell(0, 0).text = "Davacı"
+    table.cell(0, 1).text = "Ayşe\nYılmaz"
+    table.cell(1, 0).merge(table.cell(1, 1)).text = "Birleşik"
+    signature = doc.add_paragraph()
+    signature.alignment = WD_ALIGN_PARAGRAPH.RIGHT
+    signature.add_run("İmza").bold = True
+    path = tmp_path / "petition.docx"
+    doc.save(path)
+    return str(path)
+
+
+class TestDocxHtml:
+    def test_body_is_converted_in_document_order(self, petition):
+        """Paragraphs and the table between them come out in order, escaped and formatted"""
+        assert docx_to_html(petition) == (
+            "<div class='document-content'>"
+            "<p style='text-align: center;'><strong>DİLEKÇE</strong></p>"
+            "<p style='text-align: left;'>Konu: <em>Kira &lt;bedeli&gt; &amp; aidat</em></p>"
+            "<p>&nbsp;</p>"
+            "<table class='table table-bordered'>"
+            "<tr><td>Davacı</td><td>Ayşe<br>Yılmaz</td></tr>"
+            "<tr><td colspan='2'>Birleşik</td></tr>"
+            "</table>"
+            "<p style='text-align: right;'><strong>İmza</strong></p>"
+            "</div>"
+        )
+
+    def test_pieces_are_one_per_top_level_element(self, petition):
+        """The sync iterator yields the wrapper and one piece per paragraph or table"""
+        pieces = list(iter_docx_html(petition))
+        assert len(pieces) == 7
+        assert pieces[4].startswith("<table")
+
+    @pytest.mark.asyncio
+    async def test_stream_yields_the_same_html_in_chunks(self, petition):
+        """The async stream joins to the full conversion, chunked by size"""
+        chunks = [chunk async for chunk in stream_docx_html(petition, chunk_chars=100)]
+        assert len(chunks) > 1
+        assert "".join(chunks) == docx_to_html(petition)
+
+    @pytest.mark.asyncio
+    async def test_unreadable_file_fails_before_streaming(self, tmp_path):
+        """A file that is not a DOCX raises when the stream is opened"""
+        broken = tmp_path / "broken.docx"
+        broken.write_bytes(b"not a zip")
+        with pytest.raises(zipfile.BadZipFile):
+            await open_docx_html_stream(str(broken))
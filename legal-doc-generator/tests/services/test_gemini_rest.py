@@ -0,0 +1,78 @@
+# tests/services/test_gemini_rest.py
+import json
+
+import httpx
+import pytest
+from google.api_core import exceptions as google_exceptions
+
+from app.loadtest.fake_gemini import FakeGemini, create_app
+from app.schemas.analysis import GeminiDecisionsSection, GeminiLegalAnalysis
+from app.services.gemini_rest import RestGenerativeModel, response_schema
+
+PROMPT = """Bir hukuk uzmanı olarak, aşağıdaki olay örgüsüne dayalı olarak kapsamlı bir hukuki analiz yap.
+Analiz kategorisi: İş Hukuku (Labor Law)
+
+Olay örgüsü:
+İşverenim kıdem tazminatımı ödemedi.
+
+Aday kanun maddeleri:
+- İş Kanunu Madde 17 (Süreli fesih): Belirsiz süreli iş sözleşmelerinin feshinden önce durumun diğer tarafa bildirilmesi gerekir.
+
+Aday Yargıtay kararları:
+- Yargıtay 9. HD, E. 2015/1 K. 2016/2 (01.02.2016): Kıdem tazminatı ödenmelidir.
+"""
+
+
+def make_model(fake, model_name="gemini-1.5-pro"):
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(fake)), base_url="http://fake")
+    return RestGenerativeModel(model_name, "http://fake", api_key="test", client=client)
+
+
+class TestGeminiRest:
+    def test_response_schema_inlines_definitions(self):
+        """Nested models are inlined and types use the API's upper-case names"""
+        schema = response_schema(GeminiDecisionsSection)
+        assert schema["type"] == "OBJECT"
+        decision = schema["properties"]["relevant_decisions"]["items"]
+        assert decision["type"] == "OBJECT"
+        assert decision["required"] == ["case_number", "date", "summary"]
+        assert "$ref" not in json.dumps(schema)
+
+    @pytest.mark.asyncio
+    async def test_generate_picks_candidates_from_the_prompt(self):
+        """The fake answers with the prompt's candidates, limited to the schema's keys, with usage metadata"""
+        fake = FakeGemini(latency="fixed:0", seed=1)
+        model = make_model(fake)
+        response = await model.generate_content_async(
+            PROMPT, generation_config={"temperature": 0.2, "response_schema": GeminiDecisionsSection})
+        analysis = json.loads(response.text)
+        assert list(analysis) == ["relevant_decisions"]
+        assert analysis["relevant_decisions"][0]["case_number"] == "Yargıtay 9. HD, E. 2015/1 K. 2016/2"
+        assert response.usage_metadata.prompt_token_count > 0
+        assert fake.get_stats()["models"] == {"gemini-1.5-pro": 1}
+        await model.close()
+
+    @pytest.mark.asyncio
+    async def test_stream_reassembles_the_answer(self):
+        """A streamed answer arrives in several chunks that join into the full JSON"""
+        fake = FakeGemini(latency="fixed:0", stream_chunks=4, seed=1)
+        model = make_model(fake)
+        stream = await model.generate_content_async(
+            PROMPT, generation_config={"response_schema": GeminiLegalAnalysis}, stream=True)
+        chunks = [chunk.text async for chunk in stream]
+        assert len(chunks) == 4
+        analysis = json.loads("".join(chunks))
+        assert analysis["relevant_laws"][0]["title"] == "İş Kanunu Madde 17"
+        assert "İş Hukuku" in analysis["summary"]
+        await model.close()
+
+    @pytest.mark.asyncio
+    async def test_error_statuses_map_to_api_core_exceptions(self):
+        """Simulated 503 and 429 answers raise the exceptions the analyzer retries on"""
+        model = make_model(FakeGemini(latency="fixed:0", error_rate=1.0, error_mix="503:1"))
+        with pytest.raises(google_exceptions.ServiceUnavailable, match="Simulated UNAVAILABLE"):
+            await model.generate_content_async(PROMPT)
+        model = make_model(FakeGemini(latency="fixed:0", error_rate=1.0, error_mix="429:1"))
+        with pytest.raises(google_exceptions.TooManyRequests):
+            await model.generate_content_async(PROMPT, stream=True)
+        await model.close()
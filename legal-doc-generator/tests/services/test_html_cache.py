@@ -0,0 +1,70 @@
+# tests/services/test_html_cache.py
+import os
+import pytest
+from app.services.html_cache import HTMLCache, etag_matches, make_etag
+
+
+async def chunks_of(*chunks, error=None):
+    for chunk in chunks:
+        yield chunk
+    if error is not None:
+        raise error
+
+
+class TestHTMLCache:
+    @pytest.fixture
+    def docx_path(self, tmp_path):
+        path = tmp_path / "dilekce_abc.docx"
+        path.write_bytes(b"docx")
+        return str(path)
+
+    def test_etag_matching(self):
+        """If-None-Match matches the ETag in a list, weakly, or with *"""
+        etag = make_etag("ab" * 32)
+        assert etag == f'"{"ab" * 16}-1"'
+        assert etag_matches(etag, etag)
+        assert etag_matches(f'"other", W/{etag}', etag)
+        assert etag_matches("*", etag)
+        assert not etag_matches('"other"', etag)
+        assert not etag_matches(None, etag)
+
+    @pytest.mark.asyncio
+    async def test_memory_hit_then_sidecar_hit_in_another_worker(self, docx_path):
+        """Stored HTML is served from memory, and from the sidecar by a fresh instance"""
+        cache = HTMLCache(memory_bytes=1024, max_entry_bytes=512, enabled=True)
+        assert await cache.get("abc", "hash1", docx_path) == (None, None)
+        await cache.set("abc", "hash1", docx_path, "<p>İçerik</p>")
+        assert await cache.get("abc", "hash1", docx_path) == ("<p>İçerik</p>".encode("utf-8"), None)
+        assert os.path.exists(cache.sidecar_path(docx_path, "hash1"))
+
+        other = HTMLCache(memory_bytes=1024, max_entry_bytes=512, enabled=True)
+        assert (await other.get("abc", "hash1", docx_path))[0] == "<p>İçerik</p>".encode("utf-8")
+        assert await other.get("abc", "hash2", docx_path) == (None, None)
+        metrics = other.get_metrics()
+        assert (metrics["sidecar_hits"], metrics["misses"], metrics["entries"]) == (1, 1, 1)
+
+    @pytest.mark.asyncio
+    async def test_memory_is_bounded_in_bytes(self, docx_path):
+        """Least recently used entries are evicted; oversized ones are only on disk"""
+        cache = HTMLCache(memory_bytes=250, max_entry_bytes=100, enabled=True)
+        for document_id in ("a", "b", "c"):
+            await cache.set(document_id, "hash", docx_path.replace("abc", document_id), "x" * 100)
+        assert cache.get_metrics()["evictions"] == 1
+        assert cache.get_metrics()["memory_bytes"] == 200
+
+        await cache.set("big", "hash", docx_path.replace("abc", "big"), "x" * 101)
+        body, sidecar = await cache.get("big", "hash", docx_path.replace("abc", "big"))
+        assert body is None and sidecar.endswith(".html")
+
+    @pytest.mark.asyncio
+    async def test_stream_is_stored_only_when_complete(self, docx_path):
+        """A completed stream becomes the sidecar; a failed one ends with an error block and leaves nothing"""
+        cache = HTMLCache(memory_bytes=1024, max_entry_bytes=512, enabled=True)
+        failed = [chunk async for chunk in cache.stream_and_store(
+            "abc", "hash", docx_path, chunks_of("<div>", error=ValueError("bozuk")))]
+        assert failed[0] == "<div>" and "bozuk" in failed[1]
+        assert os.listdir(os.path.dirname(docx_path)) == ["dilekce_abc.docx"]
+
+        streamed = [chunk async for chunk in cache.stream_and_store("abc", "hash", docx_path, chunks_of("<div>", "</div>"))]
+        assert streamed == ["<div>", "</div>"]
+        assert await cache.get("abc", "hash", docx_path) == (b"<div></div>", None)
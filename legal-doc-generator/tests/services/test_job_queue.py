@@ -0,0 +1,151 @@
+# tests/services/test_job_queue.py
+import time
+import asyncio
+import pytest
+from app.services.job_queue import JobStore, JobWorkerPool, QUEUED, RUNNING, SUCCEEDED, FAILED
+
+
+class TestJobStore:
+    @pytest.fixture
+    def store(self, tmp_path):
+        store = JobStore(db_path=str(tmp_path / "jobs.db"), lease_seconds=60, max_attempts=2)
+        yield store
+        store.close()
+
+    def test_jobs_are_claimed_once_in_order(self, store):
+        """Each queued job is handed to exactly one worker, oldest first"""
+        first = store.enqueue("ai_document", {"n": 1})
+        second = store.enqueue("ai_document", {"n": 2})
+
+        assert store.claim("a")["id"] == first
+        claimed = store.claim("b")
+        assert claimed["id"] == second
+        assert claimed["payload"] == {"n": 2}
+        assert claimed["status"] == RUNNING
+        assert store.claim("c") is None
+
+    def test_progress_and_result_are_persisted(self, store, tmp_path):
+        """Partial results merge, and the final result survives reopening the database"""
+        job_id = store.enqueue("ai_document", {})
+        store.claim("a")
+        store.report_progress(job_id, "a", {"content": "<p>belge</p>"})
+        store.report_progress(job_id, "a", {"analysis": {"summary": "Özet"}})
+        assert store.complete(job_id, "a", {"document_id": "d1"})
+        store.close()
+
+        job = JobStore(db_path=str(tmp_path / "jobs.db")).get(job_id)
+        assert job["status"] == SUCCEEDED
+        assert job["partial"] == {"content": "<p>belge</p>", "analysis": {"summary": "Özet"}}
+        assert job["result"] == {"document_id": "d1"}
+
+    def test_expired_leases_are_requeued_then_failed(self, store):
+        """A job whose worker died is retried until it runs out of attempts"""
+        store.lease_seconds = -1
+        job_id = store.enqueue("ai_document", {})
+
+        store.claim("a")
+        assert store.recover_expired() == 1
+        assert store.get(job_id)["status"] == QUEUED
+
+        store.claim("b")
+        store.recover_expired()
+        job = store.get(job_id)
+        assert job["status"] == FAILED
+        assert job["attempts"] == 2
+
+    def test_stale_worker_cannot_finish_a_reclaimed_job(self, store):
+        """Once a lease has expired and the job was claimed again, only the new worker's outcome counts"""
+        store.lease_seconds = -1
+        job_id = store.enqueue("ai_document", {})
+        store.claim("slow")
+        store.recover_expired()
+        store.lease_seconds = 60
+        store.claim("fresh")
+
+        assert not store.report_progress(job_id, "slow", {"step": "eski"})
+        assert not store.complete(job_id, "slow", {"document_id": "eski"})
+        assert not store.fail(job_id, "slow", "zaman aşımı")
+        assert store.get(job_id)["status"] == RUNNING
+
+        assert store.complete(job_id, "fresh", {"document_id": "yeni"})
+        assert not store.fail(job_id, "fresh", "tekrar")
+        job = store.get(job_id)
+        assert (job["status"], job["result"], job["partial"]) == (SUCCEEDED, {"document_id": "yeni"}, {})
+
+
+class TestJobWorkerPool:
+    @pytest.mark.asyncio
+    async def test_pool_runs_jobs_and_records_failures(self, tmp_path):
+        """Workers pick up queued jobs, report progress and store results or errors"""
+        store = JobStore(db_path=str(tmp_path / "jobs.db"))
+
+        async def handler(payload, report_progress):
+            if payload.get("fail"):
+                raise ValueError("bozuk istek")
+            report_progress({"step": "render"})
+            await asyncio.sleep(0.01)
+            return {"value": payload["value"] * 2}
+
+        pool = JobWorkerPool(store, {"double": handler}, concurrency=2, poll_interval=0.05)
+        pool.start()
+        try:
+            ok = store.enqueue("double", {"value": 21})
+            bad = store.enqueue("double", {"fail": True})
+            unknown = store.enqueue("other", {})
+            pool.notify()
+
+            deadline = time.monotonic() + 5
+            while time.monotonic() < deadline:
+                if all(store.get(job_id)["status"] in (SUCCEEDED, FAILED) for job_id in (ok, bad, unknown)):
+                    break
+                await pool.wait_for_update(ok, 0.05)
+        finally:
+            await pool.stop()
+
+        job = store.get(ok)
+        assert job["status"] == SUCCEEDED
+        assert job["result"] == {"value": 42}
+        assert job["partial"] == {"step": "render"}
+        assert store.get(bad)["error"] == "bozuk istek"
+        assert store.get(unknown)["status"] == FAILED
+        assert pool.get_metrics()["completed"] == 1
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_expired_leases_are_swept_on_their_own_timer(self, tmp_path):
+        """Idle polls do not sweep for expired leases; the recovery task does, on start and then periodically"""
+        store = JobStore(db_path=str(tmp_path / "jobs.db"))
+        sweeps = []
+        recover_expired = store.recover_expired
+        store.recover_expired = lambda: sweeps.append(time.monotonic()) or recover_expired()
+
+        pool = JobWorkerPool(store, {}, concurrency=2, poll_interval=0.01, recover_interval=0.2)
+        pool.start()
+        try:
+            await asyncio.sleep(0.3)
+            assert pool.get_metrics()["workers"] == 2
+        finally:
+            await pool.stop()
+
+        assert len(sweeps) == 2
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_followers_of_jobs_run_elsewhere_leave_nothing_behind(self, tmp_path):
+        """A process that does not run the job drops its update event once the last waiter times out"""
+        store = JobStore(db_path=str(tmp_path / "jobs.db"))
+        pool = JobWorkerPool(store, {})
+
+        first = asyncio.ensure_future(pool.wait_for_update("elsewhere", 0.05))
+        await asyncio.sleep(0.01)
+        await pool.wait_for_update("elsewhere", 0.01)
+        assert "elsewhere" in pool._updates
+        await first
+        assert pool._updates == {}
+
+        waiter = asyncio.ensure_future(pool.wait_for_update("here", 5))
+        await asyncio.sleep(0.01)
+        pool._updated("here")
+        await asyncio.wait_for(waiter, 1)
+        assert pool._updates == {}
+        store.close()
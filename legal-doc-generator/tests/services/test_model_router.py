@@ -0,0 +1,66 @@
+# tests/services/test_model_router.py
+import pytest
+from app.services.model_router import FAST, PRO, ModelRouter, ModelTier, usage_tokens
+
+
+class NamedModel:
+    def __init__(self, model_name):
+        self.model_name = model_name
+
+
+class Usage:
+    prompt_token_count = 1000
+    candidates_token_count = 500
+
+
+class Response:
+    text = "{}"
+    usage_metadata = Usage()
+
+
+def make_router(**kwargs):
+    fast = ModelTier(FAST, NamedModel("flash"), 1024, 0.1, 0.4)
+    pro = ModelTier(PRO, NamedModel("pro"), 2048, 1.0, 5.0)
+    return ModelRouter(fast, pro, **{"fast_max_chars": 200, "pro_categories": ["ticaret_hukuku"],
+                                     "min_confidence": 0.6, "escalate_on": ["invalid", "repaired"], **kwargs})
+
+
+class TestModelRouter:
+    def test_routing_rule(self):
+        """Short cases the classifier agrees with go fast; long, listed or contradicted ones go pro"""
+        router = make_router()
+        assert router.route("Kiracım kirayı ödemiyor, ihtarname çekmek istiyorum.", "borçlar_hukuku").name == FAST
+        assert router.route("İhtarname nasıl gönderilir?", "borçlar_hukuku").name == FAST
+        assert router.route("Kiracım kirayı ödemiyor. " * 20, "borçlar_hukuku").name == PRO
+        assert router.route("Şirket ortağım fatura kesmiyor.", "ticaret_hukuku").name == PRO
+        assert router.route("İşverenim kıdem tazminatımı ödemedi.", "borçlar_hukuku").name == PRO
+        assert router.get_metrics()["routed"] == {FAST: 2, PRO: 3}
+
+    def test_escalation_rule(self):
+        """Only fast-tier answers with a configured reason are escalated"""
+        router = make_router()
+        complete = {"relevant_laws": [{}], "relevant_decisions": [{}], "metadata": {}}
+        assert router.escalate(router.fast, None) is router.pro
+        assert router.escalate(router.fast, dict(complete, metadata={"repaired": True})) is router.pro
+        assert router.escalate(router.fast, dict(complete, relevant_decisions=[])) is None
+        assert router.escalate(router.fast, complete) is None
+        assert router.escalate(router.pro, None) is None
+        assert router.get_metrics()["escalations"] == {"invalid": 1, "repaired": 1, "missing_sections": 0}
+
+        strict = make_router(escalate_on=["missing_sections"])
+        assert strict.escalate(strict.fast, dict(complete, relevant_decisions=[])) is strict.pro
+        with pytest.raises(ValueError):
+            make_router(escalate_on=["sometimes"])
+
+    def test_tier_accounting(self):
+        """Calls are accounted with tokens from usage metadata, or estimated without it, and priced per tier"""
+        router = make_router()
+        assert usage_tokens(Response(), "prompt") == (1000, 500)
+        assert usage_tokens(object(), "x" * 300, "y" * 30) == (100, 10)
+
+        router.pro.record(0.5, *usage_tokens(Response(), "prompt"))
+        router.pro.record(0.1, error=True)
+        metrics = router.get_metrics()["tiers"][PRO]
+        assert metrics["calls"] == 2 and metrics["errors"] == 1
+        assert metrics["cost_usd"] == pytest.approx(0.0035)
+        assert metrics["call_time_ms"]["max"] == 500.0
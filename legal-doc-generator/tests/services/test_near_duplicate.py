@@ -0,0 +1,67 @@
+# tests/services/test_near_duplicate.py
+import pytest
+from app.services.near_duplicate import NearDuplicateIndex, normalize_case_text
+
+ANALYSIS = {
+    "summary": "Özet",
+    "relevant_laws": [{"title": "TBK Madde 315", "description": "Kiracının temerrüdü"}],
+    "relevant_decisions": [{"case_number": "2018/4567 E, 2019/1234 K", "date": "15.03.2019", "summary": "Karar"}],
+    "recommendations": "Öneriler",
+    "metadata": {"source": "model"},
+}
+
+CASE = ("Kiracım 2023 yılının Mart ayından bu yana aylık 15.000 TL kira bedelini ödemiyor. "
+        "Kendisine noter aracılığıyla ihtarname gönderdim ancak ödeme yapılmadı. "
+        "Tahliye ve birikmiş kira alacağı için dava açmak istiyorum.")
+
+
+class TestNearDuplicateIndex:
+    @pytest.fixture
+    def index(self, tmp_path):
+        index = NearDuplicateIndex(db_path=str(tmp_path / "near.db"), threshold=0.8)
+        yield index
+        index.close()
+
+    def test_normalization_drops_punctuation_and_case(self):
+        """Punctuation, case and whitespace differences disappear"""
+        assert normalize_case_text("  KİRA, bedeli!\nödenmedi. ") == "kira bedeli ödenmedi"
+
+    def test_near_duplicate_is_reused(self, index):
+        """A lightly edited description finds the stored analysis within the same scope"""
+        case_id = index.add(CASE, "borçlar_hukuku", ANALYSIS)
+        edited = CASE.replace("15.000 TL", "15.500 TL").replace("istiyorum", "istiyorum!")
+
+        match = index.find(edited, "borçlar_hukuku")
+        assert match is not None
+        analysis, similarity, source_case_id = match
+        assert source_case_id == case_id
+        assert similarity >= 0.8
+        assert analysis["relevant_laws"] == ANALYSIS["relevant_laws"]
+
+        assert index.find(edited, "iş_hukuku") is None
+        assert index.get_metrics()["reuses"] == 1
+
+    def test_different_case_is_not_reused(self, index):
+        """An unrelated description in the same category does not match"""
+        index.add(CASE, "borçlar_hukuku", ANALYSIS)
+        other = ("İşverenim beni haklı bir neden olmadan işten çıkardı ve kıdem tazminatımı ödemedi. "
+                 "Beş yıldır aynı şirkette çalışıyordum.")
+        assert index.find(other, "borçlar_hukuku") is None
+
+    def test_expired_and_excess_cases_are_purged(self, tmp_path):
+        """Cases past the TTL stop matching, and purge keeps only the newest max_cases"""
+        index = NearDuplicateIndex(db_path=str(tmp_path / "bounded.db"), threshold=0.8, max_cases=2)
+        try:
+            ids = [index.add(CASE + f" Dosya {i}.", "borçlar_hukuku", ANALYSIS) for i in range(4)]
+            assert index.purge() == 2
+            conn = index._connection()
+            assert [row[0] for row in conn.execute("SELECT id FROM cases ORDER BY id")] == ids[2:]
+            assert conn.execute("SELECT MIN(case_id) FROM lsh_buckets").fetchone()[0] == ids[2]
+            assert index.find(CASE, "borçlar_hukuku")[2] in ids[2:]
+
+            index.ttl = 0
+            assert index.find(CASE, "borçlar_hukuku") is None
+            assert index.purge() == 2
+            assert index.get_metrics()["purged"] == 4
+        finally:
+            index.close()
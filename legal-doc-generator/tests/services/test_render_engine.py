@@ -0,0 +1,116 @@
+# tests/services/test_render_engine.py
+import time
+import asyncio
+import threading
+import pytest
+from app.services.render_engine import RenderEngine
+
+_active = 0
+_peak = 0
+_lock = threading.Lock()
+
+
+def _square(value):
+    return value * value
+
+
+def _sleep(seconds):
+    global _active, _peak
+    with _lock:
+        _active += 1
+        _peak = max(_peak, _active)
+    time.sleep(seconds)
+    with _lock:
+        _active -= 1
+    return seconds
+
+
+class TestRenderEngine:
+    @pytest.mark.asyncio
+    async def test_process_pool_returns_result(self):
+        """Jobs run in worker processes and resolve as awaitables"""
+        engine = RenderEngine(pool_size=2, job_timeout=30, use_processes=True)
+        try:
+            results = await asyncio.gather(*(engine.submit(_square, i) for i in range(4)))
+        finally:
+            engine.shutdown()
+
+        assert results == [0, 1, 4, 9]
+        metrics = engine.get_metrics()
+        assert metrics["completed"] == 4
+        assert metrics["render_time_ms"]["count"] == 4
+
+    @pytest.mark.asyncio
+    async def test_pool_is_bounded(self):
+        """No more than pool_size jobs run at once; the rest wait in the queue"""
+        engine = RenderEngine(pool_size=2, job_timeout=30, use_processes=False)
+        try:
+            tasks = [asyncio.create_task(engine.submit(_sleep, 0.05)) for _ in range(6)]
+            await asyncio.sleep(0.01)
+            assert engine.get_metrics()["queue_depth"] == 4
+            await asyncio.gather(*tasks)
+        finally:
+            engine.shutdown()
+
+        assert _peak <= 2
+        assert engine.get_metrics()["queue_depth"] == 0
+
+    @pytest.mark.asyncio
+    async def test_job_timeout(self):
+        """Jobs exceeding the timeout raise TimeoutError and are counted"""
+        engine = RenderEngine(pool_size=1, job_timeout=0.01, use_processes=False)
+        try:
+            with pytest.raises(TimeoutError):
+                await engine.submit(_sleep, 0.2)
+        finally:
+            engine.shutdown()
+
+        assert engine.get_metrics()["timed_out"] == 1
+
+    @pytest.mark.asyncio
+    async def test_timed_out_worker_is_recycled(self):
+        """A stuck worker process is killed so its slot serves the next job, and jobs it broke run again"""
+        engine = RenderEngine(pool_size=2, job_timeout=1, use_processes=True)
+        try:
+            assert await engine.submit(_square, 2) == 4
+            stuck = asyncio.create_task(engine.submit(_sleep, 30))
+            neighbour = asyncio.create_task(engine.submit(_sleep, 0.5))
+            with pytest.raises(TimeoutError):
+                await stuck
+            assert await neighbour == 0.5
+            started = time.perf_counter()
+            assert await engine.submit(_square, 3) == 9
+            assert time.perf_counter() - started < 10
+        finally:
+            engine.shutdown()
+
+        metrics = engine.get_metrics()
+        assert (metrics["timed_out"], metrics["recycled"], metrics["failed"]) == (1, 1, 0)
+
+    @pytest.mark.asyncio
+    async def test_job_cancelled_by_a_recycle_runs_again(self):
+        """A job still queued inside a recycled pool is cancelled there and resubmitted to the new pool"""
+        engine = RenderEngine(pool_size=1, job_timeout=30, use_processes=True)
+        try:
+            executor = engine._get_executor()
+            # Fill the worker and the pool's call queue so the next job stays pending, where it can be cancelled
+            blockers = [executor.submit(_sleep, 30) for _ in range(3)]
+            queued = asyncio.create_task(engine.submit(_square, 3))
+            await asyncio.sleep(0.5)
+            engine._recycle_executor(executor)
+            assert await queued == 9
+            assert all(blocker.done() for blocker in blockers)
+        finally:
+            engine.shutdown()
+
+        assert engine.get_metrics()["failed"] == 0
+
+    def test_semaphore_is_bound_to_the_loop_that_uses_it(self):
+        """The engine can be created outside a loop and used from successive loops"""
+        engine = RenderEngine(pool_size=1, job_timeout=30, use_processes=False)
+        try:
+            assert engine.get_metrics()["queue_depth"] == 0
+            assert asyncio.run(engine.submit(_square, 3)) == 9
+            assert asyncio.run(engine.submit(_square, 4)) == 16
+        finally:
+            engine.shutdown()
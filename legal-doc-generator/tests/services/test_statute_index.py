@@ -0,0 +1,60 @@
+# tests/services/test_statute_index.py
+import json
+import pytest
+from app.services.statute_index import StatuteIndex, build_statute_index
+from app.utils.text import search_terms
+
+ARTICLES = [
+    {"law": "Türk Medeni Kanunu", "law_number": "4721", "article": "166", "heading": "Evlilik birliğinin sarsılması",
+     "text": "Evlilik birliği temelinden sarsılmış olursa, eşlerden her biri boşanma davası açabilir."},
+    {"law": "Türk Medeni Kanunu", "law_number": "4721", "article": "175", "heading": "Yoksulluk nafakası",
+     "text": "Boşanma yüzünden yoksulluğa düşecek taraf, diğer taraftan süresiz olarak nafaka isteyebilir."},
+    {"law": "Türk Borçlar Kanunu", "law_number": "6098", "article": "315", "heading": "Kiracının temerrüdü",
+     "text": "Kiracı muaccel olan kira bedelini ödemezse kiraya veren, kiracıya yazılı olarak bir süre verebilir."},
+    {"law": "İş Kanunu", "law_number": "4857", "article": "17", "heading": "Süreli fesih",
+     "text": "Belirsiz süreli iş sözleşmelerinin feshinden önce durumun diğer tarafa bildirilmesi gerekir."},
+]
+
+
+class TestStatuteIndex:
+    @pytest.fixture
+    def index(self, tmp_path):
+        source = tmp_path / "statutes.jsonl"
+        source.write_text("\n".join(json.dumps(a, ensure_ascii=False) for a in ARTICLES), encoding="utf-8")
+        build_statute_index(str(source), str(tmp_path / "index"))
+        index = StatuteIndex(str(tmp_path / "index"))
+        yield index
+        index.close()
+
+    def test_stemming_matches_inflected_forms(self):
+        """Inflected forms, dotted capitals and missing Turkish letters reduce to the same terms"""
+        assert search_terms("Boşanması, NAFAKASI") == search_terms("bosanma nafaka")
+        assert search_terms("Kiracının kirayı") == ["kirac", "kira"]
+        assert "ve" not in search_terms("kira ve nafaka")
+
+    def test_search_ranks_relevant_articles(self, index):
+        """Articles sharing stemmed terms with the case come first, titled like relevant_laws"""
+        results = index.search("Eşimle boşanmak istiyorum ve nafaka talep ediyorum", limit=2)
+
+        assert [r["title"] for r in results] == ["Türk Medeni Kanunu Madde 175", "Türk Medeni Kanunu Madde 166"]
+        assert results[0]["description"].startswith("Boşanma yüzünden")
+        assert results[0]["score"] > results[1]["score"] > 0
+
+    def test_law_filter_and_no_match(self, index):
+        """A law filter (by name or number) restricts results; unrelated text finds nothing"""
+        assert [r["article"] for r in index.search("kira bedeli fesih", law="6098")] == ["315"]
+        assert [r["article"] for r in index.search("kira bedeli fesih", law="iş kanunu")] == ["17"]
+        assert index.search("uzay gemisi") == []
+
+    def test_rebuild_leaves_open_index_readable(self, index, tmp_path):
+        """A rebuild replaces the files instead of rewriting them, so an open index keeps its old data"""
+        source = tmp_path / "statutes.jsonl"
+        source.write_text(json.dumps(ARTICLES[2], ensure_ascii=False), encoding="utf-8")
+        build_statute_index(str(source), str(tmp_path / "index"))
+
+        assert [r["article"] for r in index.search("boşanma nafaka", limit=2)] == ["175", "166"]
+        rebuilt = StatuteIndex(str(tmp_path / "index"))
+        assert rebuilt.manifest["articles"] == 1
+        assert rebuilt.search("boşanma nafaka") == []
+        rebuilt.close()
+        assert sorted(path.name for path in tmp_path.iterdir()) == ["index", "statutes.jsonl"]
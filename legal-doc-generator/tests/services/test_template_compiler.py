@@ -0,0 +1,61 @@
+# tests/services/test_template_compiler.py
+import io
+import zipfile
+import pytest
+from docx import Document
+from app.core.config import TEMPLATES_DIR
+from app.services.template_compiler import TemplateCache, compile_template
+
+
+@pytest.fixture(scope="module")
+def cache():
+    return TemplateCache(TEMPLATES_DIR).load()
+
+
+class TestTemplateCompiler:
+    def test_builtin_templates_compile(self, cache):
+        """All four built-in templates are compiled from app/templates"""
+        for name in ["dilekce", "ihtarname", "vekaletname", "dava_dilekce"]:
+            assert name in cache
+        assert "konu" in cache.get("dilekce").placeholders
+
+    def test_render_escapes_and_formats_values(self, cache):
+        """Values are XML-escaped, lists numbered and newlines kept as line breaks"""
+        rendered = cache.get("dilekce").render({
+            "kurum": "istanbul valiliği",
+            "konu": "Kira <bedeli> & aidat",
+            "icerik": "Birinci satır\nİkinci satır",
+            "ad_soyad": "Ayşe Yılmaz",
+            "ekler": ["Kira sözleşmesi", "Dekont"],
+        })
+
+        doc = Document(io.BytesIO(rendered))
+        texts = [p.text for p in doc.paragraphs]
+        assert "İSTANBUL VALİLİĞİ" in texts
+        assert "Konu: Kira <bedeli> & aidat" in texts
+        assert "Birinci satır\nİkinci satır" in texts
+        assert "Ekler:\n1. Kira sözleşmesi\n2. Dekont" in texts
+
+    def test_empty_sections_are_removed(self, cache):
+        """Optional sections disappear when their value is empty"""
+        rendered = cache.get("dilekce").render({"kurum": "k", "konu": "k"})
+        texts = [p.text for p in Document(io.BytesIO(rendered)).paragraphs]
+        assert not any("Ekler" in text for text in texts)
+        assert not any("{{" in text for text in texts)
+
+    def test_split_runs_are_merged(self, tmp_path):
+        """A placeholder split across runs by Word is still recognised"""
+        doc = Document()
+        paragraph = doc.add_paragraph()
+        paragraph.add_run("Sayın {{ad_")
+        paragraph.add_run("soyad}}")
+        path = tmp_path / "split.docx"
+        doc.save(str(path))
+
+        template = compile_template(str(path))
+        assert template.placeholders == ["ad_soyad"]
+
+        rendered = template.render({"ad_soyad": "Mehmet"})
+        with zipfile.ZipFile(io.BytesIO(rendered)) as package:
+            assert package.testzip() is None
+        assert Document(io.BytesIO(rendered)).paragraphs[0].text == "Sayın Mehmet"
@@ -0,0 +1,77 @@
+# tests/services/test_vector_index.py
+import numpy as np
+import pytest
+from app.services.vector_index import (
+    FlatVectorIndex,
+    IVFPQVectorIndex,
+    build_vector_index,
+    fuse_rankings,
+    index_vectors,
+    open_vector_index,
+)
+
+TEXTS = [
+    "Evlilik birliği temelinden sarsılmış olursa eşlerden her biri boşanma davası açabilir.",
+    "Boşanma yüzünden yoksulluğa düşecek taraf süresiz olarak nafaka isteyebilir.",
+    "Kiracı muaccel olan kira bedelini ödemezse kiraya veren sözleşmeyi feshedebilir.",
+    "İşçinin iş sözleşmesini haklı nedenle feshetmesi halinde kıdem tazminatı ödenir.",
+]
+
+
+class TestVectorIndex:
+    def test_text_index_finds_similar_documents(self, tmp_path):
+        """Embedded texts are stored as float16 and the closest document ranks first"""
+        meta = build_vector_index(str(tmp_path / "v"), iter(TEXTS), len(TEXTS), dim=64, source="abc")
+        index = open_vector_index(str(tmp_path / "v"))
+
+        assert meta["backend"] == "flat"
+        assert isinstance(index, FlatVectorIndex)
+        assert index.vectors.dtype == np.float16
+        results = index.search_texts(["kira bedeli ödenmedi", "eşimden boşanmak ve nafaka"], 2)
+        assert results[0][0][0] == 2
+        assert results[1][0][0] in (0, 1)
+        assert index.fingerprint == "abc:flat"
+
+    def test_ivfpq_recall_against_exact_search(self, tmp_path):
+        """IVF-PQ answers batched queries with high recall of the exact top-k"""
+        generator = np.random.default_rng(0)
+        centres = generator.standard_normal((20, 32))
+        vectors = centres[generator.integers(20, size=4000)] + 0.3 * generator.standard_normal((4000, 32))
+        index_vectors(str(tmp_path / "flat"), vectors, backend="flat")
+        index_vectors(str(tmp_path / "ivfpq"), vectors, backend="ivfpq", nlist=16, subspaces=8)
+        flat, ivfpq = FlatVectorIndex(str(tmp_path / "flat")), IVFPQVectorIndex(str(tmp_path / "ivfpq"), nprobe=4)
+
+        queries = vectors[:50] / np.linalg.norm(vectors[:50], axis=1, keepdims=True)
+        truth, _ = flat.search(queries, 10)
+        found, scores = ivfpq.search(queries, 10)
+
+        assert found.shape == (50, 10)
+        assert (found[:, 0] == np.arange(50)).all()
+        assert np.all(np.diff(scores, axis=1) <= 1e-6)
+        recall = np.mean([len(set(found[row]) & set(truth[row])) / 10 for row in range(50)])
+        assert recall >= 0.9
+
+    def test_small_corpus_pads_results(self, tmp_path):
+        """Asking for more results than vectors pads with -1"""
+        index_vectors(str(tmp_path / "v"), np.eye(3, 8), backend="flat")
+        ids, _ = open_vector_index(str(tmp_path / "v")).search(np.eye(1, 8), 5)
+        assert ids[0].tolist()[:1] == [0]
+        assert ids[0].tolist()[3:] == [-1, -1]
+
+    def test_rebuild_leaves_open_index_readable(self, tmp_path):
+        """A rebuild replaces the files instead of rewriting the mapped ones, so an open index keeps its vectors"""
+        index_vectors(str(tmp_path / "v"), np.eye(3, 8), backend="flat", source="old")
+        opened = open_vector_index(str(tmp_path / "v"))
+        index_vectors(str(tmp_path / "v"), np.eye(5, 8)[::-1], backend="flat", source="new")
+
+        assert opened.search(np.eye(1, 8), 1)[0][0].tolist() == [0]
+        rebuilt = open_vector_index(str(tmp_path / "v"))
+        assert rebuilt.fingerprint == "new:flat"
+        assert rebuilt.search(np.eye(1, 8), 1)[0][0].tolist() == [4]
+        assert [path.name for path in tmp_path.iterdir()] == ["v"]
+
+    def test_fuse_rankings(self):
+        """Items ranked well by several lists come first"""
+        bm25 = [{"id": 1}, {"id": 2}, {"id": 3}]
+        dense = [{"id": 3}, {"id": 1}, {"id": 4}]
+        assert [item["id"] for item in fuse_rankings([bm25, dense], 3)] == [1, 3, 2]
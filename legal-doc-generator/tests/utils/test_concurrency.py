@@ -0,0 +1,68 @@
+# tests/utils/test_concurrency.py
+import time
+import asyncio
+import pytest
+from app.utils.concurrency import SingleFlight, run_concurrently
+
+
+class TestRunConcurrently:
+    @pytest.mark.asyncio
+    async def test_results_in_order_and_overlapping(self):
+        """Stages overlap, so the total is close to the slowest stage"""
+        async def stage(value, delay):
+            await asyncio.sleep(delay)
+            return value
+
+        started = time.perf_counter()
+        results = await run_concurrently(stage("render", 0.1), stage("analysis", 0.1))
+        elapsed = time.perf_counter() - started
+
+        assert results == ["render", "analysis"]
+        assert elapsed < 0.18
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_the_other_stage(self):
+        """When one stage fails the other is cancelled and the error propagates"""
+        cancelled = asyncio.Event()
+
+        async def slow():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise ValueError("render failed")
+
+        with pytest.raises(ValueError, match="render failed"):
+            await run_concurrently(slow(), failing())
+        assert cancelled.is_set()
+
+
+class TestSingleFlight:
+    @pytest.mark.asyncio
+    async def test_identical_calls_share_one_task(self):
+        """Concurrent calls with the same key run the work once; the leader's cancellation does not cancel it"""
+        flight = SingleFlight()
+        runs = []
+
+        async def work(value):
+            runs.append(value)
+            await asyncio.sleep(0.05)
+            return value
+
+        leader = asyncio.ensure_future(flight.run("a", lambda: work("a")))
+        await asyncio.sleep(0)
+        followers = [flight.run("a", lambda: work("a")) for _ in range(3)]
+        other = flight.run("b", lambda: work("b"))
+        leader.cancel()
+
+        results = await asyncio.gather(*followers, other)
+
+        assert runs == ["a", "b"]
+        assert results == [("a", True), ("a", True), ("a", True), ("b", False)]
+        metrics = flight.get_metrics()
+        assert metrics["coalesced"] == 3
+        assert metrics["in_flight"] == 0
@@ -0,0 +1,40 @@
+# tests/utils/test_index_build.py
+import os
+import pytest
+from app.utils.index_build import build_lock, staged_directory
+
+
+class TestStagedDirectory:
+    def test_files_are_replaced_with_the_manifest_last(self, tmp_path):
+        """Published files replace the old ones by rename; a file that was open keeps its old content"""
+        target = tmp_path / "index"
+        target.mkdir()
+        (target / "data.bin").write_bytes(b"old")
+        (target / "manifest.json").write_text("{}")
+
+        with open(target / "data.bin", "rb") as old:
+            with staged_directory(str(target), last=("manifest.json",)) as staging:
+                assert os.listdir(staging) == []
+                for name in ("manifest.json", "data.bin"):
+                    with open(os.path.join(staging, name), "wb") as f:
+                        f.write(b"new")
+            assert old.read() == b"old"
+
+        assert (target / "data.bin").read_bytes() == b"new"
+        assert (target / "manifest.json").read_bytes() == b"new"
+        assert sorted(os.listdir(tmp_path)) == ["index"]
+
+    def test_failed_build_leaves_the_index_untouched(self, tmp_path):
+        """If the build raises, nothing is published and the staging directory is removed"""
+        target = tmp_path / "index"
+        target.mkdir()
+        (target / "manifest.json").write_text("{}")
+
+        with pytest.raises(ValueError):
+            with build_lock(str(target)):
+                with staged_directory(str(target), last=("manifest.json",)) as staging:
+                    open(os.path.join(staging, "data.bin"), "wb").close()
+                    raise ValueError("bozuk kaynak")
+
+        assert os.listdir(target) == ["manifest.json"]
+        assert sorted(os.listdir(tmp_path)) == ["index", "index.lock"]
@@ -0,0 +1,42 @@
+# tests/utils/test_json_repair.py
+import json
+import pytest
+from app.utils.json_repair import extract_json_object
+
+ANALYSIS = {
+    "summary": "Kiracı \"temerrüt\" halinde {özet}",
+    "relevant_laws": [
+        {"title": "TBK Madde 315", "description": "Kiracının temerrüdü"},
+        {"title": "TBK Madde 352", "description": "Tahliye \\ süre"},
+    ],
+    "recommendations": "İhtarname gönderin",
+}
+
+
+class TestExtractJSONObject:
+    def test_fenced_object_with_prose(self):
+        """Fences and surrounding prose are skipped without repair"""
+        text = "Analiz:\n```json\n" + json.dumps(ANALYSIS, ensure_ascii=False) + "\n```\nBaşka not {x}"
+        assert extract_json_object(text) == (ANALYSIS, False)
+
+    def test_trailing_commas_are_dropped(self):
+        data, repaired = extract_json_object('{"relevant_laws": [{"title": "TBK 315",},], "summary": "x",}')
+        assert data == {"relevant_laws": [{"title": "TBK 315"}], "summary": "x"}
+        assert repaired
+
+    @pytest.mark.parametrize("cut", [1, 10, 25, 60, 90, 120, 150, 180])
+    def test_truncated_output_is_repaired(self, cut):
+        """Any prefix of the object parses into a prefix of the data"""
+        text = json.dumps(ANALYSIS, ensure_ascii=False)[:cut]
+        data, repaired = extract_json_object(text)
+
+        assert repaired
+        assert isinstance(data, dict)
+        for key, value in data.items():
+            if key == "relevant_laws":
+                assert len(value) <= len(ANALYSIS["relevant_laws"])
+            else:
+                assert ANALYSIS[key].startswith(value)
+
+    def test_no_object(self):
+        assert extract_json_object("Üzgünüm, yanıt veremiyorum.") == (None, False)
@@ -0,0 +1,50 @@
+# tests/utils/test_json_stream.py
+import json
+import pytest
+from app.utils.json_stream import IncrementalJSONParser
+
+DOCUMENT = {
+    "summary": "Kiracı \"temerrüt\" halinde {özet}",
+    "relevant_laws": [
+        {"title": "TBK Madde 315", "description": "Kiracının temerrüdü, [süre]"},
+        {"title": "TBK Madde 352", "description": "Tahliye"},
+    ],
+    "relevant_decisions": [],
+    "score": 12.5,
+    "recommendations": "İhtarname gönderin",
+}
+
+
+def parse_in_chunks(text, size):
+    parser = IncrementalJSONParser()
+    events = []
+    for start in range(0, len(text), size):
+        events.extend(parser.feed(text[start:start + size]))
+    return parser, events
+
+
+class TestIncrementalJSONParser:
+    @pytest.mark.parametrize("size", [1, 5, 64, 10000])
+    def test_events_independent_of_chunking(self, size):
+        """Fields and array items are reported once complete, whatever the chunk boundaries"""
+        text = "```json\n" + json.dumps(DOCUMENT, ensure_ascii=False, indent=2) + "\n```"
+        parser, events = parse_in_chunks(text, size)
+
+        assert parser.done
+        assert events == [
+            ("field", "summary", DOCUMENT["summary"]),
+            ("item", "relevant_laws", DOCUMENT["relevant_laws"][0]),
+            ("item", "relevant_laws", DOCUMENT["relevant_laws"][1]),
+            ("end", "relevant_laws", None),
+            ("end", "relevant_decisions", None),
+            ("field", "score", 12.5),
+            ("field", "recommendations", DOCUMENT["recommendations"]),
+        ]
+
+    def test_item_is_emitted_before_the_document_ends(self):
+        """The first law is available while the rest of the response is still streaming"""
+        parser = IncrementalJSONParser()
+        events = parser.feed('{"summary": "Özet", "relevant_laws": [{"title": "TBK 315", "description": "x"}, {"ti')
+
+        assert ("item", "relevant_laws", {"title": "TBK 315", "description": "x"}) in events
+        assert not parser.done
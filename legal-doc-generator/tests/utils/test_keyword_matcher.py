@@ -0,0 +1,16 @@
+# tests/utils/test_keyword_matcher.py
+from app.utils.keyword_matcher import KeywordMatcher, fold_keyword_text
+
+
+class TestKeywordMatcher:
+    def test_turkish_case_folding(self):
+        """Dotted and dotless I fold the Turkish way, and punctuation becomes word boundaries"""
+        assert fold_keyword_text("İŞVEREN'İN  Iğdır'daki") == " isveren in igdir daki "
+        assert fold_keyword_text("") == "  "
+
+    def test_overlapping_keywords_in_one_pass(self):
+        """Stems match inflected words, plain keywords only whole words, and overlaps are all counted"""
+        matcher = KeywordMatcher({"a": ["eş", "boşan*"], "b": ["şan*", "an"], "c": ["boşanma davası"]})
+        assert matcher.scores("Eşimle boşanmak istiyorum") == {"a": 1, "b": 0, "c": 0}
+        assert matcher.scores("EŞ, BOŞANMA DAVASI açtı; şans") == {"a": 2, "b": 1, "c": 1}
+        assert matcher.scores("beş eşya") == {"a": 0, "b": 0, "c": 0}
@@ -0,0 +1,126 @@
+# tests/utils/test_resilience.py
+import time
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+from app.utils.resilience import (
+    CircuitBreaker,
+    CircuitOpenError,
+    Deadline,
+    DeadlineExceededError,
+    RetryPolicy,
+    ServiceUnavailableError,
+)
+
+
+class Transient(Exception):
+    pass
+
+
+def make_policy(**kwargs):
+    options = dict(max_attempts=3, base_delay=0.01, max_delay=0.02,
+                   is_retryable=lambda error: isinstance(error, Transient))
+    options.update(kwargs)
+    return RetryPolicy(**options)
+
+
+class TestRetryPolicy:
+    @pytest.mark.asyncio
+    async def test_retries_transient_errors_then_succeeds(self):
+        """Transient errors are retried with backoff until an attempt succeeds"""
+        attempts = []
+
+        async def flaky():
+            attempts.append(time.perf_counter())
+            if len(attempts) < 3:
+                raise Transient("503")
+            return "ok"
+
+        policy = make_policy()
+        assert await policy.call(flaky, Deadline(5)) == "ok"
+        assert len(attempts) == 3
+        assert policy.get_metrics()["retries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_permanent_errors_are_not_retried(self):
+        """Non-retryable errors are raised unchanged after one attempt"""
+        attempts = []
+
+        async def invalid():
+            attempts.append(1)
+            raise ValueError("400")
+
+        with pytest.raises(ValueError):
+            await make_policy().call(invalid, Deadline(5))
+        assert len(attempts) == 1
+
+    @pytest.mark.asyncio
+    async def test_deadline_bounds_total_time(self):
+        """Slow attempts are cut off at the deadline instead of being repeated"""
+        async def hang():
+            await asyncio.sleep(10)
+
+        policy = make_policy(max_attempts=5, attempt_timeout=None)
+        started = time.perf_counter()
+        with pytest.raises(DeadlineExceededError):
+            await policy.call(hang, Deadline(0.1))
+        assert time.perf_counter() - started < 0.5
+
+    @pytest.mark.asyncio
+    async def test_slot_wait_is_not_an_attempt(self):
+        """The attempt timeout starts once the slot is held; a deadline lost in the queue is not a service failure"""
+        calls = []
+
+        @asynccontextmanager
+        async def slow_slot(deadline):
+            await asyncio.sleep(0.1)
+            yield
+
+        async def answer():
+            calls.append(1)
+            return "ok"
+
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=1, open_seconds=10)
+        policy = make_policy(attempt_timeout=0.05)
+        assert await policy.call(answer, Deadline(5), breaker, slot=slow_slot) == "ok"
+        with pytest.raises(DeadlineExceededError):
+            await policy.call(answer, Deadline(0.05), breaker, slot=slow_slot)
+        assert len(calls) == 1
+        assert breaker.get_metrics()["recent_failure_rate"] == 0.0
+
+    @pytest.mark.asyncio
+    async def test_exhausted_attempts(self):
+        """Running out of attempts raises ServiceUnavailableError"""
+        async def down():
+            raise Transient("503")
+
+        with pytest.raises(ServiceUnavailableError):
+            await make_policy().call(down, Deadline(5))
+
+
+class TestCircuitBreaker:
+    @pytest.mark.asyncio
+    async def test_opens_fails_fast_and_recovers(self):
+        """The breaker opens on a high error rate, rejects calls, then closes after a good probe"""
+        breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, open_seconds=0.05)
+        policy = make_policy(max_attempts=1)
+        healthy = False
+
+        async def call():
+            if not healthy:
+                raise Transient("503")
+            return "ok"
+
+        for _ in range(4):
+            with pytest.raises(ServiceUnavailableError):
+                await policy.call(call, Deadline(5), breaker)
+        assert breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            await policy.call(call, Deadline(5), breaker)
+
+        await asyncio.sleep(0.06)
+        healthy = True
+        assert await policy.call(call, Deadline(5), breaker) == "ok"
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.get_metrics()["rejected"] == 1
@@ -0,0 +1,23 @@
+# tests/utils/test_zip_stream.py
+import io
+import zipfile
+from app.utils.zip_stream import ZipStream
+
+
+class TestZipStream:
+    def test_members_are_handed_out_as_they_are_added(self):
+        """Each add returns that member's bytes; the pieces concatenate into a valid archive"""
+        archive = ZipStream()
+        first = archive.add("0001_dilekçe.docx", b"PK" * 1000, compress=False)
+        second = archive.add("manifest.json", b'{"failed": 0}' * 100)
+        end = archive.close()
+
+        assert len(first) > 2000 and len(second) < 1000
+        assert archive.members == 2
+        assert archive.bytes_written == len(first + second + end)
+
+        with zipfile.ZipFile(io.BytesIO(first + second + end)) as result:
+            assert result.testzip() is None
+            assert result.getinfo("0001_dilekçe.docx").compress_type == zipfile.ZIP_STORED
+            assert result.getinfo("manifest.json").compress_type == zipfile.ZIP_DEFLATED
+            assert result.read("0001_dilekçe.docx") == b"PK" * 1000